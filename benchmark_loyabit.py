@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark del cobro con fidelidad (Loyabit) contra el simulador local.
+
+Levanta simulador_loyabit.py en el mismo proceso (o usa uno externo con --url),
+apunta el cliente de Loyabit a él y ejecuta, desde varias cajas concurrentes,
+el camino de loyabit_service que toca un cobro con cliente registrado:
+
+1. info_cliente: consulta del cliente y sus puntos al identificarlo
+2. info_cliente_repetida: la misma consulta durante el cobro (debe salir de caché)
+3. acumular_puntos: acumulación en el saldo local + bandeja de salida
+
+Al terminar vacía la bandeja de salida con el despachador (despacho_lote) para
+medir cuánto tarda en confirmarse todo en Loyabit.
+
+Usa la base de datos configurada en .env: toma clientes con loyabit_id y les
+acumula puntos reales. Ejecutarlo sólo sobre una base de pruebas (por ejemplo
+una generada con generar_datos_volumen.py). Con --vincular primero se vinculan
+contra el simulador los clientes pendientes (escribe loyabit_id).
+
+Uso:
+    python benchmark_loyabit.py --cajas 8 --duracion 30
+    python benchmark_loyabit.py --latencia 120 --jitter 60 --errores 0.05 --salida loyabit.json
+    python benchmark_loyabit.py --latencia 120 --comparar loyabit.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from prueba_carga import Metricas, construir_reporte, imprimir_reporte
+from simulador_loyabit import SimuladorLoyabit
+
+
+def configurar_entorno(url: str):
+    """El cliente de Loyabit lee su configuración al crearse: debe hacerse antes de usar los servicios"""
+    os.environ["LOYABIT_BASE_URL"] = url
+    os.environ["LOYABIT_API_KEY"] = os.environ.get("LOYABIT_API_KEY") or "simulador"
+    os.environ["LOYABIT_API_SECRET"] = os.environ.get("LOYABIT_API_SECRET") or "simulador"
+    # El benchmark despacha la bandeja por su cuenta
+    os.environ["LOYABIT_OUTBOX_DESPACHADOR"] = "0"
+    load_dotenv()
+
+
+def clientes_vinculados(limite: int):
+    from database.conexion import conectar
+
+    conexion = conectar()
+    if not conexion:
+        return None
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            SELECT id_cliente FROM clientes
+            WHERE loyabit_id IS NOT NULL AND loyabit_sincronizado = TRUE
+            ORDER BY id_cliente
+            LIMIT %s
+        """, (limite,))
+        return [fila[0] for fila in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conexion.close()
+
+
+def ejecutar_caja(clientes, metricas: Metricas, fin: float, puntos_por_cobro: float):
+    from services.loyabit_service import obtener_info_cliente_loyabit, agregar_puntos_loyabit
+
+    def medir(paso, funcion, *args):
+        inicio = time.perf_counter()
+        ok = False
+        try:
+            resultado = funcion(*args)
+            ok = isinstance(resultado, dict) and "error" not in resultado
+            if ok and resultado.get("degradado"):
+                metricas.registrar(f"{paso}_degradado", time.perf_counter() - inicio, True)
+        except Exception:
+            pass
+        metricas.registrar(paso, time.perf_counter() - inicio, ok)
+        return ok
+
+    while time.time() < fin:
+        id_cliente = random.choice(clientes)
+        inicio = time.perf_counter()
+        ok = medir("info_cliente", obtener_info_cliente_loyabit, id_cliente)
+        ok = medir("info_cliente_repetida", obtener_info_cliente_loyabit, id_cliente) and ok
+        ok = medir(
+            "acumular_puntos", agregar_puntos_loyabit,
+            id_cliente, puntos_por_cobro, "Benchmark", f"benchmark-{uuid.uuid4()}"
+        ) and ok
+        metricas.registrar("cobro_total", time.perf_counter() - inicio, ok)
+        if ok:
+            metricas.pedido_completado()
+
+
+def vaciar_bandeja(metricas: Metricas, limite_segundos: float):
+    """Despacha la bandeja de salida hasta vaciarla; retorna (eventos enviados, segundos)"""
+    from services.loyabit_outbox_service import despachar_lote
+
+    inicio = time.time()
+    enviados = 0
+    while time.time() - inicio < limite_segundos:
+        inicio_lote = time.perf_counter()
+        resumen = despachar_lote()
+        metricas.registrar("despacho_lote", time.perf_counter() - inicio_lote, "error" not in resumen)
+        if "error" in resumen:
+            print(f"⚠️  {resumen['error']}")
+            break
+        if not resumen.get("reclamados"):
+            if resumen.get("mensaje"):
+                print(f"⚠️  {resumen['mensaje']}")
+            break
+        enviados += resumen.get("enviados", 0)
+    return enviados, time.time() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del cobro con Loyabit contra el simulador local")
+    parser.add_argument("--url", help="URL de un simulador ya levantado (por omisión se levanta uno)")
+    parser.add_argument("--cajas", type=int, default=8, help="Cajas (hilos) cobrando a la vez")
+    parser.add_argument("--duracion", type=int, default=30, help="Duración de la prueba en segundos")
+    parser.add_argument("--clientes", type=int, default=200, help="Clientes distintos a usar")
+    parser.add_argument("--puntos", type=float, default=10, help="Puntos acumulados por cobro")
+    parser.add_argument("--latencia", type=float, default=80, help="Latencia base del simulador (ms)")
+    parser.add_argument("--jitter", type=float, default=40, help="Latencia aleatoria adicional (ms)")
+    parser.add_argument("--errores", type=float, default=0, help="Fracción de respuestas 503")
+    parser.add_argument("--lentas", type=float, default=0, help="Fracción de respuestas lentas")
+    parser.add_argument("--lentitud", type=float, default=5000, help="Duración de una respuesta lenta (ms)")
+    parser.add_argument("--vincular", action="store_true",
+                        help="Vincular primero los clientes pendientes contra el simulador (escribe loyabit_id)")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla para reproducir la mezcla")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el resultado")
+    parser.add_argument("--comparar", help="Archivo JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    if args.semilla is not None:
+        random.seed(args.semilla)
+
+    simulador = None
+    url = args.url
+    if not url:
+        simulador = SimuladorLoyabit(args.latencia, args.jitter, args.errores, args.lentas, args.lentitud,
+                                     semilla=args.semilla)
+        url = simulador.iniciar()
+    configurar_entorno(url.rstrip("/"))
+    print(f"🧪 Simulador de Loyabit en {url}")
+
+    if args.vincular:
+        from services.loyabit_sincronizacion_service import sincronizar_clientes_pendientes
+        print("🔄 Vinculando clientes pendientes contra el simulador...")
+        resultado = sincronizar_clientes_pendientes(limite=args.clientes)
+        print(f"   Vinculados: {resultado.get('vinculados', 0)}  Errores: {resultado.get('errores', 0)}")
+
+    clientes = clientes_vinculados(args.clientes)
+    if clientes is None:
+        print("❌ Error: No se pudo conectar a la base de datos")
+        sys.exit(1)
+    if not clientes:
+        print("❌ No hay clientes vinculados con Loyabit (use --vincular sobre una base de pruebas)")
+        sys.exit(1)
+    print(f"✅ {len(clientes)} clientes vinculados")
+    print(f"⏱️  Ejecutando {args.cajas} cajas durante {args.duracion} s...")
+
+    metricas = Metricas()
+    inicio = time.time()
+    fin = inicio + args.duracion
+    with ThreadPoolExecutor(max_workers=args.cajas) as executor:
+        for _ in range(args.cajas):
+            executor.submit(ejecutar_caja, clientes, metricas, fin, args.puntos)
+    duracion_real = time.time() - inicio
+
+    print("📤 Vaciando la bandeja de salida...")
+    enviados, segundos_despacho = vaciar_bandeja(metricas, max(60, args.duracion * 2))
+
+    reporte = construir_reporte(metricas, duracion_real, args.cajas)
+    from services.loyabit_service import obtener_metricas_loyabit
+    reporte["despacho"] = {
+        "eventos_enviados": enviados,
+        "segundos": round(segundos_despacho, 2),
+        "eventos_por_segundo": round(enviados / segundos_despacho, 2) if segundos_despacho else 0,
+    }
+    reporte["loyabit"] = obtener_metricas_loyabit()
+    if simulador:
+        reporte["simulador"] = simulador.resumen()
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+
+    imprimir_reporte(reporte, anterior)
+    print(f"📤 Despacho: {enviados} eventos en {reporte['despacho']['segundos']} s "
+          f"({reporte['despacho']['eventos_por_segundo']} por segundo)")
+    print(f"🔌 Circuito: {reporte['loyabit']['circuito']['estado']}  "
+          f"Caché: {reporte['loyabit']['cache_info_clientes']}")
+    if simulador:
+        print(f"🧪 Simulador: {reporte['simulador']['peticiones']} peticiones, "
+              f"{reporte['simulador']['errores_inyectados']} errores y "
+              f"{reporte['simulador']['lentas_inyectadas']} lentas inyectadas, "
+              f"{reporte['simulador']['duplicados']} duplicados por Idempotency-Key")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False, default=str)
+        print(f"💾 Resultado guardado en {args.salida}")
+
+    if simulador:
+        simulador.detener()
+
+
+if __name__ == "__main__":
+    main()
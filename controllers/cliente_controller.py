@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from schemas.cliente_schema import ClienteBase, ClienteUpdate, VisitaClienteCreate
 from services.cliente_service import (
     crear_cliente_service,
@@ -7,9 +7,13 @@ from services.cliente_service import (
     editar_cliente_service,
     registrar_visita_service,
     ver_visitas_cliente_service,
-    contar_visitas_cliente_service
+    contar_visitas_cliente_service,
+    buscar_clientes_service,
+    ver_historial_visitas_service,
+    reconciliar_visitas_clientes_service
 )
 from utils.auth import get_current_user, require_role
+from typing import Optional
 
 router = APIRouter()
 
@@ -23,6 +27,15 @@ async def listar_clientes(current_user: dict = Depends(get_current_user)):
     """Listar todos los clientes"""
     return ver_todos_clientes_service()
 
+@router.get("/buscar_clientes")
+async def buscar_clientes(
+    q: str = Query(..., min_length=2, description="Celular, correo o nombre (prefijo)"),
+    limite: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """Buscar clientes por celular, correo o nombre para asociarlos a una venta"""
+    return buscar_clientes_service(q, limite)
+
 @router.get("/ver_cliente/{id_cliente}")
 async def ver_cliente_by_id(
     id_cliente: int,
@@ -61,5 +74,27 @@ async def contar_visitas_cliente(
     id_cliente: int,
     current_user: dict = Depends(get_current_user)
 ):
-    """Contar el total de visitas de un cliente"""
-    return contar_visitas_cliente_service(id_cliente)
\ No newline at end of file
+    """Total de visitas y última visita de un cliente (contadores, sin recorrer el historial)"""
+    return contar_visitas_cliente_service(id_cliente)
+
+@router.get("/historial_visitas/{id_cliente}")
+async def ver_historial_visitas(
+    id_cliente: int,
+    limite: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Valor 'siguiente' de la página anterior"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Historial de visitas paginado, de la más reciente a la más antigua"""
+    return ver_historial_visitas_service(id_cliente, limite, cursor)
+
+@router.post("/reconciliar_visitas")
+async def reconciliar_visitas(
+    id_cliente: Optional[int] = None,
+    en_segundo_plano: bool = False,
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """
+    Recalcular los contadores de visitas desde el historial (todos los clientes o uno).
+    Con `en_segundo_plano=true` se encola y responde con el `id_trabajo`.
+    """
+    return reconciliar_visitas_clientes_service(id_cliente, en_segundo_plano)
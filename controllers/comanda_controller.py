@@ -5,7 +5,8 @@ from services.comanda_service import (
     ver_comanda_by_id_service,
     ver_comandas_por_estado_service,
     actualizar_estado_comanda_service,
-    ver_todas_comandas_service
+    ver_todas_comandas_service,
+    ver_cola_cocina_service
 )
 from utils.auth import require_role, get_current_user
 
@@ -60,6 +61,16 @@ async def listar_comandas(
         return ver_comandas_por_estado_service(estado)
     return ver_todas_comandas_service()
 
+@router.get("/cola_cocina", summary="Tablero de cocina")
+async def cola_cocina(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Comandas abiertas (`pendiente` y `en_preparacion`) en orden de llegada, con sus
+    productos y los datos del pedido, leídas de la cola de cocina en una sola consulta.
+    """
+    return ver_cola_cocina_service()
+
 @router.put("/actualizar_estado_comanda/{id_comanda}", summary="Actualizar estado de comanda")
 async def actualizar_estado_comanda(
     id_comanda: int,
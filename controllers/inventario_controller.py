@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from schemas.inventario_schema import InsumoCreate, InsumoUpdate, MovimientoInventarioCreate
 from services.inventario_service import (
     crear_insumo_service,
@@ -7,7 +7,8 @@ from services.inventario_service import (
     editar_insumo_service,
     restar_insumo_service,
     registrar_movimiento_service,
-    obtener_insumos_bajo_stock_service
+    obtener_insumos_bajo_stock_service,
+    buscar_insumos_service
 )
 from utils.auth import require_role, get_current_user
 
@@ -26,6 +27,15 @@ async def listar_insumos(current_user: dict = Depends(get_current_user)):
     """Listar todos los insumos activos"""
     return ver_todos_insumos_service()
 
+@router.get("/buscar_insumos")
+async def buscar_insumos(
+    q: str = Query("", description="Texto a buscar (sin importar acentos ni mayúsculas)"),
+    limite: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """Autocompletar insumos activos por nombre, ordenados por relevancia"""
+    return buscar_insumos_service(q, limite)
+
 @router.get("/ver_insumo/{id_insumo}")
 async def ver_insumo_by_id(
     id_insumo: int,
@@ -1,34 +1,53 @@
 """
 Controlador para integración con Loyabit
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Header
+from typing import Optional
 from schemas.loyabit_schema import (
     LoyabitSincronizarCliente, LoyabitAgregarPuntos, LoyabitCanjearPuntos
 )
 from services.loyabit_service import (
     registrar_cliente_en_loyabit,
+    encolar_registro_cliente_loyabit,
     obtener_info_cliente_loyabit,
     sincronizar_cliente_con_loyabit,
     agregar_puntos_loyabit,
-    canjear_puntos_loyabit
+    canjear_puntos_loyabit,
+    obtener_metricas_loyabit,
+    obtener_saldo_puntos_cliente,
+    reintentar_eventos_loyabit,
+    procesar_webhook_loyabit
+)
+from services.loyabit_sincronizacion_service import (
+    iniciar_sincronizacion_masiva,
+    obtener_estado_sincronizacion
 )
 from utils.auth import require_role, get_current_user
 
 router = APIRouter()
 
+# Los handlers son `def` (no `async def`): el cliente de Loyabit es bloqueante
+# (requests, reintentos con time.sleep, plazo total de varios segundos) y así
+# FastAPI los corre en su threadpool en lugar de detener el event loop.
+# El webhook sí es async porque sólo lee el cuerpo e invalida la caché.
+
 @router.post("/registrar_cliente/{id_cliente}")
-async def registrar_cliente_loyabit(
+def registrar_cliente_loyabit(
     id_cliente: int,
+    en_segundo_plano: bool = False,
     current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
 ):
     """
     Registra un cliente en Loyabit.
     Si el cliente ya existe en Loyabit (por email), solo lo vincula.
+    Con `en_segundo_plano=true` se encola (con reintentos) y responde con el `id_trabajo`.
     """
+    if en_segundo_plano:
+        return encolar_registro_cliente_loyabit(id_cliente)
     return registrar_cliente_en_loyabit(id_cliente)
 
 @router.get("/info_cliente/{id_cliente}")
-async def obtener_info_cliente(
+def obtener_info_cliente(
     id_cliente: int,
     current_user: dict = Depends(get_current_user)
 ):
@@ -39,7 +58,7 @@ async def obtener_info_cliente(
     return obtener_info_cliente_loyabit(id_cliente)
 
 @router.post("/sincronizar_cliente")
-async def sincronizar_cliente(
+def sincronizar_cliente(
     datos: LoyabitSincronizarCliente,
     current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
 ):
@@ -53,34 +72,97 @@ async def sincronizar_cliente(
         datos.forzar_sincronizacion
     )
 
+@router.post("/sincronizar_pendientes")
+def sincronizar_pendientes(
+    tamano_lote: int = Query(100, ge=1, le=1000),
+    concurrencia: int = Query(8, ge=1, le=32),
+    limite: Optional[int] = Query(None, ge=1, description="Máximo de clientes a procesar"),
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """
+    Vincula con Loyabit todos los clientes con `loyabit_sincronizado = FALSE`.
+    Corre en segundo plano; el avance se consulta en `/sincronizar_pendientes/estado`.
+    Se puede volver a lanzar tras una interrupción: continúa con los que faltan.
+    """
+    return iniciar_sincronizacion_masiva(tamano_lote, concurrencia, limite)
+
+@router.get("/sincronizar_pendientes/estado")
+def estado_sincronizacion(
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """Avance de la sincronización masiva en este proceso"""
+    return obtener_estado_sincronizacion()
+
 @router.post("/agregar_puntos")
-async def agregar_puntos(
+def agregar_puntos(
     datos: LoyabitAgregarPuntos,
     current_user: dict = Depends(require_role(["vendedor", "administrador", "superadministrador"]))
 ):
     """
-    Agrega puntos a un cliente en Loyabit.
+    Agrega puntos a un cliente.
     Útil después de una compra para acumular puntos de fidelidad.
+    Se aplican al saldo local al instante y se envían a Loyabit en segundo plano.
     """
     return agregar_puntos_loyabit(
         datos.id_cliente,
         datos.puntos,
-        datos.motivo
+        datos.motivo,
+        datos.clave_idempotencia
     )
 
 @router.post("/canjear_puntos")
-async def canjear_puntos(
+def canjear_puntos(
     datos: LoyabitCanjearPuntos,
     current_user: dict = Depends(require_role(["vendedor", "administrador", "superadministrador"]))
 ):
     """
-    Canjea puntos de un cliente en Loyabit.
+    Canjea puntos de un cliente.
     Útil cuando un cliente usa sus puntos para obtener un descuento o premio.
+    Se valida contra el saldo local y se envía a Loyabit en segundo plano.
     """
     return canjear_puntos_loyabit(
         datos.id_cliente,
         datos.puntos,
-        datos.motivo
+        datos.motivo,
+        datos.clave_idempotencia
     )
 
+@router.get("/metricas")
+def metricas_loyabit(
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """
+    Métricas de las llamadas a Loyabit en este proceso:
+    llamadas, errores, reintentos y latencia (promedio, p50, p95, máximo) por operación.
+    """
+    return obtener_metricas_loyabit()
+
+@router.get("/saldo_puntos/{id_cliente}")
+def saldo_puntos(
+    id_cliente: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Saldo de puntos del cliente según el registro local.
+    Incluye los movimientos que aún no confirma Loyabit (`puntos_por_confirmar`).
+    """
+    return obtener_saldo_puntos_cliente(id_cliente)
 
+@router.post("/reintentar_eventos")
+def reintentar_eventos(
+    id_cliente: Optional[int] = None,
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """Vuelve a encolar los movimientos que Loyabit rechazó o que agotaron sus reintentos"""
+    return reintentar_eventos_loyabit(id_cliente)
+
+@router.post("/webhook")
+async def webhook_loyabit(
+    request: Request,
+    x_loyabit_signature: Optional[str] = Header(None)
+):
+    """
+    Webhook de Loyabit (sin JWT; se valida la firma HMAC del cuerpo).
+    Invalida la información en caché del cliente afectado.
+    """
+    return procesar_webhook_loyabit(await request.body(), x_loyabit_signature)
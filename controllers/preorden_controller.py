@@ -5,6 +5,7 @@ from schemas.preorden_schema import (
 from services.preorden_service import (
     crear_preorden_service,
     ver_preorden_by_id_service,
+    ver_preorden_por_ticket_service,
     ver_preordenes_por_estado_service,
     ver_preordenes_pendientes_service,
     actualizar_preorden_service,
@@ -53,6 +54,19 @@ async def ver_preorden_by_id(
     """
     return ver_preorden_by_id_service(id_preorden)
 
+@router.get("/ver_preorden_por_ticket/{ticket_id}", summary="Buscar pre-orden por ticket")
+async def ver_preorden_por_ticket(
+    ticket_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Obtener una pre-orden a partir de su ticket_id (ej. TICKET-20250101-093000-AB12CD34EF56).
+    
+    Útil en caja para localizar el pedido escaneando o tecleando el ticket.
+    La búsqueda usa el índice único sobre `ticket_id`.
+    """
+    return ver_preorden_por_ticket_service(ticket_id)
+
 @router.get("/ver_preordenes", summary="Listar pre-órdenes")
 async def listar_preordenes(
     estado: EstadoPreordenEnum = Query(None, description="Filtrar por estado de la pre-orden"),
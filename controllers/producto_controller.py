@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form, Response
+from fastapi import APIRouter, Depends, File, UploadFile, Form, Response, Query
 from schemas.producto_schema import ProductoCreate, ProductoUpdate
 from services.producto_service import (
     crear_producto_service,
@@ -6,8 +6,10 @@ from services.producto_service import (
     ver_producto_by_id_service,
     editar_producto_service,
     eliminar_producto_service,
-    obtener_imagen_producto_service
+    obtener_imagen_producto_service,
+    buscar_productos_service
 )
+from services.catalogo_service import importar_catalogo_service
 from utils.auth import require_role, get_current_user
 from typing import Optional
 from decimal import Decimal
@@ -64,9 +66,29 @@ async def listar_productos():
     **ENDPOINT PÚBLICO** - Listar todos los productos activos.
     
     No requiere autenticación. Usado por la página web para mostrar el menú.
+    
+    Cada producto incluye:
+    - `disponibles`: cuántas unidades se pueden preparar con el stock actual
+      (`null` si el producto no tiene receta)
+    - `agotado`: `true` si algún insumo de la receta ya no alcanza para una unidad
     """
     return ver_todos_productos_service()
 
+@router.get("/buscar_productos")
+async def buscar_productos(
+    q: str = Query("", description="Texto a buscar en el nombre (sin importar acentos ni mayúsculas)"),
+    categoria: Optional[str] = Query(None, description="Filtrar por categoría"),
+    limite: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Búsqueda rápida de productos activos para el POS.
+    
+    Responde desde un índice en memoria. Incluye `categorias` con el número de
+    coincidencias por categoría, y `agotado`/`disponibles` en cada producto.
+    """
+    return buscar_productos_service(q, categoria, limite)
+
 @router.get("/ver_producto/{id_producto}")
 async def ver_producto_by_id(
     id_producto: int,
@@ -158,6 +180,22 @@ async def editar_producto(
     
     return await editar_producto_service(id_producto, producto_update, imagen, eliminar_imagen)
 
+@router.post("/importar_catalogo")
+async def importar_catalogo(
+    archivo: UploadFile = File(..., description="CSV (una fila por línea de receta) o JSON"),
+    solo_validar: bool = Form(False),
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """
+    Importación masiva de productos con sus recetas.
+    
+    Valida todo el archivo antes de escribir: si alguna fila tiene errores no se
+    importa nada. Los productos existentes (por nombre) se actualizan y los insumos
+    que no existen se crean. Con `solo_validar` sólo devuelve el reporte.
+    """
+    contenido = await archivo.read()
+    return importar_catalogo_service(contenido, archivo.filename, solo_validar)
+
 @router.delete("/eliminar_producto/{id_producto}")
 async def eliminar_producto(
     id_producto: int,
@@ -48,6 +48,7 @@ async def obtener_productos_mas_vendidos(
 @router.get("/compras_recomendadas", summary="Análisis de compras recomendadas")
 async def obtener_compras_recomendadas(
     meses_analisis: int = Query(3, description="Número de meses históricos a analizar"),
+    en_segundo_plano: bool = Query(False, description="Encolar el análisis y responder con el id_trabajo"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -61,6 +62,8 @@ async def obtener_compras_recomendadas(
     - Proyección de consumo del siguiente mes
     
     Retorna recomendaciones ordenadas por urgencia (alta, media, baja).
+    Con `en_segundo_plano=true` responde de inmediato con el `id_trabajo`; el
+    resultado se consulta en `/api/trabajos/ver_trabajo/{id_trabajo}`.
     """
-    return analizar_compras_recomendadas_service(meses_analisis)
+    return analizar_compras_recomendadas_service(meses_analisis, en_segundo_plano)
 
@@ -0,0 +1,74 @@
+"""
+Controlador de la cola de trabajos en segundo plano
+"""
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from schemas.trabajo_schema import TrabajoCreate
+from services.trabajos_service import (
+    encolar,
+    tipos_registrados,
+    ver_trabajo_service,
+    listar_trabajos_service,
+    resumen_trabajos_service,
+    cancelar_trabajo_service,
+    reintentar_trabajo_service
+)
+from utils.auth import require_role, get_current_user
+
+router = APIRouter()
+
+@router.post("/encolar")
+async def encolar_trabajo(
+    trabajo: TrabajoCreate,
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """
+    Encola un trabajo y responde de inmediato con su `id_trabajo`.
+    El avance se consulta en `/api/trabajos/ver_trabajo/{id_trabajo}`.
+    """
+    return encolar(
+        trabajo.tipo, trabajo.parametros, trabajo.retraso_segundos, trabajo.prioridad,
+        trabajo.clave_unica, trabajo.recurrente_cada, trabajo.max_intentos
+    )
+
+@router.get("/tipos")
+async def ver_tipos(current_user: dict = Depends(require_role(["administrador", "superadministrador"]))):
+    """Tipos de trabajo disponibles, con su concurrencia e intentos máximos"""
+    return tipos_registrados()
+
+@router.get("/ver_trabajo/{id_trabajo}")
+async def ver_trabajo(id_trabajo: int, current_user: dict = Depends(get_current_user)):
+    """Estado, intentos, último error y resultado de un trabajo"""
+    return ver_trabajo_service(id_trabajo)
+
+@router.get("/ver_trabajos")
+async def ver_trabajos(
+    estado: Optional[str] = Query(None, description="pendiente, en_proceso, completado, error o cancelado"),
+    tipo: Optional[str] = None,
+    limite: int = Query(50, ge=1, le=500),
+    antes_de_id: Optional[int] = Query(None, description="Paginación: id_trabajo del último de la página anterior"),
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """Trabajos más recientes primero"""
+    return listar_trabajos_service(estado, tipo, limite, antes_de_id)
+
+@router.get("/resumen")
+async def resumen(current_user: dict = Depends(require_role(["administrador", "superadministrador"]))):
+    """Conteo por tipo y estado, atraso de la cola y trabajadores de este proceso"""
+    return resumen_trabajos_service()
+
+@router.post("/cancelar/{id_trabajo}")
+async def cancelar(
+    id_trabajo: int,
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """Cancela un trabajo pendiente (también detiene un recurrente)"""
+    return cancelar_trabajo_service(id_trabajo)
+
+@router.post("/reintentar/{id_trabajo}")
+async def reintentar(
+    id_trabajo: int,
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """Vuelve a encolar un trabajo en error o cancelado"""
+    return reintentar_trabajo_service(id_trabajo)
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from schemas.venta_schema import VentaCreate
 from services.venta_service import (
     crear_venta_service,
     ver_venta_by_id_service,
     ver_todas_ventas_service,
     ver_ventas_por_fecha_service,
-    obtener_info_ticket_actual_service
+    obtener_info_ticket_actual_service,
+    exportar_ventas_service
 )
 from utils.auth import require_role, get_current_user
 
@@ -77,3 +79,30 @@ async def obtener_info_ticket_actual(
     """
     return obtener_info_ticket_actual_service()
 
+@router.get("/exportar", summary="Exportar ventas (CSV o Parquet)")
+async def exportar_ventas(
+    fecha_inicio: str = Query(..., description="Fecha inicio en formato YYYY-MM-DD", examples=["2024-01-01"]),
+    fecha_fin: str = Query(..., description="Fecha fin en formato YYYY-MM-DD", examples=["2024-12-31"]),
+    formato: str = Query("csv", description="csv o parquet"),
+    current_user: dict = Depends(require_role(["administrador", "superadministrador"]))
+):
+    """
+    Descarga las ventas del rango para contabilidad: una fila por línea de venta
+    (producto, cantidad, precio, subtotal) con los datos de la venta, cliente y vendedor.
+    
+    - Las columnas `pago_efectivo`, `pago_tarjeta` y `pago_transferencia` llevan el total
+      de la venta sólo en su primera línea: sumarlas da lo cobrado por cada método.
+    - El archivo se genera mientras se descarga (sin límite de rango ni paginación);
+      incluye los meses ya archivados.
+    - `parquet` requiere pyarrow instalado en el servidor.
+    
+    **Permisos requeridos:** Administrador o Superadministrador
+    """
+    resultado = exportar_ventas_service(fecha_inicio, fecha_fin, formato)
+    if "error" in resultado:
+        return resultado
+    return StreamingResponse(
+        resultado["contenido"],
+        media_type=resultado["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{resultado["nombre_archivo"]}"'}
+    )
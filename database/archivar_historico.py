@@ -0,0 +1,78 @@
+"""
+Archiva en las tablas *_historico los meses cerrados de ventas, pre-órdenes y
+movimientos de inventario (ver repository/historico_repository.py).
+
+El servidor lo programa como trabajo recurrente (archivar_historico, cada
+HISTORICO_ARCHIVAR_CADA_HORAS); este script sirve para correrlo a mano, purgar
+el histórico más antiguo o comprimirlo:
+
+    python database/archivar_historico.py
+    python database/archivar_historico.py --meses-activos 3 --lote 500
+    python database/archivar_historico.py --purgar 36
+    python database/archivar_historico.py --comprimir
+    python database/archivar_historico.py --estado
+"""
+import sys
+import os
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository.historico_repository import (
+    archivar_historico, purgar_historico, comprimir_historico, estado_historico
+)
+
+def imprimir_estado():
+    estado = estado_historico()
+    if "error" in estado:
+        print(f"❌ {estado['error']}")
+        sys.exit(1)
+    for tabla in estado["tablas"]:
+        print(f"  {tabla['tabla']:<36} ~{tabla['filas_aprox'] or 0:>10} filas  "
+              f"{tabla['tamano_mb']:>9.2f} MB  {tabla['formato']}")
+    for familia in estado["control"]:
+        print(f"  📦 {familia['familia']}: archivado hasta {familia['archivado_hasta']}, "
+              f"purgado hasta {familia['purgado_hasta']}, {familia['filas_archivadas']} filas archivadas")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archivar, purgar o comprimir el histórico de ventas")
+    parser.add_argument("--meses-activos", type=int, default=None,
+                        help="Meses que se quedan en las tablas de operación (por omisión HISTORICO_MESES_ACTIVOS o 6)")
+    parser.add_argument("--lote", type=int, default=None, help="Filas por transacción (por omisión 1000)")
+    parser.add_argument("--purgar", type=int, default=None, metavar="MESES",
+                        help="Eliminar del histórico lo anterior a MESES meses (en lugar de archivar)")
+    parser.add_argument("--comprimir", action="store_true", help="Pasar las tablas del histórico a ROW_FORMAT=COMPRESSED")
+    parser.add_argument("--estado", action="store_true", help="Mostrar tamaño de las tablas y lo archivado")
+    args = parser.parse_args()
+
+    if args.estado:
+        imprimir_estado()
+        sys.exit(0)
+
+    if args.comprimir:
+        resultado = comprimir_historico()
+        if "error" in resultado:
+            print(f"❌ {resultado['error']}")
+            sys.exit(1)
+        for tabla in resultado["comprimidas"]:
+            print(f"  ✓ {tabla} comprimida")
+        for tabla, error in resultado["errores"].items():
+            print(f"  ⚠️  {tabla}: {error}")
+        sys.exit(1 if resultado["errores"] else 0)
+
+    if args.purgar is not None:
+        resultado = purgar_historico(args.purgar, args.lote)
+        filas = resultado.get("eliminadas", {})
+        accion = "eliminadas del histórico"
+    else:
+        resultado = archivar_historico(args.meses_activos, args.lote)
+        filas = resultado.get("archivadas", {})
+        accion = "archivadas"
+
+    for familia, cantidad in filas.items():
+        print(f"  ✓ {familia}: {cantidad} filas {accion}")
+    if "error" in resultado:
+        print(f"❌ {resultado['error']}")
+        sys.exit(1)
+    print(f"✅ Listo (corte: {resultado['corte']})")
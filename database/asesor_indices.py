@@ -0,0 +1,195 @@
+"""
+Asesor de índices: ejecuta EXPLAIN sobre las consultas de repository/*.py.
+
+Descubre las sentencias SQL literales (SELECT, UPDATE y DELETE) en los módulos
+del repositorio, las explica contra la base local y reporta recorridos completos
+(type=ALL), filesorts y tablas temporales, sugiriendo un índice compuesto a
+partir de las columnas de igualdad del WHERE y de la columna del ORDER BY.
+
+Los resultados sólo son representativos sobre una base con volumen; generar
+datos antes con generar_datos_volumen.py.
+
+Uso:
+    python database/asesor_indices.py
+    python database/asesor_indices.py --solo-problemas
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.conexion import conectar
+
+DIRECTORIO_REPOSITORIOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "repository")
+
+PALABRAS_SQL = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+PATRON_TABLAS = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|JOIN|ON|SET|LEFT|RIGHT|INNER|GROUP|ORDER|LIMIT)(\w+))?", re.IGNORECASE)
+PATRON_IGUALDAD = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:=\s*(?:%s|'[^']*'|\d+)|IN\s*\()", re.IGNORECASE)
+PATRON_RANGO = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:>=|<=|>|<|BETWEEN)\s*", re.IGNORECASE)
+PATRON_ORDEN = re.compile(r"ORDER\s+BY\s+(?:(\w+)\.)?(\w+)", re.IGNORECASE)
+PATRON_WHERE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bFOR\s+UPDATE\b|$)", re.IGNORECASE | re.DOTALL)
+
+
+def descubrir_consultas():
+    """
+    Recorre repository/*.py con ast y devuelve [(archivo, línea, sql)].
+    Sólo se consideran literales de texto: las f-strings arman SQL dinámico
+    (columnas o listas IN variables) y no se pueden explicar sin ejecutar el código.
+    """
+    consultas = []
+    omitidas = 0
+    for nombre in sorted(os.listdir(DIRECTORIO_REPOSITORIOS)):
+        if not nombre.endswith(".py"):
+            continue
+        ruta = os.path.join(DIRECTORIO_REPOSITORIOS, nombre)
+        with open(ruta, "r", encoding="utf-8") as archivo:
+            arbol = ast.parse(archivo.read(), filename=ruta)
+        vistas = set()
+        # ast.walk también entra a las f-strings: sus partes literales son SQL
+        # incompleto y no deben tratarse como consultas
+        dentro_de_fstring = set()
+        for nodo in ast.walk(arbol):
+            if isinstance(nodo, ast.JoinedStr):
+                dentro_de_fstring.update(id(hijo) for hijo in ast.walk(nodo) if hijo is not nodo)
+        for nodo in ast.walk(arbol):
+            if isinstance(nodo, ast.JoinedStr):
+                if id(nodo) in dentro_de_fstring:
+                    continue
+                inicio = nodo.values[0] if nodo.values else None
+                if isinstance(inicio, ast.Constant) and PALABRAS_SQL.match(str(inicio.value)):
+                    omitidas += 1
+                continue
+            if id(nodo) in dentro_de_fstring:
+                continue
+            if not (isinstance(nodo, ast.Constant) and isinstance(nodo.value, str)):
+                continue
+            sql = nodo.value.strip()
+            if not PALABRAS_SQL.match(sql) or "INFORMATION_SCHEMA" in sql.upper():
+                continue
+            clave = " ".join(sql.split())
+            if clave in vistas:
+                continue
+            vistas.add(clave)
+            consultas.append((nombre, nodo.lineno, sql))
+    return consultas, omitidas
+
+
+def sugerir_indice(sql: str, tabla: str):
+    """
+    Sugiere un índice compuesto para `tabla`: columnas de igualdad del WHERE,
+    luego una columna de rango u ORDER BY (en ese orden de preferencia).
+    """
+    alias = {tabla}
+    for nombre_tabla, alias_tabla in PATRON_TABLAS.findall(sql):
+        if nombre_tabla.lower() == tabla.lower() and alias_tabla:
+            alias.add(alias_tabla)
+    unica_tabla = len({t.lower() for t, _ in PATRON_TABLAS.findall(sql)}) == 1
+
+    def pertenece(prefijo):
+        return (prefijo in alias) if prefijo else unica_tabla
+
+    columnas = []
+    coincidencia_where = PATRON_WHERE.search(sql)
+    if coincidencia_where:
+        where = coincidencia_where.group(1)
+        for prefijo, columna in PATRON_IGUALDAD.findall(where):
+            if pertenece(prefijo) and columna not in columnas:
+                columnas.append(columna)
+        for prefijo, columna in PATRON_RANGO.findall(where):
+            if pertenece(prefijo) and columna not in columnas:
+                columnas.append(columna)
+                break
+    for prefijo, columna in PATRON_ORDEN.findall(sql):
+        if pertenece(prefijo) and columna not in columnas:
+            columnas.append(columna)
+            break
+
+    if not columnas:
+        return None
+    return f"CREATE INDEX idx_{tabla}_{'_'.join(columnas)} ON {tabla}({', '.join(columnas)});"
+
+
+def analizar(solo_problemas: bool = False):
+    consultas, omitidas = descubrir_consultas()
+
+    conexion = conectar()
+    if not conexion:
+        print("Error: No se pudo conectar a la base de datos")
+        return None
+
+    cursor = conexion.cursor(dictionary=True)
+    sugerencias = {}
+    con_problemas = 0
+    errores = 0
+
+    for archivo, linea, sql in consultas:
+        parametros = tuple("1" for _ in range(sql.count("%s")))
+        try:
+            cursor.execute("EXPLAIN " + sql, parametros)
+            plan = cursor.fetchall()
+        except Exception as e:
+            errores += 1
+            print(f"⚠️  {archivo}:{linea} no se pudo explicar: {str(e)[:100]}")
+            continue
+
+        problemas = []
+        for fila in plan:
+            tabla = fila.get("table")
+            extra = fila.get("Extra") or ""
+            if not tabla or tabla.startswith("<"):
+                continue
+            tabla_real = tabla
+            for nombre_tabla, alias_tabla in PATRON_TABLAS.findall(sql):
+                if alias_tabla == tabla:
+                    tabla_real = nombre_tabla
+            hallazgos = []
+            if fila.get("type") == "ALL":
+                hallazgos.append(f"recorrido completo (~{fila.get('rows')} filas)")
+            if "Using filesort" in extra:
+                hallazgos.append("filesort")
+            if "Using temporary" in extra:
+                hallazgos.append("tabla temporal")
+            if hallazgos:
+                sugerencia = sugerir_indice(sql, tabla_real)
+                problemas.append((tabla_real, hallazgos, sugerencia))
+                if sugerencia:
+                    sugerencias.setdefault(sugerencia, []).append(f"{archivo}:{linea}")
+
+        if problemas:
+            con_problemas += 1
+            print(f"❌ {archivo}:{linea}")
+            print(f"   {' '.join(sql.split())[:140]}")
+            for tabla, hallazgos, sugerencia in problemas:
+                print(f"   - {tabla}: {', '.join(hallazgos)}")
+                if sugerencia:
+                    print(f"     sugerido: {sugerencia}")
+        elif not solo_problemas:
+            indices = ", ".join(str(fila.get("key")) for fila in plan)
+            print(f"✓ {archivo}:{linea} (índices: {indices})")
+
+    cursor.close()
+    conexion.close()
+
+    print("")
+    print("=" * 60)
+    print(f"Consultas analizadas: {len(consultas)} | con problemas: {con_problemas} | "
+          f"sin explicar: {errores} | SQL dinámico omitido: {omitidas}")
+    if sugerencias:
+        print("")
+        print("Índices sugeridos (revisar antes de agregar a schema.sql e init_db.py):")
+        for sugerencia, ubicaciones in sorted(sugerencias.items(), key=lambda s: -len(s[1])):
+            print(f"  {sugerencia}  -- {len(ubicaciones)} consulta(s): {', '.join(ubicaciones[:3])}")
+    print("=" * 60)
+    return sugerencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asesor de índices basado en EXPLAIN")
+    parser.add_argument("--solo-problemas", action="store_true", help="Mostrar sólo consultas con problemas")
+    args = parser.parse_args()
+    if analizar(args.solo_problemas) is None:
+        sys.exit(1)
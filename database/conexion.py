@@ -1,12 +1,14 @@
 import mysql.connector
 
-def conectar():
+def conectar(**opciones):
+    # opciones: parámetros extra de mysql.connector.connect (ej. allow_local_infile=True)
     try:
         conexion = mysql.connector.connect(
             host="localhost",
             user="root",
             password="",  # Sin contraseña por defecto - cambiar si es necesario
-            database="sistema_control_inteligente"
+            database="sistema_control_inteligente",
+            **opciones
         )
         print("---------------Conexión exitosa-----------------")
         return conexion
@@ -1,6 +1,7 @@
 import os
 import re
 from database.conexion import conectar
+from repository.cola_cocina_repository import reconstruir_cola_cocina
 
 def column_exists(cursor, table_name: str, column_name: str) -> bool:
     """
@@ -192,6 +193,190 @@ def apply_migrations(cursor):
         except Exception as e:
             print(f"  ⚠️  Error al agregar campo 'tipo_imagen': {e}")
     
+    # Migración 7: Agregar origen y ticket_id a preordenes
+    if not column_exists(cursor, 'preordenes', 'origen'):
+        try:
+            cursor.execute("""
+                ALTER TABLE preordenes 
+                ADD COLUMN origen VARCHAR(20) NOT NULL DEFAULT 'web' COMMENT 'web o sistema' AFTER id_venta
+            """)
+            print("  ✓ Agregado campo 'origen' a tabla preordenes")
+            migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al agregar campo 'origen': {e}")
+    
+    if not column_exists(cursor, 'preordenes', 'ticket_id'):
+        try:
+            cursor.execute("""
+                ALTER TABLE preordenes 
+                ADD COLUMN ticket_id VARCHAR(50) NULL AFTER id_venta
+            """)
+            print("  ✓ Agregado campo 'ticket_id' a tabla preordenes")
+            migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al agregar campo 'ticket_id': {e}")
+    
+    # Migración 8: Índices compuestos para las colas de cocina y caja
+    # El orden de las columnas sigue el acceso: igualdad(es) primero y luego la
+    # columna del ORDER BY, para que MySQL lea en orden sin filesort
+    indices_compuestos = [
+        ('comandas', 'idx_comandas_estado_fecha', 'INDEX', '(estado, fecha_creacion)'),
+        ('preordenes', 'idx_preordenes_estado_fecha', 'INDEX', '(estado, fecha_creacion)'),
+        ('preordenes', 'idx_preordenes_estado_origen_fecha', 'INDEX', '(estado, origen, fecha_creacion)'),
+        ('preordenes', 'idx_preordenes_fecha_ticket', 'INDEX', '(fecha_creacion, ticket_id)'),
+        ('preordenes', 'unique_ticket_id', 'UNIQUE INDEX', '(ticket_id)'),
+    ]
+    for tabla, nombre_indice, tipo, columnas in indices_compuestos:
+        if not index_exists(cursor, tabla, nombre_indice):
+            try:
+                cursor.execute(f"ALTER TABLE {tabla} ADD {tipo} {nombre_indice} {columnas}")
+                print(f"  ✓ Agregado índice '{nombre_indice}' a tabla {tabla}")
+                migrations_applied += 1
+            except Exception as e:
+                print(f"  ⚠️  Error al agregar índice '{nombre_indice}': {e}")
+    
+    # Migración 9: Stock reservado por comandas pendientes
+    # (la tabla reservas_insumos se crea desde schema.sql al detectarse como faltante)
+    if not column_exists(cursor, 'insumos', 'cantidad_reservada'):
+        try:
+            cursor.execute("""
+                ALTER TABLE insumos 
+                ADD COLUMN cantidad_reservada DECIMAL(10, 3) NOT NULL DEFAULT 0 AFTER cantidad_minima
+            """)
+            print("  ✓ Agregado campo 'cantidad_reservada' a tabla insumos")
+            migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al agregar campo 'cantidad_reservada': {e}")
+    
+    # Migración 10: Columnas normalizadas para buscar clientes por celular o nombre
+    columnas_busqueda_clientes = [
+        ('celular_normalizado', "VARCHAR(20) NULL AFTER celular"),
+        ('nombre_normalizado', "VARCHAR(320) NULL AFTER celular_normalizado"),
+    ]
+    columnas_agregadas = False
+    for columna, definicion in columnas_busqueda_clientes:
+        if not column_exists(cursor, 'clientes', columna):
+            try:
+                cursor.execute(f"ALTER TABLE clientes ADD COLUMN {columna} {definicion}")
+                print(f"  ✓ Agregado campo '{columna}' a tabla clientes")
+                migrations_applied += 1
+                columnas_agregadas = True
+            except Exception as e:
+                print(f"  ⚠️  Error al agregar campo '{columna}': {e}")
+    
+    if columnas_agregadas:
+        try:
+            # La normalización (acentos) se hace en Python, igual que al crear clientes
+            from utils.normalize import normalizar_celular, normalizar_nombre_cliente
+            cursor.execute("SELECT id_cliente, nombre, apellido_paterno, apellido_materno, celular FROM clientes")
+            actualizaciones = [
+                (normalizar_celular(celular) or None, normalizar_nombre_cliente(nombre, paterno, materno), id_cliente)
+                for id_cliente, nombre, paterno, materno, celular in cursor.fetchall()
+            ]
+            if actualizaciones:
+                cursor.executemany(
+                    "UPDATE clientes SET celular_normalizado = %s, nombre_normalizado = %s WHERE id_cliente = %s",
+                    actualizaciones
+                )
+                print(f"  ✓ Normalizados {len(actualizaciones)} clientes existentes")
+        except Exception as e:
+            print(f"  ⚠️  Error al normalizar clientes existentes: {e}")
+    
+    for nombre_indice, columnas in [
+        ('idx_clientes_celular_normalizado', '(celular_normalizado)'),
+        ('idx_clientes_nombre_normalizado', '(nombre_normalizado)'),
+    ]:
+        if not index_exists(cursor, 'clientes', nombre_indice):
+            try:
+                cursor.execute(f"ALTER TABLE clientes ADD INDEX {nombre_indice} {columnas}")
+                print(f"  ✓ Agregado índice '{nombre_indice}' a tabla clientes")
+                migrations_applied += 1
+            except Exception as e:
+                print(f"  ⚠️  Error al agregar índice '{nombre_indice}': {e}")
+    
+    # Migración 11: Contadores de visitas en clientes (evitan COUNT(*) por consulta)
+    contadores_agregados = False
+    for columna, definicion in [
+        ('total_visitas', "INT NOT NULL DEFAULT 0 AFTER puntos"),
+        ('ultima_visita', "DATETIME NULL AFTER total_visitas"),
+    ]:
+        if not column_exists(cursor, 'clientes', columna):
+            try:
+                cursor.execute(f"ALTER TABLE clientes ADD COLUMN {columna} {definicion}")
+                print(f"  ✓ Agregado campo '{columna}' a tabla clientes")
+                migrations_applied += 1
+                contadores_agregados = True
+            except Exception as e:
+                print(f"  ⚠️  Error al agregar campo '{columna}': {e}")
+    
+    if contadores_agregados:
+        try:
+            cursor.execute("""
+                UPDATE clientes c
+                JOIN (
+                    SELECT id_cliente, COUNT(*) AS total, MAX(fecha_visita) AS ultima
+                    FROM visitas_clientes
+                    GROUP BY id_cliente
+                ) v ON v.id_cliente = c.id_cliente
+                SET c.total_visitas = v.total, c.ultima_visita = v.ultima
+            """)
+            print(f"  ✓ Contadores de visitas calculados para {cursor.rowcount} clientes")
+        except Exception as e:
+            print(f"  ⚠️  Error al calcular contadores de visitas: {e}")
+    
+    if not index_exists(cursor, 'visitas_clientes', 'idx_visitas_cliente_fecha'):
+        try:
+            cursor.execute("""
+                ALTER TABLE visitas_clientes 
+                ADD INDEX idx_visitas_cliente_fecha (id_cliente, fecha_visita, id_visita)
+            """)
+            print("  ✓ Agregado índice 'idx_visitas_cliente_fecha' a tabla visitas_clientes")
+            migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al agregar índice 'idx_visitas_cliente_fecha': {e}")
+    
+    # Migración 12: Índice para recorrer los clientes pendientes de sincronizar con Loyabit
+    if not index_exists(cursor, 'clientes', 'idx_clientes_loyabit_sync'):
+        try:
+            cursor.execute("""
+                ALTER TABLE clientes 
+                ADD INDEX idx_clientes_loyabit_sync (loyabit_sincronizado, id_cliente)
+            """)
+            print("  ✓ Agregado índice 'idx_clientes_loyabit_sync' a tabla clientes")
+            migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al agregar índice 'idx_clientes_loyabit_sync': {e}")
+    
+    # Migración 13: visitas_clientes sin llave foránea a ventas.
+    # Archivar una venta (repository/historico_repository.py) la borra de ventas;
+    # con ON DELETE CASCADE se perderían sus visitas y los contadores del cliente.
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'visitas_clientes'
+        AND COLUMN_NAME = 'id_venta'
+        AND REFERENCED_TABLE_NAME = 'ventas'
+    """)
+    for (nombre_fk,) in cursor.fetchall():
+        try:
+            cursor.execute(f"ALTER TABLE visitas_clientes DROP FOREIGN KEY {nombre_fk}")
+            print(f"  ✓ Eliminada llave foránea '{nombre_fk}' (visitas_clientes -> ventas)")
+            migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al eliminar llave foránea '{nombre_fk}': {e}")
+    
+    # Migración 14: Llenar la cola de cocina con las comandas abiertas que ya existían
+    cursor.execute("SELECT COUNT(*) FROM cola_cocina")
+    if cursor.fetchone()[0] == 0:
+        try:
+            proyectadas = reconstruir_cola_cocina(cursor)
+            if proyectadas:
+                print(f"  ✓ Cola de cocina llenada con {proyectadas} comandas abiertas")
+                migrations_applied += 1
+        except Exception as e:
+            print(f"  ⚠️  Error al llenar la cola de cocina: {e}")
+    
     return migrations_applied
 
 def execute_sql_statements(cursor, sql_script: str):
@@ -270,7 +455,12 @@ def init_database():
         tablas_requeridas = ['usuarios', 'clientes', 'productos', 'insumos', 'ventas', 
                             'detalles_venta', 'comandas', 'detalles_comanda', 
                             'recetas_insumos', 'movimientos_inventario', 
-                            'visitas_clientes', 'preordenes', 'detalles_preorden']
+                            'visitas_clientes', 'preordenes', 'detalles_preorden',
+                            'reservas_insumos', 'loyabit_outbox', 'trabajos',
+                            'ventas_historico', 'detalles_venta_historico', 'comandas_historico',
+                            'detalles_comanda_historico', 'preordenes_historico',
+                            'detalles_preorden_historico', 'movimientos_inventario_historico',
+                            'historico_control', 'cola_cocina']
         
         cursor.execute(f"""
             SELECT TABLE_NAME 
@@ -12,11 +12,14 @@ from database.conexion import conectar
 from utils.normalize import normalizar_nombre
 
 def migrar_nombres_normalizados():
-    """Actualiza el campo nombre_normalizado para todos los insumos existentes"""
+    """
+    Actualiza el campo nombre_normalizado para todos los insumos existentes.
+    Retorna {"message", "actualizados", "errores"} o {"error"} si no se pudo migrar.
+    """
     conexion = conectar()
     if not conexion:
         print("Error: No se pudo conectar a la base de datos")
-        return
+        return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor(dictionary=True)
     
@@ -28,7 +31,7 @@ def migrar_nombres_normalizados():
         
         if not insumos:
             print("No hay insumos que necesiten migración.")
-            return
+            return {"message": "No hay insumos que necesiten migración", "actualizados": 0, "errores": 0}
         
         print(f"Se encontraron {len(insumos)} insumos para migrar.")
         
@@ -65,17 +68,19 @@ def migrar_nombres_normalizados():
         print(f"\nMigración completada:")
         print(f"  - Actualizados: {actualizados}")
         print(f"  - Errores: {errores}")
+        return {"message": "Migración de nombres normalizados ejecutada", "actualizados": actualizados, "errores": errores}
         
     except Exception as e:
         conexion.rollback()
         print(f"Error durante la migración: {str(e)}")
+        return {"error": f"Error durante la migración: {str(e)}"}
     finally:
         cursor.close()
         conexion.close()
 
 if __name__ == "__main__":
     print("Iniciando migración de nombres normalizados...")
-    migrar_nombres_normalizados()
-    print("Migración finalizada.")
+    resultado = migrar_nombres_normalizados()
+    print("Migración finalizada." if "error" not in resultado else "Migración fallida.")
 
 
@@ -0,0 +1,17 @@
+-- Migración: Columnas normalizadas e índices para buscar clientes en caja
+-- Descripción: La búsqueda por celular o nombre usa LIKE 'prefijo%' sobre estas
+-- columnas, que sí puede usar índice (a diferencia de filtrar la lista completa).
+-- La aplicación las mantiene al crear/editar clientes.
+
+ALTER TABLE clientes
+ADD COLUMN celular_normalizado VARCHAR(20) NULL AFTER celular,
+ADD COLUMN nombre_normalizado VARCHAR(320) NULL AFTER celular_normalizado;
+
+-- Relleno de clientes existentes (MySQL 8+). init_db hace lo mismo en Python y
+-- además quita acentos del nombre; preferir init_db si está disponible.
+UPDATE clientes
+SET celular_normalizado = NULLIF(RIGHT(REGEXP_REPLACE(COALESCE(celular, ''), '[^0-9]', ''), 10), ''),
+    nombre_normalizado = LOWER(CONCAT_WS(' ', nombre, apellido_paterno, apellido_materno));
+
+CREATE INDEX idx_clientes_celular_normalizado ON clientes(celular_normalizado);
+CREATE INDEX idx_clientes_nombre_normalizado ON clientes(nombre_normalizado);
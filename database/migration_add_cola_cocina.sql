@@ -0,0 +1,26 @@
+-- Migración: Cola de cocina (modelo de lectura del tablero de comandas)
+-- Descripción: Una fila por comanda pendiente o en preparación con el total, los
+-- datos del pedido y los productos ya resueltos; el tablero la lee con una sola
+-- consulta por índice. Al iniciar, init_db la llena con las comandas abiertas.
+
+CREATE TABLE IF NOT EXISTS cola_cocina (
+    id_comanda INT PRIMARY KEY,
+    id_venta INT NOT NULL,
+    estado ENUM('pendiente', 'en_preparacion') NOT NULL,
+    fecha_creacion TIMESTAMP NULL,
+    fecha_actualizacion TIMESTAMP NULL,
+    total DECIMAL(10, 2),
+    fecha_venta TIMESTAMP NULL,
+    id_preorden INT NULL,
+    origen VARCHAR(20) NULL,
+    ticket_id VARCHAR(50) NULL,
+    nombre_cliente VARCHAR(255) NULL,
+    tipo_servicio VARCHAR(20) NULL,
+    tipo_leche VARCHAR(20) NULL,
+    extra_leche DECIMAL(10, 2) NULL,
+    comentarios TEXT NULL,
+    tiene_info_pedido BOOLEAN NOT NULL DEFAULT FALSE,
+    detalles JSON NOT NULL,
+    FOREIGN KEY (id_comanda) REFERENCES comandas(id_comanda) ON DELETE CASCADE,
+    INDEX idx_cola_cocina_estado_fecha (estado, fecha_creacion)
+);
@@ -0,0 +1,20 @@
+-- Migración: Contadores de visitas en clientes e índice para el historial paginado
+-- Descripción: contar_visitas_cliente lee total_visitas/ultima_visita en lugar de
+-- hacer COUNT(*) sobre visitas_clientes. registrar_visita los actualiza en la
+-- misma transacción; database/reconciliar_visitas.py corrige desviaciones.
+
+ALTER TABLE clientes
+ADD COLUMN total_visitas INT NOT NULL DEFAULT 0 AFTER puntos,
+ADD COLUMN ultima_visita DATETIME NULL AFTER total_visitas;
+
+-- Valores iniciales a partir del historial
+UPDATE clientes c
+JOIN (
+    SELECT id_cliente, COUNT(*) AS total, MAX(fecha_visita) AS ultima
+    FROM visitas_clientes
+    GROUP BY id_cliente
+) v ON v.id_cliente = c.id_cliente
+SET c.total_visitas = v.total, c.ultima_visita = v.ultima;
+
+-- Historial paginado: WHERE id_cliente = ? ORDER BY fecha_visita DESC, id_visita DESC
+CREATE INDEX idx_visitas_cliente_fecha ON visitas_clientes(id_cliente, fecha_visita, id_visita);
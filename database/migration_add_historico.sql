@@ -0,0 +1,104 @@
+-- Migración: Histórico (archivo) de ventas, pre-órdenes y movimientos de inventario
+-- Descripción: Las tablas de operación sólo conservan los meses recientes; el
+-- trabajo archivar_historico (repository/historico_repository.py) mueve por lotes
+-- las filas cerradas más antiguas a las tablas *_historico. Los reportes leen
+-- ambas cuando el rango empieza antes de historico_control.archivado_hasta.
+--
+-- No se usa particionado nativo de MySQL: no es compatible con las llaves
+-- foráneas que tienen estas tablas.
+
+CREATE TABLE IF NOT EXISTS ventas_historico (
+    id_venta INT PRIMARY KEY,
+    id_cliente INT,
+    id_usuario INT NOT NULL,
+    total DECIMAL(10, 2) NOT NULL,
+    metodo_pago ENUM('efectivo', 'tarjeta', 'transferencia') NOT NULL,
+    fecha_venta TIMESTAMP NULL,
+    INDEX idx_ventas_historico_fecha (fecha_venta),
+    INDEX idx_ventas_historico_cliente (id_cliente)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_venta_historico (
+    id_detalle_venta INT PRIMARY KEY,
+    id_venta INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    precio_unitario DECIMAL(10, 2) NOT NULL,
+    subtotal DECIMAL(10, 2) NOT NULL,
+    INDEX idx_detalles_venta_historico_venta (id_venta)
+);
+
+CREATE TABLE IF NOT EXISTS comandas_historico (
+    id_comanda INT PRIMARY KEY,
+    id_venta INT NOT NULL,
+    estado ENUM('pendiente', 'en_preparacion', 'terminada', 'cancelada'),
+    fecha_creacion TIMESTAMP NULL,
+    fecha_actualizacion TIMESTAMP NULL,
+    INDEX idx_comandas_historico_venta (id_venta)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_comanda_historico (
+    id_detalle_comanda INT PRIMARY KEY,
+    id_comanda INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    observaciones TEXT,
+    INDEX idx_detalles_comanda_historico_comanda (id_comanda)
+);
+
+CREATE TABLE IF NOT EXISTS preordenes_historico (
+    id_preorden INT PRIMARY KEY,
+    nombre_cliente VARCHAR(255),
+    estado ENUM('preorden', 'en_caja', 'pagada', 'en_cocina', 'lista', 'entregada', 'cancelada'),
+    total DECIMAL(10, 2),
+    id_venta INT,
+    ticket_id VARCHAR(50) NULL,
+    origen VARCHAR(20) NOT NULL DEFAULT 'web',
+    tipo_servicio VARCHAR(20) NULL,
+    comentarios TEXT NULL,
+    tipo_leche VARCHAR(20) NULL,
+    extra_leche DECIMAL(10, 2) DEFAULT 0,
+    fecha_creacion TIMESTAMP NULL,
+    fecha_actualizacion TIMESTAMP NULL,
+    INDEX idx_preordenes_historico_fecha (fecha_creacion),
+    INDEX idx_preordenes_historico_venta (id_venta)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_preorden_historico (
+    id_detalle_preorden INT PRIMARY KEY,
+    id_preorden INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    observaciones TEXT,
+    INDEX idx_detalles_preorden_historico_preorden (id_preorden)
+);
+
+CREATE TABLE IF NOT EXISTS movimientos_inventario_historico (
+    id_movimiento INT PRIMARY KEY,
+    id_insumo INT NOT NULL,
+    tipo_movimiento ENUM('entrada', 'salida') NOT NULL,
+    cantidad DECIMAL(10, 3) NOT NULL,
+    motivo VARCHAR(255) NOT NULL,
+    observaciones TEXT,
+    fecha_movimiento TIMESTAMP NULL,
+    INDEX idx_movimientos_historico_fecha (fecha_movimiento),
+    INDEX idx_movimientos_historico_insumo_fecha (id_insumo, fecha_movimiento)
+);
+
+-- Hasta dónde se archivó cada familia de tablas (ventas, preordenes, movimientos_inventario).
+-- Los reportes sólo consultan el histórico si el rango empieza antes de archivado_hasta.
+CREATE TABLE IF NOT EXISTS historico_control (
+    familia VARCHAR(50) PRIMARY KEY,
+    archivado_hasta DATETIME NULL, -- todo lo archivado es anterior a esta fecha
+    purgado_hasta DATETIME NULL, -- lo anterior a esta fecha ya se eliminó del histórico
+    filas_archivadas BIGINT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- visitas_clientes deja de tener llave foránea a ventas (con ON DELETE CASCADE,
+-- archivar una venta borraría sus visitas). El nombre de la restricción depende
+-- de cómo se creó la tabla; consultarlo con:
+--   SELECT CONSTRAINT_NAME FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+--   WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'visitas_clientes'
+--   AND COLUMN_NAME = 'id_venta' AND REFERENCED_TABLE_NAME = 'ventas';
+ALTER TABLE visitas_clientes DROP FOREIGN KEY visitas_clientes_ibfk_2;
@@ -0,0 +1,23 @@
+-- Migración: Índices compuestos para las colas de cocina y caja, y búsqueda por ticket
+-- Descripción: Cada índice sigue el patrón de acceso de su consulta (columnas de
+-- igualdad primero y al final la del ORDER BY) para evitar filesort.
+-- Requiere las columnas origen y ticket_id en preordenes.
+
+ALTER TABLE preordenes
+ADD COLUMN ticket_id VARCHAR(50) NULL AFTER id_venta,
+ADD COLUMN origen VARCHAR(20) NOT NULL DEFAULT 'web' COMMENT 'web o sistema' AFTER ticket_id;
+
+-- ver_comandas_por_estado: WHERE estado = ? ORDER BY fecha_creacion
+CREATE INDEX idx_comandas_estado_fecha ON comandas(estado, fecha_creacion);
+
+-- ver_preordenes_por_estado sin origen: WHERE estado = ? ORDER BY fecha_creacion
+CREATE INDEX idx_preordenes_estado_fecha ON preordenes(estado, fecha_creacion);
+
+-- ver_preordenes_por_estado con origen: WHERE estado = ? AND origen = ? ORDER BY fecha_creacion
+CREATE INDEX idx_preordenes_estado_origen_fecha ON preordenes(estado, origen, fecha_creacion);
+
+-- obtener_info_ticket_actual: WHERE ticket_id IS NOT NULL ORDER BY fecha_creacion DESC LIMIT 1
+CREATE INDEX idx_preordenes_fecha_ticket ON preordenes(fecha_creacion, ticket_id);
+
+-- ver_preorden_por_ticket: WHERE ticket_id = ?
+CREATE UNIQUE INDEX unique_ticket_id ON preordenes(ticket_id);
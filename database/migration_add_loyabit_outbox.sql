@@ -0,0 +1,27 @@
+-- Migración: Bandeja de salida (outbox) para movimientos de puntos de Loyabit
+-- Descripción: Los puntos se registran en clientes.puntos y en esta tabla dentro
+-- de la misma transacción que la venta; services/loyabit_outbox_service.py los
+-- entrega a Loyabit en segundo plano, con reintentos y deduplicación por
+-- clave_idempotencia.
+
+CREATE TABLE IF NOT EXISTS loyabit_outbox (
+    id_evento BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo ENUM('agregar_puntos', 'canjear_puntos') NOT NULL,
+    id_cliente INT NOT NULL,
+    id_venta INT NULL,
+    puntos DECIMAL(10, 2) NOT NULL,
+    motivo VARCHAR(255),
+    clave_idempotencia VARCHAR(100) NOT NULL,
+    estado ENUM('pendiente', 'enviado', 'error') NOT NULL DEFAULT 'pendiente',
+    intentos INT NOT NULL DEFAULT 0,
+    siguiente_intento DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lote VARCHAR(36) NULL,
+    ultimo_error TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_envio DATETIME NULL,
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id_cliente) ON DELETE CASCADE,
+    UNIQUE KEY unique_outbox_clave (clave_idempotencia),
+    INDEX idx_outbox_estado_siguiente (estado, siguiente_intento),
+    INDEX idx_outbox_lote (lote),
+    INDEX idx_outbox_cliente_estado (id_cliente, estado)
+);
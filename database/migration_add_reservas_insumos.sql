@@ -0,0 +1,20 @@
+-- Migración: Reservas de insumos al cobrar
+-- Descripción: El stock necesario para una comanda se aparta al crear la venta o
+-- procesar el pago de la pre-orden (disponible = cantidad_actual - cantidad_reservada).
+-- Al terminar la comanda la reserva se convierte en salida; al cancelarla se libera.
+
+ALTER TABLE insumos
+ADD COLUMN cantidad_reservada DECIMAL(10, 3) NOT NULL DEFAULT 0 AFTER cantidad_minima;
+
+CREATE TABLE IF NOT EXISTS reservas_insumos (
+    id_reserva INT AUTO_INCREMENT PRIMARY KEY,
+    id_comanda INT NOT NULL,
+    id_insumo INT NOT NULL,
+    cantidad DECIMAL(10, 3) NOT NULL,
+    estado ENUM('activa', 'consumida', 'liberada') NOT NULL DEFAULT 'activa',
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP NULL,
+    FOREIGN KEY (id_comanda) REFERENCES comandas(id_comanda) ON DELETE CASCADE,
+    FOREIGN KEY (id_insumo) REFERENCES insumos(id_insumo) ON DELETE CASCADE,
+    INDEX idx_reservas_comanda_estado (id_comanda, estado)
+);
@@ -0,0 +1,29 @@
+-- Migración: Cola de trabajos en segundo plano
+-- Descripción: Trabajos lentos (reportes, llamadas a Loyabit, migraciones de
+-- datos) se encolan aquí y los ejecutan los trabajadores de
+-- services/trabajos_service.py, que los reclaman con
+-- SELECT ... FOR UPDATE SKIP LOCKED (requiere MySQL 8.0+).
+
+CREATE TABLE IF NOT EXISTS trabajos (
+    id_trabajo BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(100) NOT NULL,
+    parametros JSON NULL,
+    estado ENUM('pendiente', 'en_proceso', 'completado', 'error', 'cancelado') NOT NULL DEFAULT 'pendiente',
+    prioridad INT NOT NULL DEFAULT 0, -- mayor se atiende primero
+    intentos INT NOT NULL DEFAULT 0,
+    max_intentos INT NOT NULL DEFAULT 3,
+    ejecutar_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    recurrente_cada INT NULL, -- segundos; al terminar se reprograma en lugar de cerrarse
+    clave_unica VARCHAR(150) NULL, -- evita encolar dos veces el mismo trabajo
+    bloqueado_por VARCHAR(100) NULL, -- trabajador que lo tomó
+    bloqueado_hasta DATETIME NULL, -- plazo (lease); vencido, otro trabajador lo retoma
+    resultado JSON NULL,
+    ultimo_error TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_inicio DATETIME NULL,
+    fecha_fin DATETIME NULL,
+    UNIQUE KEY unique_trabajos_clave (clave_unica),
+    INDEX idx_trabajos_cola (estado, ejecutar_en, prioridad),
+    INDEX idx_trabajos_bloqueo (estado, bloqueado_hasta),
+    INDEX idx_trabajos_tipo_estado (tipo, estado)
+);
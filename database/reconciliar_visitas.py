@@ -0,0 +1,30 @@
+"""
+Reconcilia los contadores de visitas (clientes.total_visitas / ultima_visita)
+con la tabla visitas_clientes.
+
+registrar_visita mantiene los contadores en la misma transacción; este script
+corrige las diferencias que dejan los borrados en cascada o cargas manuales.
+Pensado para ejecutarse periódicamente (p. ej. cron nocturno):
+
+    python database/reconciliar_visitas.py
+    python database/reconciliar_visitas.py --cliente 42
+"""
+import sys
+import os
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository.cliente_repository import reconciliar_visitas_clientes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconciliar contadores de visitas de clientes")
+    parser.add_argument("--cliente", type=int, default=None, help="Sólo este id_cliente")
+    args = parser.parse_args()
+
+    resultado = reconciliar_visitas_clientes(args.cliente)
+    if "error" in resultado:
+        print(f"❌ {resultado['error']}")
+        sys.exit(1)
+    print(f"✅ Clientes corregidos: {resultado['clientes_corregidos']}")
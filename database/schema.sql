@@ -25,9 +25,13 @@ CREATE TABLE IF NOT EXISTS clientes (
     correo VARCHAR(255) UNIQUE NOT NULL,
     contrasena VARCHAR(255) NOT NULL,
     celular VARCHAR(20),
+    celular_normalizado VARCHAR(20), -- sólo dígitos, para buscar por prefijo
+    nombre_normalizado VARCHAR(320), -- nombre y apellidos sin acentos ni mayúsculas
     rfc VARCHAR(20),
     direccion TEXT,
     puntos DECIMAL(10, 2) DEFAULT 0.00,
+    total_visitas INT NOT NULL DEFAULT 0, -- contador mantenido por registrar_visita
+    ultima_visita DATETIME NULL,
     loyabit_id VARCHAR(255) NULL,
     loyabit_sincronizado BOOLEAN DEFAULT FALSE,
     fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -56,6 +60,7 @@ CREATE TABLE IF NOT EXISTS insumos (
     unidad_medida VARCHAR(50) NOT NULL, -- kg, litros, unidades, etc.
     cantidad_actual DECIMAL(10, 3) NOT NULL DEFAULT 0,
     cantidad_minima DECIMAL(10, 3) NOT NULL DEFAULT 0,
+    cantidad_reservada DECIMAL(10, 3) NOT NULL DEFAULT 0, -- apartado para comandas pendientes
     precio_compra DECIMAL(10, 2),
     activo BOOLEAN DEFAULT TRUE,
     fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -137,7 +142,8 @@ CREATE TABLE IF NOT EXISTS visitas_clientes (
     id_venta INT NOT NULL,
     fecha_visita TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (id_cliente) REFERENCES clientes(id_cliente) ON DELETE CASCADE,
-    FOREIGN KEY (id_venta) REFERENCES ventas(id_venta) ON DELETE CASCADE
+    -- Sin llave foránea a ventas: la visita se conserva cuando su venta pasa a ventas_historico
+    INDEX idx_visitas_venta (id_venta)
 );
 
 -- Tabla de pre-órdenes (pedidos públicos desde la web)
@@ -147,6 +153,8 @@ CREATE TABLE IF NOT EXISTS preordenes (
     estado ENUM('preorden', 'en_caja', 'pagada', 'en_cocina', 'lista', 'entregada', 'cancelada') DEFAULT 'preorden',
     total DECIMAL(10, 2),
     id_venta INT,
+    ticket_id VARCHAR(50) NULL,
+    origen VARCHAR(20) NOT NULL DEFAULT 'web', -- web o sistema
     fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (id_venta) REFERENCES ventas(id_venta) ON DELETE SET NULL
@@ -163,6 +171,188 @@ CREATE TABLE IF NOT EXISTS detalles_preorden (
     FOREIGN KEY (id_producto) REFERENCES productos(id_producto) ON DELETE RESTRICT
 );
 
+-- Tabla de reservas de insumos (stock apartado al cobrar, consumido al terminar la comanda)
+CREATE TABLE IF NOT EXISTS reservas_insumos (
+    id_reserva INT AUTO_INCREMENT PRIMARY KEY,
+    id_comanda INT NOT NULL,
+    id_insumo INT NOT NULL,
+    cantidad DECIMAL(10, 3) NOT NULL,
+    estado ENUM('activa', 'consumida', 'liberada') NOT NULL DEFAULT 'activa',
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP NULL,
+    FOREIGN KEY (id_comanda) REFERENCES comandas(id_comanda) ON DELETE CASCADE,
+    FOREIGN KEY (id_insumo) REFERENCES insumos(id_insumo) ON DELETE CASCADE,
+    INDEX idx_reservas_comanda_estado (id_comanda, estado)
+);
+
+-- Bandeja de salida (outbox) de movimientos de puntos hacia Loyabit.
+-- Se escribe en la misma transacción que la venta / el saldo local (clientes.puntos);
+-- un despachador en segundo plano la entrega a Loyabit.
+CREATE TABLE IF NOT EXISTS loyabit_outbox (
+    id_evento BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo ENUM('agregar_puntos', 'canjear_puntos') NOT NULL,
+    id_cliente INT NOT NULL,
+    id_venta INT NULL,
+    puntos DECIMAL(10, 2) NOT NULL,
+    motivo VARCHAR(255),
+    clave_idempotencia VARCHAR(100) NOT NULL,
+    estado ENUM('pendiente', 'enviado', 'error') NOT NULL DEFAULT 'pendiente',
+    intentos INT NOT NULL DEFAULT 0,
+    siguiente_intento DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lote VARCHAR(36) NULL, -- lote del despachador que lo tomó
+    ultimo_error TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_envio DATETIME NULL,
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id_cliente) ON DELETE CASCADE,
+    UNIQUE KEY unique_outbox_clave (clave_idempotencia),
+    INDEX idx_outbox_estado_siguiente (estado, siguiente_intento),
+    INDEX idx_outbox_lote (lote),
+    INDEX idx_outbox_cliente_estado (id_cliente, estado)
+);
+
+-- Cola de trabajos en segundo plano (services/trabajos_service.py).
+-- Los trabajadores la reclaman con SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8+).
+CREATE TABLE IF NOT EXISTS trabajos (
+    id_trabajo BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(100) NOT NULL,
+    parametros JSON NULL,
+    estado ENUM('pendiente', 'en_proceso', 'completado', 'error', 'cancelado') NOT NULL DEFAULT 'pendiente',
+    prioridad INT NOT NULL DEFAULT 0, -- mayor se atiende primero
+    intentos INT NOT NULL DEFAULT 0,
+    max_intentos INT NOT NULL DEFAULT 3,
+    ejecutar_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    recurrente_cada INT NULL, -- segundos; al terminar se reprograma en lugar de cerrarse
+    clave_unica VARCHAR(150) NULL, -- evita encolar dos veces el mismo trabajo
+    bloqueado_por VARCHAR(100) NULL, -- trabajador que lo tomó
+    bloqueado_hasta DATETIME NULL, -- plazo (lease); vencido, otro trabajador lo retoma
+    resultado JSON NULL,
+    ultimo_error TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_inicio DATETIME NULL,
+    fecha_fin DATETIME NULL,
+    UNIQUE KEY unique_trabajos_clave (clave_unica),
+    INDEX idx_trabajos_cola (estado, ejecutar_en, prioridad),
+    INDEX idx_trabajos_bloqueo (estado, bloqueado_hasta),
+    INDEX idx_trabajos_tipo_estado (tipo, estado)
+);
+
+-- Histórico (archivo) de ventas, pre-órdenes y movimientos de inventario.
+-- Misma estructura que las tablas de operación pero sin llaves foráneas ni
+-- AUTO_INCREMENT: repository/historico_repository.py mueve aquí por lotes los
+-- meses cerrados y los reportes leen ambas tablas cuando el rango lo requiere.
+CREATE TABLE IF NOT EXISTS ventas_historico (
+    id_venta INT PRIMARY KEY,
+    id_cliente INT,
+    id_usuario INT NOT NULL,
+    total DECIMAL(10, 2) NOT NULL,
+    metodo_pago ENUM('efectivo', 'tarjeta', 'transferencia') NOT NULL,
+    fecha_venta TIMESTAMP NULL,
+    INDEX idx_ventas_historico_fecha (fecha_venta),
+    INDEX idx_ventas_historico_cliente (id_cliente)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_venta_historico (
+    id_detalle_venta INT PRIMARY KEY,
+    id_venta INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    precio_unitario DECIMAL(10, 2) NOT NULL,
+    subtotal DECIMAL(10, 2) NOT NULL,
+    INDEX idx_detalles_venta_historico_venta (id_venta)
+);
+
+CREATE TABLE IF NOT EXISTS comandas_historico (
+    id_comanda INT PRIMARY KEY,
+    id_venta INT NOT NULL,
+    estado ENUM('pendiente', 'en_preparacion', 'terminada', 'cancelada'),
+    fecha_creacion TIMESTAMP NULL,
+    fecha_actualizacion TIMESTAMP NULL,
+    INDEX idx_comandas_historico_venta (id_venta)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_comanda_historico (
+    id_detalle_comanda INT PRIMARY KEY,
+    id_comanda INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    observaciones TEXT,
+    INDEX idx_detalles_comanda_historico_comanda (id_comanda)
+);
+
+CREATE TABLE IF NOT EXISTS preordenes_historico (
+    id_preorden INT PRIMARY KEY,
+    nombre_cliente VARCHAR(255),
+    estado ENUM('preorden', 'en_caja', 'pagada', 'en_cocina', 'lista', 'entregada', 'cancelada'),
+    total DECIMAL(10, 2),
+    id_venta INT,
+    ticket_id VARCHAR(50) NULL,
+    origen VARCHAR(20) NOT NULL DEFAULT 'web',
+    tipo_servicio VARCHAR(20) NULL,
+    comentarios TEXT NULL,
+    tipo_leche VARCHAR(20) NULL,
+    extra_leche DECIMAL(10, 2) DEFAULT 0,
+    fecha_creacion TIMESTAMP NULL,
+    fecha_actualizacion TIMESTAMP NULL,
+    INDEX idx_preordenes_historico_fecha (fecha_creacion),
+    INDEX idx_preordenes_historico_venta (id_venta)
+);
+
+CREATE TABLE IF NOT EXISTS detalles_preorden_historico (
+    id_detalle_preorden INT PRIMARY KEY,
+    id_preorden INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    observaciones TEXT,
+    INDEX idx_detalles_preorden_historico_preorden (id_preorden)
+);
+
+CREATE TABLE IF NOT EXISTS movimientos_inventario_historico (
+    id_movimiento INT PRIMARY KEY,
+    id_insumo INT NOT NULL,
+    tipo_movimiento ENUM('entrada', 'salida') NOT NULL,
+    cantidad DECIMAL(10, 3) NOT NULL,
+    motivo VARCHAR(255) NOT NULL,
+    observaciones TEXT,
+    fecha_movimiento TIMESTAMP NULL,
+    INDEX idx_movimientos_historico_fecha (fecha_movimiento),
+    INDEX idx_movimientos_historico_insumo_fecha (id_insumo, fecha_movimiento)
+);
+
+-- Hasta dónde se archivó cada familia de tablas (ventas, preordenes, movimientos_inventario).
+-- Los reportes sólo consultan el histórico si el rango empieza antes de archivado_hasta.
+CREATE TABLE IF NOT EXISTS historico_control (
+    familia VARCHAR(50) PRIMARY KEY,
+    archivado_hasta DATETIME NULL, -- todo lo archivado es anterior a esta fecha
+    purgado_hasta DATETIME NULL, -- lo anterior a esta fecha ya se eliminó del histórico
+    filas_archivadas BIGINT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Cola de cocina: una fila por comanda abierta (pendiente o en preparación) con lo
+-- que muestra el tablero ya resuelto (ver repository/cola_cocina_repository.py).
+-- Se escribe en la misma transacción que la comanda; al cerrarla se elimina la fila.
+CREATE TABLE IF NOT EXISTS cola_cocina (
+    id_comanda INT PRIMARY KEY,
+    id_venta INT NOT NULL,
+    estado ENUM('pendiente', 'en_preparacion') NOT NULL,
+    fecha_creacion TIMESTAMP NULL,
+    fecha_actualizacion TIMESTAMP NULL,
+    total DECIMAL(10, 2),
+    fecha_venta TIMESTAMP NULL,
+    id_preorden INT NULL,
+    origen VARCHAR(20) NULL,
+    ticket_id VARCHAR(50) NULL,
+    nombre_cliente VARCHAR(255) NULL,
+    tipo_servicio VARCHAR(20) NULL,
+    tipo_leche VARCHAR(20) NULL,
+    extra_leche DECIMAL(10, 2) NULL,
+    comentarios TEXT NULL,
+    tiene_info_pedido BOOLEAN NOT NULL DEFAULT FALSE, -- FALSE: el tablero recibe preorden = null
+    detalles JSON NOT NULL, -- [{id_detalle_comanda, id_comanda, id_producto, cantidad, observaciones, producto_nombre}]
+    FOREIGN KEY (id_comanda) REFERENCES comandas(id_comanda) ON DELETE CASCADE,
+    INDEX idx_cola_cocina_estado_fecha (estado, fecha_creacion)
+);
+
 -- Índices para mejorar rendimiento
 -- Nota: IF NOT EXISTS no es soportado en todas las versiones de MySQL para índices
 -- El sistema de inicialización manejará los errores de duplicados automáticamente
@@ -173,10 +363,23 @@ CREATE INDEX idx_comandas_estado ON comandas(estado);
 CREATE INDEX idx_comandas_venta ON comandas(id_venta);
 CREATE INDEX idx_visitas_cliente ON visitas_clientes(id_cliente);
 CREATE INDEX idx_visitas_fecha ON visitas_clientes(fecha_visita);
+-- Historial paginado de un cliente: WHERE id_cliente = ? ORDER BY fecha_visita DESC, id_visita DESC
+CREATE INDEX idx_visitas_cliente_fecha ON visitas_clientes(id_cliente, fecha_visita, id_visita);
 CREATE INDEX idx_movimientos_insumo ON movimientos_inventario(id_insumo);
 CREATE INDEX idx_movimientos_fecha ON movimientos_inventario(fecha_movimiento);
 CREATE INDEX idx_preordenes_estado ON preordenes(estado);
 CREATE INDEX idx_preordenes_fecha ON preordenes(fecha_creacion);
+-- Colas de cocina y caja: filtro por igualdad + ORDER BY fecha_creacion sin filesort
+CREATE INDEX idx_comandas_estado_fecha ON comandas(estado, fecha_creacion);
+CREATE INDEX idx_preordenes_estado_fecha ON preordenes(estado, fecha_creacion);
+CREATE INDEX idx_preordenes_estado_origen_fecha ON preordenes(estado, origen, fecha_creacion);
+CREATE INDEX idx_preordenes_fecha_ticket ON preordenes(fecha_creacion, ticket_id);
+CREATE UNIQUE INDEX unique_ticket_id ON preordenes(ticket_id);
 CREATE INDEX idx_loyabit_id ON clientes(loyabit_id);
+-- Sincronización masiva con Loyabit: WHERE loyabit_sincronizado = FALSE AND id_cliente > ? ORDER BY id_cliente
+CREATE INDEX idx_clientes_loyabit_sync ON clientes(loyabit_sincronizado, id_cliente);
+-- Búsqueda de clientes en caja: LIKE 'prefijo%' sobre columnas normalizadas
+CREATE INDEX idx_clientes_celular_normalizado ON clientes(celular_normalizado);
+CREATE INDEX idx_clientes_nombre_normalizado ON clientes(nombre_normalizado);
 CREATE UNIQUE INDEX unique_nombre_normalizado ON insumos(nombre_normalizado);
 
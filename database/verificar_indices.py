@@ -0,0 +1,106 @@
+"""
+Script para verificar con EXPLAIN que las consultas de las colas de cocina y caja
+usan los índices compuestos y no requieren filesort.
+Ejecutar después de init_database() (o de migration_add_indices_colas.sql).
+Conviene correrlo sobre una base con volumen (ver generar_datos_volumen.py): con
+tablas casi vacías el optimizador puede preferir un recorrido completo.
+"""
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.conexion import conectar
+
+# (descripción, consulta, parámetros, índices aceptables para la tabla principal)
+CONSULTAS = [
+    (
+        "ver_comandas_por_estado",
+        """
+        SELECT c.*, v.total, v.fecha_venta
+        FROM comandas c
+        JOIN ventas v ON c.id_venta = v.id_venta
+        WHERE c.estado = %s
+        ORDER BY c.fecha_creacion ASC
+        """,
+        ("pendiente",),
+        {"idx_comandas_estado_fecha"},
+    ),
+    (
+        "ver_preordenes_por_estado (estado)",
+        "SELECT * FROM preordenes WHERE estado = %s ORDER BY fecha_creacion ASC",
+        ("pagada",),
+        {"idx_preordenes_estado_fecha", "idx_preordenes_estado_origen_fecha"},
+    ),
+    (
+        "ver_preordenes_por_estado (estado + origen)",
+        "SELECT * FROM preordenes WHERE estado = %s AND origen = %s ORDER BY fecha_creacion ASC",
+        ("pagada", "web"),
+        {"idx_preordenes_estado_origen_fecha"},
+    ),
+    (
+        "obtener_info_ticket_actual",
+        """
+        SELECT ticket_id, fecha_creacion
+        FROM preordenes
+        WHERE ticket_id IS NOT NULL
+        ORDER BY fecha_creacion DESC
+        LIMIT 1
+        """,
+        (),
+        {"idx_preordenes_fecha_ticket", "idx_preordenes_fecha"},
+    ),
+    (
+        "ver_preorden_por_ticket",
+        "SELECT * FROM preordenes WHERE ticket_id = %s",
+        ("TICKET-00000000-000000-0000",),
+        {"unique_ticket_id"},
+    ),
+]
+
+
+def verificar_indices():
+    """Ejecuta EXPLAIN de cada consulta y reporta el índice usado y si hay filesort"""
+    conexion = conectar()
+    if not conexion:
+        print("Error: No se pudo conectar a la base de datos")
+        return False
+
+    cursor = conexion.cursor(dictionary=True)
+    fallas = 0
+
+    try:
+        for descripcion, sql, parametros, indices_esperados in CONSULTAS:
+            cursor.execute("EXPLAIN " + sql, parametros)
+            filas = cursor.fetchall()
+            principal = filas[0]
+            extras = " ".join((fila.get("Extra") or "") for fila in filas)
+            indice = principal.get("key")
+
+            problemas = []
+            if "Using filesort" in extras:
+                problemas.append("usa filesort")
+            if indice not in indices_esperados:
+                problemas.append(f"usa índice {indice or 'ninguno'} (esperado: {', '.join(sorted(indices_esperados))})")
+
+            if problemas:
+                fallas += 1
+                print(f"❌ {descripcion}: {'; '.join(problemas)}")
+            else:
+                print(f"✓ {descripcion}: índice {indice}, sin filesort")
+    finally:
+        cursor.close()
+        conexion.close()
+
+    print("")
+    if fallas:
+        print(f"{fallas} consulta(s) no usan el plan esperado")
+        return False
+    print("Todas las consultas usan sus índices compuestos")
+    return True
+
+
+if __name__ == "__main__":
+    if not verificar_indices():
+        sys.exit(1)
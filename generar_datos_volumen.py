@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos de alto volumen para pruebas de rendimiento.
+
+A diferencia de insertar_datos_prueba.py (unas cuantas filas, una sentencia a
+la vez), este script genera meses o años de operación realista:
+productos con recetas, insumos, clientes, ventas con sus detalles, pre-órdenes,
+comandas, visitas y movimientos de inventario.
+
+- Determinista: la misma semilla sobre la misma base produce los mismos datos
+  (las fechas parten de --fecha-fin, no del reloj)
+- Los IDs se asignan en el script (a partir del MAX actual de cada tabla), lo que
+  permite escribir todas las tablas relacionadas en lotes sin depender de lastrowid
+- Escritura con INSERT multi-fila por lotes, o con LOAD DATA LOCAL INFILE (--load-data)
+
+Uso:
+    python generar_datos_volumen.py --dias 365 --pedidos-por-dia 400 --semilla 42
+    python generar_datos_volumen.py --dias 730 --load-data
+    python generar_datos_volumen.py --dias 90 --fecha-fin 2026-06-30
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import bcrypt
+
+from database.conexion import conectar
+from utils.conversiones import convertir_unidades
+from utils.normalize import normalizar_nombre, normalizar_celular, normalizar_nombre_cliente
+
+# Insumos base: (nombre, unidad del insumo, unidad en receta, cantidad por receta (min, max), precio de compra)
+INSUMOS_BASE = [
+    ("Café en grano", "kg", "gramos", (14, 22), 350.00),
+    ("Leche entera", "litros", "mililitros", (120, 250), 25.00),
+    ("Leche deslactosada", "litros", "mililitros", (120, 250), 29.00),
+    ("Azúcar", "kg", "gramos", (5, 15), 30.00),
+    ("Chocolate", "kg", "gramos", (15, 30), 180.00),
+    ("Canela", "kg", "gramos", (1, 3), 320.00),
+    ("Jarabe de vainilla", "litros", "mililitros", (10, 25), 210.00),
+    ("Jarabe de caramelo", "litros", "mililitros", (10, 25), 210.00),
+    ("Matcha", "kg", "gramos", (3, 6), 900.00),
+    ("Chai", "kg", "gramos", (8, 15), 400.00),
+    ("Hielo", "kg", "gramos", (150, 250), 5.00),
+    ("Agua tónica", "litros", "mililitros", (100, 200), 40.00),
+    ("Jugo de naranja", "litros", "mililitros", (80, 150), 35.00),
+    ("Mango", "kg", "gramos", (80, 150), 45.00),
+    ("Fresa", "kg", "gramos", (60, 120), 70.00),
+    ("Plátano", "kg", "gramos", (80, 120), 25.00),
+    ("Yogurt griego", "kg", "gramos", (100, 180), 95.00),
+    ("Granola", "kg", "gramos", (30, 60), 120.00),
+    ("Miel", "kg", "gramos", (10, 25), 150.00),
+    ("Proteína", "kg", "gramos", (25, 35), 650.00),
+    ("Pan de caja", "unidades", "piezas", (2, 2), 3.50),
+    ("Jamón", "kg", "gramos", (40, 70), 180.00),
+    ("Queso manchego", "kg", "gramos", (30, 60), 160.00),
+    ("Huevo", "unidades", "piezas", (1, 2), 3.00),
+    ("Vaso desechable", "unidades", "piezas", (1, 1), 1.80),
+    ("Tapa desechable", "unidades", "piezas", (1, 1), 0.90),
+]
+
+# Productos: (nombre, precio, categoría, índices de insumos en INSUMOS_BASE)
+PRODUCTOS_BASE = [
+    ("Americano", 40.00, "Bebidas Calientes", [0, 24, 25]),
+    ("Capuchino", 55.00, "Bebidas Calientes", [0, 1, 24, 25]),
+    ("Energy Latte", 60.00, "Bebidas Calientes", [0, 1, 24, 25]),
+    ("Chai Latte", 60.00, "Bebidas Calientes", [9, 1, 3, 24, 25]),
+    ("Matcha Latte", 65.00, "Bebidas Calientes", [8, 1, 18, 24, 25]),
+    ("Muka Rush", 65.00, "Bebidas Calientes", [0, 4, 1, 24, 25]),
+    ("Caramel Latte", 65.00, "Bebidas Calientes", [0, 7, 1, 24, 25]),
+    ("Vainilla Latte", 65.00, "Bebidas Calientes", [0, 6, 1, 24, 25]),
+    ("Iced Americano", 50.00, "Bebidas Frías", [0, 10, 24, 25]),
+    ("Iced Latte", 55.00, "Bebidas Frías", [0, 1, 10, 24, 25]),
+    ("Expresso Tonic", 50.00, "Bebidas Frías", [0, 11, 10, 24]),
+    ("Orange Coffee", 65.00, "Bebidas Frías", [0, 12, 11, 10, 24]),
+    ("Smoothie de Mango", 70.00, "Bebidas Frías", [13, 1, 10, 24, 25]),
+    ("Smoothie de Fresa", 70.00, "Bebidas Frías", [14, 1, 10, 24, 25]),
+    ("Power Boost Latte", 65.00, "Bebidas Fitness", [0, 1, 19, 24, 25]),
+    ("Recovery Dúo Fruit", 65.00, "Bebidas Fitness", [1, 15, 14, 19, 24, 25]),
+    ("Mango Marathon", 75.00, "Bebidas Fitness", [1, 13, 18, 16, 19, 24, 25]),
+    ("Yogur Bloom", 98.00, "Menú Dulce", [16, 17, 18, 14]),
+    ("Chocobanana Sando", 67.00, "Menú Dulce", [20, 4, 15]),
+    ("Ichigo Sando", 92.00, "Menú Dulce", [20, 14]),
+    ("Classic Sando", 89.00, "Menú Salado", [20, 21, 22]),
+    ("Tamago Sando", 60.00, "Menú Salado", [20, 23]),
+]
+
+NOMBRES = ["Ana", "Luis", "María", "José", "Sofía", "Carlos", "Valeria", "Diego", "Fernanda", "Jorge",
+           "Camila", "Miguel", "Daniela", "Andrés", "Lucía", "Ricardo", "Paola", "Emilio", "Renata", "Hugo"]
+APELLIDOS = ["García", "Martínez", "López", "Hernández", "González", "Pérez", "Rodríguez", "Sánchez",
+             "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Cruz", "Morales", "Reyes", "Ortiz"]
+METODOS_PAGO = ["efectivo", "tarjeta", "transferencia"]
+OBSERVACIONES = [None, None, None, None, "Sin azúcar", "Extra caliente", "Poco hielo", "Leche de almendra"]
+
+# Ancla por defecto de las fechas generadas: fija para que la salida sólo dependa de la semilla
+FECHA_FIN_DEFAULT = "2025-12-31"
+
+# Distribución horaria de pedidos (hora -> peso); picos de desayuno y comida
+PESOS_HORA = {7: 3, 8: 9, 9: 10, 10: 7, 11: 5, 12: 6, 13: 8, 14: 8, 15: 5, 16: 5, 17: 6, 18: 5, 19: 3, 20: 2}
+
+# Orden de carga (padres antes que hijos) y columnas de cada tabla generada
+COLUMNAS = {
+    "insumos": ["id_insumo", "nombre", "nombre_normalizado", "descripcion", "unidad_medida",
+                "cantidad_actual", "cantidad_minima", "precio_compra", "activo"],
+    "productos": ["id_producto", "nombre", "descripcion", "precio", "categoria", "tiempo_preparacion", "activo"],
+    "recetas_insumos": ["id_producto", "id_insumo", "cantidad_necesaria", "unidad_medida"],
+    "clientes": ["id_cliente", "nombre", "apellido_paterno", "apellido_materno", "correo", "contrasena",
+                 "celular", "celular_normalizado", "nombre_normalizado", "puntos", "fecha_creacion",
+                 "total_visitas", "ultima_visita"],
+    "ventas": ["id_venta", "id_cliente", "id_usuario", "total", "metodo_pago", "fecha_venta",
+               "tipo_servicio", "comentarios", "tipo_leche", "extra_leche"],
+    "detalles_venta": ["id_venta", "id_producto", "cantidad", "precio_unitario", "subtotal"],
+    "preordenes": ["id_preorden", "nombre_cliente", "estado", "total", "id_venta", "ticket_id", "origen",
+                   "tipo_servicio", "comentarios", "tipo_leche", "extra_leche", "fecha_creacion",
+                   "fecha_actualizacion"],
+    "detalles_preorden": ["id_preorden", "id_producto", "cantidad", "observaciones"],
+    "comandas": ["id_comanda", "id_venta", "estado", "fecha_creacion", "fecha_actualizacion"],
+    "detalles_comanda": ["id_comanda", "id_producto", "cantidad", "observaciones"],
+    "visitas_clientes": ["id_cliente", "id_venta", "fecha_visita"],
+    "movimientos_inventario": ["id_insumo", "tipo_movimiento", "cantidad", "motivo", "fecha_movimiento"],
+}
+
+
+class EscritorLotes:
+    """
+    Acumula filas por tabla y las escribe en bloque.
+    - Modo INSERT: una sentencia INSERT multi-fila cada `tamano_lote` filas
+    - Modo LOAD DATA: vuelca cada tabla a un archivo TSV y lo carga al final
+    """
+
+    def __init__(self, conexion, tamano_lote: int, usar_load_data: bool):
+        self.conexion = conexion
+        self.cursor = conexion.cursor()
+        # Columnas opcionales (agregadas por migraciones) que no existan en esta base se omiten
+        self.columnas = {}
+        self.posiciones = {}
+        for tabla, columnas in COLUMNAS.items():
+            self.cursor.execute("""
+                SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """, (tabla,))
+            existentes = {fila[0] for fila in self.cursor.fetchall()}
+            self.posiciones[tabla] = [i for i, columna in enumerate(columnas) if columna in existentes]
+            self.columnas[tabla] = [columnas[i] for i in self.posiciones[tabla]]
+        self.tamano_lote = tamano_lote
+        self.usar_load_data = usar_load_data
+        self.pendientes = {tabla: [] for tabla in COLUMNAS}
+        self.totales = {tabla: 0 for tabla in COLUMNAS}
+        self.archivos = {}
+        self.directorio = tempfile.mkdtemp(prefix="datos_volumen_") if usar_load_data else None
+
+    def agregar(self, tabla: str, fila: tuple):
+        self.pendientes[tabla].append(tuple(fila[i] for i in self.posiciones[tabla]))
+        self.totales[tabla] += 1
+        if len(self.pendientes[tabla]) >= self.tamano_lote:
+            self._vaciar(tabla)
+
+    def _vaciar(self, tabla: str):
+        filas = self.pendientes[tabla]
+        if not filas:
+            return
+        if self.usar_load_data:
+            archivo = self.archivos.get(tabla)
+            if archivo is None:
+                archivo = open(os.path.join(self.directorio, f"{tabla}.tsv"), "w", encoding="utf-8", newline="\n")
+                self.archivos[tabla] = archivo
+            for fila in filas:
+                archivo.write("\t".join(_valor_tsv(v) for v in fila) + "\n")
+        else:
+            columnas = self.columnas[tabla]
+            marcadores = "(" + ", ".join(["%s"] * len(columnas)) + ")"
+            sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES " + ", ".join([marcadores] * len(filas))
+            valores = [valor for fila in filas for valor in fila]
+            self.cursor.execute(sql, valores)
+            self.conexion.commit()
+        self.pendientes[tabla] = []
+
+    def finalizar(self):
+        for tabla in COLUMNAS:
+            self._vaciar(tabla)
+        if self.usar_load_data:
+            for tabla in COLUMNAS:
+                archivo = self.archivos.get(tabla)
+                if archivo is None:
+                    continue
+                archivo.close()
+                ruta = archivo.name.replace("\\", "/")
+                print(f"   ⏳ LOAD DATA {tabla} ({self.totales[tabla]} filas)...")
+                self.cursor.execute(
+                    f"LOAD DATA LOCAL INFILE '{ruta}' INTO TABLE {tabla} "
+                    f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(self.columnas[tabla])})"
+                )
+                self.conexion.commit()
+                os.remove(archivo.name)
+            os.rmdir(self.directorio)
+        self.cursor.close()
+
+
+def _valor_tsv(valor) -> str:
+    """Formatea un valor para LOAD DATA con el formato por defecto de MySQL"""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    if isinstance(valor, datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    texto = str(valor)
+    return texto.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def siguiente_id(cursor, tabla: str, columna: str) -> int:
+    cursor.execute(f"SELECT COALESCE(MAX({columna}), 0) FROM {tabla}")
+    return cursor.fetchone()[0] + 1
+
+
+def generar(args):
+    rnd = random.Random(args.semilla)
+
+    conexion = conectar(allow_local_infile=True) if args.load_data else conectar()
+    if not conexion:
+        print("❌ Error: No se pudo conectar a la base de datos")
+        return False
+
+    cursor = conexion.cursor()
+    cursor.execute("SELECT id_usuario FROM usuarios WHERE rol IN ('vendedor', 'administrador', 'superadministrador')")
+    usuarios = [fila[0] for fila in cursor.fetchall()]
+    if not usuarios:
+        print("❌ No hay usuarios vendedores/administradores. Crea uno con crear_admin_directo.py")
+        cursor.close()
+        conexion.close()
+        return False
+
+    ids = {
+        "insumo": siguiente_id(cursor, "insumos", "id_insumo"),
+        "producto": siguiente_id(cursor, "productos", "id_producto"),
+        "cliente": siguiente_id(cursor, "clientes", "id_cliente"),
+        "venta": siguiente_id(cursor, "ventas", "id_venta"),
+        "preorden": siguiente_id(cursor, "preordenes", "id_preorden"),
+        "comanda": siguiente_id(cursor, "comandas", "id_comanda"),
+    }
+    # Sufijo de corrida para que nombres únicos no choquen con datos previos
+    sufijo = f"{ids['insumo']:05d}"
+
+    # Desactivar verificación de llaves foráneas durante la carga masiva: las
+    # tablas hijas pueden vaciarse antes que sus padres
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    cursor.close()
+
+    escritor = EscritorLotes(conexion, args.lote, args.load_data)
+    inicio = time.time()
+    fecha_fin = args.fecha_fin
+    fecha_inicio = fecha_fin - timedelta(days=args.dias)
+
+    # ========== CATÁLOGO: INSUMOS, PRODUCTOS Y RECETAS ==========
+    # Las filas de insumos se escriben al final: cantidad_actual sale de sus movimientos
+    insumos = []
+    for nombre, unidad, unidad_receta, rango, precio in INSUMOS_BASE:
+        id_insumo = ids["insumo"]
+        ids["insumo"] += 1
+        insumos.append({
+            "id": id_insumo, "nombre": nombre, "nombre_corrida": f"{nombre} {sufijo}", "unidad": unidad,
+            "unidad_receta": unidad_receta, "rango": rango, "precio": precio
+        })
+
+    productos = []
+    for nombre, precio, categoria, indices_insumos in PRODUCTOS_BASE:
+        for tamano, incremento in (("M", 0), ("G", 5)):
+            if categoria.startswith("Menú") and tamano == "G":
+                continue
+            id_producto = ids["producto"]
+            ids["producto"] += 1
+            nombre_producto = f"{nombre} {tamano}" if categoria.startswith("Bebidas") else nombre
+            productos.append({"id": id_producto, "precio": Decimal(str(precio + incremento)), "insumos": []})
+            escritor.agregar("productos", (
+                id_producto, nombre_producto, f"{nombre_producto} (generado)", precio + incremento,
+                categoria, rnd.randint(3, 12), True
+            ))
+            for indice in indices_insumos:
+                insumo = insumos[indice]
+                cantidad = Decimal(str(rnd.randint(*insumo["rango"])))
+                if tamano == "G":
+                    cantidad = (cantidad * Decimal("1.3")).quantize(Decimal("1"))
+                # Consumo por unidad de producto en la unidad del insumo, como lo descuenta el sistema
+                productos[-1]["insumos"].append(
+                    (insumo["id"], convertir_unidades(cantidad, insumo["unidad_receta"], insumo["unidad"]))
+                )
+                escritor.agregar("recetas_insumos", (id_producto, insumo["id"], cantidad, insumo["unidad_receta"]))
+
+    # ========== CLIENTES ==========
+    # Un solo hash para todos: bcrypt por fila haría el generador inútilmente lento
+    contrasena_hash = bcrypt.hashpw(b"cliente123", bcrypt.gensalt()).decode("utf-8")
+    clientes = []
+    for _ in range(args.clientes):
+        id_cliente = ids["cliente"]
+        ids["cliente"] += 1
+        nombre = rnd.choice(NOMBRES)
+        apellido_paterno, apellido_materno = rnd.choice(APELLIDOS), rnd.choice(APELLIDOS)
+        celular = f"55{rnd.randint(10000000, 99999999)}"
+        # Columnas de búsqueda con la misma normalización que crear_cliente; la fila
+        # se escribe al final, con los contadores de visitas ya calculados
+        clientes.append({
+            "id": id_cliente, "nombre": nombre, "visitas": 0, "ultima_visita": None, "fila": (
+                id_cliente, nombre, apellido_paterno, apellido_materno,
+                f"cliente{id_cliente}@ejemplo.com", contrasena_hash,
+                celular, normalizar_celular(celular) or None,
+                normalizar_nombre_cliente(nombre, apellido_paterno, apellido_materno), Decimal("0"),
+                fecha_inicio + timedelta(minutes=rnd.randint(0, args.dias * 24 * 60))
+            )
+        })
+
+    print(f"✅ Catálogo: {len(insumos)} insumos, {len(productos)} productos, {len(clientes)} clientes")
+
+    # ========== OPERACIÓN DIARIA ==========
+    horas = list(PESOS_HORA.keys())
+    pesos_horas = list(PESOS_HORA.values())
+    consumo_semanal = {}
+    # Saldo de cada insumo según los movimientos generados y el mínimo que alcanzó,
+    # para fijar un inventario inicial que nunca deje el stock en negativo
+    saldo = {insumo["id"]: Decimal("0") for insumo in insumos}
+    saldo_minimo = dict(saldo)
+
+    for dia in range(args.dias):
+        fecha_dia = fecha_inicio + timedelta(days=dia)
+
+        # Reabastecimiento semanal (lunes antes de abrir): una entrada por insumo con lo consumido
+        if fecha_dia.weekday() == 0 and consumo_semanal:
+            for id_insumo, cantidad in consumo_semanal.items():
+                escritor.agregar("movimientos_inventario", (
+                    id_insumo, "entrada", cantidad, "Compra semanal", fecha_dia.replace(hour=6)
+                ))
+                saldo[id_insumo] += cantidad
+            consumo_semanal = {}
+
+        # Fines de semana con más tráfico
+        factor = 1.25 if fecha_dia.weekday() >= 5 else 1.0
+        pedidos_dia = max(1, int(rnd.gauss(args.pedidos_por_dia * factor, args.pedidos_por_dia * 0.1)))
+
+        for _ in range(pedidos_dia):
+            fecha = fecha_dia.replace(hour=rnd.choices(horas, weights=pesos_horas)[0],
+                                      minute=rnd.randint(0, 59), second=rnd.randint(0, 59))
+            id_venta = ids["venta"]
+            ids["venta"] += 1
+
+            cliente = rnd.choice(clientes) if clientes and rnd.random() < 0.3 else None
+            lineas = []
+            total = Decimal("0")
+            for producto in rnd.sample(productos, rnd.choices([1, 2, 3, 4], weights=[50, 30, 15, 5])[0]):
+                cantidad = rnd.choices([1, 2, 3], weights=[80, 15, 5])[0]
+                subtotal = producto["precio"] * cantidad
+                total += subtotal
+                lineas.append((producto, cantidad, subtotal, rnd.choice(OBSERVACIONES)))
+
+            tipo_leche = rnd.choice([None, "entera", "entera", "deslactosada"])
+            extra_leche = Decimal("15") if tipo_leche == "deslactosada" else None
+            total_venta = total + (extra_leche or 0)
+            tipo_servicio = rnd.choice(["comer-aqui", "para-llevar"])
+            origen = "web" if rnd.random() < 0.3 else "sistema"
+
+            escritor.agregar("ventas", (
+                id_venta, cliente["id"] if cliente else None, rnd.choice(usuarios), total_venta,
+                rnd.choice(METODOS_PAGO), fecha, tipo_servicio, None, tipo_leche, extra_leche
+            ))
+            for producto, cantidad, subtotal, _ in lineas:
+                escritor.agregar("detalles_venta", (id_venta, producto["id"], cantidad, producto["precio"], subtotal))
+
+            # Pre-orden (web) o pedido del sistema, ya entregado
+            id_preorden = ids["preorden"]
+            ids["preorden"] += 1
+            fecha_pedido = fecha - timedelta(minutes=rnd.randint(2, 15)) if origen == "web" else fecha
+            fecha_entrega = fecha + timedelta(minutes=rnd.randint(3, 20))
+            escritor.agregar("preordenes", (
+                id_preorden, cliente["nombre"] if cliente else None, "entregada", total_venta, id_venta,
+                f"TICKET-{fecha.strftime('%Y%m%d-%H%M%S')}-{id_preorden:X}", origen, tipo_servicio, None,
+                tipo_leche, extra_leche, fecha_pedido, fecha_entrega
+            ))
+            for producto, cantidad, _, observaciones in lineas:
+                escritor.agregar("detalles_preorden", (id_preorden, producto["id"], cantidad, observaciones))
+
+            # Comanda terminada y su consumo de inventario
+            id_comanda = ids["comanda"]
+            ids["comanda"] += 1
+            escritor.agregar("comandas", (id_comanda, id_venta, "terminada", fecha, fecha_entrega))
+            consumo_comanda = {}
+            for producto, cantidad, _, observaciones in lineas:
+                escritor.agregar("detalles_comanda", (id_comanda, producto["id"], cantidad, observaciones))
+                for id_insumo, cantidad_receta in producto["insumos"]:
+                    consumo_comanda[id_insumo] = consumo_comanda.get(id_insumo, 0) + cantidad_receta * cantidad
+            for id_insumo, cantidad in consumo_comanda.items():
+                escritor.agregar("movimientos_inventario", (id_insumo, "salida", cantidad, "Comanda terminada", fecha_entrega))
+                consumo_semanal[id_insumo] = consumo_semanal.get(id_insumo, 0) + cantidad
+                saldo[id_insumo] -= cantidad
+                saldo_minimo[id_insumo] = min(saldo_minimo[id_insumo], saldo[id_insumo])
+
+            if cliente:
+                escritor.agregar("visitas_clientes", (cliente["id"], id_venta, fecha))
+                cliente["visitas"] += 1
+                cliente["ultima_visita"] = max(cliente["ultima_visita"] or fecha, fecha)
+
+        if (dia + 1) % 30 == 0:
+            print(f"   📅 {dia + 1}/{args.dias} días generados ({escritor.totales['ventas']} ventas)")
+
+    # ========== CLIENTES: CONTADORES DE VISITAS (los que lee el historial de visitas) ==========
+    for cliente in clientes:
+        escritor.agregar("clientes", cliente["fila"] + (cliente["visitas"], cliente["ultima_visita"]))
+
+    # ========== INVENTARIO: STOCK FINAL = INICIAL + ENTRADAS - SALIDAS ==========
+    for insumo in insumos:
+        id_insumo = insumo["id"]
+        reserva = Decimal("500") if insumo["unidad"] == "unidades" else Decimal("50")
+        inicial = reserva - saldo_minimo[id_insumo]
+        escritor.agregar("movimientos_inventario", (id_insumo, "entrada", inicial, "Inventario inicial", fecha_inicio))
+        escritor.agregar("insumos", (
+            id_insumo, insumo["nombre_corrida"], normalizar_nombre(insumo["nombre_corrida"]),
+            f"{insumo['nombre']} (generado)", insumo["unidad"], inicial + saldo[id_insumo],
+            Decimal("50") if insumo["unidad"] == "unidades" else Decimal("5"), insumo["precio"], True
+        ))
+
+    escritor.finalizar()
+
+    cursor = conexion.cursor()
+    cursor.execute("SET SESSION foreign_key_checks = 1")
+    cursor.close()
+    conexion.close()
+
+    duracion = time.time() - inicio
+    total_filas = sum(escritor.totales.values())
+    print("")
+    print("=" * 50)
+    print(f"✅ {total_filas} filas generadas en {duracion:.1f} s ({total_filas / max(duracion, 0.001):.0f} filas/s)")
+    for tabla, total in escritor.totales.items():
+        print(f"   - {tabla}: {total}")
+    print("=" * 50)
+    return True
+
+
+def _fecha(texto: str) -> datetime:
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha inválida '{texto}' (formato AAAA-MM-DD)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de alto volumen")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla para generar datos reproducibles")
+    parser.add_argument("--dias", type=int, default=180, help="Días de historia a generar")
+    parser.add_argument("--pedidos-por-dia", type=int, default=300, help="Pedidos promedio por día")
+    parser.add_argument("--fecha-fin", type=_fecha, default=FECHA_FIN_DEFAULT,
+                        help="Último día generado, AAAA-MM-DD (fijo para que la semilla reproduzca los mismos datos)")
+    parser.add_argument("--clientes", type=int, default=5000, help="Clientes registrados a generar")
+    parser.add_argument("--lote", type=int, default=2000, help="Filas por sentencia INSERT")
+    parser.add_argument("--load-data", action="store_true",
+                        help="Usar LOAD DATA LOCAL INFILE (requiere local_infile=1 en el servidor)")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("🚀 Generador de datos de volumen")
+    print("=" * 50)
+    print(f"   Semilla: {args.semilla} | Días: {args.dias} | Pedidos/día: {args.pedidos_por_dia} | "
+          f"Hasta: {args.fecha_fin:%Y-%m-%d}")
+    print("")
+
+    if not generar(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from routes.routes import api_router
 from database.init_db import init_database
+from services.loyabit_outbox_service import iniciar_despachador, detener_despachador
+from services.trabajos_service import iniciar_trabajadores, detener_trabajadores, programar_recurrente
+import os
 
 # Inicializar base de datos al arrancar (similar a Spring Boot ddl-auto=update)
 print("🔄 Inicializando base de datos...")
@@ -78,6 +81,14 @@ tags_metadata = [
         "name": "Pre-órdenes",
         "description": "Sistema de pedidos públicos desde la página web. Los clientes pueden crear pre-órdenes sin autenticación, que luego pasan por caja y cocina.",
     },
+    {
+        "name": "Loyabit",
+        "description": "Integración con Loyabit (puntos de fidelidad). Los puntos se registran localmente y se envían a Loyabit en segundo plano.",
+    },
+    {
+        "name": "Trabajos",
+        "description": "Cola de trabajos en segundo plano (reportes pesados, llamadas a Loyabit, migraciones de datos).",
+    },
 ]
 
 app = FastAPI(
@@ -141,6 +152,25 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 # Incluir todas las rutas
 app.include_router(api_router)
 
+@app.on_event("startup")
+async def iniciar_tareas_segundo_plano():
+    """Arranca el envío en segundo plano de los puntos pendientes a Loyabit y los trabajadores de la cola"""
+    if iniciar_despachador():
+        print("📤 Despachador de puntos Loyabit iniciado")
+    # TRABAJOS_EN_SERVIDOR=0 cuando los trabajos los atienden procesos aparte (trabajador.py)
+    if os.getenv("TRABAJOS_EN_SERVIDOR", "1") == "1" and iniciar_trabajadores():
+        print("🛠️  Trabajadores de la cola iniciados")
+    # Archivado diario del histórico (HISTORICO_ARCHIVAR_CADA_HORAS=0 lo desactiva);
+    # programar_recurrente no lo duplica si ya está en la cola
+    horas_archivado = float(os.getenv("HISTORICO_ARCHIVAR_CADA_HORAS", "24"))
+    if horas_archivado > 0:
+        programar_recurrente("archivar_historico", int(horas_archivado * 3600))
+
+@app.on_event("shutdown")
+async def detener_tareas_segundo_plano():
+    detener_despachador()
+    detener_trabajadores()
+
 @app.get("/", tags=["General"])
 async def root():
     """
@@ -165,7 +195,9 @@ async def root():
             "ventas": "/api/ventas",
             "comandas": "/api/comandas",
             "recetas": "/api/recetas",
-            "preordenes": "/api/preordenes"
+            "preordenes": "/api/preordenes",
+            "loyabit": "/api/loyabit",
+            "trabajos": "/api/trabajos"
         }
     }
 
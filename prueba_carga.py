@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del ciclo completo de pedidos (hora pico).
+
+Reproduce una mezcla realista de tráfico contra un servidor local:
+- Menú público: ver_productos + descarga de imágenes
+- Pre-orden web: crear_preorden -> actualizar_preorden (en_caja) -> procesar_pago
+- Venta directa en caja: crear_venta
+- Cocina: consulta de comandas pendientes y actualizar_estado_comanda a terminada
+
+Al final reporta, por paso: peticiones, errores, tasa de error, throughput y
+latencias p50/p95/p99. El resultado puede guardarse en JSON (--salida) y
+compararse contra una corrida anterior (--comparar) para medir el impacto de
+cambios de rendimiento.
+
+Uso:
+    python prueba_carga.py --usuarios 20 --duracion 60 --salida corrida.json
+    python prueba_carga.py --usuarios 20 --duracion 60 --comparar corrida.json
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+# Credenciales del usuario con el que se autentican cajero y cocina
+ADMIN_EMAIL = "admin@cafeteria.com"
+ADMIN_PASSWORD = "admin123"
+
+# Peso relativo de cada escenario dentro de la mezcla de hora pico
+MEZCLA_ESCENARIOS = {
+    "menu": 40,
+    "preorden_web": 20,
+    "venta_directa": 25,
+    "cocina": 15,
+}
+
+METODOS_PAGO = ["efectivo", "tarjeta", "transferencia"]
+
+
+class Metricas:
+    """Acumula latencias y errores por paso de forma segura entre hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+        self.pedidos_completados = 0
+
+    def registrar(self, paso: str, segundos: float, ok: bool):
+        with self._lock:
+            self.latencias.setdefault(paso, []).append(segundos * 1000)
+            if not ok:
+                self.errores[paso] = self.errores.get(paso, 0) + 1
+
+    def pedido_completado(self):
+        with self._lock:
+            self.pedidos_completados += 1
+
+
+def percentil(valores_ordenados, p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, math.ceil(p / 100.0 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+class ClienteCarga:
+    """Un usuario virtual: mantiene su sesión HTTP y ejecuta escenarios"""
+
+    def __init__(self, token: str, id_usuario: int, productos, productos_con_imagen, metricas: Metricas):
+        self.sesion = requests.Session()
+        self.sesion.headers.update({"Authorization": f"Bearer {token}"})
+        self.id_usuario = id_usuario
+        self.productos = productos
+        self.productos_con_imagen = productos_con_imagen
+        self.metricas = metricas
+
+    def _llamar(self, paso: str, metodo: str, ruta: str, **kwargs):
+        """Ejecuta una petición y la registra. Devuelve el JSON (o None si falló)"""
+        inicio = time.perf_counter()
+        datos = None
+        ok = False
+        try:
+            respuesta = self.sesion.request(metodo, f"{BASE_URL}{ruta}", timeout=30, **kwargs)
+            ok = 200 <= respuesta.status_code < 300
+            if ok and respuesta.headers.get("content-type", "").startswith("application/json"):
+                datos = respuesta.json()
+                # La API responde 200 con {"error": ...} en fallos de negocio
+                if isinstance(datos, dict) and "error" in datos:
+                    ok = False
+            elif ok:
+                datos = {}
+        except requests.RequestException:
+            ok = False
+        self.metricas.registrar(paso, time.perf_counter() - inicio, ok)
+        return datos if ok else None
+
+    def _detalles_aleatorios(self):
+        seleccion = random.sample(self.productos, min(random.randint(1, 3), len(self.productos)))
+        return [(p, random.randint(1, 2)) for p in seleccion]
+
+    def escenario_menu(self):
+        self._llamar("ver_productos", "GET", "/api/productos/ver_productos")
+        if self.productos_con_imagen:
+            for producto in random.sample(self.productos_con_imagen, min(3, len(self.productos_con_imagen))):
+                self._llamar("imagen_producto", "GET", f"/api/productos/imagen/{producto['id_producto']}")
+
+    def escenario_preorden_web(self):
+        detalles = self._detalles_aleatorios()
+        preorden = self._llamar("crear_preorden", "POST", "/api/preordenes/crear_preorden", json={
+            "nombre_cliente": f"Carga {random.randint(1, 9999)}",
+            "detalles": [{"id_producto": p["id_producto"], "cantidad": c} for p, c in detalles],
+        })
+        if not preorden:
+            return
+        id_preorden = preorden["id_preorden"]
+        if not self._llamar("actualizar_preorden", "PUT", f"/api/preordenes/actualizar_preorden/{id_preorden}",
+                            json={"estado": "en_caja"}):
+            return
+        if self._llamar("procesar_pago", "POST", f"/api/preordenes/procesar_pago/{id_preorden}",
+                        json={"metodo_pago": random.choice(METODOS_PAGO)}):
+            self.metricas.pedido_completado()
+
+    def escenario_venta_directa(self):
+        detalles = self._detalles_aleatorios()
+        lineas = []
+        total = 0.0
+        for producto, cantidad in detalles:
+            precio = float(producto["precio"])
+            subtotal = precio * cantidad
+            total += subtotal
+            lineas.append({
+                "id_producto": producto["id_producto"],
+                "cantidad": cantidad,
+                "precio_unitario": precio,
+                "subtotal": subtotal,
+            })
+        if self._llamar("crear_venta", "POST", "/api/ventas/crear_venta", json={
+            "id_usuario": self.id_usuario,
+            "total": total,
+            "metodo_pago": random.choice(METODOS_PAGO),
+            "detalles": lineas,
+        }):
+            self.metricas.pedido_completado()
+
+    def escenario_cocina(self):
+        comandas = self._llamar("ver_comandas_pendientes", "GET", "/api/comandas/ver_comandas",
+                                params={"estado": "pendiente"})
+        if not comandas:
+            return
+        # Elegir entre las más antiguas para simular la cola de cocina sin que
+        # todos los hilos compitan por la misma comanda
+        comanda = random.choice(comandas[:5])
+        self._llamar("terminar_comanda", "PUT",
+                     f"/api/comandas/actualizar_estado_comanda/{comanda['id_comanda']}",
+                     params={"estado": "terminada"})
+
+
+def preparar():
+    """Hace login y carga el catálogo que se usará durante la prueba"""
+    try:
+        respuesta = requests.post(f"{BASE_URL}/api/login",
+                                  json={"correo": ADMIN_EMAIL, "contrasena": ADMIN_PASSWORD}, timeout=10)
+    except requests.RequestException as e:
+        print(f"❌ No se pudo contactar al servidor en {BASE_URL}: {e}")
+        return None
+    if respuesta.status_code != 200:
+        print(f"❌ Error en login: {respuesta.status_code} - {respuesta.text}")
+        return None
+    login = respuesta.json()
+
+    productos = requests.get(f"{BASE_URL}/api/productos/ver_productos", timeout=10).json()
+    if not isinstance(productos, list) or not productos:
+        print("❌ No hay productos activos. Registra el menú antes de la prueba.")
+        return None
+    productos = [p for p in productos if float(p.get("precio") or 0) > 0]
+    productos_con_imagen = [p for p in productos if p.get("tipo_imagen")]
+
+    return {
+        "token": login["access_token"],
+        "id_usuario": login["usuario"]["id_usuario"],
+        "productos": productos,
+        "productos_con_imagen": productos_con_imagen,
+    }
+
+
+def ejecutar_usuario(contexto, metricas: Metricas, fin: float):
+    cliente = ClienteCarga(contexto["token"], contexto["id_usuario"], contexto["productos"],
+                           contexto["productos_con_imagen"], metricas)
+    escenarios = list(MEZCLA_ESCENARIOS.keys())
+    pesos = list(MEZCLA_ESCENARIOS.values())
+    while time.time() < fin:
+        escenario = random.choices(escenarios, weights=pesos)[0]
+        getattr(cliente, f"escenario_{escenario}")()
+
+
+def construir_reporte(metricas: Metricas, duracion: float, usuarios: int):
+    pasos = {}
+    for paso, latencias in sorted(metricas.latencias.items()):
+        ordenadas = sorted(latencias)
+        total = len(ordenadas)
+        errores = metricas.errores.get(paso, 0)
+        pasos[paso] = {
+            "peticiones": total,
+            "errores": errores,
+            "tasa_error": round(errores / total, 4) if total else 0,
+            "throughput_rps": round(total / duracion, 2),
+            "p50_ms": round(percentil(ordenadas, 50), 2),
+            "p95_ms": round(percentil(ordenadas, 95), 2),
+            "p99_ms": round(percentil(ordenadas, 99), 2),
+            "max_ms": round(ordenadas[-1], 2) if ordenadas else 0,
+        }
+    return {
+        "fecha": datetime.now().isoformat(),
+        "usuarios": usuarios,
+        "duracion_segundos": round(duracion, 2),
+        "pedidos_completados": metricas.pedidos_completados,
+        "pedidos_por_minuto": round(metricas.pedidos_completados / duracion * 60, 2),
+        "pasos": pasos,
+    }
+
+
+def imprimir_reporte(reporte, anterior=None):
+    print("")
+    print("=" * 96)
+    print(f"📊 Resultado: {reporte['usuarios']} usuarios, {reporte['duracion_segundos']} s")
+    print(f"   Pedidos completados: {reporte['pedidos_completados']} "
+          f"({reporte['pedidos_por_minuto']} por minuto)")
+    if anterior:
+        print(f"   Corrida anterior: {anterior['pedidos_por_minuto']} pedidos por minuto")
+    print("=" * 96)
+    print(f"{'Paso':<26}{'Peticiones':>11}{'Err %':>8}{'RPS':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δ p95':>10}")
+    for paso, datos in reporte["pasos"].items():
+        delta = ""
+        if anterior and paso in anterior.get("pasos", {}):
+            previo = anterior["pasos"][paso]["p95_ms"]
+            if previo:
+                delta = f"{(datos['p95_ms'] - previo) / previo * 100:+.1f}%"
+        print(f"{paso:<26}{datos['peticiones']:>11}{datos['tasa_error'] * 100:>7.1f}%{datos['throughput_rps']:>9}"
+              f"{datos['p50_ms']:>10}{datos['p95_ms']:>10}{datos['p99_ms']:>10}{delta:>10}")
+    print("=" * 96)
+
+
+def main():
+    global BASE_URL
+    parser = argparse.ArgumentParser(description="Prueba de carga del ciclo completo de pedidos")
+    parser.add_argument("--url", default=BASE_URL, help="URL base de la API")
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--duracion", type=int, default=60, help="Duración de la prueba en segundos")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla para reproducir la mezcla")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el resultado")
+    parser.add_argument("--comparar", help="Archivo JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    BASE_URL = args.url.rstrip("/")
+    if args.semilla is not None:
+        random.seed(args.semilla)
+
+    print("🚀 Preparando prueba de carga...")
+    contexto = preparar()
+    if not contexto:
+        sys.exit(1)
+    print(f"✅ {len(contexto['productos'])} productos, {len(contexto['productos_con_imagen'])} con imagen")
+    print(f"⏱️  Ejecutando {args.usuarios} usuarios durante {args.duracion} s...")
+
+    metricas = Metricas()
+    inicio = time.time()
+    fin = inicio + args.duracion
+    with ThreadPoolExecutor(max_workers=args.usuarios) as executor:
+        for _ in range(args.usuarios):
+            executor.submit(ejecutar_usuario, contexto, metricas, fin)
+    duracion_real = time.time() - inicio
+
+    reporte = construir_reporte(metricas, duracion_real, args.usuarios)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+
+    imprimir_reporte(reporte, anterior)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        print(f"💾 Resultado guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Búsqueda rápida de productos para el punto de venta.
+
+Índice en memoria (utils.indice_busqueda) de los productos activos: prefijos del
+nombre sin acentos y la categoría como faceta. Se carga con una consulta la
+primera vez y después cada tecla se responde sin tocar MySQL. producto_repository
+invalida el índice al crear, editar o desactivar productos.
+"""
+import threading
+from database.conexion import conectar
+from utils.indice_busqueda import IndiceBusqueda
+
+_indice = IndiceBusqueda()
+_cargado = False
+_lock = threading.Lock()
+
+def invalidar_busqueda_productos():
+    """El índice se vuelve a cargar en la siguiente búsqueda"""
+    global _cargado
+    with _lock:
+        _cargado = False
+
+def _asegurar_indice():
+    global _cargado
+    with _lock:
+        if _cargado:
+            return None
+        conexion = conectar()
+        if not conexion:
+            return {"error": "Error de conexión a la base de datos"}
+        cursor = conexion.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT id_producto, nombre, precio, categoria FROM productos WHERE activo = 1")
+            _indice.reconstruir(
+                (
+                    fila["id_producto"],
+                    fila["nombre"],
+                    {
+                        "id_producto": fila["id_producto"],
+                        "nombre": fila["nombre"],
+                        "precio": fila["precio"],
+                        "categoria": fila["categoria"]
+                    },
+                    {"categoria": fila["categoria"]}
+                )
+                for fila in cursor.fetchall()
+            )
+            _cargado = True
+            return None
+        except Exception as e:
+            return {"error": f"Error al cargar índice de productos: {str(e)}"}
+        finally:
+            cursor.close()
+            conexion.close()
+
+def buscar_productos(texto: str, categoria: str = None, limite: int = 20):
+    """
+    Retorna {"resultados": [...], "categorias": {categoria: total}}.
+    Los resultados (id_producto, nombre, precio, categoria, puntaje) se ordenan por
+    relevancia; `categorias` cuenta por categoría las mismas coincidencias (también
+    las aproximadas) sin aplicar el filtro ni el límite, para las pestañas del POS.
+    """
+    error = _asegurar_indice()
+    if error:
+        return error
+    filtros = {"categoria": categoria} if categoria else None
+    resultados, categorias = _indice.buscar_con_facetas(texto, "categoria", limite=limite, filtros=filtros)
+    for resultado in resultados:
+        del resultado["id"]
+    return {
+        "resultados": resultados,
+        "categorias": categorias
+    }
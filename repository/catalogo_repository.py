@@ -0,0 +1,147 @@
+"""
+Importación masiva del catálogo (ver services/catalogo_service.py).
+
+leer_catalogo_actual trae en dos consultas lo necesario para validar un archivo
+completo antes de escribir nada. aplicar_importacion escribe todo en una sola
+transacción con sentencias por lote (executemany): insumos nuevos, productos
+nuevos y actualizados y sus recetas (sólo las líneas que cambian). Si algo
+falla no queda nada a medias.
+"""
+from database.conexion import conectar
+from repository.lista_materiales_repository import invalidar_lista_materiales, receta_tiene_unidad_medida
+from repository.disponibilidad_repository import invalidar_disponibilidad
+from repository.busqueda_productos_repository import invalidar_busqueda_productos
+from repository.inventario_repository import invalidar_indice_insumos
+from repository.receta_repository import aplicar_diferencias_recetas
+from utils.normalize import normalizar_nombre
+
+# Columnas de productos que puede modificar una importación
+CAMPOS_ACTUALIZABLES = ("nombre", "descripcion", "precio", "categoria", "activo")
+
+def leer_catalogo_actual():
+    """
+    Retorna {"productos": {nombre_normalizado: [id_producto, ...]},
+             "datos_productos": {id_producto: {"nombre", "descripcion", "precio", "categoria", "activo"}},
+             "insumos": {id_insumo: {"id_insumo", "nombre", "unidad_medida", "activo"}},
+             "insumos_por_nombre": {nombre_normalizado: id_insumo}} o {"error"}
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT id_producto, nombre, descripcion, precio, categoria, activo FROM productos ORDER BY id_producto"
+        )
+        productos = {}
+        datos_productos = {}
+        for fila in cursor.fetchall():
+            productos.setdefault(normalizar_nombre(fila["nombre"]), []).append(fila["id_producto"])
+            datos_productos[fila["id_producto"]] = fila
+
+        cursor.execute("SELECT id_insumo, nombre, unidad_medida, activo FROM insumos")
+        insumos = {fila["id_insumo"]: fila for fila in cursor.fetchall()}
+        insumos_por_nombre = {normalizar_nombre(fila["nombre"]): id_insumo for id_insumo, fila in insumos.items()}
+        return {
+            "productos": productos, "datos_productos": datos_productos,
+            "insumos": insumos, "insumos_por_nombre": insumos_por_nombre
+        }
+    except Exception as e:
+        return {"error": f"Error al leer el catálogo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def _ids_por_nombre(cursor, sql: str, nombres):
+    marcadores = ", ".join(["%s"] * len(nombres))
+    cursor.execute(sql.format(marcadores=marcadores), tuple(nombres))
+    # Ordenado por id: ante nombres repetidos queda el más reciente (el recién insertado)
+    return {normalizar_nombre(nombre): id_fila for id_fila, nombre in cursor.fetchall()}
+
+def aplicar_importacion(insumos_nuevos, productos_nuevos, productos_actualizados, recetas):
+    """
+    Escribe la importación en una transacción.
+    - insumos_nuevos: [{"nombre", "descripcion", "unidad_medida", "cantidad_minima", "precio_compra"}]
+    - productos_nuevos: [{"nombre", "descripcion", "precio", "categoria", "activo"}]
+    - productos_actualizados: [{"id_producto", "cambios": {campo: valor}}]; sólo se escriben
+      los campos de "cambios" (los que traía el archivo y son distintos a lo guardado)
+    - recetas: {producto: [(insumo, cantidad_necesaria, unidad_medida)]} donde producto es
+      un id_producto o el nombre normalizado de un producto nuevo, e insumo un id_insumo o
+      el nombre normalizado de un insumo nuevo. Reemplaza las recetas de esos productos
+      aplicando sólo las diferencias con lo guardado.
+    Retorna {"ids_productos": {nombre_normalizado: id}, "ids_insumos": {nombre_normalizado: id}} o {"error"}
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    ids_insumos = {}
+    ids_productos = {}
+    try:
+        if insumos_nuevos:
+            cursor.executemany("""
+                INSERT INTO insumos(
+                    nombre, nombre_normalizado, descripcion, unidad_medida, cantidad_actual,
+                    cantidad_minima, precio_compra, activo
+                )
+                VALUES (%s, %s, %s, %s, 0, %s, %s, TRUE)
+            """, [
+                (i["nombre"], normalizar_nombre(i["nombre"]), i["descripcion"], i["unidad_medida"],
+                 i["cantidad_minima"], i["precio_compra"])
+                for i in insumos_nuevos
+            ])
+            ids_insumos = _ids_por_nombre(
+                cursor,
+                "SELECT id_insumo, nombre FROM insumos WHERE nombre_normalizado IN ({marcadores}) ORDER BY id_insumo",
+                [normalizar_nombre(i["nombre"]) for i in insumos_nuevos]
+            )
+
+        if productos_nuevos:
+            cursor.executemany("""
+                INSERT INTO productos(nombre, descripcion, precio, categoria, activo)
+                VALUES (%s, %s, %s, %s, %s)
+            """, [(p["nombre"], p["descripcion"], p["precio"], p["categoria"], p["activo"]) for p in productos_nuevos])
+            ids_productos = _ids_por_nombre(
+                cursor,
+                "SELECT id_producto, nombre FROM productos WHERE nombre IN ({marcadores}) ORDER BY id_producto",
+                [p["nombre"] for p in productos_nuevos]
+            )
+
+        # Un UPDATE por combinación de campos modificados, cada uno por lote
+        por_campos = {}
+        for p in productos_actualizados:
+            campos = tuple(campo for campo in CAMPOS_ACTUALIZABLES if campo in p["cambios"])
+            if campos:
+                por_campos.setdefault(campos, []).append(
+                    tuple(p["cambios"][campo] for campo in campos) + (p["id_producto"],)
+                )
+        for campos, valores in por_campos.items():
+            asignaciones = ", ".join(f"{campo} = %s" for campo in campos)
+            cursor.executemany(f"UPDATE productos SET {asignaciones} WHERE id_producto = %s", valores)
+
+        if recetas:
+            tiene_unidad_medida = receta_tiene_unidad_medida(cursor)
+            for producto, lineas_producto in recetas.items():
+                aplicar_diferencias_recetas(
+                    cursor, ids_productos.get(producto, producto),
+                    [(ids_insumos.get(insumo, insumo), cantidad, unidad) for insumo, cantidad, unidad in lineas_producto],
+                    tiene_unidad_medida
+                )
+
+        conexion.commit()
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al importar catálogo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+    # Cachés derivadas del catálogo (por proceso)
+    invalidar_lista_materiales()
+    invalidar_disponibilidad()
+    invalidar_busqueda_productos()
+    if insumos_nuevos:
+        invalidar_indice_insumos()
+    return {"ids_productos": ids_productos, "ids_insumos": ids_insumos}
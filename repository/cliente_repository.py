@@ -2,6 +2,21 @@ from database.conexion import conectar
 from schemas.cliente_schema import VisitaClienteCreate
 from utils.auth import get_password_hash
 from datetime import datetime
+from utils.normalize import normalizar_celular, normalizar_nombre_cliente, normalizar_nombre
+from utils.indice_busqueda import IndiceBusqueda
+import threading
+import time
+import re
+
+# Respaldo en memoria para búsquedas con errores de dedo (ver buscar_clientes).
+# Se recarga cada INDICE_CLIENTES_TTL segundos para incluir clientes dados de
+# alta por otros procesos; los del propio proceso se agregan al momento.
+INDICE_CLIENTES_TTL = 600
+_indice_clientes = IndiceBusqueda()
+_indice_clientes_cargado_en = None
+_indice_clientes_lock = threading.Lock()
+
+COLUMNAS_BUSQUEDA_CLIENTE = "id_cliente, nombre, apellido_paterno, apellido_materno, correo, celular, puntos"
 
 def crear_cliente(cliente):
     conexion = conectar()
@@ -24,13 +39,15 @@ def crear_cliente(cliente):
     sql = """
     INSERT INTO clientes(
         nombre, apellido_paterno, apellido_materno, correo, contrasena, 
-        celular, rfc, direccion, puntos
+        celular, celular_normalizado, nombre_normalizado, rfc, direccion, puntos
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
     datos = (
         cliente.nombre, cliente.apellido_paterno, cliente.apellido_materno,
         cliente.correo, contrasena_hash, cliente.celular,
+        normalizar_celular(cliente.celular) or None,
+        normalizar_nombre_cliente(cliente.nombre, cliente.apellido_paterno, cliente.apellido_materno),
         cliente.rfc, cliente.direccion, cliente.puntos
     )
     
@@ -38,6 +55,11 @@ def crear_cliente(cliente):
         cursor.execute(sql, datos)
         conexion.commit()
         cliente_id = cursor.lastrowid
+        _indexar_cliente({
+            "id_cliente": cliente_id, "nombre": cliente.nombre,
+            "apellido_paterno": cliente.apellido_paterno, "apellido_materno": cliente.apellido_materno,
+            "correo": cliente.correo, "celular": cliente.celular, "puntos": cliente.puntos
+        })
         cursor.close()
         conexion.close()
         return {"message": "Cliente creado correctamente", "id_cliente": cliente_id}
@@ -66,7 +88,11 @@ def ver_cliente_by_id(id_cliente: int):
         return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor(dictionary=True)
-    sql = "SELECT id_cliente, nombre, apellido_paterno, apellido_materno, correo, celular, rfc, direccion, puntos FROM clientes WHERE id_cliente = %s"
+    sql = """
+    SELECT id_cliente, nombre, apellido_paterno, apellido_materno, correo, celular, rfc, direccion, puntos,
+           loyabit_id, loyabit_sincronizado
+    FROM clientes WHERE id_cliente = %s
+    """
     cursor.execute(sql, (id_cliente,))
     cliente = cursor.fetchone()
     cursor.close()
@@ -77,6 +103,187 @@ def ver_cliente_by_id(id_cliente: int):
     return cliente
 
 
+def obtener_cliente_por_loyabit_id(loyabit_id: str):
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor(dictionary=True)
+    sql = """
+    SELECT id_cliente, nombre, apellido_paterno, apellido_materno, correo, celular, puntos,
+           loyabit_id, loyabit_sincronizado
+    FROM clientes WHERE loyabit_id = %s
+    """
+    cursor.execute(sql, (loyabit_id,))
+    cliente = cursor.fetchone()
+    cursor.close()
+    conexion.close()
+    
+    if not cliente:
+        return {"error": "Cliente no encontrado"}
+    return cliente
+
+def actualizar_loyabit_id(id_cliente: int, loyabit_id: str, sincronizado: bool = True):
+    """Vincula el cliente local con su ID en Loyabit"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor()
+    sql = "UPDATE clientes SET loyabit_id = %s, loyabit_sincronizado = %s WHERE id_cliente = %s"
+    try:
+        cursor.execute(sql, (loyabit_id, sincronizado, id_cliente))
+        conexion.commit()
+        cursor.close()
+        conexion.close()
+        return {"message": "Cliente vinculado con Loyabit", "loyabit_id": loyabit_id}
+    except Exception as e:
+        conexion.rollback()
+        cursor.close()
+        conexion.close()
+        return {"error": f"Error al actualizar loyabit_id: {str(e)}"}
+
+def obtener_clientes_sin_sincronizar(despues_de_id: int = 0, limite: int = 100):
+    """
+    Siguiente página de clientes pendientes de vincular con Loyabit, en orden de id.
+    Paginación por llave (id_cliente > despues_de_id) con idx_clientes_loyabit_sync.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor(dictionary=True)
+    sql = """
+    SELECT id_cliente, nombre, apellido_paterno, apellido_materno, correo, celular
+    FROM clientes
+    WHERE loyabit_sincronizado = FALSE AND id_cliente > %s
+    ORDER BY id_cliente
+    LIMIT %s
+    """
+    cursor.execute(sql, (despues_de_id, limite))
+    clientes = cursor.fetchall()
+    cursor.close()
+    conexion.close()
+    return clientes
+
+def marcar_clientes_sincronizados(vinculos):
+    """Guarda en una sola transacción los loyabit_id de un lote: vinculos = [(id_cliente, loyabit_id)]"""
+    if not vinculos:
+        return {"actualizados": 0}
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor()
+    try:
+        cursor.executemany(
+            "UPDATE clientes SET loyabit_id = %s, loyabit_sincronizado = TRUE WHERE id_cliente = %s",
+            [(loyabit_id, id_cliente) for id_cliente, loyabit_id in vinculos]
+        )
+        conexion.commit()
+        cursor.close()
+        conexion.close()
+        return {"actualizados": len(vinculos)}
+    except Exception as e:
+        conexion.rollback()
+        cursor.close()
+        conexion.close()
+        return {"error": f"Error al guardar vínculos con Loyabit: {str(e)}"}
+
+def _datos_busqueda_cliente(fila):
+    return {
+        "id_cliente": fila["id_cliente"],
+        "nombre": fila["nombre"],
+        "apellido_paterno": fila["apellido_paterno"],
+        "apellido_materno": fila["apellido_materno"],
+        "correo": fila["correo"],
+        "celular": fila["celular"],
+        "puntos": fila["puntos"]
+    }
+
+def _indexar_cliente(fila):
+    """Agrega o actualiza un cliente en el índice en memoria, si ya está cargado"""
+    if _indice_clientes_cargado_en is None:
+        return
+    _indice_clientes.agregar(
+        fila["id_cliente"],
+        normalizar_nombre_cliente(fila["nombre"], fila["apellido_paterno"], fila["apellido_materno"]),
+        _datos_busqueda_cliente(fila)
+    )
+
+def _asegurar_indice_clientes(cursor):
+    global _indice_clientes_cargado_en
+    with _indice_clientes_lock:
+        if _indice_clientes_cargado_en is not None and time.monotonic() - _indice_clientes_cargado_en < INDICE_CLIENTES_TTL:
+            return
+        cursor.execute(f"SELECT {COLUMNAS_BUSQUEDA_CLIENTE} FROM clientes")
+        _indice_clientes.reconstruir(
+            (
+                fila["id_cliente"],
+                normalizar_nombre_cliente(fila["nombre"], fila["apellido_paterno"], fila["apellido_materno"]),
+                _datos_busqueda_cliente(fila),
+                None
+            )
+            for fila in cursor.fetchall()
+        )
+        _indice_clientes_cargado_en = time.monotonic()
+
+def _prefijo_like(texto: str) -> str:
+    """Patrón LIKE 'texto%' escapando los comodines que escriba el usuario"""
+    return re.sub(r'([\\%_])', r'\\\1', texto) + '%'
+
+def buscar_clientes(texto: str, limite: int = 10):
+    """
+    Búsqueda de clientes para asociarlos a una venta.
+    
+    - Con '@' se busca por prefijo del correo
+    - Sólo dígitos (y separadores de teléfono) se busca por prefijo del celular
+    - Cualquier otro texto se busca por prefijo del nombre completo normalizado
+    
+    Cada caso es una consulta LIKE 'prefijo%' con índice y LIMIT. Si por nombre hay
+    menos de `limite` resultados, se completa con el índice en memoria, que
+    encuentra apellidos sueltos y tolera errores de dedo.
+    """
+    texto = (texto or "").strip()
+    if len(texto) < 2:
+        return []
+    
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor(dictionary=True)
+    digitos = normalizar_celular(texto)
+    try:
+        if "@" in texto:
+            columna, valor = "correo", texto.lower()
+        elif digitos and not re.search(r'[^\d\s()+.-]', texto):
+            columna, valor = "celular_normalizado", digitos
+        else:
+            columna, valor = "nombre_normalizado", normalizar_nombre(texto)
+        
+        cursor.execute(
+            f"SELECT {COLUMNAS_BUSQUEDA_CLIENTE} FROM clientes WHERE {columna} LIKE %s ORDER BY {columna} LIMIT %s",
+            (_prefijo_like(valor), limite)
+        )
+        resultados = cursor.fetchall()
+        
+        if columna == "nombre_normalizado" and len(resultados) < limite:
+            _asegurar_indice_clientes(cursor)
+            encontrados = {cliente["id_cliente"] for cliente in resultados}
+            for coincidencia in _indice_clientes.buscar(texto, limite=limite):
+                if len(resultados) >= limite:
+                    break
+                if coincidencia["id"] not in encontrados:
+                    del coincidencia["id"], coincidencia["puntaje"]
+                    resultados.append(coincidencia)
+        
+        return resultados
+    except Exception as e:
+        return {"error": f"Error al buscar clientes: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
 
 def editar_cliente(id_cliente: int, cliente):
     conexion = conectar()
@@ -107,6 +314,8 @@ def editar_cliente(id_cliente: int, cliente):
     if cliente.celular is not None:
         campos.append("celular = %s")
         valores.append(cliente.celular)
+        campos.append("celular_normalizado = %s")
+        valores.append(normalizar_celular(cliente.celular) or None)
     if cliente.rfc is not None:
         campos.append("rfc = %s")
         valores.append(cliente.rfc)
@@ -127,11 +336,22 @@ def editar_cliente(id_cliente: int, cliente):
     
     try:
         cursor.execute(sql, valores)
-        conexion.commit()
         if cursor.rowcount == 0:
+            conexion.rollback()
             cursor.close()
             conexion.close()
             return {"error": "Cliente no encontrado"}
+        
+        # nombre_normalizado depende de los tres campos de nombre: recalcularlo en la misma transacción
+        cursor.execute(f"SELECT {COLUMNAS_BUSQUEDA_CLIENTE} FROM clientes WHERE id_cliente = %s", (id_cliente,))
+        fila = dict(zip([d[0] for d in cursor.description], cursor.fetchone()))
+        if cliente.nombre is not None or cliente.apellido_paterno is not None or cliente.apellido_materno is not None:
+            cursor.execute(
+                "UPDATE clientes SET nombre_normalizado = %s WHERE id_cliente = %s",
+                (normalizar_nombre_cliente(fila["nombre"], fila["apellido_paterno"], fila["apellido_materno"]), id_cliente)
+            )
+        conexion.commit()
+        _indexar_cliente(fila)
         cursor.close()
         conexion.close()
         return {"message": "Cliente actualizado correctamente"}
@@ -142,7 +362,7 @@ def editar_cliente(id_cliente: int, cliente):
         return {"error": f"Error al actualizar cliente: {str(e)}"}
 
 def registrar_visita(visita: VisitaClienteCreate):
-    """Registra una visita de un cliente"""
+    """Registra una visita de un cliente y actualiza sus contadores en la misma transacción"""
     conexion = conectar()
     if not conexion:
         return {"error": "Error de conexión a la base de datos"}
@@ -156,8 +376,15 @@ def registrar_visita(visita: VisitaClienteCreate):
     
     try:
         cursor.execute(sql, datos)
-        conexion.commit()
         visita_id = cursor.lastrowid
+        # GREATEST: una visita registrada con fecha atrasada no retrocede ultima_visita
+        cursor.execute("""
+            UPDATE clientes
+            SET total_visitas = total_visitas + 1,
+                ultima_visita = GREATEST(COALESCE(ultima_visita, %s), %s)
+            WHERE id_cliente = %s
+        """, (visita.fecha_visita, visita.fecha_visita, visita.id_cliente))
+        conexion.commit()
         cursor.close()
         conexion.close()
         return {"message": "Visita registrada correctamente", "id_visita": visita_id}
@@ -175,9 +402,10 @@ def ver_visitas_cliente(id_cliente: int):
     
     cursor = conexion.cursor(dictionary=True)
     sql = """
-    SELECT v.*, ve.total, ve.fecha_venta
+    SELECT v.*, COALESCE(ve.total, vh.total) AS total, COALESCE(ve.fecha_venta, vh.fecha_venta) AS fecha_venta
     FROM visitas_clientes v
-    JOIN ventas ve ON v.id_venta = ve.id_venta
+    LEFT JOIN ventas ve ON v.id_venta = ve.id_venta
+    LEFT JOIN ventas_historico vh ON ve.id_venta IS NULL AND v.id_venta = vh.id_venta
     WHERE v.id_cliente = %s
     ORDER BY v.fecha_visita DESC
     """
@@ -187,16 +415,109 @@ def ver_visitas_cliente(id_cliente: int):
     conexion.close()
     return visitas
 
+def ver_historial_visitas(id_cliente: int, limite: int = 20, cursor_pagina: str = None):
+    """
+    Historial de visitas paginado por llave (keyset), de la más reciente a la más antigua.
+    
+    cursor_pagina es el valor "siguiente" de la página anterior ("<fecha ISO>|<id_visita>").
+    A diferencia de OFFSET, cada página cuesta lo mismo sin importar qué tan atrás esté:
+    se continúa desde la última fila vista usando idx_visitas_cliente_fecha.
+    Retorna {"visitas": [...], "siguiente": str | None}
+    """
+    filtro = ""
+    parametros = [id_cliente]
+    if cursor_pagina:
+        try:
+            fecha_texto, id_texto = cursor_pagina.split("|", 1)
+            fecha_cursor = datetime.fromisoformat(fecha_texto)
+            id_cursor = int(id_texto)
+        except ValueError:
+            return {"error": "Cursor de paginación inválido"}
+        filtro = "AND (v.fecha_visita < %s OR (v.fecha_visita = %s AND v.id_visita < %s))"
+        parametros += [fecha_cursor, fecha_cursor, id_cursor]
+    
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor(dictionary=True)
+    # Se pide una fila de más para saber si hay otra página
+    sql = f"""
+    SELECT v.id_visita, v.id_cliente, v.id_venta, v.fecha_visita,
+           COALESCE(ve.total, vh.total) AS total, COALESCE(ve.fecha_venta, vh.fecha_venta) AS fecha_venta
+    FROM visitas_clientes v
+    LEFT JOIN ventas ve ON v.id_venta = ve.id_venta
+    -- Visitas cuya venta ya se archivó (ver historico_repository)
+    LEFT JOIN ventas_historico vh ON ve.id_venta IS NULL AND v.id_venta = vh.id_venta
+    WHERE v.id_cliente = %s {filtro}
+    ORDER BY v.fecha_visita DESC, v.id_visita DESC
+    LIMIT %s
+    """
+    try:
+        cursor.execute(sql, tuple(parametros + [limite + 1]))
+        visitas = cursor.fetchall()
+    except Exception as e:
+        return {"error": f"Error al obtener historial de visitas: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+    
+    siguiente = None
+    if len(visitas) > limite:
+        visitas = visitas[:limite]
+        ultima = visitas[-1]
+        siguiente = f"{ultima['fecha_visita'].isoformat()}|{ultima['id_visita']}"
+    return {"visitas": visitas, "siguiente": siguiente}
+
 def contar_visitas_cliente(id_cliente: int):
-    """Cuenta el total de visitas de un cliente"""
+    """Total de visitas y fecha de la última, leídos de los contadores del cliente"""
     conexion = conectar()
     if not conexion:
         return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor()
-    sql = "SELECT COUNT(*) as total FROM visitas_clientes WHERE id_cliente = %s"
+    sql = "SELECT total_visitas, ultima_visita FROM clientes WHERE id_cliente = %s"
     cursor.execute(sql, (id_cliente,))
     resultado = cursor.fetchone()
     cursor.close()
     conexion.close()
-    return {"total_visitas": resultado[0] if resultado else 0}
+    if not resultado:
+        return {"total_visitas": 0, "ultima_visita": None}
+    return {"total_visitas": resultado[0], "ultima_visita": resultado[1]}
+
+def reconciliar_visitas_clientes(id_cliente: int = None):
+    """
+    Recalcula total_visitas y ultima_visita desde visitas_clientes y corrige los
+    clientes cuyo contador no coincide (p. ej. visitas borradas o cargadas a mano).
+    Retorna {"clientes_corregidos": n}
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor()
+    filtro = "AND c.id_cliente = %s" if id_cliente is not None else ""
+    filtro_visitas = "WHERE id_cliente = %s" if id_cliente is not None else ""
+    sql = f"""
+    UPDATE clientes c
+    LEFT JOIN (
+        SELECT id_cliente, COUNT(*) AS total, MAX(fecha_visita) AS ultima
+        FROM visitas_clientes
+        {filtro_visitas}
+        GROUP BY id_cliente
+    ) v ON v.id_cliente = c.id_cliente
+    SET c.total_visitas = COALESCE(v.total, 0), c.ultima_visita = v.ultima
+    WHERE (c.total_visitas <> COALESCE(v.total, 0) OR NOT (c.ultima_visita <=> v.ultima)) {filtro}
+    """
+    try:
+        cursor.execute(sql, (id_cliente, id_cliente) if id_cliente is not None else ())
+        conexion.commit()
+        corregidos = cursor.rowcount
+        cursor.close()
+        conexion.close()
+        return {"message": "Contadores de visitas reconciliados", "clientes_corregidos": corregidos}
+    except Exception as e:
+        conexion.rollback()
+        cursor.close()
+        conexion.close()
+        return {"error": f"Error al reconciliar visitas: {str(e)}"}
@@ -0,0 +1,190 @@
+"""
+Cola de cocina: modelo de lectura del tablero de comandas.
+
+La tabla cola_cocina tiene una fila por comanda abierta (pendiente o en
+preparación) con lo que muestra el tablero ya resuelto: totales de la venta,
+datos del pedido (ticket, cliente, tipo de leche, comentarios) y los productos
+como JSON. Así el tablero es una sola consulta por (estado, fecha_creacion) en
+lugar de unir comandas, ventas, detalles, productos, pre-órdenes y clientes
+por cada comanda.
+
+Se escribe en la misma transacción que la comanda (crear_venta,
+procesar_pago_preorden, crear_comanda, actualizar_estado_comanda); al terminar
+o cancelar la comanda su fila se elimina. Los nombres de producto quedan como
+estaban al crear la comanda.
+"""
+import json
+from database.conexion import conectar
+from repository.lista_materiales_repository import filas_como_dict
+
+ESTADOS_ABIERTOS = ("pendiente", "en_preparacion")
+
+def _a_json(valor):
+    return json.dumps(valor, default=str, ensure_ascii=False)
+
+def _de_json(valor):
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode()
+    return json.loads(valor) if isinstance(valor, str) else (valor or [])
+
+def _info_pedido(fila):
+    """Mismo criterio que comanda_repository.obtener_info_pedido_para_comanda"""
+    if fila["id_preorden"]:
+        return {
+            "id_preorden": fila["id_preorden"], "origen": fila["origen"], "ticket_id": fila["ticket_id"],
+            "nombre_cliente": fila["nombre_cliente"], "tipo_servicio": fila["tipo_servicio_preorden"],
+            "comentarios": fila["comentarios_preorden"], "tipo_leche": fila["tipo_leche_preorden"],
+            "extra_leche": fila["extra_leche_preorden"],
+        }
+    # Ventas antiguas sin pre-orden: sólo si la venta trae datos del pedido
+    if fila["tipo_servicio"] or fila["tipo_leche"] or fila["comentarios"]:
+        return {
+            "id_preorden": None, "origen": "sistema", "ticket_id": None,
+            "nombre_cliente": fila["nombre_cliente_venta"], "tipo_servicio": fila["tipo_servicio"],
+            "comentarios": fila["comentarios"], "tipo_leche": fila["tipo_leche"],
+            "extra_leche": fila["extra_leche"],
+        }
+    return None
+
+def proyectar_en_cola_cocina(cursor, ids_comanda):
+    """
+    Escribe (o reescribe) en cola_cocina las comandas indicadas que siguen abiertas y
+    quita las cerradas. Funciona con cursor normal o dictionary y no hace commit:
+    debe correr dentro de la transacción que creó o modificó la comanda.
+    """
+    ids = list(dict.fromkeys(ids_comanda))
+    if not ids:
+        return
+    marcadores = ", ".join(["%s"] * len(ids))
+
+    cursor.execute(f"""
+        SELECT c.id_comanda, c.id_venta, c.estado, c.fecha_creacion, c.fecha_actualizacion,
+               v.total, v.fecha_venta, v.tipo_servicio, v.comentarios, v.tipo_leche, v.extra_leche,
+               cl.nombre AS nombre_cliente_venta,
+               p.id_preorden, p.origen, p.ticket_id, p.nombre_cliente,
+               p.tipo_servicio AS tipo_servicio_preorden, p.comentarios AS comentarios_preorden,
+               p.tipo_leche AS tipo_leche_preorden, p.extra_leche AS extra_leche_preorden
+        FROM comandas c
+        JOIN ventas v ON v.id_venta = c.id_venta
+        LEFT JOIN clientes cl ON cl.id_cliente = v.id_cliente
+        LEFT JOIN preordenes p ON p.id_venta = c.id_venta
+        WHERE c.id_comanda IN ({marcadores})
+        ORDER BY p.id_preorden
+    """, tuple(ids))
+    comandas = {}
+    for fila in filas_como_dict(cursor):
+        comandas.setdefault(fila["id_comanda"], fila)
+
+    cursor.execute(f"""
+        SELECT dc.*, p.nombre AS producto_nombre
+        FROM detalles_comanda dc
+        JOIN productos p ON dc.id_producto = p.id_producto
+        WHERE dc.id_comanda IN ({marcadores})
+        ORDER BY dc.id_detalle_comanda
+    """, tuple(ids))
+    detalles = {}
+    for fila in filas_como_dict(cursor):
+        detalles.setdefault(fila["id_comanda"], []).append(fila)
+
+    abiertas = []
+    for id_comanda, fila in comandas.items():
+        if fila["estado"] not in ESTADOS_ABIERTOS:
+            continue
+        info = _info_pedido(fila) or {}
+        abiertas.append((
+            id_comanda, fila["id_venta"], fila["estado"], fila["fecha_creacion"], fila["fecha_actualizacion"],
+            fila["total"], fila["fecha_venta"], info.get("id_preorden"), info.get("origen"), info.get("ticket_id"),
+            info.get("nombre_cliente"), info.get("tipo_servicio"), info.get("tipo_leche"), info.get("extra_leche"),
+            info.get("comentarios"), bool(info), _a_json(detalles.get(id_comanda, []))
+        ))
+
+    ids_abiertas = {fila[0] for fila in abiertas}
+    cerradas = [(id_comanda,) for id_comanda in ids if id_comanda not in ids_abiertas]
+    if cerradas:
+        cursor.executemany("DELETE FROM cola_cocina WHERE id_comanda = %s", cerradas)
+    if abiertas:
+        cursor.executemany("""
+            INSERT INTO cola_cocina(
+                id_comanda, id_venta, estado, fecha_creacion, fecha_actualizacion, total, fecha_venta,
+                id_preorden, origen, ticket_id, nombre_cliente, tipo_servicio, tipo_leche, extra_leche,
+                comentarios, tiene_info_pedido, detalles
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                estado = VALUES(estado), fecha_actualizacion = VALUES(fecha_actualizacion),
+                total = VALUES(total), fecha_venta = VALUES(fecha_venta), id_preorden = VALUES(id_preorden),
+                origen = VALUES(origen), ticket_id = VALUES(ticket_id), nombre_cliente = VALUES(nombre_cliente),
+                tipo_servicio = VALUES(tipo_servicio), tipo_leche = VALUES(tipo_leche),
+                extra_leche = VALUES(extra_leche), comentarios = VALUES(comentarios),
+                tiene_info_pedido = VALUES(tiene_info_pedido), detalles = VALUES(detalles)
+        """, abiertas)
+
+def actualizar_estado_en_cola_cocina(cursor, id_comanda: int, estado: str, fecha_actualizacion):
+    """Cambio de estado: sólo toca la fila de la comanda (la proyecta si faltaba). Sin commit."""
+    if estado not in ESTADOS_ABIERTOS:
+        cursor.execute("DELETE FROM cola_cocina WHERE id_comanda = %s", (id_comanda,))
+        return
+    cursor.execute(
+        "UPDATE cola_cocina SET estado = %s, fecha_actualizacion = %s WHERE id_comanda = %s",
+        (estado, fecha_actualizacion, id_comanda)
+    )
+    if cursor.rowcount == 0:
+        proyectar_en_cola_cocina(cursor, [id_comanda])
+
+def reconstruir_cola_cocina(cursor):
+    """
+    Vuelve a proyectar todas las comandas abiertas (migración inicial o reparación).
+    Retorna cuántas quedaron en la cola. Sin commit.
+    """
+    cursor.execute("DELETE FROM cola_cocina")
+    cursor.execute(
+        "SELECT id_comanda FROM comandas WHERE estado IN (%s, %s) ORDER BY id_comanda", ESTADOS_ABIERTOS
+    )
+    ids = [fila["id_comanda"] for fila in filas_como_dict(cursor)]
+    # Por lotes para no armar un IN gigante
+    for inicio in range(0, len(ids), 500):
+        proyectar_en_cola_cocina(cursor, ids[inicio:inicio + 500])
+    return len(ids)
+
+def leer_cola_cocina(estado: str = None):
+    """
+    Comandas abiertas en orden de llegada, con la misma forma que ver_comandas_por_estado:
+    columnas de la comanda, total, fecha_venta, "detalles" y "preorden".
+    Sin estado retorna pendientes y en preparación.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        if estado:
+            cursor.execute(
+                "SELECT * FROM cola_cocina WHERE estado = %s ORDER BY fecha_creacion ASC, id_comanda ASC", (estado,)
+            )
+        else:
+            cursor.execute("SELECT * FROM cola_cocina ORDER BY fecha_creacion ASC, id_comanda ASC")
+        comandas = []
+        for fila in cursor.fetchall():
+            comandas.append({
+                "id_comanda": fila["id_comanda"],
+                "id_venta": fila["id_venta"],
+                "estado": fila["estado"],
+                "fecha_creacion": fila["fecha_creacion"],
+                "fecha_actualizacion": fila["fecha_actualizacion"],
+                "total": fila["total"],
+                "fecha_venta": fila["fecha_venta"],
+                "detalles": _de_json(fila["detalles"]),
+                "preorden": {
+                    "id_preorden": fila["id_preorden"], "origen": fila["origen"], "ticket_id": fila["ticket_id"],
+                    "nombre_cliente": fila["nombre_cliente"], "tipo_servicio": fila["tipo_servicio"],
+                    "comentarios": fila["comentarios"], "tipo_leche": fila["tipo_leche"],
+                    "extra_leche": fila["extra_leche"],
+                } if fila["tiene_info_pedido"] else None,
+            })
+        return comandas
+    except Exception as e:
+        return {"error": f"Error al leer la cola de cocina: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
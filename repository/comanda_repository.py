@@ -2,7 +2,13 @@ from database.conexion import conectar
 from schemas.comanda_schema import ComandaCreate, ComandaUpdate, EstadoComandaEnum
 from datetime import datetime
 from decimal import Decimal
-from utils.conversiones import convertir_unidades, son_unidades_compatibles
+from repository.inventario_repository import (
+    descontar_stock, calcular_consumo_insumos, consumir_reservas, liberar_reservas
+)
+from repository.disponibilidad_repository import marcar_insumos_modificados
+from repository.cola_cocina_repository import (
+    ESTADOS_ABIERTOS, proyectar_en_cola_cocina, actualizar_estado_en_cola_cocina, leer_cola_cocina
+)
 
 def obtener_info_pedido_para_comanda(cursor, id_venta):
     """
@@ -103,6 +109,7 @@ def crear_comanda(comanda: ComandaCreate):
             )
             cursor_normal.execute(sql_detalle, datos_detalle)
         
+        proyectar_en_cola_cocina(cursor_normal, [comanda_id])
         conexion.commit()
         cursor.close()
         cursor_normal.close()
@@ -154,6 +161,10 @@ def ver_comanda_by_id(id_comanda: int):
     return comanda
 
 def ver_comandas_por_estado(estado: EstadoComandaEnum):
+    # Pendientes y en preparación (el tablero de cocina): una lectura de la cola
+    if estado.value in ESTADOS_ABIERTOS:
+        return leer_cola_cocina(estado.value)
+    
     conexion = conectar()
     if not conexion:
         return {"error": "Error de conexión a la base de datos"}
@@ -199,7 +210,9 @@ def actualizar_estado_comanda(id_comanda: int, estado: EstadoComandaEnum):
     
     try:
         # Verificar que la comanda existe y obtener id_venta
-        sql_check = "SELECT estado, id_venta FROM comandas WHERE id_comanda = %s"
+        # FOR UPDATE: si dos terminales la marcan terminada a la vez, la segunda espera
+        # y ve el estado ya actualizado, así los insumos no se restan dos veces
+        sql_check = "SELECT estado, id_venta FROM comandas WHERE id_comanda = %s FOR UPDATE"
         cursor.execute(sql_check, (id_comanda,))
         comanda_actual = cursor.fetchone()
         
@@ -213,6 +226,7 @@ def actualizar_estado_comanda(id_comanda: int, estado: EstadoComandaEnum):
         # Variables para tracking de insumos restados
         insumos_restados = []
         errores_insumos = []
+        insumos_modificados = []  # disponible cambiado: se avisa al motor de disponibilidad tras el commit
         
         # Si se marca como terminada, restar insumos
         # Verificar que el estado anterior no sea "terminada" para evitar restar dos veces
@@ -224,130 +238,40 @@ def actualizar_estado_comanda(id_comanda: int, estado: EstadoComandaEnum):
         no_estaba_terminada = (estado_anterior != "terminada" and estado_anterior != estado_terminada_value)
         
         if es_terminada and no_estaba_terminada:
-            # Verificar si existe unidad_medida en recetas (una sola vez, fuera del loop)
-            cursor.execute("""
-                SELECT COUNT(*) as existe 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_SCHEMA = DATABASE() 
-                AND TABLE_NAME = 'recetas_insumos' 
-                AND COLUMN_NAME = 'unidad_medida'
-            """)
-            tiene_unidad_medida = cursor.fetchone()['existe'] > 0
-            
-            # Obtener detalles de la comanda
-            sql_detalles = "SELECT id_producto, cantidad FROM detalles_comanda WHERE id_comanda = %s"
-            cursor.execute(sql_detalles, (id_comanda,))
-            detalles = cursor.fetchall()
+            # Camino normal: el stock se reservó al cobrar, sólo se convierten las
+            # reservas en movimientos (no hay verificación que pueda fallar aquí)
+            reservas = consumir_reservas(cursor, id_comanda)
+            for reserva in reservas:
+                insumos_restados.append({
+                    "id_insumo": reserva["id_insumo"],
+                    "cantidad_restada": float(reserva["cantidad"]),
+                    "unidad": reserva["unidad_medida"],
+                    "desde_reserva": True
+                })
             
-            if not detalles:
-                # No hay detalles, continuar sin error
-                pass
-            else:
-                # Para cada producto, obtener sus insumos de la receta y restar
-                for detalle in detalles:
-                    # Obtener recetas del producto
-                    if tiene_unidad_medida:
-                        sql_receta = """
-                        SELECT id_insumo, cantidad_necesaria, unidad_medida
-                        FROM recetas_insumos
-                        WHERE id_producto = %s
-                        """
-                    else:
-                        sql_receta = """
-                        SELECT id_insumo, cantidad_necesaria
-                        FROM recetas_insumos
-                        WHERE id_producto = %s
-                        """
-                    
-                    cursor.execute(sql_receta, (detalle["id_producto"],))
-                    receta = cursor.fetchall()
-                    
-                    if not receta:
-                        # Producto sin recetas, registrar advertencia
-                        errores_insumos.append(f"Producto ID {detalle['id_producto']} no tiene recetas (insumos) configuradas")
-                        continue
-                    
-                    # Restar cada insumo según la cantidad del producto
-                    for insumo_receta in receta:
-                        try:
-                            cantidad_necesaria = Decimal(str(insumo_receta["cantidad_necesaria"]))
-                            cantidad_total = cantidad_necesaria * Decimal(str(detalle["cantidad"]))
-                            
-                            # Obtener unidad de medida de la receta y del insumo
-                            unidad_receta = insumo_receta.get("unidad_medida", None) if tiene_unidad_medida else None
-                            
-                            # Obtener información del insumo (cantidad y unidad)
-                            sql_insumo = "SELECT cantidad_actual, unidad_medida FROM insumos WHERE id_insumo = %s"
-                            cursor.execute(sql_insumo, (insumo_receta["id_insumo"],))
-                            insumo_info = cursor.fetchone()
-                            
-                            if not insumo_info:
-                                errores_insumos.append(f"Insumo ID {insumo_receta['id_insumo']} no encontrado")
-                                continue
-                            
-                            unidad_insumo = insumo_info["unidad_medida"]
-                            cantidad_actual_insumo = Decimal(str(insumo_info["cantidad_actual"]))
-                            
-                            # Si hay unidad en la receta, convertir; si no, usar la del insumo
-                            if unidad_receta and unidad_receta != unidad_insumo:
-                                # Verificar compatibilidad
-                                if son_unidades_compatibles(unidad_receta, unidad_insumo):
-                                    # Convertir cantidad de la receta a la unidad del insumo
-                                    cantidad_a_restar = convertir_unidades(
-                                        cantidad_total,
-                                        unidad_receta,
-                                        unidad_insumo
-                                    )
-                                else:
-                                    # Unidades incompatibles
-                                    errores_insumos.append(f"Insumo ID {insumo_receta['id_insumo']}: unidades incompatibles ({unidad_receta} vs {unidad_insumo})")
-                                    continue
-                            else:
-                                # Misma unidad o no hay unidad en receta
-                                cantidad_a_restar = cantidad_total
-                            
-                            # Verificar stock disponible
-                            if cantidad_actual_insumo >= cantidad_a_restar:
-                                # Restar del inventario
-                                # ⚠️ Usar Decimal directamente para mantener precisión
-                                sql_update = """
-                                UPDATE insumos 
-                                SET cantidad_actual = cantidad_actual - %s 
-                                WHERE id_insumo = %s
-                                """
-                                # Convertir Decimal a float solo para la consulta SQL (MySQL requiere float para DECIMAL)
-                                cantidad_a_restar_float = float(cantidad_a_restar)
-                                cursor.execute(sql_update, (cantidad_a_restar_float, insumo_receta["id_insumo"]))
-                                
-                                # Registrar movimiento
-                                sql_mov = """
-                                INSERT INTO movimientos_inventario(
-                                    id_insumo, tipo_movimiento, cantidad, motivo, fecha_movimiento
-                                )
-                                VALUES (%s, 'salida', %s, 'Comanda terminada', %s)
-                                """
-                                cursor.execute(sql_mov, (
-                                    insumo_receta["id_insumo"],
-                                    cantidad_a_restar_float,
-                                    datetime.now()
-                                ))
-                                
-                                insumos_restados.append({
-                                    "id_insumo": insumo_receta["id_insumo"],
-                                    "cantidad_restada": float(cantidad_a_restar),
-                                    "unidad": unidad_insumo,
-                                    "cantidad_original_receta": float(cantidad_necesaria),
-                                    "unidad_original_receta": unidad_receta or unidad_insumo,
-                                    "cantidad_productos": int(detalle["cantidad"])
-                                })
-                            else:
-                                # Stock insuficiente
-                                errores_insumos.append(f"Insumo ID {insumo_receta['id_insumo']}: stock insuficiente (tiene {cantidad_actual_insumo} {unidad_insumo}, necesita {cantidad_a_restar} {unidad_insumo})")
-                        except Exception as e:
-                            errores_insumos.append(f"Error al procesar insumo ID {insumo_receta.get('id_insumo', 'desconocido')}: {str(e)}")
+            if not reservas:
+                # Comandas sin reserva (anteriores a las reservas o creadas a mano):
+                # calcular el consumo y descontarlo directamente
+                sql_detalles = "SELECT id_producto, cantidad FROM detalles_comanda WHERE id_comanda = %s"
+                cursor.execute(sql_detalles, (id_comanda,))
+                detalles = cursor.fetchall()
+                
+                consumo, lineas, errores = calcular_consumo_insumos(
+                    cursor, [(d["id_producto"], d["cantidad"]) for d in detalles]
+                )
+                errores_insumos.extend(errores)
                 
-                # Si hay errores críticos (stock insuficiente), hacer rollback
-                if any("stock insuficiente" in error for error in errores_insumos):
+                # Descontar con UPDATE condicional (sin leer el stock antes) y
+                # registrar los movimientos en un solo lote
+                insuficientes = descontar_stock(cursor, consumo, "Comanda terminada")
+                if insuficientes:
+                    for id_insumo in insuficientes:
+                        cursor.execute("SELECT cantidad_actual, cantidad_reservada, unidad_medida FROM insumos WHERE id_insumo = %s", (id_insumo,))
+                        insumo_info = cursor.fetchone() or {}
+                        disponible = Decimal(str(insumo_info.get("cantidad_actual") or 0)) - Decimal(str(insumo_info.get("cantidad_reservada") or 0))
+                        unidad_insumo = insumo_info.get("unidad_medida", "")
+                        errores_insumos.append(f"Insumo ID {id_insumo}: stock insuficiente (tiene {disponible} {unidad_insumo} disponibles, necesita {consumo[id_insumo]} {unidad_insumo})")
+                    
                     conexion.rollback()
                     cursor.close()
                     conexion.close()
@@ -355,6 +279,13 @@ def actualizar_estado_comanda(id_comanda: int, estado: EstadoComandaEnum):
                         "error": "No se pudo completar la operación. Errores:",
                         "errores": errores_insumos
                     }
+                insumos_restados.extend(lineas)
+                insumos_modificados.extend(consumo)
+        
+        # Si se cancela, liberar lo reservado para que vuelva a estar disponible
+        if estado == EstadoComandaEnum.CANCELADA and estado_anterior not in ("terminada", "cancelada"):
+            reservas_liberadas = liberar_reservas(cursor, id_comanda)
+            insumos_modificados.extend(reserva["id_insumo"] for reserva in reservas_liberadas)
         
         # Actualizar estado de la comanda
         sql_update = """
@@ -363,13 +294,16 @@ def actualizar_estado_comanda(id_comanda: int, estado: EstadoComandaEnum):
         WHERE id_comanda = %s
         """
         try:
-            cursor.execute(sql_update, (estado.value, datetime.now(), id_comanda))
+            fecha_actualizacion = datetime.now()
+            cursor.execute(sql_update, (estado.value, fecha_actualizacion, id_comanda))
             filas_afectadas = cursor.rowcount
             if filas_afectadas == 0:
                 conexion.rollback()
                 cursor.close()
                 conexion.close()
                 return {"error": "No se pudo actualizar el estado de la comanda. La comanda no existe o ya tiene ese estado."}
+            # Tablero de cocina: mueve la fila de columna o la saca si la comanda se cerró
+            actualizar_estado_en_cola_cocina(cursor, id_comanda, estado.value, fecha_actualizacion)
         except Exception as e:
             conexion.rollback()
             cursor.close()
@@ -403,6 +337,7 @@ def actualizar_estado_comanda(id_comanda: int, estado: EstadoComandaEnum):
         
         try:
             conexion.commit()
+            marcar_insumos_modificados(insumos_modificados)
             
             # Verificar que el estado se actualizó correctamente
             cursor.execute("SELECT estado FROM comandas WHERE id_comanda = %s", (id_comanda,))
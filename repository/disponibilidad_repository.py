@@ -0,0 +1,133 @@
+"""
+Motor de disponibilidad del menú: ¿cuántas unidades de cada producto se pueden
+preparar con el stock actual?
+
+Se mantiene en memoria:
+- el disponible de cada insumo (cantidad_actual - cantidad_reservada)
+- la lista de materiales de cada producto activo (lista_materiales_repository)
+- un índice invertido insumo -> productos que lo usan
+
+Un producto puede prepararse min(disponible / cantidad por unidad) veces sobre sus
+insumos. Los cambios de stock sólo marcan insumos como modificados; en la
+siguiente consulta se recargan esos insumos con una sola consulta y se
+recalculan únicamente los productos que los usan.
+"""
+import threading
+from decimal import Decimal
+from database.conexion import conectar
+from repository.lista_materiales_repository import obtener_listas_materiales, filas_como_dict
+
+_lock = threading.Lock()
+_cargado = False
+_stock = {}             # id_insumo -> Decimal disponible
+_listas = {}            # id_producto -> lista de materiales compilada
+_consumidores = {}      # id_insumo -> {id_producto}
+_disponibles = {}       # id_producto -> int, o None si no tiene receta que lo limite
+_insumos_modificados = set()
+
+def marcar_insumos_modificados(ids_insumos):
+    """
+    Avisa que cambió el stock de estos insumos. Llamar después del commit: la
+    recarga ocurre en la siguiente consulta de disponibilidad.
+    """
+    with _lock:
+        _insumos_modificados.update(ids_insumos)
+
+def invalidar_disponibilidad():
+    """Fuerza una recarga completa (altas, bajas o cambios de productos y recetas)"""
+    global _cargado
+    with _lock:
+        _cargado = False
+
+def _calcular_producto(id_producto):
+    lista = _listas.get(id_producto)
+    if not lista or not lista["componentes"]:
+        return None
+    maximo = None
+    for componente in lista["componentes"]:
+        if componente["cantidad"] <= 0:
+            continue
+        disponible = max(_stock.get(componente["id_insumo"], Decimal("0")), Decimal("0"))
+        unidades = int(disponible // componente["cantidad"])
+        maximo = unidades if maximo is None else min(maximo, unidades)
+    return maximo
+
+def _cargar_stock(cursor, ids_insumos=None):
+    if ids_insumos is None:
+        cursor.execute("SELECT id_insumo, cantidad_actual - cantidad_reservada AS disponible FROM insumos")
+    else:
+        marcadores = ", ".join(["%s"] * len(ids_insumos))
+        cursor.execute(
+            f"SELECT id_insumo, cantidad_actual - cantidad_reservada AS disponible FROM insumos WHERE id_insumo IN ({marcadores})",
+            tuple(ids_insumos)
+        )
+    return {fila["id_insumo"]: Decimal(str(fila["disponible"])) for fila in filas_como_dict(cursor)}
+
+def _recargar(cursor):
+    """Carga completa: stock, productos activos y sus listas de materiales"""
+    global _cargado, _stock, _listas, _consumidores, _disponibles
+    with _lock:
+        _insumos_modificados.clear()
+    stock = _cargar_stock(cursor)
+    cursor.execute("SELECT id_producto FROM productos WHERE activo = 1")
+    ids_productos = [fila["id_producto"] for fila in filas_como_dict(cursor)]
+    listas = obtener_listas_materiales(cursor, ids_productos) if ids_productos else {}
+
+    consumidores = {}
+    for id_producto, lista in listas.items():
+        for componente in lista["componentes"]:
+            consumidores.setdefault(componente["id_insumo"], set()).add(id_producto)
+
+    with _lock:
+        _stock, _listas, _consumidores = stock, listas, consumidores
+        _disponibles = {id_producto: _calcular_producto(id_producto) for id_producto in listas}
+        _cargado = True
+
+def _refrescar_modificados(cursor, ids_insumos):
+    """Recarga sólo los insumos modificados y recalcula los productos que los usan"""
+    stock = _cargar_stock(cursor, sorted(ids_insumos))
+    with _lock:
+        _stock.update(stock)
+        afectados = set()
+        for id_insumo in ids_insumos:
+            afectados |= _consumidores.get(id_insumo, set())
+        for id_producto in afectados:
+            _disponibles[id_producto] = _calcular_producto(id_producto)
+
+def obtener_disponibilidad():
+    """
+    Retorna {id_producto: {"agotado": bool, "disponibles": int | None}} para los
+    productos activos. `disponibles` es None si el producto no tiene receta.
+    Sólo consulta la base si hay cambios pendientes de aplicar.
+    """
+    with _lock:
+        cargado = _cargado
+        modificados = set(_insumos_modificados)
+        _insumos_modificados.difference_update(modificados)
+
+    if not cargado or modificados:
+        conexion = conectar()
+        if not conexion:
+            return {"error": "Error de conexión a la base de datos"}
+        cursor = conexion.cursor(dictionary=True)
+        try:
+            if not cargado:
+                _recargar(cursor)
+            else:
+                _refrescar_modificados(cursor, modificados)
+        except Exception as e:
+            # Volver a marcar lo que no se pudo aplicar para reintentar en la próxima consulta
+            marcar_insumos_modificados(modificados)
+            return {"error": f"Error al calcular disponibilidad: {str(e)}"}
+        finally:
+            cursor.close()
+            conexion.close()
+
+    with _lock:
+        return {
+            id_producto: {
+                "agotado": disponibles is not None and disponibles <= 0,
+                "disponibles": disponibles
+            }
+            for id_producto, disponibles in _disponibles.items()
+        }
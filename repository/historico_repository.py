@@ -0,0 +1,360 @@
+"""
+Histórico (archivo) de ventas, pre-órdenes y movimientos de inventario.
+
+Las tablas de operación conservan sólo los meses recientes (HISTORICO_MESES_ACTIVOS,
+por omisión 6). archivar_historico mueve las filas cerradas más antiguas a las
+tablas *_historico, por lotes y con una transacción por lote (INSERT ... SELECT +
+DELETE), así las colas, los contadores de tickets y las pre-órdenes pendientes
+recorren índices pequeños. Qué se archiva de cada familia:
+
+- preordenes: entregadas o canceladas, con sus detalles
+- ventas: con todas sus comandas terminadas o canceladas y sin pre-orden en las
+  tablas de operación; junto con detalles_venta, comandas y detalles_comanda (las
+  reservas de insumos, ya consumidas o liberadas, se eliminan en cascada)
+- movimientos_inventario: todos
+
+No se usa particionado nativo: MySQL no permite particionar tablas con llaves
+foráneas. Los reportes leen con union_con_historico, que agrega las tablas
+*_historico sólo si el rango empieza antes de lo archivado.
+"""
+import os
+from datetime import datetime
+from database.conexion import conectar
+
+MESES_ACTIVOS = int(os.getenv("HISTORICO_MESES_ACTIVOS", "6"))
+TAMANO_LOTE = int(os.getenv("HISTORICO_TAMANO_LOTE", "1000"))
+
+# Columnas en el mismo orden en la tabla de operación y en la del histórico
+COLUMNAS = {
+    "ventas": "id_venta, id_cliente, id_usuario, total, metodo_pago, fecha_venta",
+    "detalles_venta": "id_detalle_venta, id_venta, id_producto, cantidad, precio_unitario, subtotal",
+    "comandas": "id_comanda, id_venta, estado, fecha_creacion, fecha_actualizacion",
+    "detalles_comanda": "id_detalle_comanda, id_comanda, id_producto, cantidad, observaciones",
+    "preordenes": """
+        id_preorden, nombre_cliente, estado, total, id_venta, ticket_id, origen, tipo_servicio,
+        comentarios, tipo_leche, extra_leche, fecha_creacion, fecha_actualizacion
+    """,
+    "detalles_preorden": "id_detalle_preorden, id_preorden, id_producto, cantidad, observaciones",
+    "movimientos_inventario": "id_movimiento, id_insumo, tipo_movimiento, cantidad, motivo, observaciones, fecha_movimiento",
+}
+
+FAMILIAS = ("preordenes", "ventas", "movimientos_inventario")
+
+TABLAS_OPERACION = {tabla: tabla for tabla in COLUMNAS}
+TABLAS_HISTORICO = {tabla: f"{tabla}_historico" for tabla in COLUMNAS}
+
+# Ids candidatos a archivar (recorridos por id para no volver a evaluar los que se saltan)
+SQL_CANDIDATOS = {
+    "preordenes": """
+        SELECT id_preorden FROM preordenes
+        WHERE fecha_creacion < %s AND id_preorden > %s
+        AND estado IN ('entregada', 'cancelada')
+        ORDER BY id_preorden
+        LIMIT %s
+        FOR UPDATE
+    """,
+    "ventas": """
+        SELECT v.id_venta FROM ventas v
+        WHERE v.fecha_venta < %s AND v.id_venta > %s
+        AND NOT EXISTS (
+            SELECT 1 FROM comandas c
+            WHERE c.id_venta = v.id_venta AND c.estado IN ('pendiente', 'en_preparacion')
+        )
+        AND NOT EXISTS (SELECT 1 FROM preordenes p WHERE p.id_venta = v.id_venta)
+        ORDER BY v.id_venta
+        LIMIT %s
+        FOR UPDATE
+    """,
+    "movimientos_inventario": """
+        SELECT id_movimiento FROM movimientos_inventario
+        WHERE fecha_movimiento < %s AND id_movimiento > %s
+        ORDER BY id_movimiento
+        LIMIT %s
+        FOR UPDATE
+    """,
+}
+
+SQL_CANDIDATOS_PURGA = {
+    "preordenes": """
+        SELECT id_preorden FROM preordenes_historico
+        WHERE fecha_creacion < %s AND id_preorden > %s ORDER BY id_preorden LIMIT %s
+    """,
+    "ventas": """
+        SELECT id_venta FROM ventas_historico
+        WHERE fecha_venta < %s AND id_venta > %s ORDER BY id_venta LIMIT %s
+    """,
+    "movimientos_inventario": """
+        SELECT id_movimiento FROM movimientos_inventario_historico
+        WHERE fecha_movimiento < %s AND id_movimiento > %s ORDER BY id_movimiento LIMIT %s
+    """,
+}
+
+def inicio_de_mes(meses_atras: int) -> datetime:
+    """Primer día del mes, meses_atras meses antes del actual"""
+    hoy = datetime.now()
+    meses = hoy.year * 12 + hoy.month - 1 - meses_atras
+    return datetime(meses // 12, meses % 12 + 1, 1)
+
+def archivado_hasta(conexion, familia: str):
+    """Fecha antes de la cual puede haber filas de la familia en el histórico (None si no hay)"""
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("SELECT archivado_hasta FROM historico_control WHERE familia = %s", (familia,))
+        fila = cursor.fetchone()
+        return fila[0] if fila else None
+    except Exception:
+        # Base sin las tablas del histórico (init_db pendiente): no hay nada archivado
+        return None
+    finally:
+        cursor.close()
+
+def union_con_historico(conexion, sql: str, parametros, familia: str, desde=None):
+    """
+    Lectura transparente de tablas de operación + histórico.
+
+    sql es una consulta sobre las tablas de operación con sus nombres entre llaves
+    ({ventas}, {detalles_venta}, {comandas}, {preordenes}, {movimientos_inventario}...).
+    Retorna (sql, parametros): la consulta tal cual si el rango (desde) no llega a lo
+    archivado de la familia, o su UNION ALL con la misma consulta sobre las tablas
+    *_historico. Se usa como tabla derivada: FROM ({sql}) AS v
+    """
+    parametros = tuple(parametros)
+    sql_operacion = sql.format(**TABLAS_OPERACION)
+    limite = archivado_hasta(conexion, familia)
+    if limite is None:
+        return sql_operacion, parametros
+    if desde is not None:
+        try:
+            fecha_desde = desde if isinstance(desde, datetime) else datetime.fromisoformat(str(desde))
+        except ValueError:
+            fecha_desde = None
+        if fecha_desde is not None and fecha_desde >= limite:
+            return sql_operacion, parametros
+    return f"{sql_operacion}\nUNION ALL\n{sql.format(**TABLAS_HISTORICO)}", parametros * 2
+
+def buscar_en_historico(cursor, tabla: str, columna: str, valor):
+    """Filas de {tabla}_historico con columna = valor ([] si no hay o el histórico no existe)"""
+    try:
+        cursor.execute(f"SELECT {COLUMNAS[tabla]} FROM {tabla}_historico WHERE {columna} = %s", (valor,))
+        return cursor.fetchall()
+    except Exception:
+        return []
+
+def _copiar(cursor, tabla: str, condicion: str, parametros):
+    columnas = COLUMNAS[tabla]
+    cursor.execute(
+        f"INSERT INTO {tabla}_historico ({columnas}) SELECT {columnas} FROM {tabla} WHERE {condicion}",
+        parametros
+    )
+
+def _mover_preordenes(cursor, marcadores: str, ids):
+    _copiar(cursor, "detalles_preorden", f"id_preorden IN ({marcadores})", ids)
+    _copiar(cursor, "preordenes", f"id_preorden IN ({marcadores})", ids)
+    # detalles_preorden se elimina en cascada
+    cursor.execute(f"DELETE FROM preordenes WHERE id_preorden IN ({marcadores})", ids)
+
+def _mover_ventas(cursor, marcadores: str, ids):
+    _copiar(cursor, "detalles_venta", f"id_venta IN ({marcadores})", ids)
+    _copiar(cursor, "detalles_comanda",
+            f"id_comanda IN (SELECT id_comanda FROM comandas WHERE id_venta IN ({marcadores}))", ids)
+    _copiar(cursor, "comandas", f"id_venta IN ({marcadores})", ids)
+    _copiar(cursor, "ventas", f"id_venta IN ({marcadores})", ids)
+    # detalles_venta, comandas, detalles_comanda y reservas_insumos se eliminan en cascada
+    cursor.execute(f"DELETE FROM ventas WHERE id_venta IN ({marcadores})", ids)
+
+def _mover_movimientos(cursor, marcadores: str, ids):
+    _copiar(cursor, "movimientos_inventario", f"id_movimiento IN ({marcadores})", ids)
+    cursor.execute(f"DELETE FROM movimientos_inventario WHERE id_movimiento IN ({marcadores})", ids)
+
+def _purgar_preordenes(cursor, marcadores: str, ids):
+    cursor.execute(f"DELETE FROM detalles_preorden_historico WHERE id_preorden IN ({marcadores})", ids)
+    cursor.execute(f"DELETE FROM preordenes_historico WHERE id_preorden IN ({marcadores})", ids)
+
+def _purgar_ventas(cursor, marcadores: str, ids):
+    cursor.execute(f"DELETE FROM detalles_venta_historico WHERE id_venta IN ({marcadores})", ids)
+    cursor.execute(f"""
+        DELETE dc FROM detalles_comanda_historico dc
+        JOIN comandas_historico c ON dc.id_comanda = c.id_comanda
+        WHERE c.id_venta IN ({marcadores})
+    """, ids)
+    cursor.execute(f"DELETE FROM comandas_historico WHERE id_venta IN ({marcadores})", ids)
+    cursor.execute(f"DELETE FROM ventas_historico WHERE id_venta IN ({marcadores})", ids)
+
+def _purgar_movimientos(cursor, marcadores: str, ids):
+    cursor.execute(f"DELETE FROM movimientos_inventario_historico WHERE id_movimiento IN ({marcadores})", ids)
+
+MOVER = {"preordenes": _mover_preordenes, "ventas": _mover_ventas, "movimientos_inventario": _mover_movimientos}
+PURGAR = {"preordenes": _purgar_preordenes, "ventas": _purgar_ventas, "movimientos_inventario": _purgar_movimientos}
+
+def _por_lotes(conexion, sql_candidatos: str, corte: datetime, lote: int, accion):
+    """Aplica accion a los ids candidatos, un lote por transacción. Retorna cuántos procesó."""
+    cursor = conexion.cursor()
+    total = 0
+    ultimo_id = 0
+    try:
+        while True:
+            try:
+                cursor.execute(sql_candidatos, (corte, ultimo_id, lote))
+                ids = [fila[0] for fila in cursor.fetchall()]
+                if ids:
+                    accion(cursor, ", ".join(["%s"] * len(ids)), ids)
+                conexion.commit()
+            except Exception:
+                conexion.rollback()
+                raise
+            total += len(ids)
+            if len(ids) < lote:
+                return total
+            ultimo_id = ids[-1]
+    finally:
+        cursor.close()
+
+def _fk_visitas_ventas(conexion):
+    """Nombre de la llave foránea visitas_clientes -> ventas si todavía existe (migración 13 pendiente)"""
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            SELECT CONSTRAINT_NAME
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'visitas_clientes'
+            AND COLUMN_NAME = 'id_venta'
+            AND REFERENCED_TABLE_NAME = 'ventas'
+        """)
+        fila = cursor.fetchone()
+        return fila[0] if fila else None
+    finally:
+        cursor.close()
+
+def archivar_historico(meses_activos: int = None, tamano_lote: int = None, familias=None):
+    """
+    Mueve al histórico lo anterior al inicio del mes de hace meses_activos meses.
+    Retorna {"corte", "archivadas": {familia: filas}} o {"error"}
+    """
+    meses_activos = MESES_ACTIVOS if meses_activos is None else meses_activos
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    familias = [familia for familia in FAMILIAS if familia in (familias or FAMILIAS)]
+    if meses_activos < 1:
+        return {"error": "Se debe conservar al menos un mes en las tablas de operación"}
+
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    corte = inicio_de_mes(meses_activos)
+    archivadas = {}
+    cursor = conexion.cursor()
+    try:
+        if "ventas" in familias and _fk_visitas_ventas(conexion):
+            return {"error": "visitas_clientes aún tiene llave foránea a ventas: ejecute init_db (migración 13) antes de archivar"}
+        for familia in familias:
+            # Primero se registra el límite: un reporte que corra durante el archivado
+            # ya lee el histórico y no pierde las filas que se van moviendo
+            cursor.execute("""
+                INSERT INTO historico_control(familia, archivado_hasta) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE archivado_hasta = GREATEST(COALESCE(archivado_hasta, VALUES(archivado_hasta)), VALUES(archivado_hasta))
+            """, (familia, corte))
+            conexion.commit()
+            # Pre-órdenes antes que ventas: una venta con pre-orden en operación no se archiva
+            archivadas[familia] = _por_lotes(conexion, SQL_CANDIDATOS[familia], corte, tamano_lote, MOVER[familia])
+            cursor.execute(
+                "UPDATE historico_control SET filas_archivadas = filas_archivadas + %s WHERE familia = %s",
+                (archivadas[familia], familia)
+            )
+            conexion.commit()
+        return {"message": "Histórico archivado", "corte": corte.strftime("%Y-%m-%d"), "archivadas": archivadas}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al archivar histórico: {str(e)}", "corte": corte.strftime("%Y-%m-%d"),
+                "archivadas": archivadas}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def purgar_historico(meses_conservar: int, tamano_lote: int = None, familias=None):
+    """
+    Elimina del histórico lo anterior al inicio del mes de hace meses_conservar meses.
+    Retorna {"corte", "eliminadas": {familia: filas}} o {"error"}
+    """
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    familias = [familia for familia in FAMILIAS if familia in (familias or FAMILIAS)]
+    if meses_conservar < MESES_ACTIVOS:
+        return {"error": f"meses_conservar debe ser al menos {MESES_ACTIVOS} (HISTORICO_MESES_ACTIVOS)"}
+
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    corte = inicio_de_mes(meses_conservar)
+    eliminadas = {}
+    cursor = conexion.cursor()
+    try:
+        for familia in familias:
+            eliminadas[familia] = _por_lotes(conexion, SQL_CANDIDATOS_PURGA[familia], corte, tamano_lote, PURGAR[familia])
+            cursor.execute("""
+                UPDATE historico_control
+                SET purgado_hasta = GREATEST(COALESCE(purgado_hasta, %s), %s)
+                WHERE familia = %s
+            """, (corte, corte, familia))
+            conexion.commit()
+        return {"message": "Histórico purgado", "corte": corte.strftime("%Y-%m-%d"), "eliminadas": eliminadas}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al purgar histórico: {str(e)}", "corte": corte.strftime("%Y-%m-%d"),
+                "eliminadas": eliminadas}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def comprimir_historico():
+    """
+    Pasa las tablas del histórico a ROW_FORMAT=COMPRESSED (requiere innodb_file_per_table).
+    Reconstruye cada tabla: conviene correrlo fuera de horario.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    comprimidas = []
+    errores = {}
+    try:
+        for tabla in TABLAS_HISTORICO.values():
+            try:
+                cursor.execute(f"ALTER TABLE {tabla} ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8")
+                comprimidas.append(tabla)
+            except Exception as e:
+                errores[tabla] = str(e)
+        return {"comprimidas": comprimidas, "errores": errores}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def estado_historico():
+    """Filas y tamaño (aproximados, de INFORMATION_SCHEMA) de cada tabla y lo registrado en historico_control"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    nombres = list(TABLAS_OPERACION) + list(TABLAS_HISTORICO.values())
+    try:
+        cursor.execute(f"""
+            SELECT TABLE_NAME AS tabla, TABLE_ROWS AS filas_aprox, ROW_FORMAT AS formato,
+                   ROUND((DATA_LENGTH + INDEX_LENGTH) / 1024 / 1024, 2) AS tamano_mb
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME IN ({", ".join(["%s"] * len(nombres))})
+            ORDER BY TABLE_NAME
+        """, nombres)
+        tablas = cursor.fetchall()
+        for tabla in tablas:
+            tabla["tamano_mb"] = float(tabla["tamano_mb"] or 0)
+        cursor.execute("SELECT * FROM historico_control ORDER BY familia")
+        control = cursor.fetchall()
+        return {"tablas": tablas, "control": control}
+    except Exception as e:
+        return {"error": f"Error al consultar el histórico: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
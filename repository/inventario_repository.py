@@ -1,22 +1,120 @@
 from database.conexion import conectar
 from schemas.inventario_schema import InsumoCreate, InsumoUpdate, MovimientoInventarioCreate
 from datetime import datetime
+from decimal import Decimal
+import threading
+from repository.lista_materiales_repository import (
+    obtener_listas_materiales, invalidar_por_insumo, filas_como_dict
+)
+from repository.disponibilidad_repository import marcar_insumos_modificados, invalidar_disponibilidad
+from utils.indice_busqueda import IndiceBusqueda
+from utils.normalize import normalizar_nombre
+
+# Índice en memoria de insumos activos para autocompletar (ver buscar_insumos).
+# Se carga en la primera búsqueda y se actualiza al crear o editar insumos.
+_indice_insumos = IndiceBusqueda()
+_indice_insumos_cargado = False
+_indice_insumos_lock = threading.Lock()
+
+def _datos_indice_insumo(insumo):
+    return {"id_insumo": insumo["id_insumo"], "nombre": insumo["nombre"], "unidad_medida": insumo["unidad_medida"]}
+
+def _asegurar_indice_insumos():
+    """Carga el índice de insumos si aún no se cargó. Retorna False si no hay conexión."""
+    global _indice_insumos_cargado
+    if _indice_insumos_cargado:
+        return True
+    with _indice_insumos_lock:
+        if _indice_insumos_cargado:
+            return True
+        conexion = conectar()
+        if not conexion:
+            return False
+        cursor = conexion.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT id_insumo, nombre, unidad_medida FROM insumos WHERE activo = 1")
+            _indice_insumos.reconstruir(
+                (fila["id_insumo"], fila["nombre"], _datos_indice_insumo(fila), None)
+                for fila in cursor.fetchall()
+            )
+            _indice_insumos_cargado = True
+        finally:
+            cursor.close()
+            conexion.close()
+    return True
+
+def invalidar_indice_insumos():
+    """El índice se vuelve a cargar en la siguiente búsqueda (p. ej. tras una importación masiva)"""
+    global _indice_insumos_cargado
+    with _indice_insumos_lock:
+        _indice_insumos_cargado = False
+
+def _refrescar_insumo_en_indice(conexion, id_insumo: int):
+    """Vuelve a leer un insumo y lo agrega, reemplaza o quita del índice según su estado"""
+    global _indice_insumos_cargado
+    if not _indice_insumos_cargado:
+        return
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id_insumo, nombre, unidad_medida, activo FROM insumos WHERE id_insumo = %s", (id_insumo,))
+        fila = cursor.fetchone()
+    except Exception:
+        # El cambio ya está guardado; recargar el índice completo en la próxima búsqueda
+        _indice_insumos_cargado = False
+        return
+    finally:
+        cursor.close()
+    if fila and fila["activo"]:
+        _indice_insumos.agregar(id_insumo, fila["nombre"], _datos_indice_insumo(fila))
+    else:
+        _indice_insumos.eliminar(id_insumo)
+
+def buscar_insumos(texto: str, limite: int = 10):
+    """
+    Autocompletado de insumos activos por nombre (sin acentos ni mayúsculas).
+    Retorna [{"id_insumo", "nombre", "unidad_medida", "puntaje"}] ordenados por
+    relevancia; si no hay coincidencias por prefijo sugiere nombres parecidos.
+    """
+    try:
+        if not _asegurar_indice_insumos():
+            return {"error": "Error de conexión a la base de datos"}
+    except Exception as e:
+        return {"error": f"Error al cargar índice de insumos: {str(e)}"}
+    resultados = _indice_insumos.buscar(texto, limite=limite)
+    for resultado in resultados:
+        del resultado["id"]
+    return resultados
+
+def buscar_insumo_por_nombre(nombre: str):
+    """Id del insumo activo cuyo nombre normalizado es igual al dado, o None"""
+    try:
+        if not _asegurar_indice_insumos():
+            return None
+    except Exception:
+        return None
+    return _indice_insumos.buscar_exacto(nombre)
 
 def crear_insumo(insumo: InsumoCreate):
     conexion = conectar()
     if not conexion:
         return {"error": "Error de conexión a la base de datos"}
     
+    # Evitar el INSERT fallido contra unique_nombre_normalizado si ya se sabe que existe
+    id_existente = buscar_insumo_por_nombre(insumo.nombre)
+    if id_existente:
+        conexion.close()
+        return {"error": f"Ya existe un insumo con el nombre '{insumo.nombre}'", "id_insumo_existente": id_existente}
+    
     cursor = conexion.cursor()
     sql = """
     INSERT INTO insumos(
-        nombre, descripcion, unidad_medida, cantidad_actual,
+        nombre, nombre_normalizado, descripcion, unidad_medida, cantidad_actual,
         cantidad_minima, precio_compra, activo
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
     """
     datos = (
-        insumo.nombre, insumo.descripcion, insumo.unidad_medida,
+        insumo.nombre, normalizar_nombre(insumo.nombre), insumo.descripcion, insumo.unidad_medida,
         insumo.cantidad_actual, insumo.cantidad_minima,
         insumo.precio_compra, insumo.activo
     )
@@ -25,6 +123,10 @@ def crear_insumo(insumo: InsumoCreate):
         cursor.execute(sql, datos)
         conexion.commit()
         insumo_id = cursor.lastrowid
+        if _indice_insumos_cargado and insumo.activo:
+            _indice_insumos.agregar(insumo_id, insumo.nombre, {
+                "id_insumo": insumo_id, "nombre": insumo.nombre, "unidad_medida": insumo.unidad_medida
+            })
         cursor.close()
         conexion.close()
         return {"message": "Insumo creado correctamente", "id_insumo": insumo_id}
@@ -75,6 +177,8 @@ def editar_insumo(id_insumo: int, insumo: InsumoUpdate):
     if insumo.nombre is not None:
         campos.append("nombre = %s")
         valores.append(insumo.nombre)
+        campos.append("nombre_normalizado = %s")
+        valores.append(normalizar_nombre(insumo.nombre))
     if insumo.descripcion is not None:
         campos.append("descripcion = %s")
         valores.append(insumo.descripcion)
@@ -109,6 +213,14 @@ def editar_insumo(id_insumo: int, insumo: InsumoUpdate):
             cursor.close()
             conexion.close()
             return {"error": "Insumo no encontrado"}
+        if insumo.unidad_medida is not None:
+            # Las listas de materiales guardan cantidades en la unidad del insumo
+            invalidar_por_insumo(id_insumo)
+            invalidar_disponibilidad()
+        elif insumo.cantidad_actual is not None:
+            marcar_insumos_modificados([id_insumo])
+        if insumo.nombre is not None or insumo.unidad_medida is not None or insumo.activo is not None:
+            _refrescar_insumo_en_indice(conexion, id_insumo)
         cursor.close()
         conexion.close()
         return {"message": "Insumo actualizado correctamente"}
@@ -118,6 +230,212 @@ def editar_insumo(id_insumo: int, insumo: InsumoUpdate):
         conexion.close()
         return {"error": f"Error al actualizar insumo: {str(e)}"}
 
+def descontar_stock(cursor, descuentos: dict, motivo: str, observaciones: str = None):
+    """
+    Descuenta stock de varios insumos dentro de la transacción del cursor.
+
+    Cada descuento es un UPDATE condicional sobre el disponible (cantidad_actual
+    menos lo reservado para comandas pendientes) verificado por rowcount, así dos terminales descontando a la vez no pierden actualizaciones
+    y no hace falta leer el stock antes. Los movimientos de salida se insertan en un
+    solo executemany. No hace commit ni rollback: eso lo decide quien llama.
+
+    descuentos: {id_insumo: cantidad} en la unidad del insumo
+    Retorna la lista de id_insumo que no se pudieron descontar (stock insuficiente o
+    insumo inexistente); si no está vacía, quien llama debe hacer rollback.
+    """
+    sql_update = """
+    UPDATE insumos
+    SET cantidad_actual = cantidad_actual - %s
+    WHERE id_insumo = %s AND cantidad_actual - cantidad_reservada >= %s
+    """
+    sql_mov = """
+    INSERT INTO movimientos_inventario(
+        id_insumo, tipo_movimiento, cantidad, motivo, observaciones, fecha_movimiento
+    )
+    VALUES (%s, 'salida', %s, %s, %s, %s)
+    """
+    fecha = datetime.now()
+    insuficientes = []
+    movimientos = []
+
+    # Orden fijo por id_insumo para que transacciones concurrentes bloqueen filas
+    # en el mismo orden y no se produzcan deadlocks
+    for id_insumo in sorted(descuentos):
+        # Misma escala que la columna DECIMAL(10, 3): un descuento que redondea a 0
+        # no modifica la fila y rowcount sería 0 aunque haya stock
+        cantidad = Decimal(str(descuentos[id_insumo])).quantize(Decimal("0.001"))
+        if cantidad <= 0:
+            continue
+        cursor.execute(sql_update, (cantidad, id_insumo, cantidad))
+        if cursor.rowcount == 0:
+            insuficientes.append(id_insumo)
+        else:
+            movimientos.append((id_insumo, cantidad, motivo, observaciones, fecha))
+
+    if movimientos and not insuficientes:
+        cursor.executemany(sql_mov, movimientos)
+    return insuficientes
+
+def calcular_consumo_insumos(cursor, detalles):
+    """
+    Calcula cuánto consume de cada insumo un conjunto de productos, en la unidad
+    del insumo, a partir de las listas de materiales precompiladas (ver
+    lista_materiales_repository). Sólo consulta la base para productos que no
+    estén en caché.
+
+    detalles: iterable de (id_producto, cantidad)
+    Retorna (consumo, lineas, errores):
+    - consumo: {id_insumo: Decimal} total por insumo
+    - lineas: una entrada por línea de receta (formato de insumos_restados)
+    - errores: productos sin receta o con unidades incompatibles
+    """
+    detalles = [(id_producto, cantidad) for id_producto, cantidad in detalles]
+    consumo = {}
+    lineas = []
+    errores = []
+    if not detalles:
+        return consumo, lineas, errores
+
+    listas = obtener_listas_materiales(cursor, [id_producto for id_producto, _ in detalles])
+
+    for id_producto, cantidad_producto in detalles:
+        lista = listas[id_producto]
+        errores.extend(lista["errores"])
+        if not lista["componentes"] and not lista["errores"]:
+            errores.append(f"Producto ID {id_producto} no tiene recetas (insumos) configuradas")
+            continue
+
+        cantidad_producto = Decimal(str(cantidad_producto))
+        for componente in lista["componentes"]:
+            cantidad_insumo = componente["cantidad"] * cantidad_producto
+            consumo[componente["id_insumo"]] = consumo.get(componente["id_insumo"], Decimal("0")) + cantidad_insumo
+            lineas.append({
+                "id_insumo": componente["id_insumo"],
+                "cantidad_restada": float(cantidad_insumo),
+                "unidad": componente["unidad"],
+                "cantidad_original_receta": float(componente["cantidad_receta"]),
+                "unidad_original_receta": componente["unidad_receta"],
+                "cantidad_productos": int(cantidad_producto)
+            })
+
+    return consumo, lineas, errores
+
+def reservar_insumos(cursor, id_comanda: int, consumo: dict):
+    """
+    Reserva insumos para una comanda dentro de la transacción del cursor.
+
+    Disponible = cantidad_actual - cantidad_reservada. Cada reserva es un UPDATE
+    condicional sobre ese disponible y las filas de reservas_insumos se insertan
+    en un solo executemany. No hace commit ni rollback.
+
+    Retorna la lista de id_insumo sin disponible suficiente; si no está vacía,
+    quien llama debe hacer rollback.
+    """
+    sql_reservar = """
+    UPDATE insumos
+    SET cantidad_reservada = cantidad_reservada + %s
+    WHERE id_insumo = %s AND cantidad_actual - cantidad_reservada >= %s
+    """
+    sql_reserva = """
+    INSERT INTO reservas_insumos(id_comanda, id_insumo, cantidad, estado, fecha_creacion)
+    VALUES (%s, %s, %s, 'activa', %s)
+    """
+    fecha = datetime.now()
+    insuficientes = []
+    reservas = []
+
+    for id_insumo in sorted(consumo):
+        cantidad = Decimal(str(consumo[id_insumo])).quantize(Decimal("0.001"))
+        if cantidad <= 0:
+            continue
+        cursor.execute(sql_reservar, (cantidad, id_insumo, cantidad))
+        if cursor.rowcount == 0:
+            insuficientes.append(id_insumo)
+        else:
+            reservas.append((id_comanda, id_insumo, cantidad, fecha))
+
+    if reservas and not insuficientes:
+        cursor.executemany(sql_reserva, reservas)
+    return insuficientes
+
+def reservar_para_comanda(cursor, id_comanda: int, detalles):
+    """
+    Calcula el consumo de los productos de una comanda y lo reserva en un solo paso.
+
+    detalles: iterable de (id_producto, cantidad)
+    Retorna (insuficientes, advertencias, ids_insumos): nombres de los insumos sin
+    disponible suficiente (si hay alguno, quien llama debe hacer rollback), los
+    problemas de receta o unidades que no impiden la venta y los insumos reservados.
+    """
+    consumo, _, advertencias = calcular_consumo_insumos(cursor, detalles)
+    ids_insuficientes = reservar_insumos(cursor, id_comanda, consumo)
+    if not ids_insuficientes:
+        return [], advertencias, list(consumo)
+
+    marcadores = ", ".join(["%s"] * len(ids_insuficientes))
+    cursor.execute(f"SELECT nombre FROM insumos WHERE id_insumo IN ({marcadores})", tuple(ids_insuficientes))
+    return [fila["nombre"] for fila in filas_como_dict(cursor)], advertencias, []
+
+def _reservas_activas(cursor, id_comanda: int):
+    cursor.execute("""
+        SELECT r.id_insumo, r.cantidad, i.unidad_medida
+        FROM reservas_insumos r
+        JOIN insumos i ON r.id_insumo = i.id_insumo
+        WHERE r.id_comanda = %s AND r.estado = 'activa'
+        ORDER BY r.id_insumo
+        FOR UPDATE
+    """, (id_comanda,))
+    return filas_como_dict(cursor)
+
+def consumir_reservas(cursor, id_comanda: int, motivo: str = "Comanda terminada"):
+    """
+    Convierte las reservas activas de una comanda en salidas de inventario.
+    El stock ya se apartó al cobrar, así que no hay verificación que pueda fallar.
+    Retorna las reservas consumidas (lista vacía si la comanda no tenía reservas).
+    """
+    reservas = _reservas_activas(cursor, id_comanda)
+    if not reservas:
+        return []
+
+    fecha = datetime.now()
+    cursor.executemany("""
+        UPDATE insumos
+        SET cantidad_actual = cantidad_actual - %s,
+            cantidad_reservada = GREATEST(cantidad_reservada - %s, 0)
+        WHERE id_insumo = %s
+    """, [(r["cantidad"], r["cantidad"], r["id_insumo"]) for r in reservas])
+    cursor.executemany("""
+        INSERT INTO movimientos_inventario(
+            id_insumo, tipo_movimiento, cantidad, motivo, fecha_movimiento
+        )
+        VALUES (%s, 'salida', %s, %s, %s)
+    """, [(r["id_insumo"], r["cantidad"], motivo, fecha) for r in reservas])
+    cursor.execute("""
+        UPDATE reservas_insumos
+        SET estado = 'consumida', fecha_actualizacion = %s
+        WHERE id_comanda = %s AND estado = 'activa'
+    """, (fecha, id_comanda))
+    return reservas
+
+def liberar_reservas(cursor, id_comanda: int):
+    """Libera las reservas activas de una comanda (p. ej. al cancelarla)"""
+    reservas = _reservas_activas(cursor, id_comanda)
+    if not reservas:
+        return []
+
+    fecha = datetime.now()
+    cursor.executemany("""
+        UPDATE insumos
+        SET cantidad_reservada = GREATEST(cantidad_reservada - %s, 0)
+        WHERE id_insumo = %s
+    """, [(r["cantidad"], r["id_insumo"]) for r in reservas])
+    cursor.execute("""
+        UPDATE reservas_insumos
+        SET estado = 'liberada', fecha_actualizacion = %s
+        WHERE id_comanda = %s AND estado = 'activa'
+    """, (fecha, id_comanda))
+    return reservas
+
 def restar_insumo(id_insumo: int, cantidad: float):
     """Resta cantidad del inventario"""
     conexion = conectar()
@@ -126,28 +444,24 @@ def restar_insumo(id_insumo: int, cantidad: float):
     
     cursor = conexion.cursor(dictionary=True)
     
-    # Verificar cantidad actual
-    sql_check = "SELECT cantidad_actual FROM insumos WHERE id_insumo = %s"
-    cursor.execute(sql_check, (id_insumo,))
-    insumo = cursor.fetchone()
-    
-    if not insumo:
-        cursor.close()
-        conexion.close()
-        return {"error": "Insumo no encontrado"}
-    
-    nueva_cantidad = float(insumo["cantidad_actual"]) - cantidad
-    
-    if nueva_cantidad < 0:
-        cursor.close()
-        conexion.close()
-        return {"error": "No hay suficiente inventario"}
-    
-    # Actualizar cantidad
-    sql_update = "UPDATE insumos SET cantidad_actual = %s WHERE id_insumo = %s"
     try:
-        cursor.execute(sql_update, (nueva_cantidad, id_insumo))
+        insuficientes = descontar_stock(cursor, {id_insumo: cantidad}, "Resta de inventario")
+        
+        if insuficientes:
+            conexion.rollback()
+            # Distinguir insumo inexistente de stock insuficiente
+            cursor.execute("SELECT id_insumo FROM insumos WHERE id_insumo = %s", (id_insumo,))
+            existe = cursor.fetchone()
+            cursor.close()
+            conexion.close()
+            if not existe:
+                return {"error": "Insumo no encontrado"}
+            return {"error": "No hay suficiente inventario"}
+        
+        cursor.execute("SELECT cantidad_actual FROM insumos WHERE id_insumo = %s", (id_insumo,))
+        nueva_cantidad = float(cursor.fetchone()["cantidad_actual"])
         conexion.commit()
+        marcar_insumos_modificados([id_insumo])
         cursor.close()
         conexion.close()
         return {"message": "Inventario actualizado correctamente", "cantidad_restante": nueva_cantidad}
@@ -159,35 +473,53 @@ def restar_insumo(id_insumo: int, cantidad: float):
 
 def registrar_movimiento(movimiento: MovimientoInventarioCreate):
     """Registra un movimiento en el inventario"""
+    # Con cantidad 0 o negativa una salida no registraría movimiento y una entrada
+    # no cambiaría ninguna fila (se reportaría como insumo inexistente)
+    if movimiento.cantidad is None or movimiento.cantidad <= 0:
+        return {"error": "La cantidad del movimiento debe ser mayor a 0"}
+    
     conexion = conectar()
     if not conexion:
         return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor()
     
-    # Actualizar cantidad del insumo
-    if movimiento.tipo_movimiento == "entrada":
-        sql_update = "UPDATE insumos SET cantidad_actual = cantidad_actual + %s WHERE id_insumo = %s"
-    else:  # salida
-        sql_update = "UPDATE insumos SET cantidad_actual = cantidad_actual - %s WHERE id_insumo = %s"
-    
     try:
-        cursor.execute(sql_update, (movimiento.cantidad, movimiento.id_insumo))
-        
-        # Registrar movimiento
-        sql_mov = """
-        INSERT INTO movimientos_inventario(
-            id_insumo, tipo_movimiento, cantidad, motivo, observaciones, fecha_movimiento
-        )
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        datos_mov = (
-            movimiento.id_insumo, movimiento.tipo_movimiento, movimiento.cantidad,
-            movimiento.motivo, movimiento.observaciones, datetime.now()
-        )
-        cursor.execute(sql_mov, datos_mov)
+        if movimiento.tipo_movimiento == "salida":
+            # Las salidas usan el descuento condicional: nunca dejan stock negativo
+            insuficientes = descontar_stock(
+                cursor, {movimiento.id_insumo: movimiento.cantidad},
+                movimiento.motivo, movimiento.observaciones
+            )
+            if insuficientes:
+                conexion.rollback()
+                cursor.close()
+                conexion.close()
+                return {"error": "Insumo no encontrado o sin inventario suficiente para la salida"}
+        else:  # entrada
+            sql_update = "UPDATE insumos SET cantidad_actual = cantidad_actual + %s WHERE id_insumo = %s"
+            cursor.execute(sql_update, (movimiento.cantidad, movimiento.id_insumo))
+            if cursor.rowcount == 0:
+                conexion.rollback()
+                cursor.close()
+                conexion.close()
+                return {"error": "Insumo no encontrado"}
+            
+            # Registrar movimiento
+            sql_mov = """
+            INSERT INTO movimientos_inventario(
+                id_insumo, tipo_movimiento, cantidad, motivo, observaciones, fecha_movimiento
+            )
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """
+            datos_mov = (
+                movimiento.id_insumo, movimiento.tipo_movimiento, movimiento.cantidad,
+                movimiento.motivo, movimiento.observaciones, datetime.now()
+            )
+            cursor.execute(sql_mov, datos_mov)
         
         conexion.commit()
+        marcar_insumos_modificados([movimiento.id_insumo])
         movimiento_id = cursor.lastrowid
         cursor.close()
         conexion.close()
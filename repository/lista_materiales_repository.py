@@ -0,0 +1,135 @@
+"""
+Lista de materiales (BOM) precompilada por producto.
+
+Cada receta se compila una vez a una lista de componentes ya convertidos a la
+unidad de stock de cada insumo, y se guarda en memoria. Descontar inventario,
+calcular disponibilidad o costos sólo multiplica por la cantidad vendida.
+
+La caché es por proceso: se invalida desde receta_repository (crear/eliminar
+recetas) e inventario_repository (cambio de unidad de un insumo).
+"""
+import threading
+from decimal import Decimal
+from utils.conversiones import convertir_lote
+
+_cache = {}             # id_producto -> lista compilada (ver _compilar)
+_productos_por_insumo = {}  # id_insumo -> {id_producto}, para invalidar por insumo
+_generacion = 0         # aumenta en cada invalidación; evita guardar compilaciones obsoletas
+_lock = threading.Lock()
+
+# Se consulta una sola vez por proceso si recetas_insumos tiene unidad_medida
+_receta_tiene_unidad = None
+
+def filas_como_dict(cursor):
+    """fetchall() como lista de dicts sin importar si el cursor es dictionary o no"""
+    filas = cursor.fetchall()
+    if filas and not isinstance(filas[0], dict):
+        columnas = [d[0] for d in cursor.description]
+        filas = [dict(zip(columnas, fila)) for fila in filas]
+    return filas
+
+def receta_tiene_unidad_medida(cursor) -> bool:
+    global _receta_tiene_unidad
+    if _receta_tiene_unidad is None:
+        cursor.execute("""
+            SELECT COUNT(*) AS existe
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'recetas_insumos'
+            AND COLUMN_NAME = 'unidad_medida'
+        """)
+        _receta_tiene_unidad = filas_como_dict(cursor)[0]["existe"] > 0
+    return _receta_tiene_unidad
+
+def _compilar(filas):
+    """
+    Convierte las líneas de receta de un producto a componentes en la unidad del insumo.
+    Retorna {"componentes": [...], "errores": [...]}; cada componente tiene
+    id_insumo, cantidad (por unidad de producto, en la unidad del insumo), unidad,
+    cantidad_receta y unidad_receta.
+    """
+    componentes = []
+    errores = []
+    # Toda la receta se convierte en una sola llamada; sin unidad en la receta se
+    # asume la del insumo
+    cantidades = convertir_lote(
+        [
+            (fila["cantidad_necesaria"], fila.get("unidad_receta") or fila["unidad_insumo"], fila["unidad_insumo"])
+            for fila in filas
+        ],
+        estricto=False
+    )
+    for fila, cantidad in zip(filas, cantidades):
+        id_insumo = fila["id_insumo"]
+        unidad_insumo = fila["unidad_insumo"]
+        unidad_receta = fila.get("unidad_receta") or unidad_insumo
+        if cantidad is None:
+            errores.append(f"Insumo ID {id_insumo}: unidades incompatibles ({unidad_receta} vs {unidad_insumo})")
+            continue
+
+        componentes.append({
+            "id_insumo": id_insumo,
+            "cantidad": cantidad,
+            "unidad": unidad_insumo,
+            "cantidad_receta": Decimal(str(fila["cantidad_necesaria"])),
+            "unidad_receta": unidad_receta
+        })
+    return {"componentes": componentes, "errores": errores}
+
+def obtener_listas_materiales(cursor, ids_productos):
+    """
+    Retorna {id_producto: lista compilada} para los productos pedidos.
+    Los que no están en caché se compilan con una sola consulta usando `cursor`.
+    Un producto sin receta queda con componentes vacíos.
+    """
+    ids = set(ids_productos)
+    with _lock:
+        resultado = {id_producto: _cache[id_producto] for id_producto in ids if id_producto in _cache}
+        generacion = _generacion
+    faltantes = sorted(ids - resultado.keys())
+    if not faltantes:
+        return resultado
+
+    columna_unidad = ", r.unidad_medida AS unidad_receta" if receta_tiene_unidad_medida(cursor) else ""
+    marcadores = ", ".join(["%s"] * len(faltantes))
+    # INNER JOIN: una línea de receta cuyo insumo ya no existe no se puede descontar
+    cursor.execute(
+        f"SELECT r.id_producto, r.id_insumo, r.cantidad_necesaria, i.unidad_medida AS unidad_insumo{columna_unidad} "
+        f"FROM recetas_insumos r JOIN insumos i ON r.id_insumo = i.id_insumo "
+        f"WHERE r.id_producto IN ({marcadores}) ORDER BY r.id_receta",
+        tuple(faltantes)
+    )
+    filas_por_producto = {id_producto: [] for id_producto in faltantes}
+    for fila in filas_como_dict(cursor):
+        filas_por_producto[fila["id_producto"]].append(fila)
+
+    compiladas = {id_producto: _compilar(filas) for id_producto, filas in filas_por_producto.items()}
+    with _lock:
+        # Si hubo una invalidación mientras se consultaba, no guardar datos posiblemente viejos
+        if generacion == _generacion:
+            for id_producto, lista in compiladas.items():
+                _cache[id_producto] = lista
+                # Incluye líneas con unidades incompatibles: corregir la unidad debe invalidarlas
+                for fila in filas_por_producto[id_producto]:
+                    _productos_por_insumo.setdefault(fila["id_insumo"], set()).add(id_producto)
+    resultado.update(compiladas)
+    return resultado
+
+def invalidar_lista_materiales(id_producto: int = None):
+    """Invalida la lista de un producto, o toda la caché si no se indica producto"""
+    global _generacion
+    with _lock:
+        _generacion += 1
+        if id_producto is None:
+            _cache.clear()
+            _productos_por_insumo.clear()
+        else:
+            _cache.pop(id_producto, None)
+
+def invalidar_por_insumo(id_insumo: int):
+    """Invalida las listas de todos los productos que usan el insumo (p. ej. cambió su unidad)"""
+    global _generacion
+    with _lock:
+        _generacion += 1
+        for id_producto in _productos_por_insumo.pop(id_insumo, set()):
+            _cache.pop(id_producto, None)
@@ -0,0 +1,247 @@
+"""
+Bandeja de salida (outbox) de puntos hacia Loyabit y saldo local de puntos.
+
+clientes.puntos es el saldo local y loyabit_outbox el registro de cada
+movimiento. Ambos se escriben en la misma transacción (la de la venta, cuando
+se acumulan puntos al cobrar). Así la caja nunca espera a Loyabit y un fallo
+remoto no pierde la acumulación: el despachador (services/loyabit_outbox_service)
+reintenta hasta confirmar.
+"""
+import os
+from decimal import Decimal, ROUND_DOWN
+from database.conexion import conectar
+
+# Puntos que genera cada peso vendido a un cliente registrado (0 desactiva la
+# acumulación automática al cobrar)
+PUNTOS_POR_PESO = Decimal(os.getenv("LOYABIT_PUNTOS_POR_PESO", "0"))
+MAX_INTENTOS = int(os.getenv("LOYABIT_OUTBOX_MAX_INTENTOS", "12"))
+
+def calcular_puntos_venta(total) -> Decimal:
+    return (Decimal(str(total)) * PUNTOS_POR_PESO).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+
+def encolar_movimiento_puntos(cursor, tipo: str, id_cliente: int, puntos, motivo: str,
+                              clave_idempotencia: str, id_venta: int = None):
+    """
+    Registra un movimiento de puntos dentro de la transacción de `cursor`:
+    actualiza clientes.puntos y agrega el evento a la bandeja de salida.
+    No hace commit.
+
+    Si la clave ya existe no se aplica otra vez (un reintento de la caja no
+    duplica puntos). Retorna {"id_evento", "duplicado"} o {"error"}; ante error
+    el llamador debe hacer rollback.
+    """
+    puntos = Decimal(str(puntos))
+    if puntos <= 0:
+        return {"error": "La cantidad de puntos debe ser mayor a 0"}
+
+    cursor.execute("""
+        INSERT IGNORE INTO loyabit_outbox(tipo, id_cliente, id_venta, puntos, motivo, clave_idempotencia)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (tipo, id_cliente, id_venta, puntos, motivo, clave_idempotencia))
+    if cursor.rowcount == 0:
+        cursor.execute("SELECT id_evento FROM loyabit_outbox WHERE clave_idempotencia = %s", (clave_idempotencia,))
+        fila = cursor.fetchone()
+        id_evento = fila["id_evento"] if isinstance(fila, dict) else fila[0]
+        return {"id_evento": id_evento, "duplicado": True}
+    id_evento = cursor.lastrowid
+
+    if tipo == "agregar_puntos":
+        cursor.execute("UPDATE clientes SET puntos = puntos + %s WHERE id_cliente = %s", (puntos, id_cliente))
+        if cursor.rowcount == 0:
+            return {"error": "Cliente no encontrado"}
+    else:
+        # Condicional: dos canjes simultáneos no pueden dejar el saldo negativo
+        cursor.execute(
+            "UPDATE clientes SET puntos = puntos - %s WHERE id_cliente = %s AND puntos >= %s",
+            (puntos, id_cliente, puntos)
+        )
+        if cursor.rowcount == 0:
+            return {"error": "Puntos insuficientes o cliente no encontrado"}
+    return {"id_evento": id_evento, "duplicado": False}
+
+def acumular_puntos_venta(cursor, id_cliente: int, id_venta: int, total):
+    """
+    Acumula los puntos de una venta dentro de su transacción (sin commit).
+    Retorna None si no aplica (sin cliente o acumulación desactivada).
+    """
+    if not id_cliente or PUNTOS_POR_PESO <= 0:
+        return None
+    puntos = calcular_puntos_venta(total)
+    if puntos <= 0:
+        return None
+    resultado = encolar_movimiento_puntos(
+        cursor, "agregar_puntos", id_cliente, puntos, f"Compra venta #{id_venta}",
+        f"venta-{id_venta}", id_venta
+    )
+    if "error" in resultado:
+        return resultado
+    return {**resultado, "puntos": puntos}
+
+def registrar_movimiento_puntos(tipo: str, id_cliente: int, puntos, motivo: str, clave_idempotencia: str):
+    """Movimiento de puntos fuera de una venta (endpoints de agregar/canjear), en su propia transacción"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        resultado = encolar_movimiento_puntos(cursor, tipo, id_cliente, puntos, motivo, clave_idempotencia)
+        if "error" in resultado:
+            conexion.rollback()
+            return resultado
+        conexion.commit()
+        cursor.execute("SELECT puntos, loyabit_id FROM clientes WHERE id_cliente = %s", (id_cliente,))
+        fila = cursor.fetchone()
+        resultado["saldo_local"] = fila["puntos"] if fila else None
+        resultado["loyabit_id"] = fila["loyabit_id"] if fila else None
+        return resultado
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al registrar movimiento de puntos: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def obtener_saldo_puntos(id_cliente: int):
+    """
+    Saldo local del cliente y lo que falta confirmar en Loyabit.
+    Este es el saldo que debe mostrarse en caja: ya incluye los movimientos
+    pendientes de envío.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT puntos FROM clientes WHERE id_cliente = %s", (id_cliente,))
+        cliente = cursor.fetchone()
+        if not cliente:
+            return {"error": "Cliente no encontrado"}
+        cursor.execute("""
+            SELECT estado, COUNT(*) AS eventos,
+                   COALESCE(SUM(CASE WHEN tipo = 'agregar_puntos' THEN puntos ELSE -puntos END), 0) AS neto
+            FROM loyabit_outbox
+            WHERE id_cliente = %s AND estado IN ('pendiente', 'error')
+            GROUP BY estado
+        """, (id_cliente,))
+        por_estado = {fila["estado"]: fila for fila in cursor.fetchall()}
+        pendiente = por_estado.get("pendiente", {"eventos": 0, "neto": 0})
+        con_error = por_estado.get("error", {"eventos": 0, "neto": 0})
+        return {
+            "id_cliente": id_cliente,
+            "puntos": cliente["puntos"],
+            "eventos_pendientes": pendiente["eventos"],
+            "puntos_por_confirmar": pendiente["neto"],
+            "eventos_con_error": con_error["eventos"]
+        }
+    finally:
+        cursor.close()
+        conexion.close()
+
+def reclamar_eventos(lote: str, limite: int, lease_segundos: int):
+    """
+    Toma hasta `limite` eventos pendientes y vencidos para el lote dado.
+    El siguiente_intento se adelanta `lease_segundos`: si el proceso muere a
+    medias, otro despachador los vuelve a tomar al vencer ese plazo.
+    Retorna la lista de eventos con el loyabit_id del cliente.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            UPDATE loyabit_outbox
+            SET lote = %s, siguiente_intento = NOW() + INTERVAL %s SECOND
+            WHERE estado = 'pendiente' AND siguiente_intento <= NOW()
+            ORDER BY siguiente_intento, id_evento
+            LIMIT %s
+        """, (lote, lease_segundos, limite))
+        conexion.commit()
+        if cursor.rowcount == 0:
+            return []
+        cursor.execute("""
+            SELECT o.id_evento, o.tipo, o.id_cliente, o.puntos, o.motivo, o.clave_idempotencia,
+                   o.intentos, c.loyabit_id
+            FROM loyabit_outbox o
+            JOIN clientes c ON c.id_cliente = o.id_cliente
+            WHERE o.lote = %s AND o.estado = 'pendiente'
+            ORDER BY o.id_evento
+        """, (lote,))
+        return cursor.fetchall()
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al reclamar eventos de Loyabit: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def registrar_resultados_eventos(enviados, reintentos, fallidos, esperando):
+    """
+    Guarda el resultado de un lote en una sola transacción:
+    - enviados: [id_evento] confirmados por Loyabit
+    - reintentos: [(id_evento, error, segundos)] fallos temporales (cuentan intento)
+    - fallidos: [(id_evento, error)] rechazos definitivos, quedan en estado 'error'
+    - esperando: [(id_evento, motivo, segundos)] aún no se pueden enviar (no cuentan intento)
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        if enviados:
+            cursor.executemany(
+                "UPDATE loyabit_outbox SET estado = 'enviado', fecha_envio = NOW(), lote = NULL, ultimo_error = NULL WHERE id_evento = %s",
+                [(id_evento,) for id_evento in enviados]
+            )
+        if reintentos:
+            cursor.executemany("""
+                UPDATE loyabit_outbox
+                SET intentos = intentos + 1, ultimo_error = %s, lote = NULL,
+                    siguiente_intento = NOW() + INTERVAL %s SECOND,
+                    estado = IF(intentos >= %s, 'error', 'pendiente')
+                WHERE id_evento = %s
+            """, [(error, segundos, MAX_INTENTOS, id_evento) for id_evento, error, segundos in reintentos])
+        if fallidos:
+            cursor.executemany(
+                "UPDATE loyabit_outbox SET estado = 'error', intentos = intentos + 1, ultimo_error = %s, lote = NULL WHERE id_evento = %s",
+                [(error, id_evento) for id_evento, error in fallidos]
+            )
+        if esperando:
+            cursor.executemany(
+                "UPDATE loyabit_outbox SET ultimo_error = %s, lote = NULL, siguiente_intento = NOW() + INTERVAL %s SECOND WHERE id_evento = %s",
+                [(motivo, segundos, id_evento) for id_evento, motivo, segundos in esperando]
+            )
+        conexion.commit()
+        return {"enviados": len(enviados), "reintentos": len(reintentos), "fallidos": len(fallidos), "esperando": len(esperando)}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al guardar resultados de Loyabit: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def reintentar_eventos_con_error(id_cliente: int = None):
+    """Vuelve a poner en cola los eventos en estado 'error' (p. ej. tras corregir el cliente)"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    filtro = "AND id_cliente = %s" if id_cliente is not None else ""
+    try:
+        cursor.execute(
+            f"UPDATE loyabit_outbox SET estado = 'pendiente', intentos = 0, siguiente_intento = NOW() WHERE estado = 'error' {filtro}",
+            (id_cliente,) if id_cliente is not None else ()
+        )
+        conexion.commit()
+        return {"message": "Eventos puestos en cola nuevamente", "eventos": cursor.rowcount}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al reintentar eventos: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
@@ -3,12 +3,18 @@ from schemas.preorden_schema import PreordenCreate, PreordenUpdate, EstadoPreord
 from datetime import datetime
 from decimal import Decimal
 import uuid
+from repository.inventario_repository import reservar_para_comanda
+from repository.cola_cocina_repository import proyectar_en_cola_cocina
+from repository.disponibilidad_repository import marcar_insumos_modificados
+from repository.loyabit_outbox_repository import acumular_puntos_venta
+from repository.historico_repository import buscar_en_historico
 
 def generar_ticket_id():
     """Genera un ID de ticket único"""
-    # Formato: TICKET-YYYYMMDD-HHMMSS-XXXX (últimos 4 caracteres aleatorios)
+    # Formato: TICKET-YYYYMMDD-HHMMSS-XXXXXXXXXXXX (12 hex aleatorios, 48 bits): ticket_id
+    # es UNIQUE y un choque haría fallar el cobro, así que 4 caracteres no bastan
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    random_suffix = str(uuid.uuid4())[:4].upper().replace('-', '')
+    random_suffix = uuid.uuid4().hex[:12].upper()
     return f"TICKET-{timestamp}-{random_suffix}"
 
 def obtener_id_usuario_ventas_globales(cursor_existente=None):
@@ -129,9 +135,14 @@ def ver_preorden_by_id(id_preorden: int):
     preorden = cursor.fetchone()
     
     if not preorden:
+        # Puede ser de un mes ya archivado
+        archivada = buscar_en_historico(cursor, "preordenes", "id_preorden", id_preorden)
+        if archivada:
+            archivada[0]["detalles"] = buscar_en_historico(cursor, "detalles_preorden", "id_preorden", id_preorden)
+            archivada[0]["archivada"] = True
         cursor.close()
         conexion.close()
-        return {"error": "Pre-orden no encontrada"}
+        return archivada[0] if archivada else {"error": "Pre-orden no encontrada"}
     
     # Obtener detalles
     sql_detalles = """
@@ -148,6 +159,35 @@ def ver_preorden_by_id(id_preorden: int):
     conexion.close()
     return preorden
 
+def ver_preorden_por_ticket(ticket_id: str):
+    """Obtiene una pre-orden por su ticket_id (usa el índice único unique_ticket_id)"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    cursor = conexion.cursor(dictionary=True)
+    
+    cursor.execute("SELECT * FROM preordenes WHERE ticket_id = %s", (ticket_id,))
+    preorden = cursor.fetchone()
+    
+    if not preorden:
+        cursor.close()
+        conexion.close()
+        return {"error": "Ticket no encontrado"}
+    
+    sql_detalles = """
+    SELECT dp.*, p.nombre as producto_nombre, p.precio
+    FROM detalles_preorden dp
+    JOIN productos p ON dp.id_producto = p.id_producto
+    WHERE dp.id_preorden = %s
+    """
+    cursor.execute(sql_detalles, (preorden["id_preorden"],))
+    preorden["detalles"] = cursor.fetchall()
+    
+    cursor.close()
+    conexion.close()
+    return preorden
+
 def ver_preordenes_por_estado(estado: EstadoPreordenEnum, origen: str = None):
     """Obtiene pre-órdenes filtradas por estado y opcionalmente por origen"""
     conexion = conectar()
@@ -249,11 +289,24 @@ def actualizar_preorden(id_preorden: int, preorden: PreordenUpdate):
     
     try:
         cursor.execute(sql, valores)
-        conexion.commit()
         if cursor.rowcount == 0:
+            conexion.rollback()
             cursor.close()
             conexion.close()
             return {"error": "Pre-orden no encontrada"}
+        
+        if preorden.nombre_cliente is not None:
+            # Si ya está pagada y su comanda sigue abierta, el tablero de cocina
+            # debe mostrar el nombre nuevo
+            cursor.execute("""
+                SELECT c.id_comanda
+                FROM preordenes p
+                JOIN comandas c ON c.id_venta = p.id_venta
+                WHERE p.id_preorden = %s
+            """, (id_preorden,))
+            proyectar_en_cola_cocina(cursor, [fila[0] for fila in cursor.fetchall()])
+        
+        conexion.commit()
         cursor.close()
         conexion.close()
         return {"message": "Pre-orden actualizada correctamente"}
@@ -471,6 +524,22 @@ def procesar_pago_preorden(id_preorden: int, id_usuario: int, metodo_pago: str,
             )
             cursor.execute(sql_detalle_comanda, datos_detalle_comanda)
         
+        # ========== PASO 8.1: RESERVAR INSUMOS ==========
+        # La verificación de stock se hace al cobrar; al terminar la comanda sólo
+        # se convierten las reservas en salidas
+        insuficientes, _, insumos_reservados = reservar_para_comanda(
+            cursor, comanda_id,
+            [(producto["id_producto"], producto["cantidad"]) for producto in productos_validados]
+        )
+        if insuficientes:
+            conexion.rollback()
+            cursor.close()
+            conexion.close()
+            return {
+                "error": f"Inventario insuficiente para preparar el pedido: {', '.join(insuficientes)}",
+                "insumos_insuficientes": insuficientes
+            }
+        
         # ========== PASO 9: ACTUALIZAR PRE-ORDEN CON TICKET_ID ==========
         # Generar ticket_id único
         ticket_id = generar_ticket_id()
@@ -488,8 +557,21 @@ def procesar_pago_preorden(id_preorden: int, id_usuario: int, metodo_pago: str,
             conexion.close()
             return {"error": "No se pudo actualizar el estado de la pre-orden"}
         
+        # ========== PASO 9.1: PUNTOS DE FIDELIDAD (SALDO LOCAL + OUTBOX) ==========
+        puntos = acumular_puntos_venta(cursor, id_cliente, venta_id, total_preorden)
+        if puntos and "error" in puntos:
+            conexion.rollback()
+            cursor.close()
+            conexion.close()
+            return {"error": f"Error al acumular puntos: {puntos['error']}"}
+        
+        # ========== PASO 9.2: COLA DE COCINA ==========
+        # Con el ticket_id ya asignado, la comanda entra al tablero de cocina
+        proyectar_en_cola_cocina(cursor, [comanda_id])
+        
         # ========== PASO 10: COMMIT DE TODA LA TRANSACCIÓN ==========
         conexion.commit()
+        marcar_insumos_modificados(insumos_reservados)
         
         # Obtener la pre-orden actualizada para retornar el estado y ticket_id
         cursor.execute("SELECT estado, ticket_id FROM preordenes WHERE id_preorden = %s", (id_preorden,))
@@ -505,6 +587,7 @@ def procesar_pago_preorden(id_preorden: int, id_usuario: int, metodo_pago: str,
             "id_preorden": id_preorden,
             "ticket_id": preorden_actualizada["ticket_id"] if preorden_actualizada else ticket_id,
             "estado_preorden": preorden_actualizada["estado"] if preorden_actualizada else "pagada",
+            "puntos_acumulados": puntos["puntos"] if puntos else 0,
             "total": float(total_preorden)
         }
         
@@ -1,5 +1,7 @@
 from database.conexion import conectar
 from schemas.producto_schema import ProductoCreate, ProductoUpdate
+from repository.disponibilidad_repository import invalidar_disponibilidad
+from repository.busqueda_productos_repository import invalidar_busqueda_productos
 
 def crear_producto(producto: ProductoCreate, imagen_bytes: bytes = None, tipo_imagen: str = None):
     conexion = conectar()
@@ -52,6 +54,8 @@ def crear_producto(producto: ProductoCreate, imagen_bytes: bytes = None, tipo_im
         cursor.execute(sql, datos)
         conexion.commit()
         producto_id = cursor.lastrowid
+        invalidar_disponibilidad()
+        invalidar_busqueda_productos()
         cursor.close()
         conexion.close()
         return {"message": "Producto creado correctamente", "id_producto": producto_id}
@@ -273,6 +277,8 @@ def editar_producto(id_producto: int, producto: ProductoUpdate, imagen_bytes: by
         cursor.execute(sql, valores)
         conexion.commit()
         filas_afectadas = cursor.rowcount
+        invalidar_disponibilidad()
+        invalidar_busqueda_productos()
         
         # Si no se afectaron filas, puede ser que los valores sean iguales
         # Esto no es necesariamente un error - simplemente no había cambios
@@ -329,6 +335,8 @@ def eliminar_producto(id_producto: int):
     try:
         cursor.execute(sql, (id_producto,))
         conexion.commit()
+        invalidar_disponibilidad()
+        invalidar_busqueda_productos()
         if cursor.rowcount == 0:
             cursor.close()
             conexion.close()
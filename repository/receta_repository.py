@@ -1,5 +1,10 @@
 from database.conexion import conectar
 from schemas.comanda_schema import RecetaInsumoCreate
+from repository.lista_materiales_repository import invalidar_lista_materiales, receta_tiene_unidad_medida
+from repository.disponibilidad_repository import invalidar_disponibilidad
+from repository.inventario_repository import invalidar_indice_insumos
+from utils.normalize import normalizar_nombre
+from decimal import Decimal
 
 def crear_receta(receta: RecetaInsumoCreate):
     conexion = conectar()
@@ -8,16 +13,9 @@ def crear_receta(receta: RecetaInsumoCreate):
     
     cursor = conexion.cursor()
     
-    # Verificar si existe la columna unidad_medida
+    # Verificar si existe la columna unidad_medida (consulta cacheada por proceso)
     try:
-        cursor.execute("""
-            SELECT COUNT(*) as existe 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_SCHEMA = DATABASE() 
-            AND TABLE_NAME = 'recetas_insumos' 
-            AND COLUMN_NAME = 'unidad_medida'
-        """)
-        tiene_unidad_medida = cursor.fetchone()[0] > 0
+        tiene_unidad_medida = receta_tiene_unidad_medida(cursor)
     except:
         tiene_unidad_medida = False
     
@@ -38,6 +36,8 @@ def crear_receta(receta: RecetaInsumoCreate):
         cursor.execute(sql, datos)
         conexion.commit()
         receta_id = cursor.lastrowid
+        invalidar_lista_materiales(receta.id_producto)
+        invalidar_disponibilidad()
         cursor.close()
         conexion.close()
         return {"message": "Receta creada correctamente", "id_receta": receta_id}
@@ -105,12 +105,16 @@ def eliminar_receta(id_receta: int):
     sql = "DELETE FROM recetas_insumos WHERE id_receta = %s"
     
     try:
+        cursor.execute("SELECT id_producto FROM recetas_insumos WHERE id_receta = %s", (id_receta,))
+        receta = cursor.fetchone()
         cursor.execute(sql, (id_receta,))
         conexion.commit()
         if cursor.rowcount == 0:
             cursor.close()
             conexion.close()
             return {"error": "Receta no encontrada"}
+        invalidar_lista_materiales(receta[0] if receta else None)
+        invalidar_disponibilidad()
         cursor.close()
         conexion.close()
         return {"message": "Receta eliminada correctamente"}
@@ -133,6 +137,8 @@ def eliminar_todas_recetas_producto(id_producto: int):
         cursor.execute(sql, (id_producto,))
         conexion.commit()
         recetas_eliminadas = cursor.rowcount
+        invalidar_lista_materiales(id_producto)
+        invalidar_disponibilidad()
         cursor.close()
         conexion.close()
         return {"message": f"Recetas eliminadas correctamente", "recetas_eliminadas": recetas_eliminadas}
@@ -142,3 +148,114 @@ def eliminar_todas_recetas_producto(id_producto: int):
         conexion.close()
         return {"error": f"Error al eliminar recetas: {str(e)}"}
 
+
+def aplicar_diferencias_recetas(cursor, id_producto: int, lineas, tiene_unidad_medida: bool):
+    """
+    Deja las recetas de un producto iguales a `lineas` [(id_insumo, cantidad_necesaria, unidad_medida)]
+    tocando sólo las filas que cambian: inserta las nuevas, actualiza cantidad/unidad de
+    las que ya estaban y elimina las que sobran, cada grupo con un executemany.
+    No hace commit: debe correr dentro de la transacción del llamador.
+    Retorna {"insertadas", "actualizadas", "eliminadas"}
+    """
+    columnas = "id_receta, id_insumo, cantidad_necesaria" + (", unidad_medida" if tiene_unidad_medida else "")
+    cursor.execute(f"SELECT {columnas} FROM recetas_insumos WHERE id_producto = %s FOR UPDATE", (id_producto,))
+    actuales = {fila[1]: fila for fila in cursor.fetchall()}
+
+    deseadas = {}
+    for id_insumo, cantidad, unidad in lineas:
+        if id_insumo in deseadas:
+            raise ValueError(f"El insumo {id_insumo} está repetido en la receta")
+        # Misma escala que la columna DECIMAL(10, 3) para comparar con lo guardado
+        deseadas[id_insumo] = (Decimal(str(cantidad)).quantize(Decimal("0.001")), unidad)
+
+    insertar = []
+    actualizar = []
+    for id_insumo, (cantidad, unidad) in deseadas.items():
+        actual = actuales.get(id_insumo)
+        if actual is None:
+            insertar.append((id_producto, id_insumo, cantidad, unidad) if tiene_unidad_medida
+                            else (id_producto, id_insumo, cantidad))
+        elif Decimal(str(actual[2])) != cantidad or (tiene_unidad_medida and actual[3] != unidad):
+            actualizar.append((cantidad, unidad, actual[0]) if tiene_unidad_medida else (cantidad, actual[0]))
+    eliminar = [(fila[0],) for id_insumo, fila in actuales.items() if id_insumo not in deseadas]
+
+    if eliminar:
+        cursor.executemany("DELETE FROM recetas_insumos WHERE id_receta = %s", eliminar)
+    if actualizar:
+        if tiene_unidad_medida:
+            cursor.executemany(
+                "UPDATE recetas_insumos SET cantidad_necesaria = %s, unidad_medida = %s WHERE id_receta = %s",
+                actualizar
+            )
+        else:
+            cursor.executemany("UPDATE recetas_insumos SET cantidad_necesaria = %s WHERE id_receta = %s", actualizar)
+    if insertar:
+        if tiene_unidad_medida:
+            cursor.executemany("""
+                INSERT INTO recetas_insumos(id_producto, id_insumo, cantidad_necesaria, unidad_medida)
+                VALUES (%s, %s, %s, %s)
+            """, insertar)
+        else:
+            cursor.executemany("""
+                INSERT INTO recetas_insumos(id_producto, id_insumo, cantidad_necesaria)
+                VALUES (%s, %s, %s)
+            """, insertar)
+    return {"insertadas": len(insertar), "actualizadas": len(actualizar), "eliminadas": len(eliminar)}
+
+def reemplazar_recetas_producto(id_producto: int, lineas, insumos_nuevos=None):
+    """
+    Reemplaza el conjunto de recetas de un producto en una sola transacción.
+    - lineas: [(insumo, cantidad_necesaria, unidad_medida)] donde insumo es un id_insumo
+      o el nombre normalizado de uno de insumos_nuevos
+    - insumos_nuevos: [{"nombre", "descripcion", "unidad_medida"}] que se crean en la misma
+      transacción con stock en cero; la unidad es la de la receta que los usa
+    Con lineas vacías elimina todas las recetas del producto.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    insumos_creados = []
+    try:
+        ids_insumos = {}
+        for insumo in insumos_nuevos or []:
+            cursor.execute("""
+                INSERT INTO insumos(
+                    nombre, nombre_normalizado, descripcion, unidad_medida, cantidad_actual,
+                    cantidad_minima, precio_compra, activo
+                )
+                VALUES (%s, %s, %s, %s, 0, 0, 0, TRUE)
+            """, (
+                insumo["nombre"], normalizar_nombre(insumo["nombre"]), insumo.get("descripcion"),
+                insumo.get("unidad_medida") or "unidades"
+            ))
+            ids_insumos[normalizar_nombre(insumo["nombre"])] = cursor.lastrowid
+            insumos_creados.append({"id_insumo": cursor.lastrowid, "nombre": insumo["nombre"]})
+
+        cambios = aplicar_diferencias_recetas(
+            cursor, id_producto,
+            [(ids_insumos.get(insumo, insumo), cantidad, unidad) for insumo, cantidad, unidad in lineas],
+            receta_tiene_unidad_medida(cursor)
+        )
+        cursor.execute(
+            "SELECT id_receta, id_insumo, cantidad_necesaria FROM recetas_insumos WHERE id_producto = %s ORDER BY id_receta",
+            (id_producto,)
+        )
+        recetas = [
+            {"id_receta": id_receta, "id_insumo": id_insumo, "cantidad_necesaria": float(cantidad)}
+            for id_receta, id_insumo, cantidad in cursor.fetchall()
+        ]
+        conexion.commit()
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al guardar recetas: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+    invalidar_lista_materiales(id_producto)
+    invalidar_disponibilidad()
+    if insumos_creados:
+        invalidar_indice_insumos()
+    return {"message": "Recetas guardadas correctamente", **cambios, "recetas": recetas, "insumos_creados": insumos_creados}
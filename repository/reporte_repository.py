@@ -1,4 +1,5 @@
 from database.conexion import conectar
+from repository.historico_repository import union_con_historico
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -9,18 +10,22 @@ def obtener_ventas_por_dia(fecha_inicio: str, fecha_fin: str):
         return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor(dictionary=True)
-    sql = """
+    # Los meses archivados se leen de ventas_historico (ver historico_repository)
+    ventas, parametros = union_con_historico(conexion, """
+        SELECT fecha_venta, total FROM {ventas}
+        WHERE fecha_venta >= %s AND fecha_venta < DATE_ADD(%s, INTERVAL 1 DAY)
+    """, (fecha_inicio, fecha_fin), "ventas", fecha_inicio)
+    sql = f"""
     SELECT 
         DATE(fecha_venta) as fecha,
         COUNT(*) as cantidad_ventas,
         SUM(total) as total_ventas,
         AVG(total) as ticket_promedio
-    FROM ventas
-    WHERE DATE(fecha_venta) BETWEEN %s AND %s
+    FROM ({ventas}) AS ventas
     GROUP BY DATE(fecha_venta)
     ORDER BY fecha ASC
     """
-    cursor.execute(sql, (fecha_inicio, fecha_fin))
+    cursor.execute(sql, parametros)
     resultados = cursor.fetchall()
     
     # Convertir Decimal a float para JSON
@@ -39,7 +44,13 @@ def obtener_productos_mas_vendidos(fecha_inicio: str, fecha_fin: str, limite: in
         return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor(dictionary=True)
-    sql = """
+    detalles, parametros = union_con_historico(conexion, """
+        SELECT dv.id_venta, dv.id_producto, dv.cantidad, dv.subtotal
+        FROM {detalles_venta} dv
+        JOIN {ventas} v ON dv.id_venta = v.id_venta
+        WHERE v.fecha_venta >= %s AND v.fecha_venta < DATE_ADD(%s, INTERVAL 1 DAY)
+    """, (fecha_inicio, fecha_fin), "ventas", fecha_inicio)
+    sql = f"""
     SELECT 
         p.id_producto,
         p.nombre,
@@ -47,15 +58,13 @@ def obtener_productos_mas_vendidos(fecha_inicio: str, fecha_fin: str, limite: in
         SUM(dv.cantidad) as cantidad_vendida,
         SUM(dv.subtotal) as total_ventas,
         COUNT(DISTINCT dv.id_venta) as veces_vendido
-    FROM detalles_venta dv
+    FROM ({detalles}) AS dv
     JOIN productos p ON dv.id_producto = p.id_producto
-    JOIN ventas v ON dv.id_venta = v.id_venta
-    WHERE DATE(v.fecha_venta) BETWEEN %s AND %s
     GROUP BY p.id_producto, p.nombre, p.categoria
     ORDER BY cantidad_vendida DESC
     LIMIT %s
     """
-    cursor.execute(sql, (fecha_inicio, fecha_fin, limite))
+    cursor.execute(sql, parametros + (limite,))
     resultados = cursor.fetchall()
     
     # Convertir Decimal a float
@@ -93,6 +102,17 @@ def analizar_compras_recomendadas(meses_analisis: int = 3):
     
     recomendaciones = []
     
+    # Consumo de un insumo en el período; incluye movimientos_inventario_historico
+    # si el período empieza antes de lo archivado (una rama por tabla)
+    rango = (fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
+    consumo_sql, consumo_parametros = union_con_historico(conexion, """
+        SELECT cantidad FROM {movimientos_inventario}
+        WHERE id_insumo = %s 
+        AND tipo_movimiento = 'salida'
+        AND fecha_movimiento >= %s AND fecha_movimiento < DATE_ADD(%s, INTERVAL 1 DAY)
+    """, (None,) + rango, "movimientos_inventario", fecha_inicio)
+    ramas = len(consumo_parametros) // 3
+    
     for insumo in insumos:
         id_insumo = insumo['id_insumo']
         nombre_insumo = insumo['nombre']
@@ -102,15 +122,12 @@ def analizar_compras_recomendadas(meses_analisis: int = 3):
         precio_compra = float(insumo['precio_compra']) if insumo['precio_compra'] else 0
         
         # Calcular consumo histórico (solo salidas)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 SUM(cantidad) as consumo_total,
                 COUNT(*) as movimientos
-            FROM movimientos_inventario
-            WHERE id_insumo = %s 
-            AND tipo_movimiento = 'salida'
-            AND DATE(fecha_movimiento) BETWEEN %s AND %s
-        """, (id_insumo, fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d')))
+            FROM ({consumo_sql}) AS movimientos
+        """, ((id_insumo,) + rango) * ramas)
         
         consumo_data = cursor.fetchone()
         consumo_total = float(consumo_data['consumo_total']) if consumo_data and consumo_data['consumo_total'] else 0
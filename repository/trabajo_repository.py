@@ -0,0 +1,327 @@
+"""
+Cola de trabajos en segundo plano (tabla trabajos).
+
+Los trabajadores reclaman con SELECT ... FOR UPDATE SKIP LOCKED: varios hilos o
+procesos pueden tomar trabajos a la vez sin bloquearse entre sí ni tomar el
+mismo. Cada trabajo tomado lleva un plazo (bloqueado_hasta); si el trabajador
+muere, al vencer el plazo vuelve a la cola.
+"""
+import json
+from database.conexion import conectar
+
+COLUMNAS_TRABAJO = """
+    id_trabajo, tipo, parametros, estado, prioridad, intentos, max_intentos, ejecutar_en,
+    recurrente_cada, clave_unica, bloqueado_por, bloqueado_hasta, resultado, ultimo_error,
+    fecha_creacion, fecha_inicio, fecha_fin
+"""
+
+def _a_json(valor):
+    return json.dumps(valor, default=str, ensure_ascii=False) if valor is not None else None
+
+def _de_json(valor):
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode()
+    if isinstance(valor, str):
+        try:
+            return json.loads(valor)
+        except ValueError:
+            return valor
+    return valor
+
+def _formatear(trabajo):
+    trabajo["parametros"] = _de_json(trabajo.get("parametros")) or {}
+    trabajo["resultado"] = _de_json(trabajo.get("resultado"))
+    return trabajo
+
+def encolar_trabajo(tipo: str, parametros: dict = None, retraso_segundos: int = 0, prioridad: int = 0,
+                    max_intentos: int = 3, clave_unica: str = None, recurrente_cada: int = None, ejecutar_en=None):
+    """
+    Agrega un trabajo a la cola. Con clave_unica, si ya existe uno con esa clave
+    no se duplica y se retorna el existente ({"id_trabajo", "duplicado": True}).
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            INSERT IGNORE INTO trabajos(tipo, parametros, prioridad, max_intentos, clave_unica, recurrente_cada, ejecutar_en)
+            VALUES (%s, %s, %s, %s, %s, %s, {"%s" if ejecutar_en else "NOW() + INTERVAL %s SECOND"})
+        """, (tipo, _a_json(parametros or {}), prioridad, max_intentos, clave_unica, recurrente_cada,
+              ejecutar_en or max(0, int(retraso_segundos or 0))))
+        conexion.commit()
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT id_trabajo, estado FROM trabajos WHERE clave_unica = %s", (clave_unica,))
+            existente = cursor.fetchone()
+            return {"id_trabajo": existente["id_trabajo"], "estado": existente["estado"], "duplicado": True}
+        return {"id_trabajo": cursor.lastrowid, "estado": "pendiente", "duplicado": False}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al encolar trabajo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def reclamar_trabajos(trabajador: str, tipos, limite: int, lease_segundos: int):
+    """
+    Toma hasta `limite` trabajos listos de los `tipos` dados (por prioridad y
+    antigüedad), los marca en_proceso a nombre del trabajador y los retorna.
+    """
+    if not tipos or limite <= 0:
+        return []
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    marcadores = ", ".join(["%s"] * len(tipos))
+    try:
+        cursor.execute(f"""
+            SELECT id_trabajo FROM trabajos
+            WHERE estado = 'pendiente' AND ejecutar_en <= NOW() AND tipo IN ({marcadores})
+            ORDER BY prioridad DESC, ejecutar_en, id_trabajo
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (*tipos, limite))
+        ids = [fila["id_trabajo"] for fila in cursor.fetchall()]
+        if not ids:
+            conexion.commit()
+            return []
+        marcadores_ids = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"""
+            UPDATE trabajos
+            SET estado = 'en_proceso', bloqueado_por = %s, bloqueado_hasta = NOW() + INTERVAL %s SECOND,
+                intentos = intentos + 1, fecha_inicio = NOW(), fecha_fin = NULL
+            WHERE id_trabajo IN ({marcadores_ids})
+        """, (trabajador, lease_segundos, *ids))
+        cursor.execute(f"SELECT {COLUMNAS_TRABAJO} FROM trabajos WHERE id_trabajo IN ({marcadores_ids})", ids)
+        trabajos = [_formatear(trabajo) for trabajo in cursor.fetchall()]
+        conexion.commit()
+        return trabajos
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al reclamar trabajos: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def completar_trabajo(id_trabajo: int, trabajador: str, resultado=None):
+    """
+    Cierra el trabajo; si es recurrente se reprograma para su siguiente ejecución.
+    Sólo aplica si el trabajo sigue a nombre de `trabajador` (si venció su plazo
+    y otro lo retomó, el resultado tardío se descarta).
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            UPDATE trabajos
+            SET resultado = %s, ultimo_error = NULL, bloqueado_por = NULL, bloqueado_hasta = NULL, fecha_fin = NOW(),
+                estado = IF(recurrente_cada IS NULL, 'completado', 'pendiente'),
+                intentos = IF(recurrente_cada IS NULL, intentos, 0),
+                ejecutar_en = IF(recurrente_cada IS NULL, ejecutar_en, NOW() + INTERVAL recurrente_cada SECOND)
+            WHERE id_trabajo = %s AND estado = 'en_proceso' AND bloqueado_por = %s
+        """, (_a_json(resultado), id_trabajo, trabajador))
+        conexion.commit()
+        return {"actualizado": cursor.rowcount > 0}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al completar trabajo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def fallar_trabajo(id_trabajo: int, trabajador: str, error: str, reintentar_en_segundos: int):
+    """
+    Registra un fallo. Si quedan intentos vuelve a la cola después de la espera;
+    si no, queda en 'error' (los recurrentes se reprograman para su siguiente periodo).
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            UPDATE trabajos
+            SET ultimo_error = %s, bloqueado_por = NULL, bloqueado_hasta = NULL, fecha_fin = NOW(),
+                estado = IF(intentos < max_intentos OR recurrente_cada IS NOT NULL, 'pendiente', 'error'),
+                ejecutar_en = CASE
+                    WHEN intentos < max_intentos THEN NOW() + INTERVAL %s SECOND
+                    WHEN recurrente_cada IS NOT NULL THEN NOW() + INTERVAL recurrente_cada SECOND
+                    ELSE ejecutar_en
+                END,
+                intentos = IF(intentos >= max_intentos AND recurrente_cada IS NOT NULL, 0, intentos)
+            WHERE id_trabajo = %s AND estado = 'en_proceso' AND bloqueado_por = %s
+        """, (str(error)[:2000], reintentar_en_segundos, id_trabajo, trabajador))
+        conexion.commit()
+        return {"actualizado": cursor.rowcount > 0}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al registrar fallo del trabajo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def extender_bloqueo(id_trabajo: int, trabajador: str, lease_segundos: int):
+    """Renueva el plazo de un trabajo largo que sigue en ejecución"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            UPDATE trabajos SET bloqueado_hasta = NOW() + INTERVAL %s SECOND
+            WHERE id_trabajo = %s AND estado = 'en_proceso' AND bloqueado_por = %s
+        """, (lease_segundos, id_trabajo, trabajador))
+        conexion.commit()
+        return {"actualizado": cursor.rowcount > 0}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al extender bloqueo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def liberar_trabajos_vencidos():
+    """Regresa a la cola los trabajos cuyo trabajador dejó vencer el plazo (murió o se colgó)"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            UPDATE trabajos
+            SET estado = IF(intentos < max_intentos OR recurrente_cada IS NOT NULL, 'pendiente', 'error'),
+                ultimo_error = CONCAT('Plazo vencido en ', COALESCE(bloqueado_por, '?')),
+                bloqueado_por = NULL, bloqueado_hasta = NULL, ejecutar_en = NOW()
+            WHERE estado = 'en_proceso' AND bloqueado_hasta < NOW()
+        """)
+        conexion.commit()
+        return {"liberados": cursor.rowcount}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al liberar trabajos vencidos: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def ver_trabajo(id_trabajo: int):
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {COLUMNAS_TRABAJO} FROM trabajos WHERE id_trabajo = %s", (id_trabajo,))
+        trabajo = cursor.fetchone()
+        if not trabajo:
+            return {"error": "Trabajo no encontrado"}
+        return _formatear(trabajo)
+    finally:
+        cursor.close()
+        conexion.close()
+
+def listar_trabajos(estado: str = None, tipo: str = None, limite: int = 50, antes_de_id: int = None):
+    """Trabajos más recientes primero; antes_de_id pagina hacia atrás"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    condiciones, valores = [], []
+    if estado:
+        condiciones.append("estado = %s")
+        valores.append(estado)
+    if tipo:
+        condiciones.append("tipo = %s")
+        valores.append(tipo)
+    if antes_de_id:
+        condiciones.append("id_trabajo < %s")
+        valores.append(antes_de_id)
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    try:
+        cursor.execute(f"""
+            SELECT {COLUMNAS_TRABAJO} FROM trabajos
+            {donde}
+            ORDER BY id_trabajo DESC
+            LIMIT %s
+        """, (*valores, limite))
+        return [_formatear(trabajo) for trabajo in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conexion.close()
+
+def resumen_trabajos():
+    """Conteo por tipo y estado, y el trabajo pendiente más atrasado"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT tipo, estado, COUNT(*) AS total FROM trabajos GROUP BY tipo, estado")
+        por_tipo = {}
+        for fila in cursor.fetchall():
+            por_tipo.setdefault(fila["tipo"], {})[fila["estado"]] = fila["total"]
+        cursor.execute("""
+            SELECT TIMESTAMPDIFF(SECOND, MIN(ejecutar_en), NOW()) AS atraso_segundos
+            FROM trabajos WHERE estado = 'pendiente' AND ejecutar_en <= NOW()
+        """)
+        atraso = cursor.fetchone()["atraso_segundos"]
+        return {"por_tipo": por_tipo, "atraso_maximo_segundos": atraso or 0}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def cancelar_trabajo(id_trabajo: int):
+    """Cancela un trabajo que aún no empieza (o un recurrente en espera)"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute(
+            "UPDATE trabajos SET estado = 'cancelado', fecha_fin = NOW() WHERE id_trabajo = %s AND estado = 'pendiente'",
+            (id_trabajo,)
+        )
+        conexion.commit()
+        if cursor.rowcount == 0:
+            return {"error": "El trabajo no existe o ya no está pendiente"}
+        return {"message": "Trabajo cancelado", "id_trabajo": id_trabajo}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al cancelar trabajo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
+
+def reintentar_trabajo(id_trabajo: int):
+    """Vuelve a poner en cola un trabajo en 'error' o 'cancelado', con intentos desde cero"""
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("""
+            UPDATE trabajos SET estado = 'pendiente', intentos = 0, ejecutar_en = NOW(), fecha_fin = NULL
+            WHERE id_trabajo = %s AND estado IN ('error', 'cancelado')
+        """, (id_trabajo,))
+        conexion.commit()
+        if cursor.rowcount == 0:
+            return {"error": "El trabajo no existe o no está en error/cancelado"}
+        return {"message": "Trabajo puesto en cola nuevamente", "id_trabajo": id_trabajo}
+    except Exception as e:
+        conexion.rollback()
+        return {"error": f"Error al reintentar trabajo: {str(e)}"}
+    finally:
+        cursor.close()
+        conexion.close()
@@ -1,14 +1,21 @@
 from database.conexion import conectar
 from schemas.venta_schema import VentaCreate
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
 import uuid
+from repository.inventario_repository import reservar_para_comanda
+from repository.disponibilidad_repository import marcar_insumos_modificados
+from repository.lista_materiales_repository import obtener_listas_materiales
+from repository.loyabit_outbox_repository import acumular_puntos_venta
+from repository.historico_repository import COLUMNAS, union_con_historico, buscar_en_historico
+from repository.cola_cocina_repository import proyectar_en_cola_cocina
 
 def generar_ticket_id():
     """Genera un ID de ticket único"""
-    # Formato: TICKET-YYYYMMDD-HHMMSS-XXXX (últimos 4 caracteres aleatorios)
+    # Formato: TICKET-YYYYMMDD-HHMMSS-XXXXXXXXXXXX (12 hex aleatorios, 48 bits): ticket_id
+    # es UNIQUE y un choque haría fallar el cobro, así que 4 caracteres no bastan
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    random_suffix = str(uuid.uuid4())[:4].upper().replace('-', '')
+    random_suffix = uuid.uuid4().hex[:12].upper()
     return f"TICKET-{timestamp}-{random_suffix}"
 
 def crear_venta(venta: VentaCreate):
@@ -120,21 +127,17 @@ def crear_venta(venta: VentaCreate):
             cursor.execute(sql_detalle_pedido, datos_detalle_pedido)
         
         # Crear comanda automáticamente en estado "pendiente" para que pase a barista
-        # Verificar si hay productos con recetas (insumos)
-        productos_con_recetas = []
-        for detalle in venta.detalles:
-            cursor.execute("""
-                SELECT COUNT(*) as tiene_recetas 
-                FROM recetas_insumos 
-                WHERE id_producto = %s
-            """, (detalle.id_producto,))
-            resultado = cursor.fetchone()
-            if resultado and resultado[0] > 0:
-                productos_con_recetas.append(detalle)
+        # Verificar si hay productos con recetas (insumos), usando las listas de materiales en caché
+        listas = obtener_listas_materiales(cursor, [detalle.id_producto for detalle in venta.detalles])
+        productos_con_recetas = [
+            detalle for detalle in venta.detalles
+            if listas[detalle.id_producto]["componentes"] or listas[detalle.id_producto]["errores"]
+        ]
         
         # Si hay productos con recetas, crear comanda en estado "pendiente"
-        # Los insumos se restarán cuando la comanda se marque como "terminada"
+        # Los insumos se reservan aquí y se restan cuando la comanda se marque como "terminada"
         comanda_id = None
+        insumos_reservados = []
         if productos_con_recetas:
             # ⚠️ IMPORTANTE: Verificar si ya existe una comanda para esta venta
             # Usar cursor dictionary para acceso por nombre
@@ -167,8 +170,36 @@ def crear_venta(venta: VentaCreate):
                     cursor.execute(sql_detalle_comanda, (
                         comanda_id, detalle.id_producto, detalle.cantidad, observaciones
                     ))
+                
+                # Reservar los insumos ahora: al terminar la comanda sólo se convierten
+                # las reservas en salidas, así cocina nunca falla por stock
+                insuficientes, _, insumos_reservados = reservar_para_comanda(
+                    cursor, comanda_id,
+                    [(detalle.id_producto, detalle.cantidad) for detalle in productos_con_recetas]
+                )
+                if insuficientes:
+                    conexion.rollback()
+                    cursor.close()
+                    conexion.close()
+                    return {
+                        "error": f"Inventario insuficiente para preparar el pedido: {', '.join(insuficientes)}",
+                        "insumos_insuficientes": insuficientes
+                    }
+                
+                # Tablero de cocina: la comanda entra a la cola con el pedido ya resuelto
+                proyectar_en_cola_cocina(cursor, [comanda_id])
+        
+        # Puntos de fidelidad: saldo local + bandeja de salida, en esta misma transacción.
+        # Loyabit se actualiza en segundo plano (services/loyabit_outbox_service)
+        puntos = acumular_puntos_venta(cursor, venta.id_cliente, venta_id, venta.total)
+        if puntos and "error" in puntos:
+            conexion.rollback()
+            cursor.close()
+            conexion.close()
+            return {"error": f"Error al acumular puntos: {puntos['error']}"}
         
         conexion.commit()
+        marcar_insumos_modificados(insumos_reservados)
         cursor.close()
         conexion.close()
         return {
@@ -177,7 +208,8 @@ def crear_venta(venta: VentaCreate):
             "id_pedido": pedido_id,
             "ticket_id": ticket_id,
             "id_comanda": comanda_id,
-            "comanda_creada": comanda_id is not None
+            "comanda_creada": comanda_id is not None,
+            "puntos_acumulados": puntos["puntos"] if puntos else 0
         }
     except Exception as e:
         conexion.rollback()
@@ -198,9 +230,14 @@ def ver_venta_by_id(id_venta: int):
     venta = cursor.fetchone()
     
     if not venta:
+        # Puede ser de un mes ya archivado
+        archivada = buscar_en_historico(cursor, "ventas", "id_venta", id_venta)
+        if archivada:
+            archivada[0]["detalles"] = buscar_en_historico(cursor, "detalles_venta", "id_venta", id_venta)
+            archivada[0]["archivada"] = True
         cursor.close()
         conexion.close()
-        return {"error": "Venta no encontrada"}
+        return archivada[0] if archivada else {"error": "Venta no encontrada"}
     
     # Obtener los detalles
     sql_detalles = """
@@ -251,11 +288,13 @@ def obtener_info_ticket_actual():
     try:
         # Contar tickets del día actual (incluyendo los que ya tienen ticket_id)
         fecha_hoy = datetime.now().strftime("%Y-%m-%d")
+        # Rango [hoy, mañana) en lugar de DATE(fecha_creacion) para poder usar el índice
+        inicio_dia = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         cursor.execute("""
             SELECT COUNT(*) as total_tickets_hoy
             FROM preordenes
-            WHERE DATE(fecha_creacion) = %s
-        """, (fecha_hoy,))
+            WHERE fecha_creacion >= %s AND fecha_creacion < %s
+        """, (inicio_dia, inicio_dia + timedelta(days=1)))
         contador_dia = cursor.fetchone()
         
         # Obtener el último ticket_id generado
@@ -296,19 +335,24 @@ def ver_ventas_por_fecha(fecha_inicio: str, fecha_fin: str):
         return {"error": "Error de conexión a la base de datos"}
     
     cursor = conexion.cursor(dictionary=True)
-    sql = """
+    # Si el rango llega a meses archivados se leen también las tablas *_historico;
+    # cada venta trae el nombre de la tabla donde están sus detalles
+    ventas_rango, parametros = union_con_historico(conexion, f"""
+        SELECT {COLUMNAS['ventas']}, '{{detalles_venta}}' AS tabla_detalles FROM {{ventas}}
+        WHERE fecha_venta >= %s AND fecha_venta < DATE_ADD(%s, INTERVAL 1 DAY)
+    """, (fecha_inicio, fecha_fin), "ventas", fecha_inicio)
+    sql = f"""
     SELECT v.*, u.nombre as vendedor_nombre, c.nombre as cliente_nombre
-    FROM ventas v
+    FROM ({ventas_rango}) AS v
     LEFT JOIN usuarios u ON v.id_usuario = u.id_usuario
     LEFT JOIN clientes c ON v.id_cliente = c.id_cliente
-    WHERE DATE(v.fecha_venta) BETWEEN %s AND %s
     ORDER BY v.fecha_venta DESC
     """
-    cursor.execute(sql, (fecha_inicio, fecha_fin))
+    cursor.execute(sql, parametros)
     ventas = cursor.fetchall()
     
     for venta in ventas:
-        sql_detalles = "SELECT * FROM detalles_venta WHERE id_venta = %s"
+        sql_detalles = f"SELECT * FROM {venta.pop('tabla_detalles')} WHERE id_venta = %s"
         cursor.execute(sql_detalles, (venta["id_venta"],))
         venta["detalles"] = cursor.fetchall()
     
@@ -316,3 +360,67 @@ def ver_ventas_por_fecha(fecha_inicio: str, fecha_fin: str):
     conexion.close()
     return ventas
 
+
+# Columnas de abrir_lineas_ventas, en el orden de cada tupla
+COLUMNAS_LINEAS_VENTA = [
+    "id_venta", "fecha_venta", "metodo_pago", "total_venta", "id_cliente", "cliente",
+    "id_usuario", "vendedor", "id_detalle_venta", "id_producto", "producto", "categoria",
+    "cantidad", "precio_unitario", "subtotal"
+]
+
+def abrir_lineas_ventas(fecha_inicio: str, fecha_fin: str, tamano_bloque: int = 1000):
+    """
+    Ventas del rango con sus líneas (una fila por detalle, ordenadas por venta) para
+    exportar. La consulta se lee con un cursor sin búfer: las filas llegan del
+    servidor de a tamano_bloque y nunca se cargan todas en memoria.
+    Retorna un generador de bloques (listas de tuplas, ver COLUMNAS_LINEAS_VENTA)
+    o {"error"}; la conexión se cierra al agotarse o cerrarse el generador.
+    """
+    conexion = conectar()
+    if not conexion:
+        return {"error": "Error de conexión a la base de datos"}
+    
+    lineas, parametros = union_con_historico(conexion, """
+        SELECT v.id_venta, v.fecha_venta, v.metodo_pago, v.total, v.id_cliente, v.id_usuario,
+               dv.id_detalle_venta, dv.id_producto, dv.cantidad, dv.precio_unitario, dv.subtotal
+        FROM {ventas} v
+        LEFT JOIN {detalles_venta} dv ON dv.id_venta = v.id_venta
+        WHERE v.fecha_venta >= %s AND v.fecha_venta < DATE_ADD(%s, INTERVAL 1 DAY)
+    """, (fecha_inicio, fecha_fin), "ventas", fecha_inicio)
+    sql = f"""
+    SELECT l.id_venta, l.fecha_venta, l.metodo_pago, l.total, l.id_cliente, c.nombre,
+           l.id_usuario, u.nombre, l.id_detalle_venta, l.id_producto, p.nombre, p.categoria,
+           l.cantidad, l.precio_unitario, l.subtotal
+    FROM ({lineas}) AS l
+    LEFT JOIN clientes c ON l.id_cliente = c.id_cliente
+    LEFT JOIN usuarios u ON l.id_usuario = u.id_usuario
+    LEFT JOIN productos p ON l.id_producto = p.id_producto
+    ORDER BY l.fecha_venta, l.id_venta, l.id_detalle_venta
+    """
+    cursor = conexion.cursor(buffered=False)
+    try:
+        # Con un cursor sin búfer el servidor espera a que el cliente lea; si la
+        # descarga es lenta no debe cortar la conexión por net_write_timeout
+        cursor.execute("SET SESSION net_write_timeout = 3600")
+        cursor.execute(sql, parametros)
+    except Exception as e:
+        cursor.close()
+        conexion.close()
+        return {"error": f"Error al exportar ventas: {str(e)}"}
+    
+    def bloques():
+        try:
+            while True:
+                filas = cursor.fetchmany(tamano_bloque)
+                if not filas:
+                    break
+                yield filas
+        finally:
+            # Si la descarga se cortó quedan filas sin leer: cerrar la conexión las descarta
+            for recurso in (cursor, conexion):
+                try:
+                    recurso.close()
+                except Exception:
+                    pass
+    
+    return bloques()
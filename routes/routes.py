@@ -9,6 +9,8 @@ from controllers.comanda_controller import router as comanda_router
 from controllers.receta_controller import router as receta_router
 from controllers.preorden_controller import router as preorden_router
 from controllers.reporte_controller import router as reporte_router
+from controllers.loyabit_controller import router as loyabit_router
+from controllers.trabajo_controller import router as trabajo_router
 
 api_router = APIRouter()
 
@@ -40,4 +42,10 @@ api_router.include_router(receta_router, prefix="/api/recetas", tags=["Recetas"]
 api_router.include_router(preorden_router, prefix="/api/preordenes", tags=["Pre-órdenes"])
 
 # Rutas de reportes
-api_router.include_router(reporte_router, prefix="/api/reportes", tags=["Reportes"])
\ No newline at end of file
+api_router.include_router(reporte_router, prefix="/api/reportes", tags=["Reportes"])
+
+# Rutas de integración con Loyabit (puntos de fidelidad)
+api_router.include_router(loyabit_router, prefix="/api/loyabit", tags=["Loyabit"])
+
+# Rutas de la cola de trabajos en segundo plano
+api_router.include_router(trabajo_router, prefix="/api/trabajos", tags=["Trabajos"])
@@ -0,0 +1,46 @@
+"""
+Schemas para la importación masiva del catálogo (productos con recetas e insumos)
+"""
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Optional, List
+from decimal import Decimal
+
+class InsumoImportado(BaseModel):
+    """Insumo declarado en el archivo (sección "insumos" del JSON)"""
+    nombre: str = Field(..., min_length=1, max_length=255)
+    unidad_medida: str = "unidades"  # Unidad de stock del insumo
+    descripcion: Optional[str] = None
+    cantidad_minima: Decimal = Field(Decimal("0"), ge=0)
+    precio_compra: Decimal = Field(Decimal("0"), ge=0)
+
+class RecetaImportada(BaseModel):
+    """Línea de receta: el insumo se indica por id o por nombre (se crea si no existe)"""
+    id_insumo: Optional[int] = None
+    insumo: Optional[str] = None
+    cantidad_necesaria: Decimal = Field(..., gt=0)
+    unidad_medida: str
+
+    @model_validator(mode='after')
+    def validar_insumo(self):
+        if not self.id_insumo and not (self.insumo or "").strip():
+            raise ValueError("Debe indicar 'id_insumo' o 'insumo'")
+        if self.id_insumo and (self.insumo or "").strip():
+            raise ValueError("No puede indicar 'id_insumo' e 'insumo' al mismo tiempo")
+        return self
+
+class ProductoImportado(BaseModel):
+    nombre: str = Field(..., min_length=1, max_length=255)
+    descripcion: Optional[str] = None
+    precio: Decimal = Field(..., ge=0)
+    categoria: str = Field(..., min_length=1, max_length=100)
+    activo: bool = True
+    # None: no se tocan las recetas del producto; []: se eliminan todas
+    recetas: Optional[List[RecetaImportada]] = None
+
+    @field_validator('nombre', 'categoria')
+    @classmethod
+    def quitar_espacios(cls, v: str) -> str:
+        v = " ".join(v.split())
+        if not v:
+            raise ValueError("No puede estar vacío")
+        return v
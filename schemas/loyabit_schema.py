@@ -32,11 +32,13 @@ class LoyabitAgregarPuntos(BaseModel):
     id_cliente: int
     puntos: Decimal
     motivo: Optional[str] = "Compra realizada"
+    clave_idempotencia: Optional[str] = None  # Reintentos con la misma clave no duplican puntos
 
 class LoyabitCanjearPuntos(BaseModel):
     """Schema para canjear puntos de un cliente"""
     id_cliente: int
     puntos: Decimal
     motivo: Optional[str] = "Canje de puntos"
+    clave_idempotencia: Optional[str] = None
 
 
@@ -0,0 +1,15 @@
+"""
+Schemas para la cola de trabajos en segundo plano
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+
+class TrabajoCreate(BaseModel):
+    """Schema para encolar un trabajo"""
+    tipo: str
+    parametros: Dict[str, Any] = {}
+    retraso_segundos: int = Field(0, ge=0)  # Programarlo para más tarde
+    prioridad: int = 0  # Mayor se atiende primero
+    clave_unica: Optional[str] = None  # No encolar dos veces el mismo trabajo
+    recurrente_cada: Optional[int] = Field(None, ge=60)  # Segundos entre ejecuciones
+    max_intentos: Optional[int] = Field(None, ge=1, le=20)
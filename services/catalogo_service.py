@@ -0,0 +1,330 @@
+"""
+Importación masiva del catálogo (productos con sus recetas e insumos) desde un
+archivo CSV o JSON.
+
+JSON: {"insumos": [...], "productos": [...]} o sólo la lista de productos (ver
+schemas/catalogo_schema.py). Cada producto puede traer "recetas" con "insumo"
+(nombre) o "id_insumo", "cantidad_necesaria" y "unidad_medida".
+
+CSV: una fila por línea de receta, con las columnas
+    producto, descripcion, precio, categoria, activo, insumo, id_insumo, cantidad, unidad_medida
+Las filas del mismo producto se agrupan y sus datos se toman de la primera que los
+traiga. Un producto sin filas con insumo conserva las recetas que ya tenga.
+
+Todo el archivo se valida antes de escribir: si alguna fila tiene errores no se
+importa nada y el reporte indica qué corregir. Los productos se buscan por nombre
+(sin acentos ni mayúsculas): si existe se actualiza y si no se crea. Al actualizar
+sólo se escriben los campos que trae el archivo (una columna ausente, como
+"descripcion" o "activo", conserva lo guardado) y el reporte indica cuáles
+cambiaron en "campos_modificados". Los insumos nombrados que no existen se crean
+con la unidad de la receta (o la declarada en "insumos") y stock en cero.
+"""
+import csv
+import io
+import json
+from pydantic import ValidationError
+from repository.catalogo_repository import leer_catalogo_actual, aplicar_importacion
+from schemas.catalogo_schema import InsumoImportado, ProductoImportado
+from utils.conversiones import normalizar_unidad, dimension_de, son_unidades_compatibles
+from utils.normalize import normalizar_nombre
+
+TAMANO_MAXIMO_BYTES = 5 * 1024 * 1024
+
+# Encabezados aceptados en el CSV -> campo
+COLUMNAS_CSV = {
+    "producto": "nombre", "nombre": "nombre", "descripcion": "descripcion", "precio": "precio",
+    "categoria": "categoria", "activo": "activo", "insumo": "insumo", "id_insumo": "id_insumo",
+    "cantidad": "cantidad_necesaria", "cantidad_necesaria": "cantidad_necesaria",
+    "unidad": "unidad_medida", "unidad_medida": "unidad_medida",
+}
+CAMPOS_PRODUCTO = ("descripcion", "precio", "categoria", "activo")
+VALORES_ACTIVO = {"si": True, "sí": True, "no": False}
+
+def _errores_validacion(error: ValidationError):
+    return [
+        f"{'.'.join(str(parte) for parte in detalle['loc'])}: {detalle['msg']}" if detalle["loc"] else detalle["msg"]
+        for detalle in error.errors()
+    ]
+
+def _leer_json(texto: str):
+    """Retorna (insumos, productos) como listas de (fila, datos)"""
+    datos = json.loads(texto)
+    if isinstance(datos, list):
+        datos = {"productos": datos}
+    if not isinstance(datos, dict) or not isinstance(datos.get("productos", []), list) \
+            or not isinstance(datos.get("insumos", []), list):
+        raise ValueError('Se esperaba una lista de productos o {"insumos": [...], "productos": [...]}')
+    insumos = list(enumerate(datos.get("insumos", []), start=1))
+    productos = [(fila, producto, [fila]) for fila, producto in enumerate(datos.get("productos", []), start=1)]
+    return insumos, productos
+
+def _leer_csv(texto: str):
+    """Agrupa las filas por producto. Retorna ([], [(primera fila, datos, filas)])"""
+    lector = csv.DictReader(io.StringIO(texto))
+    encabezados = {columna: COLUMNAS_CSV.get(normalizar_nombre(columna or "").replace(" ", "_"))
+                   for columna in (lector.fieldnames or [])}
+    if "nombre" not in encabezados.values():
+        raise ValueError("El CSV debe tener la columna 'producto'")
+
+    grupos = {}
+    for numero, fila in enumerate(lector, start=2):
+        valores = {}
+        for columna, valor in fila.items():
+            campo = encabezados.get(columna)
+            if campo and valor is not None and str(valor).strip() != "":
+                valores[campo] = str(valor).strip()
+        if not valores:
+            continue
+        clave = normalizar_nombre(valores.get("nombre", ""))
+        grupo = grupos.setdefault(clave or f"fila-{numero}", {
+            "fila": numero, "filas": [], "datos": {"nombre": valores.get("nombre", "")},
+            "recetas": [], "conflictos": [], "origen": {}
+        })
+        grupo["filas"].append(numero)
+        for campo in CAMPOS_PRODUCTO:
+            if campo not in valores:
+                continue
+            valor = valores[campo]
+            if campo == "activo":
+                valor = VALORES_ACTIVO.get(valor.lower(), valor)
+            if campo not in grupo["datos"]:
+                grupo["datos"][campo] = valor
+                grupo["origen"][campo] = numero
+            elif grupo["datos"][campo] != valor:
+                grupo["conflictos"].append(
+                    f"Fila {numero}: '{campo}' distinto al de la fila {grupo['origen'][campo]}"
+                )
+        if "insumo" in valores or "id_insumo" in valores:
+            grupo["recetas"].append({
+                campo: valores.get(campo) for campo in ("insumo", "id_insumo", "cantidad_necesaria", "unidad_medida")
+            })
+        elif "cantidad_necesaria" in valores or "unidad_medida" in valores:
+            grupo["conflictos"].append(f"Fila {numero}: línea de receta sin insumo")
+
+    productos = []
+    for grupo in grupos.values():
+        datos = grupo["datos"]
+        if grupo["recetas"]:
+            datos["recetas"] = grupo["recetas"]
+        datos["_conflictos"] = grupo["conflictos"]
+        productos.append((grupo["fila"], datos, grupo["filas"]))
+    return [], productos
+
+def leer_archivo_catalogo(contenido: bytes, nombre_archivo: str = None):
+    """Retorna (insumos, productos) o {"error"}"""
+    if len(contenido) > TAMANO_MAXIMO_BYTES:
+        return {"error": f"El archivo supera el máximo de {TAMANO_MAXIMO_BYTES // (1024 * 1024)} MB"}
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return {"error": "El archivo debe estar en UTF-8"}
+    extension = (nombre_archivo or "").lower().rsplit(".", 1)[-1]
+    es_json = extension == "json" or (extension != "csv" and texto.lstrip()[:1] in ("[", "{"))
+    try:
+        return _leer_json(texto) if es_json else _leer_csv(texto)
+    except json.JSONDecodeError as e:
+        return {"error": f"JSON mal formado: {str(e)}"}
+    except (ValueError, csv.Error) as e:
+        return {"error": f"Archivo inválido: {str(e)}"}
+
+def _mismo_valor(campo: str, nuevo, actual) -> bool:
+    """Compara un campo del archivo con el guardado (activo llega como 0/1 desde MySQL)"""
+    if campo == "activo":
+        return actual is not None and bool(nuevo) == bool(actual)
+    return nuevo == actual
+
+def _validar_unidad(unidad: str):
+    if dimension_de(unidad) is None:
+        return f"Unidad de medida desconocida: '{unidad}'"
+    return None
+
+def validar_catalogo(insumos, productos, catalogo):
+    """
+    Valida el archivo completo contra el catálogo actual sin escribir nada.
+    Retorna (reporte_insumos, reporte_filas, plan); plan es None si hay errores.
+    """
+    # Insumos por nombre normalizado: existentes + declarados en el archivo + creados por recetas
+    insumos_nuevos = {}         # nombre_normalizado -> datos para insertar
+    unidad_insumo = {}          # id_insumo o nombre_normalizado -> unidad de stock
+    for id_insumo, insumo in catalogo["insumos"].items():
+        unidad_insumo[id_insumo] = insumo["unidad_medida"]
+
+    reporte_insumos = []
+    for fila, datos in insumos:
+        entrada = {"fila": fila, "nombre": datos.get("nombre") if isinstance(datos, dict) else None, "errores": []}
+        reporte_insumos.append(entrada)
+        try:
+            insumo = InsumoImportado(**datos) if isinstance(datos, dict) else InsumoImportado.model_validate(datos)
+        except ValidationError as e:
+            entrada["errores"] = _errores_validacion(e)
+            continue
+        clave = normalizar_nombre(insumo.nombre)
+        error_unidad = _validar_unidad(insumo.unidad_medida)
+        if error_unidad:
+            entrada["errores"].append(error_unidad)
+        elif clave in insumos_nuevos:
+            entrada["errores"].append("Insumo repetido en el archivo")
+        elif clave in catalogo["insumos_por_nombre"]:
+            entrada["accion"] = "existente"
+            entrada["id_insumo"] = catalogo["insumos_por_nombre"][clave]
+        else:
+            entrada["accion"] = "crear"
+            insumos_nuevos[clave] = {
+                "nombre": " ".join(insumo.nombre.split()), "descripcion": insumo.descripcion,
+                "unidad_medida": normalizar_unidad(insumo.unidad_medida),
+                "cantidad_minima": insumo.cantidad_minima, "precio_compra": insumo.precio_compra,
+            }
+            unidad_insumo[clave] = insumos_nuevos[clave]["unidad_medida"]
+
+    reporte_filas = []
+    productos_nuevos = []
+    productos_actualizados = []
+    recetas = {}
+    vistos = {}
+    for fila, datos, filas in productos:
+        entrada = {"fila": fila, "producto": datos.get("nombre") if isinstance(datos, dict) else None, "errores": []}
+        if len(filas) > 1:
+            entrada["filas"] = filas
+        reporte_filas.append(entrada)
+        if not isinstance(datos, dict):
+            entrada["errores"].append("Cada producto debe ser un objeto")
+            continue
+        entrada["errores"].extend(datos.pop("_conflictos", []))
+        try:
+            producto = ProductoImportado(**datos)
+        except ValidationError as e:
+            entrada["errores"].extend(_errores_validacion(e))
+            continue
+        entrada["producto"] = producto.nombre
+
+        clave = normalizar_nombre(producto.nombre)
+        if clave in vistos:
+            entrada["errores"].append(f"Producto repetido en el archivo (fila {vistos[clave]})")
+        vistos.setdefault(clave, fila)
+        existentes = catalogo["productos"].get(clave, [])
+        if len(existentes) > 1:
+            entrada["errores"].append(f"Hay varios productos con ese nombre (ids {', '.join(map(str, existentes))})")
+
+        lineas = []
+        insumos_producto = set()
+        for numero, receta in enumerate(producto.recetas or [], start=1):
+            prefijo = f"recetas.{numero}"
+            error_unidad = _validar_unidad(receta.unidad_medida)
+            if error_unidad:
+                entrada["errores"].append(f"{prefijo}: {error_unidad}")
+                continue
+            unidad = normalizar_unidad(receta.unidad_medida)
+            if receta.id_insumo:
+                insumo = receta.id_insumo
+                if insumo not in catalogo["insumos"]:
+                    entrada["errores"].append(f"{prefijo}: no existe el insumo {insumo}")
+                    continue
+            else:
+                insumo = normalizar_nombre(receta.insumo)
+                insumo = catalogo["insumos_por_nombre"].get(insumo, insumo)
+                if insumo not in unidad_insumo:
+                    # Insumo nuevo: se crea con la unidad de la primera receta que lo usa
+                    insumos_nuevos[insumo] = {
+                        "nombre": " ".join(receta.insumo.split()), "descripcion": None, "unidad_medida": unidad,
+                        "cantidad_minima": 0, "precio_compra": 0,
+                    }
+                    unidad_insumo[insumo] = unidad
+                    entrada.setdefault("insumos_nuevos", []).append(insumos_nuevos[insumo]["nombre"])
+            if not son_unidades_compatibles(unidad, unidad_insumo[insumo]):
+                entrada["errores"].append(
+                    f"{prefijo}: '{receta.unidad_medida}' no es compatible con la unidad del insumo ({unidad_insumo[insumo]})"
+                )
+                continue
+            if insumo in insumos_producto:
+                entrada["errores"].append(f"{prefijo}: el insumo está repetido en la receta")
+                continue
+            insumos_producto.add(insumo)
+            lineas.append((insumo, receta.cantidad_necesaria, unidad))
+
+        if entrada["errores"]:
+            continue
+        datos_producto = {
+            "nombre": producto.nombre, "descripcion": producto.descripcion, "precio": producto.precio,
+            "categoria": producto.categoria, "activo": producto.activo,
+        }
+        if existentes:
+            # Sólo los campos que traía la fila/objeto: los ausentes conservan lo guardado
+            actual = catalogo["datos_productos"][existentes[0]]
+            cambios = {
+                campo: valor for campo, valor in datos_producto.items()
+                if campo in producto.model_fields_set and not _mismo_valor(campo, valor, actual[campo])
+            }
+            entrada["accion"] = "actualizar"
+            entrada["id_producto"] = existentes[0]
+            entrada["campos_modificados"] = list(cambios)
+            if cambios:
+                productos_actualizados.append({"id_producto": existentes[0], "cambios": cambios})
+        else:
+            entrada["accion"] = "crear"
+            productos_nuevos.append(datos_producto)
+        if producto.recetas is not None:
+            recetas[existentes[0] if existentes else clave] = lineas
+            entrada["recetas"] = len(lineas)
+
+    hay_errores = any(entrada["errores"] for entrada in reporte_insumos + reporte_filas)
+    plan = None if hay_errores else {
+        "insumos_nuevos": list(insumos_nuevos.values()),
+        "productos_nuevos": productos_nuevos,
+        "productos_actualizados": productos_actualizados,
+        "recetas": recetas,
+    }
+    return reporte_insumos, reporte_filas, plan
+
+def importar_catalogo_service(contenido: bytes, nombre_archivo: str = None, solo_validar: bool = False):
+    """
+    Valida e importa un archivo de catálogo. Retorna el reporte por fila:
+    {"aplicado", "resumen", "filas": [{"fila", "producto", "accion", "errores", ...}], "insumos"}
+    y "error" si no se importó nada.
+    """
+    leido = leer_archivo_catalogo(contenido, nombre_archivo)
+    if isinstance(leido, dict):
+        return leido
+    insumos, productos = leido
+    if not productos and not insumos:
+        return {"error": "El archivo no tiene productos"}
+
+    catalogo = leer_catalogo_actual()
+    if "error" in catalogo:
+        return catalogo
+
+    reporte_insumos, reporte_filas, plan = validar_catalogo(insumos, productos, catalogo)
+    filas_con_error = sum(1 for entrada in reporte_insumos + reporte_filas if entrada["errores"])
+    resumen = {
+        "productos": len(reporte_filas),
+        "filas_con_error": filas_con_error,
+    }
+    if plan:
+        resumen.update({
+            "productos_nuevos": len(plan["productos_nuevos"]),
+            "productos_actualizados": sum(1 for entrada in reporte_filas if entrada.get("accion") == "actualizar"),
+            "insumos_nuevos": len(plan["insumos_nuevos"]),
+            "lineas_receta": sum(len(lineas) for lineas in plan["recetas"].values()),
+        })
+    reporte = {"aplicado": False, "resumen": resumen, "filas": reporte_filas}
+    if reporte_insumos:
+        reporte["insumos"] = reporte_insumos
+
+    if not plan:
+        return {"error": f"{filas_con_error} filas con errores: no se importó nada", **reporte}
+    if solo_validar:
+        return {"message": "Archivo válido (no se guardó nada)", **reporte}
+
+    resultado = aplicar_importacion(
+        plan["insumos_nuevos"], plan["productos_nuevos"], plan["productos_actualizados"], plan["recetas"]
+    )
+    if "error" in resultado:
+        return {**reporte, "error": resultado["error"]}
+
+    for entrada in reporte_filas:
+        if entrada.get("accion") == "crear":
+            entrada["id_producto"] = resultado["ids_productos"].get(normalizar_nombre(entrada["producto"]))
+    for entrada in reporte_insumos:
+        if entrada.get("accion") == "crear":
+            entrada["id_insumo"] = resultado["ids_insumos"].get(normalizar_nombre(entrada["nombre"]))
+    reporte["aplicado"] = True
+    return {"message": "Catálogo importado correctamente", **reporte}
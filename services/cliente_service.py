@@ -1,8 +1,10 @@
 from repository.cliente_repository import (
     crear_cliente, ver_todos_clientes, ver_cliente_by_id,
-    editar_cliente, registrar_visita, ver_visitas_cliente, contar_visitas_cliente
+    editar_cliente, registrar_visita, ver_visitas_cliente, contar_visitas_cliente,
+    buscar_clientes, ver_historial_visitas, reconciliar_visitas_clientes
 )
 from schemas.cliente_schema import VisitaClienteCreate
+from services.trabajos_service import encolar
 
 def crear_cliente_service(cliente):
     return crear_cliente(cliente)
@@ -10,6 +12,9 @@ def crear_cliente_service(cliente):
 def ver_todos_clientes_service():
     return ver_todos_clientes()
 
+def buscar_clientes_service(texto: str, limite: int = 10):
+    return buscar_clientes(texto, limite)
+
 def ver_cliente_by_id_service(id_cliente: int):
     return ver_cliente_by_id(id_cliente)
 
@@ -23,4 +28,12 @@ def ver_visitas_cliente_service(id_cliente: int):
     return ver_visitas_cliente(id_cliente)
 
 def contar_visitas_cliente_service(id_cliente: int):
-    return contar_visitas_cliente(id_cliente)
\ No newline at end of file
+    return contar_visitas_cliente(id_cliente)
+
+def ver_historial_visitas_service(id_cliente: int, limite: int = 20, cursor_pagina: str = None):
+    return ver_historial_visitas(id_cliente, limite, cursor_pagina)
+
+def reconciliar_visitas_clientes_service(id_cliente: int = None, en_segundo_plano: bool = False):
+    if en_segundo_plano:
+        return encolar("reconciliar_visitas", {"id_cliente": id_cliente})
+    return reconciliar_visitas_clientes(id_cliente)
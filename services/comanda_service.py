@@ -2,6 +2,7 @@ from repository.comanda_repository import (
     crear_comanda, ver_comanda_by_id, ver_comandas_por_estado,
     actualizar_estado_comanda, ver_todas_comandas
 )
+from repository.cola_cocina_repository import leer_cola_cocina
 from schemas.comanda_schema import ComandaCreate, ComandaUpdate, EstadoComandaEnum
 
 def crear_comanda_service(comanda: ComandaCreate):
@@ -19,3 +20,5 @@ def actualizar_estado_comanda_service(id_comanda: int, estado: EstadoComandaEnum
 def ver_todas_comandas_service():
     return ver_todas_comandas()
 
+def ver_cola_cocina_service():
+    return leer_cola_cocina()
@@ -0,0 +1,26 @@
+import os
+from repository.historico_repository import (
+    archivar_historico, purgar_historico, comprimir_historico, estado_historico
+)
+
+# Meses que se guardan en el histórico antes de eliminarse (vacío: no se elimina nada)
+MESES_CONSERVAR = os.getenv("HISTORICO_MESES_CONSERVAR")
+
+def archivar_historico_service(meses_activos: int = None, tamano_lote: int = None, meses_conservar: int = None):
+    """Archiva los meses cerrados y, si hay plazo de conservación, purga el histórico más antiguo"""
+    resultado = archivar_historico(meses_activos, tamano_lote)
+    if "error" in resultado:
+        return resultado
+    meses_conservar = meses_conservar or (int(MESES_CONSERVAR) if MESES_CONSERVAR else None)
+    if meses_conservar:
+        resultado["purga"] = purgar_historico(meses_conservar, tamano_lote)
+    return resultado
+
+def purgar_historico_service(meses_conservar: int, tamano_lote: int = None):
+    return purgar_historico(meses_conservar, tamano_lote)
+
+def comprimir_historico_service():
+    return comprimir_historico()
+
+def estado_historico_service():
+    return estado_historico()
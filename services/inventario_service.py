@@ -1,7 +1,7 @@
 from repository.inventario_repository import (
     crear_insumo, ver_todos_insumos, ver_insumo_by_id,
     editar_insumo, restar_insumo, registrar_movimiento,
-    obtener_insumos_bajo_stock
+    obtener_insumos_bajo_stock, buscar_insumos
 )
 from schemas.inventario_schema import InsumoCreate, InsumoUpdate, MovimientoInventarioCreate
 
@@ -26,3 +26,6 @@ def registrar_movimiento_service(movimiento: MovimientoInventarioCreate):
 def obtener_insumos_bajo_stock_service():
     return obtener_insumos_bajo_stock()
 
+
+def buscar_insumos_service(texto: str, limite: int = 10):
+    return buscar_insumos(texto, limite)
@@ -0,0 +1,126 @@
+"""
+Despachador de la bandeja de salida de Loyabit.
+
+Un hilo en segundo plano toma lotes de eventos pendientes (loyabit_outbox),
+los envía a Loyabit con la clave de idempotencia de cada evento y guarda los
+resultados del lote en una sola transacción. Varios procesos pueden correrlo a
+la vez: cada lote se reclama con un UPDATE y un plazo (lease).
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from repository.loyabit_outbox_repository import reclamar_eventos, registrar_resultados_eventos
+from services.loyabit_service import invalidar_cache_cliente_loyabit
+from utils.circuit_breaker import CircuitoAbiertoError
+from utils.loyabit_client import get_loyabit_client
+
+TAMANO_LOTE = int(os.getenv("LOYABIT_OUTBOX_LOTE", "50"))
+INTERVALO_SEGUNDOS = float(os.getenv("LOYABIT_OUTBOX_INTERVALO", "2"))
+LEASE_SEGUNDOS = int(os.getenv("LOYABIT_OUTBOX_LEASE", "120"))
+ENVIOS_SIMULTANEOS = int(os.getenv("LOYABIT_OUTBOX_CONCURRENCIA", "4"))
+# Un cliente sin loyabit_id no es un error del envío: se espera a que se sincronice
+ESPERA_SIN_REGISTRO_SEGUNDOS = 600
+# Con el circuito abierto el envío no se intentó: no cuenta como intento
+ESPERA_CIRCUITO_ABIERTO_SEGUNDOS = 30
+
+_hilo = None
+_detener = threading.Event()
+
+def _espera_reintento(intentos: int) -> int:
+    """Backoff exponencial por evento: 5s, 10s, 20s... hasta 1 hora"""
+    return min(5 * (2 ** intentos), 3600)
+
+def _enviar_evento(cliente_loyabit, evento):
+    """Retorna ("enviado" | "reintento" | "fallido" | "esperando", detalle)"""
+    if not evento["loyabit_id"]:
+        return "esperando", "Cliente no registrado en Loyabit"
+    enviar = cliente_loyabit.agregar_puntos if evento["tipo"] == "agregar_puntos" else cliente_loyabit.canjear_puntos
+    try:
+        enviar(evento["loyabit_id"], float(evento["puntos"]), evento["motivo"], referencia=evento["clave_idempotencia"])
+        return "enviado", None
+    except CircuitoAbiertoError as e:
+        return "esperando", str(e.detail)
+    except HTTPException as e:
+        # 409: Loyabit ya tenía un movimiento con esta referencia (envío previo confirmado)
+        if e.status_code == 409:
+            return "enviado", None
+        # Otros 4xx son rechazos del contenido; reintentar no cambia el resultado
+        if 400 <= e.status_code < 500 and e.status_code not in (408, 429):
+            return "fallido", str(e.detail)
+        return "reintento", str(e.detail)
+    except Exception as e:
+        return "reintento", str(e)
+
+def despachar_lote(limite: int = TAMANO_LOTE):
+    """
+    Envía un lote de eventos pendientes. Retorna el resumen del lote
+    ({"reclamados", "enviados", ...}) o {"error"}.
+    """
+    cliente_loyabit = get_loyabit_client()
+    if not cliente_loyabit.enabled:
+        return {"reclamados": 0, "mensaje": "Loyabit no configurado"}
+    if cliente_loyabit.circuito.abierto:
+        # No reclamar eventos que sólo se rechazarían: se reanuda al cerrarse el circuito
+        return {"reclamados": 0, "mensaje": "Circuito de Loyabit abierto"}
+
+    lote = str(uuid.uuid4())
+    eventos = reclamar_eventos(lote, limite, LEASE_SEGUNDOS)
+    if isinstance(eventos, dict):
+        return eventos
+    if not eventos:
+        return {"reclamados": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(ENVIOS_SIMULTANEOS, len(eventos)))) as ejecutor:
+        resultados = list(ejecutor.map(lambda evento: _enviar_evento(cliente_loyabit, evento), eventos))
+
+    enviados, reintentos, fallidos, esperando = [], [], [], []
+    for evento, (resultado, detalle) in zip(eventos, resultados):
+        if resultado == "enviado":
+            enviados.append(evento["id_evento"])
+            # Loyabit ya aplicó el movimiento: su información en caché quedó vieja
+            invalidar_cache_cliente_loyabit(evento["loyabit_id"])
+        elif resultado == "fallido":
+            fallidos.append((evento["id_evento"], detalle))
+        elif resultado == "esperando":
+            espera = ESPERA_CIRCUITO_ABIERTO_SEGUNDOS if evento["loyabit_id"] else ESPERA_SIN_REGISTRO_SEGUNDOS
+            esperando.append((evento["id_evento"], detalle, espera))
+        else:
+            reintentos.append((evento["id_evento"], detalle, _espera_reintento(evento["intentos"])))
+
+
+    resumen = registrar_resultados_eventos(enviados, reintentos, fallidos, esperando)
+    if "error" in resumen:
+        # Los eventos siguen reclamados; se reintentan al vencer el lease.
+        # Loyabit deduplica por referencia, así que reenviar los ya aplicados es seguro.
+        return resumen
+    return {"reclamados": len(eventos), **resumen}
+
+def _ciclo_despachador():
+    while not _detener.is_set():
+        try:
+            resumen = despachar_lote()
+            # Si el lote vino lleno probablemente hay más: seguir sin esperar
+            if resumen.get("reclamados", 0) >= TAMANO_LOTE and "error" not in resumen:
+                continue
+            if "error" in resumen:
+                print(f"⚠️  Despachador Loyabit: {resumen['error']}")
+        except Exception as e:
+            print(f"⚠️  Despachador Loyabit: {str(e)}")
+        _detener.wait(INTERVALO_SEGUNDOS)
+
+def iniciar_despachador():
+    """Arranca el hilo del despachador si Loyabit está configurado y no está desactivado"""
+    global _hilo
+    if os.getenv("LOYABIT_OUTBOX_DESPACHADOR", "1") != "1" or not get_loyabit_client().enabled:
+        return False
+    if _hilo is not None and _hilo.is_alive():
+        return True
+    _detener.clear()
+    _hilo = threading.Thread(target=_ciclo_despachador, name="despachador-loyabit", daemon=True)
+    _hilo.start()
+    return True
+
+def detener_despachador():
+    _detener.set()
@@ -4,9 +4,39 @@ Servicio para integración con Loyabit
 from repository.cliente_repository import (
     ver_cliente_by_id, actualizar_loyabit_id, obtener_cliente_por_loyabit_id
 )
+from repository.loyabit_outbox_repository import (
+    registrar_movimiento_puntos, obtener_saldo_puntos, reintentar_eventos_con_error
+)
+from services.trabajos_service import encolar
 from utils.loyabit_client import get_loyabit_client
-from decimal import Decimal
+from utils.cache_ttl import CacheTTL
+from utils.circuit_breaker import CircuitoAbiertoError
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
 from typing import Optional, Dict, Any
+from decimal import Decimal
+import hashlib
+import hmac
+import json
+import os
+import uuid
+
+# Información remota (cliente + puntos) por loyabit_id. Un TTL corto basta para
+# que las consultas repetidas durante un mismo cobro no salgan a la red; los
+# movimientos locales de puntos y los webhooks de Loyabit la invalidan antes.
+_cache_info_clientes = CacheTTL(float(os.getenv("LOYABIT_CACHE_TTL", "60")), max_entradas=2000)
+_ejecutor_consultas = ThreadPoolExecutor(max_workers=8, thread_name_prefix="loyabit-consulta")
+
+def invalidar_cache_cliente_loyabit(loyabit_id: Optional[str]):
+    if loyabit_id:
+        _cache_info_clientes.invalidar(loyabit_id)
+
+def _consultar_info_remota(loyabit_id: str) -> Dict[str, Any]:
+    """Pide cliente y puntos a Loyabit en paralelo; cualquier error se propaga (y no se cachea)"""
+    loyabit_client = get_loyabit_client()
+    futuro_cliente = _ejecutor_consultas.submit(loyabit_client.obtener_cliente, loyabit_id)
+    futuro_puntos = _ejecutor_consultas.submit(loyabit_client.obtener_puntos_cliente, loyabit_id)
+    return {"cliente": futuro_cliente.result(), "puntos": futuro_puntos.result()}
 
 def registrar_cliente_en_loyabit(id_cliente: int) -> Dict[str, Any]:
     """
@@ -76,6 +106,10 @@ def registrar_cliente_en_loyabit(id_cliente: int) -> Dict[str, Any]:
             "error": f"Error al registrar cliente en Loyabit: {str(e)}"
         }
 
+def encolar_registro_cliente_loyabit(id_cliente: int) -> Dict[str, Any]:
+    """Registra el cliente en Loyabit desde la cola de trabajos (con reintentos) sin esperar a la API"""
+    return encolar("registrar_cliente_loyabit", {"id_cliente": id_cliente})
+
 def obtener_info_cliente_loyabit(id_cliente: int) -> Dict[str, Any]:
     """
     Obtiene información de un cliente desde Loyabit
@@ -97,16 +131,35 @@ def obtener_info_cliente_loyabit(id_cliente: int) -> Dict[str, Any]:
             "sincronizar_primero": True
         }
     
-    loyabit_client = get_loyabit_client()
-    
     try:
-        info_cliente = loyabit_client.obtener_cliente(loyabit_id)
-        puntos = loyabit_client.obtener_puntos_cliente(loyabit_id)
+        info_remota = _cache_info_clientes.obtener_o_calcular(
+            loyabit_id, lambda: _consultar_info_remota(loyabit_id)
+        )
         
         return {
-            "cliente": info_cliente,
-            "puntos": puntos,
-            "loyabit_id": loyabit_id
+            "cliente": info_remota["cliente"],
+            "puntos": info_remota["puntos"],
+            "loyabit_id": loyabit_id,
+            # Mientras haya movimientos sin confirmar, el saldo válido es el local
+            "saldo_local": obtener_saldo_puntos(id_cliente)
+        }
+    except HTTPException as e:
+        if e.status_code < 500:
+            return {"error": f"Error al obtener información del cliente desde Loyabit: {e.detail}"}
+        # Loyabit caído, lento o con el circuito abierto: modo degradado con lo último
+        # que se obtuvo (si hay) y el saldo local, que es el que vale en caja
+        vencido = _cache_info_clientes.obtener_vencido(loyabit_id)
+        return {
+            "cliente": vencido[0]["cliente"] if vencido else None,
+            "puntos": vencido[0]["puntos"] if vencido else None,
+            "loyabit_id": loyabit_id,
+            "saldo_local": obtener_saldo_puntos(id_cliente),
+            "degradado": True,
+            "antiguedad_segundos": round(vencido[1]) if vencido else None,
+            "motivo": (
+                "Loyabit no disponible (circuito abierto)" if isinstance(e, CircuitoAbiertoError)
+                else str(e.detail)
+            )
         }
     except Exception as e:
         return {
@@ -143,6 +196,7 @@ def sincronizar_cliente_con_loyabit(id_cliente: int, forzar: bool = False) -> Di
                     "celular": cliente_local.get("celular", ""),
                 }
                 loyabit_client.actualizar_cliente(cliente_local["loyabit_id"], cliente_data)
+                invalidar_cache_cliente_loyabit(cliente_local["loyabit_id"])
                 
                 return {
                     "message": "Cliente actualizado en Loyabit",
@@ -161,78 +215,115 @@ def sincronizar_cliente_con_loyabit(id_cliente: int, forzar: bool = False) -> Di
             "error": f"Error al sincronizar cliente con Loyabit: {str(e)}"
         }
 
-def agregar_puntos_loyabit(id_cliente: int, puntos: Decimal, motivo: str = "Compra realizada") -> Dict[str, Any]:
+def agregar_puntos_loyabit(id_cliente: int, puntos: Decimal, motivo: str = "Compra realizada",
+                           clave_idempotencia: Optional[str] = None) -> Dict[str, Any]:
     """
-    Agrega puntos a un cliente en Loyabit
+    Agrega puntos a un cliente: se aplican al saldo local y quedan en la bandeja
+    de salida para enviarse a Loyabit en segundo plano (sin esperar a la API).
     
     Args:
         id_cliente: ID del cliente en la base de datos local
         puntos: Cantidad de puntos a agregar
         motivo: Motivo por el cual se agregan puntos
+        clave_idempotencia: Si la caja reintenta con la misma clave, no se duplican los puntos
         
     Returns:
         Diccionario con el resultado de la operación
     """
-    cliente_local = ver_cliente_by_id(id_cliente)
-    if isinstance(cliente_local, dict) and "error" in cliente_local:
-        return cliente_local
-    
-    loyabit_id = cliente_local.get("loyabit_id")
-    if not loyabit_id:
-        return {
-            "error": "Cliente no está registrado en Loyabit. Regístrelo primero.",
-            "sincronizar_primero": True
-        }
-    
-    loyabit_client = get_loyabit_client()
-    
-    try:
-        respuesta = loyabit_client.agregar_puntos(loyabit_id, float(puntos), motivo)
-        return {
-            "message": f"Puntos agregados correctamente en Loyabit",
-            "puntos_agregados": puntos,
-            "respuesta_loyabit": respuesta
-        }
-    except Exception as e:
-        return {
-            "error": f"Error al agregar puntos en Loyabit: {str(e)}"
-        }
+    resultado = registrar_movimiento_puntos(
+        "agregar_puntos", id_cliente, puntos, motivo, clave_idempotencia or str(uuid.uuid4())
+    )
+    if "error" in resultado:
+        return resultado
+    invalidar_cache_cliente_loyabit(resultado["loyabit_id"])
+    return {
+        "message": "Puntos agregados; se confirmarán en Loyabit en segundo plano",
+        "puntos_agregados": puntos,
+        "id_evento": resultado["id_evento"],
+        "duplicado": resultado["duplicado"],
+        "saldo_local": resultado["saldo_local"]
+    }
 
-def canjear_puntos_loyabit(id_cliente: int, puntos: Decimal, motivo: str = "Canje de puntos") -> Dict[str, Any]:
+def canjear_puntos_loyabit(id_cliente: int, puntos: Decimal, motivo: str = "Canje de puntos",
+                           clave_idempotencia: Optional[str] = None) -> Dict[str, Any]:
     """
-    Canjea puntos de un cliente en Loyabit
+    Canjea puntos de un cliente contra el saldo local (falla si no alcanza) y
+    deja el canje en la bandeja de salida para enviarse a Loyabit.
     
     Args:
         id_cliente: ID del cliente en la base de datos local
         puntos: Cantidad de puntos a canjear
         motivo: Motivo del canje
+        clave_idempotencia: Si la caja reintenta con la misma clave, no se descuenta dos veces
         
     Returns:
         Diccionario con el resultado de la operación
     """
-    cliente_local = ver_cliente_by_id(id_cliente)
-    if isinstance(cliente_local, dict) and "error" in cliente_local:
-        return cliente_local
-    
-    loyabit_id = cliente_local.get("loyabit_id")
-    if not loyabit_id:
-        return {
-            "error": "Cliente no está registrado en Loyabit. Regístrelo primero.",
-            "sincronizar_primero": True
-        }
-    
-    loyabit_client = get_loyabit_client()
+    resultado = registrar_movimiento_puntos(
+        "canjear_puntos", id_cliente, puntos, motivo, clave_idempotencia or str(uuid.uuid4())
+    )
+    if "error" in resultado:
+        return resultado
+    invalidar_cache_cliente_loyabit(resultado["loyabit_id"])
+    return {
+        "message": "Puntos canjeados; se confirmarán en Loyabit en segundo plano",
+        "puntos_canjeados": puntos,
+        "id_evento": resultado["id_evento"],
+        "duplicado": resultado["duplicado"],
+        "saldo_local": resultado["saldo_local"]
+    }
+
+def obtener_saldo_puntos_cliente(id_cliente: int) -> Dict[str, Any]:
+    """Saldo de puntos para mostrar en caja (local, incluye lo pendiente de confirmar)"""
+    return obtener_saldo_puntos(id_cliente)
+
+def reintentar_eventos_loyabit(id_cliente: Optional[int] = None) -> Dict[str, Any]:
+    return reintentar_eventos_con_error(id_cliente)
+
+def procesar_webhook_loyabit(cuerpo: bytes, firma: Optional[str]) -> Dict[str, Any]:
+    """
+    Webhook de Loyabit: cuando cambia un cliente o sus puntos del lado de
+    Loyabit se invalida su información en caché.
+    La firma es HMAC-SHA256 del cuerpo con LOYABIT_WEBHOOK_SECRET, en hexadecimal
+    (ajustar header y formato según la documentación de Loyabit).
+    """
+    secreto = os.getenv("LOYABIT_WEBHOOK_SECRET", "")
+    if not secreto:
+        raise HTTPException(status_code=503, detail="Webhook de Loyabit no configurado (LOYABIT_WEBHOOK_SECRET)")
+    esperada = hmac.new(secreto.encode(), cuerpo, hashlib.sha256).hexdigest()
+    if not firma or not hmac.compare_digest(esperada, firma.strip().lower().removeprefix("sha256=")):
+        raise HTTPException(status_code=401, detail="Firma de webhook inválida")
     
     try:
-        respuesta = loyabit_client.canjear_puntos(loyabit_id, float(puntos), motivo)
-        return {
-            "message": f"Puntos canjeados correctamente en Loyabit",
-            "puntos_canjeados": puntos,
-            "respuesta_loyabit": respuesta
-        }
-    except Exception as e:
-        return {
-            "error": f"Error al canjear puntos en Loyabit: {str(e)}"
-        }
-
+        evento = json.loads(cuerpo or b"{}")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cuerpo de webhook inválido")
+    if not isinstance(evento, dict):
+        raise HTTPException(status_code=400, detail="Cuerpo de webhook inválido")
+    
+    # Ajustar según la estructura de los eventos de Loyabit
+    datos = evento.get("data") or {}
+    if not isinstance(datos, dict):
+        raise HTTPException(status_code=400, detail="Cuerpo de webhook inválido")
+    cliente = datos.get("customer") or {}
+    loyabit_id = (
+        evento.get("customer_id")
+        or datos.get("customer_id")
+        or (cliente.get("id") if isinstance(cliente, dict) else None)
+    )
+    if loyabit_id:
+        invalidar_cache_cliente_loyabit(str(loyabit_id))
+    return {"recibido": True, "evento": evento.get("event") or evento.get("type"), "loyabit_id": loyabit_id}
 
+def obtener_metricas_loyabit() -> Dict[str, Any]:
+    """Latencia, errores y reintentos de las llamadas a Loyabit de este proceso"""
+    loyabit_client = get_loyabit_client()
+    return {
+        "habilitado": loyabit_client.enabled,
+        "timeout_conexion": loyabit_client.timeout[0],
+        "timeout_lectura": loyabit_client.timeout[1],
+        "plazo_total": loyabit_client.plazo_total,
+        "circuito": loyabit_client.circuito.estado(),
+        "operaciones": loyabit_client.metricas.resumen(),
+        "cache_info_clientes": _cache_info_clientes.estadisticas()
+    }
@@ -0,0 +1,165 @@
+"""
+Sincronización masiva de clientes con Loyabit.
+
+Recorre clientes WHERE loyabit_sincronizado = FALSE por páginas (llave id_cliente)
+y los vincula con Loyabit:
+- si la API tiene operación en lote (customers/bulk_upsert), una llamada por página
+- si no, varias llamadas en paralelo (búsqueda por email y, si no existe, alta)
+
+Cada página se guarda con un solo UPDATE por lotes antes de pasar a la
+siguiente. La bandera loyabit_sincronizado es el punto de control: si el
+proceso se interrumpe, volver a ejecutarlo continúa con los que faltan, y los
+que alcanzaron a crearse en Loyabit se vinculan por email sin duplicarse.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from repository.cliente_repository import obtener_clientes_sin_sincronizar, marcar_clientes_sincronizados
+from utils.loyabit_client import get_loyabit_client
+
+_lock = threading.Lock()
+_hilo = None
+_estado = {"en_curso": False}
+# None: aún no se sabe si la API tiene operación en lote
+_lote_disponible = None
+
+def _datos_cliente(cliente):
+    return {
+        "nombre": cliente["nombre"],
+        "apellido_paterno": cliente["apellido_paterno"],
+        "apellido_materno": cliente.get("apellido_materno") or "",
+        "correo": cliente["correo"],
+        "celular": cliente.get("celular") or "",
+    }
+
+def _id_loyabit(respuesta):
+    return (respuesta or {}).get("id") or (respuesta or {}).get("customer_id")  # Ajustar según la respuesta
+
+def _vincular_uno(loyabit_client, cliente):
+    """Misma lógica que registrar_cliente_en_loyabit: buscar por email y crear si no existe"""
+    encontrado = loyabit_client.buscar_cliente_por_email(cliente["correo"])
+    if encontrado:
+        return _id_loyabit(encontrado)
+    return _id_loyabit(loyabit_client.crear_cliente(_datos_cliente(cliente)))
+
+def _vincular_en_lote(loyabit_client, clientes):
+    """Retorna {id_cliente: loyabit_id} de los que devolvió la operación en lote, o None si no existe"""
+    global _lote_disponible
+    if _lote_disponible is False:
+        return None
+    try:
+        respuesta = loyabit_client.crear_clientes_lote([_datos_cliente(cliente) for cliente in clientes])
+    except HTTPException as e:
+        if e.status_code in (404, 405, 501):
+            _lote_disponible = False
+            return None
+        raise
+    _lote_disponible = True
+    por_email = {
+        (item.get("email") or "").lower(): _id_loyabit(item)
+        for item in respuesta if isinstance(item, dict)
+    }
+    return {
+        cliente["id_cliente"]: por_email[cliente["correo"].lower()]
+        for cliente in clientes
+        if por_email.get(cliente["correo"].lower())
+    }
+
+def _sincronizar_pagina(loyabit_client, clientes, concurrencia: int, usar_lote: bool):
+    """Retorna (vinculos [(id_cliente, loyabit_id)], errores [{id_cliente, error}])"""
+    vinculados = {}
+    errores = []
+    if usar_lote:
+        try:
+            vinculados = _vincular_en_lote(loyabit_client, clientes) or {}
+        except Exception as e:
+            # Si falla el lote completo se intenta uno por uno
+            print(f"⚠️  Sincronización en lote falló, se intentará por cliente: {str(e)}")
+
+    restantes = [cliente for cliente in clientes if cliente["id_cliente"] not in vinculados]
+
+    def vincular(cliente):
+        try:
+            return cliente, _vincular_uno(loyabit_client, cliente), None
+        except HTTPException as e:
+            return cliente, None, str(e.detail)
+        except Exception as e:
+            return cliente, None, str(e)
+
+    if restantes:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrencia, len(restantes)))) as ejecutor:
+            for cliente, loyabit_id, error in ejecutor.map(vincular, restantes):
+                if loyabit_id:
+                    vinculados[cliente["id_cliente"]] = loyabit_id
+                else:
+                    errores.append({"id_cliente": cliente["id_cliente"], "error": error or "Loyabit no devolvió ID"})
+
+    return list(vinculados.items()), errores
+
+def sincronizar_clientes_pendientes(tamano_lote: int = 100, concurrencia: int = 8,
+                                    limite: int = None, usar_lote: bool = True, progreso: dict = None):
+    """
+    Sincroniza todos los clientes pendientes (o hasta `limite`).
+    `progreso` (opcional) se actualiza después de cada página.
+    Retorna {"procesados", "vinculados", "errores", "primeros_errores", "segundos"} o {"error"}.
+    """
+    loyabit_client = get_loyabit_client()
+    if not loyabit_client.enabled:
+        return {"error": "Servicio de Loyabit no configurado"}
+
+    progreso = progreso if progreso is not None else {}
+    progreso.update({"procesados": 0, "vinculados": 0, "errores": 0, "primeros_errores": [], "ultimo_id": 0})
+    inicio = time.monotonic()
+    ultimo_id = 0
+
+    while limite is None or progreso["procesados"] < limite:
+        if loyabit_client.circuito.abierto:
+            # Seguir sólo acumularía rechazos; los pendientes quedan para otra corrida
+            progreso["interrumpido"] = "Circuito de Loyabit abierto"
+            break
+        tamano = tamano_lote if limite is None else min(tamano_lote, limite - progreso["procesados"])
+        clientes = obtener_clientes_sin_sincronizar(ultimo_id, tamano)
+        if isinstance(clientes, dict):
+            return {**progreso, **clientes}
+        if not clientes:
+            break
+
+        vinculos, errores = _sincronizar_pagina(loyabit_client, clientes, concurrencia, usar_lote)
+        resultado = marcar_clientes_sincronizados(vinculos)
+        if "error" in resultado:
+            return {**progreso, **resultado}
+
+        # Los que fallaron se saltan en esta corrida (id_cliente > ultimo_id) y
+        # quedan pendientes para la siguiente
+        ultimo_id = clientes[-1]["id_cliente"]
+        progreso["procesados"] += len(clientes)
+        progreso["vinculados"] += len(vinculos)
+        progreso["errores"] += len(errores)
+        progreso["ultimo_id"] = ultimo_id
+        progreso["primeros_errores"] = (progreso["primeros_errores"] + errores)[:20]
+
+    progreso["segundos"] = round(time.monotonic() - inicio, 2)
+    return dict(progreso)
+
+def iniciar_sincronizacion_masiva(tamano_lote: int = 100, concurrencia: int = 8, limite: int = None):
+    """Lanza la sincronización en un hilo; sólo una a la vez por proceso"""
+    global _hilo, _estado
+    with _lock:
+        if _estado.get("en_curso"):
+            return {"error": "Ya hay una sincronización en curso", "estado": dict(_estado)}
+        _estado = {"en_curso": True, "inicio": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    def ejecutar():
+        global _estado
+        resultado = sincronizar_clientes_pendientes(tamano_lote, concurrencia, limite, progreso=_estado)
+        with _lock:
+            _estado = {**resultado, "en_curso": False, "inicio": _estado.get("inicio")}
+
+    _hilo = threading.Thread(target=ejecutar, name="sincronizacion-loyabit", daemon=True)
+    _hilo.start()
+    return {"message": "Sincronización masiva iniciada", "estado": dict(_estado)}
+
+def obtener_estado_sincronizacion():
+    with _lock:
+        return dict(_estado)
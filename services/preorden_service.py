@@ -1,5 +1,5 @@
 from repository.preorden_repository import (
-    crear_preorden, ver_preorden_by_id, ver_preordenes_por_estado,
+    crear_preorden, ver_preorden_by_id, ver_preorden_por_ticket, ver_preordenes_por_estado,
     ver_preordenes_pendientes, actualizar_preorden, procesar_pago_preorden,
     marcar_preorden_en_cocina, marcar_preorden_lista, marcar_preorden_entregada
 )
@@ -11,6 +11,9 @@ def crear_preorden_service(preorden: PreordenCreate):
 def ver_preorden_by_id_service(id_preorden: int):
     return ver_preorden_by_id(id_preorden)
 
+def ver_preorden_por_ticket_service(ticket_id: str):
+    return ver_preorden_por_ticket(ticket_id)
+
 def ver_preordenes_por_estado_service(estado: EstadoPreordenEnum, origen: str = None):
     return ver_preordenes_por_estado(estado, origen)
 
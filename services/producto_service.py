@@ -2,101 +2,69 @@ from repository.producto_repository import (
     crear_producto, ver_todos_productos, ver_producto_by_id,
     editar_producto, eliminar_producto, obtener_imagen_producto
 )
-from repository.receta_repository import crear_receta, eliminar_todas_recetas_producto
-from repository.inventario_repository import crear_insumo
+from repository.receta_repository import reemplazar_recetas_producto
+from repository.inventario_repository import buscar_insumo_por_nombre
+from repository.disponibilidad_repository import obtener_disponibilidad
+from repository.busqueda_productos_repository import buscar_productos
 from schemas.producto_schema import ProductoCreate, ProductoUpdate
-from schemas.comanda_schema import RecetaInsumoCreate
-from schemas.inventario_schema import InsumoCreate
+from utils.normalize import normalizar_nombre
+from utils.conversiones import normalizar_unidad
 from fastapi import UploadFile
 from typing import Optional
 
 def _procesar_recetas(id_producto: int, recetas):
-    """Función auxiliar para procesar recetas (crear insumos nuevos si es necesario y crear recetas)"""
+    """
+    Reemplaza las recetas del producto por `recetas` en una sola transacción: crea los
+    insumos nuevos y aplica sólo las diferencias con las recetas guardadas.
+    Si alguna receta es inválida o falla la escritura no se modifica nada.
+    """
     from schemas.producto_schema import RecetaInsumoEnProducto
     
-    recetas_creadas = []
     errores = []
-    insumos_creados = []
     
     # Convertir diccionarios a objetos RecetaInsumoEnProducto si es necesario
     recetas_objetos = []
     for i, receta in enumerate(recetas):
-        print(f"[DEBUG] Procesando receta {i+1}: tipo={type(receta)}, valor={receta}")
         if isinstance(receta, dict):
-            # Convertir diccionario a objeto
             try:
-                print(f"[DEBUG]   Convirtiendo diccionario a RecetaInsumoEnProducto...")
-                receta_obj = RecetaInsumoEnProducto(**receta)
-                recetas_objetos.append(receta_obj)
-                print(f"[DEBUG]   ✅ Receta convertida: id_insumo={receta_obj.id_insumo}, cantidad={receta_obj.cantidad_necesaria}, unidad={receta_obj.unidad_medida}")
+                recetas_objetos.append(RecetaInsumoEnProducto(**receta))
             except Exception as e:
-                error_msg = f"Error al procesar receta {i+1}: {str(e)}"
-                print(f"[DEBUG]   ❌ {error_msg}")
-                errores.append(error_msg)
-                continue
+                errores.append(f"Error al procesar receta {i+1}: {str(e)}")
         else:
-            print(f"[DEBUG]   Receta ya es objeto, agregando directamente")
             recetas_objetos.append(receta)
     
+    if errores:
+        return {"recetas_creadas": [], "insumos_creados": [], "errores": errores}
+    
+    lineas = []
+    insumos_nuevos = {}
     for receta in recetas_objetos:
-        id_insumo = None
-        
-        # Si se proporciona un insumo nuevo, crearlo primero
-        # Solo con datos básicos - valores por defecto para inventario
         if receta.insumo_nuevo:
-            from decimal import Decimal
-            # El insumo se crea sin unidad de medida (se usa una genérica por defecto)
-            insumo_data = InsumoCreate(
-                nombre=receta.insumo_nuevo.nombre,
-                descripcion=receta.insumo_nuevo.descripcion,
-                unidad_medida="unidades",  # Valor por defecto genérico
-                cantidad_actual=Decimal('0'),  # Valor por defecto
-                cantidad_minima=Decimal('0'),   # Valor por defecto
-                precio_compra=Decimal('0'),    # Valor por defecto
-                activo=True
-            )
-            resultado_insumo = crear_insumo(insumo_data)
-            
-            if "error" in resultado_insumo:
-                errores.append(f"Error al crear insumo '{receta.insumo_nuevo.nombre}': {resultado_insumo['error']}")
-                continue
-            
-            id_insumo = resultado_insumo["id_insumo"]
-            insumos_creados.append({
-                "id_insumo": id_insumo,
-                "nombre": receta.insumo_nuevo.nombre
-            })
+            # Ya existe un insumo con el mismo nombre normalizado: reutilizarlo en vez de duplicarlo
+            insumo = buscar_insumo_por_nombre(receta.insumo_nuevo.nombre)
+            if not insumo:
+                # Se crea en la misma transacción que las recetas y con la unidad de la
+                # receta (como la importación del catálogo), así la lista de materiales
+                # no queda con unidades incompatibles
+                insumo = normalizar_nombre(receta.insumo_nuevo.nombre)
+                insumos_nuevos.setdefault(insumo, {
+                    "nombre": receta.insumo_nuevo.nombre,
+                    "descripcion": receta.insumo_nuevo.descripcion,
+                    "unidad_medida": normalizar_unidad(receta.unidad_medida)
+                })
         else:
-            # Usar el insumo existente
-            id_insumo = receta.id_insumo
-        
-        # Crear la receta (relación producto-insumo)
+            insumo = receta.id_insumo
         # La unidad_medida va en la receta, no en el insumo
-        print(f"[DEBUG] Creando receta: producto={id_producto}, insumo={id_insumo}, cantidad={receta.cantidad_necesaria}, unidad={receta.unidad_medida}")
-        receta_data = RecetaInsumoCreate(
-            id_producto=id_producto,
-            id_insumo=id_insumo,
-            cantidad_necesaria=receta.cantidad_necesaria,
-            unidad_medida=receta.unidad_medida
-        )
-        resultado_receta = crear_receta(receta_data)
-        
-        if "error" in resultado_receta:
-            error_msg = f"Error al crear receta para insumo ID {id_insumo}: {resultado_receta['error']}"
-            print(f"[DEBUG] ❌ {error_msg}")
-            errores.append(error_msg)
-        else:
-            print(f"[DEBUG] ✅ Receta creada exitosamente: ID {resultado_receta['id_receta']}")
-            recetas_creadas.append({
-                "id_receta": resultado_receta["id_receta"],
-                "id_insumo": id_insumo,
-                "cantidad_necesaria": float(receta.cantidad_necesaria)
-            })
+        lineas.append((insumo, receta.cantidad_necesaria, receta.unidad_medida))
+    
+    resultado = reemplazar_recetas_producto(id_producto, lineas, list(insumos_nuevos.values()))
+    if "error" in resultado:
+        return {"recetas_creadas": [], "insumos_creados": [], "errores": [resultado["error"]]}
     
     return {
-        "recetas_creadas": recetas_creadas,
-        "insumos_creados": insumos_creados,
-        "errores": errores
+        "recetas_creadas": resultado["recetas"],
+        "insumos_creados": resultado["insumos_creados"],
+        "errores": []
     }
 
 async def crear_producto_service(producto: ProductoCreate, imagen: Optional[UploadFile] = None):
@@ -191,12 +159,40 @@ async def crear_producto_service(producto: ProductoCreate, imagen: Optional[Uplo
         
         if resultado_recetas["errores"]:
             resultado_producto["errores_recetas"] = resultado_recetas["errores"]
-            resultado_producto["advertencia"] = "Producto creado pero algunos insumos/recetas tuvieron errores"
+            resultado_producto["advertencia"] = "Producto creado sin recetas: no se pudieron guardar los insumos/recetas"
     
     return resultado_producto
 
 def ver_todos_productos_service():
-    return ver_todos_productos()
+    """Lista los productos activos con su disponibilidad según el stock actual"""
+    productos = ver_todos_productos()
+    if not isinstance(productos, list):
+        return productos
+    
+    disponibilidad = obtener_disponibilidad()
+    if "error" in disponibilidad:
+        # Sin disponibilidad el menú se sigue mostrando, sólo sin los campos calculados
+        return productos
+    
+    for producto in productos:
+        estado = disponibilidad.get(producto["id_producto"], {"agotado": False, "disponibles": None})
+        producto["agotado"] = estado["agotado"]
+        producto["disponibles"] = estado["disponibles"]
+    return productos
+
+def buscar_productos_service(texto: str, categoria: str = None, limite: int = 20):
+    """Búsqueda rápida para el POS; marca los productos agotados igual que ver_todos_productos"""
+    resultado = buscar_productos(texto, categoria, limite)
+    if "error" in resultado:
+        return resultado
+    
+    disponibilidad = obtener_disponibilidad()
+    if "error" not in disponibilidad:
+        for producto in resultado["resultados"]:
+            estado = disponibilidad.get(producto["id_producto"], {"agotado": False, "disponibles": None})
+            producto["agotado"] = estado["agotado"]
+            producto["disponibles"] = estado["disponibles"]
+    return resultado
 
 def ver_producto_by_id_service(id_producto: int):
     """Obtiene un producto por ID e incluye sus recetas"""
@@ -282,19 +278,6 @@ async def editar_producto_service(id_producto: int, producto: ProductoUpdate, im
     else:
         print(f"[DEBUG IMAGEN] No se recibió imagen para el producto {id_producto}")
     
-    # Si se proporcionan recetas, primero eliminar las existentes y luego crear las nuevas
-    if producto.recetas is not None:
-        # Debug: verificar qué recetas se recibieron
-        print(f"[DEBUG SERVICE] Editar producto {id_producto}: Recibidas {len(producto.recetas)} recetas")
-        for i, receta in enumerate(producto.recetas):
-            print(f"[DEBUG SERVICE] Receta {i+1}: {receta}")
-        
-        # Eliminar todas las recetas existentes del producto
-        resultado_eliminacion = eliminar_todas_recetas_producto(id_producto)
-        print(f"[DEBUG SERVICE] Recetas eliminadas: {resultado_eliminacion}")
-    else:
-        print(f"[DEBUG SERVICE] ⚠️ producto.recetas es None - no se tocarán las recetas existentes")
-    
     # Actualizar el producto (sin recetas en el update)
     producto_sin_recetas = ProductoUpdate(
         nombre=producto.nombre,
@@ -311,42 +294,22 @@ async def editar_producto_service(id_producto: int, producto: ProductoUpdate, im
     if "error" in resultado_producto:
         return resultado_producto
     
-    # Si se proporcionaron recetas, procesarlas
+    # Si se proporcionaron recetas, reemplazarlas (una lista vacía elimina todas)
     if producto.recetas is not None:
-        if len(producto.recetas) > 0:
-            print(f"[DEBUG] Procesando {len(producto.recetas)} recetas...")
-            resultado_recetas = _procesar_recetas(id_producto, producto.recetas)
-            
-            print(f"[DEBUG] Resultado procesamiento:")
-            print(f"[DEBUG]   - Recetas creadas: {len(resultado_recetas['recetas_creadas'])}")
-            print(f"[DEBUG]   - Insumos creados: {len(resultado_recetas['insumos_creados'])}")
-            print(f"[DEBUG]   - Errores: {len(resultado_recetas['errores'])}")
-            if resultado_recetas['errores']:
-                print(f"[DEBUG]   - Detalle errores: {resultado_recetas['errores']}")
-            
-            # Agregar información de recetas al resultado
-            resultado_producto["recetas_actualizadas"] = len(resultado_recetas["recetas_creadas"])
-            resultado_producto["insumos_creados"] = len(resultado_recetas["insumos_creados"])
-            resultado_producto["recetas"] = resultado_recetas["recetas_creadas"]
-            resultado_producto["insumos_nuevos"] = resultado_recetas["insumos_creados"]
-            
-            # ⚠️ IMPORTANTE: Si no se crearon recetas, verificar por qué
-            if len(resultado_recetas["recetas_creadas"]) == 0:
-                if resultado_recetas["errores"]:
-                    resultado_producto["error"] = "No se pudieron crear las recetas. Verifique los errores."
-                    resultado_producto["errores"] = resultado_recetas["errores"]
-                    print(f"[DEBUG] ❌ ERROR: No se crearon recetas. Errores: {resultado_recetas['errores']}")
-                    return resultado_producto
-                else:
-                    resultado_producto["advertencia"] = "No se crearon recetas. Verifique los logs del servidor."
-                    print(f"[DEBUG] ⚠️ ADVERTENCIA: No se crearon recetas pero no hay errores registrados")
-            elif resultado_recetas["errores"]:
-                resultado_producto["errores_recetas"] = resultado_recetas["errores"]
-                resultado_producto["advertencia"] = "Producto actualizado pero algunos insumos/recetas tuvieron errores"
-        else:
-            # Si se envía una lista vacía, solo se eliminaron las recetas
-            print(f"[DEBUG] Lista de recetas vacía - solo se eliminaron recetas existentes")
-            resultado_producto["recetas_actualizadas"] = 0
+        resultado_recetas = _procesar_recetas(id_producto, producto.recetas)
+        
+        if resultado_recetas["errores"]:
+            # La transacción de recetas no se aplicó: se conservan las recetas anteriores
+            resultado_producto["error"] = "Producto actualizado pero no se pudieron guardar las recetas; se conservan las anteriores."
+            resultado_producto["errores"] = resultado_recetas["errores"]
+            return resultado_producto
+        
+        # Agregar información de recetas al resultado
+        resultado_producto["recetas_actualizadas"] = len(resultado_recetas["recetas_creadas"])
+        resultado_producto["insumos_creados"] = len(resultado_recetas["insumos_creados"])
+        resultado_producto["recetas"] = resultado_recetas["recetas_creadas"]
+        resultado_producto["insumos_nuevos"] = resultado_recetas["insumos_creados"]
+        if not producto.recetas:
             resultado_producto["mensaje"] = "Producto actualizado y todas las recetas eliminadas"
     
     return resultado_producto
@@ -3,6 +3,7 @@ from repository.reporte_repository import (
     obtener_productos_mas_vendidos,
     analizar_compras_recomendadas
 )
+from services.trabajos_service import encolar
 
 def obtener_ventas_por_dia_service(fecha_inicio: str, fecha_fin: str):
     return obtener_ventas_por_dia(fecha_inicio, fecha_fin)
@@ -10,6 +11,9 @@ def obtener_ventas_por_dia_service(fecha_inicio: str, fecha_fin: str):
 def obtener_productos_mas_vendidos_service(fecha_inicio: str, fecha_fin: str, limite: int = 10):
     return obtener_productos_mas_vendidos(fecha_inicio, fecha_fin, limite)
 
-def analizar_compras_recomendadas_service(meses_analisis: int = 3):
+def analizar_compras_recomendadas_service(meses_analisis: int = 3, en_segundo_plano: bool = False):
+    if en_segundo_plano:
+        # El resultado queda en trabajos.resultado (/api/trabajos/ver_trabajo/{id_trabajo})
+        return encolar("analizar_compras_recomendadas", {"meses_analisis": meses_analisis})
     return analizar_compras_recomendadas(meses_analisis)
 
@@ -0,0 +1,51 @@
+"""
+Tipos de trabajo en segundo plano (ver services/trabajos_service.py).
+
+Para agregar uno: una función que reciba sus parámetros por nombre, decorada con
+@tarea("tipo", concurrencia=..., lease_segundos=...). El lease debe cubrir con
+holgura una ejecución normal; se renueva solo mientras el trabajo corre.
+"""
+from services.trabajos_service import tarea
+
+
+@tarea("analizar_compras_recomendadas", concurrencia=1, lease_segundos=600)
+def analizar_compras_recomendadas(meses_analisis: int = 3):
+    """Reporte de compras recomendadas (recorre el consumo histórico de todos los insumos)"""
+    from services.reporte_service import analizar_compras_recomendadas_service
+    return analizar_compras_recomendadas_service(meses_analisis)
+
+
+@tarea("reconciliar_visitas", concurrencia=1, lease_segundos=600)
+def reconciliar_visitas(id_cliente: int = None):
+    """Recalcula los contadores de visitas de los clientes desde el historial"""
+    from services.cliente_service import reconciliar_visitas_clientes_service
+    return reconciliar_visitas_clientes_service(id_cliente)
+
+
+@tarea("registrar_cliente_loyabit", concurrencia=4, max_intentos=5)
+def registrar_cliente_loyabit(id_cliente: int):
+    """Registra (o vincula por email) un cliente en Loyabit"""
+    from services.loyabit_service import registrar_cliente_en_loyabit
+    return registrar_cliente_en_loyabit(id_cliente)
+
+
+@tarea("sincronizar_clientes_loyabit", concurrencia=1, lease_segundos=900)
+def sincronizar_clientes_loyabit(tamano_lote: int = 100, concurrencia: int = 8, limite: int = None):
+    """Vincula con Loyabit todos los clientes pendientes de sincronizar"""
+    from services.loyabit_sincronizacion_service import sincronizar_clientes_pendientes
+    return sincronizar_clientes_pendientes(tamano_lote, concurrencia, limite)
+
+
+@tarea("migrar_nombres_normalizados", concurrencia=1, max_intentos=1, lease_segundos=1800)
+def migrar_nombres_normalizados():
+    """Rellena insumos.nombre_normalizado (database/migrar_nombres_normalizados.py)"""
+    from database.migrar_nombres_normalizados import migrar_nombres_normalizados as migrar
+    # {"error"} (p. ej. sin conexión) marca el trabajo como fallido
+    return migrar()
+
+
+@tarea("archivar_historico", concurrencia=1, max_intentos=2, lease_segundos=1800)
+def archivar_historico(meses_activos: int = None, tamano_lote: int = None, meses_conservar: int = None):
+    """Mueve a las tablas *_historico los meses cerrados de ventas, pre-órdenes y movimientos"""
+    from services.historico_service import archivar_historico_service
+    return archivar_historico_service(meses_activos, tamano_lote, meses_conservar)
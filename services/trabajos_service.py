@@ -0,0 +1,218 @@
+"""
+Trabajos en segundo plano sobre la cola de MySQL (tabla trabajos).
+
+Un manejador de petición encola y responde de inmediato con el id_trabajo:
+
+    from services.trabajos_service import encolar
+    encolar("analizar_compras_recomendadas", {"meses_analisis": 6})
+
+Cada tipo de trabajo se registra con @tarea (ver services/tareas.py). La función
+recibe los parámetros como argumentos con nombre; lo que retorna se guarda en
+trabajos.resultado. Un dict con "error" o una excepción cuentan como fallo y se
+reintentan con backoff exponencial hasta max_intentos.
+
+Los trabajadores corren como hilos dentro del servidor (iniciar_trabajadores,
+desde main.py) o en procesos aparte (trabajador.py). Un hilo reclama trabajos
+respetando la concurrencia máxima de cada tipo y los entrega a un pool de hilos;
+mientras un trabajo corre se renueva su plazo (lease).
+"""
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from repository.trabajo_repository import (
+    encolar_trabajo, reclamar_trabajos, completar_trabajo, fallar_trabajo,
+    extender_bloqueo, liberar_trabajos_vencidos, ver_trabajo, listar_trabajos,
+    resumen_trabajos, cancelar_trabajo, reintentar_trabajo
+)
+
+INTERVALO_SEGUNDOS = float(os.getenv("TRABAJOS_INTERVALO", "2"))
+INTERVALO_LIBERAR_SEGUNDOS = 60
+
+# tipo -> {"funcion", "concurrencia", "max_intentos", "lease_segundos", "descripcion"}
+_tareas = {}
+_tareas_cargadas = False
+
+_lock = threading.Lock()
+_en_curso = {}              # tipo -> trabajos ejecutándose en este proceso
+_despertar = threading.Event()
+_detener = threading.Event()
+_hilo = None
+_estado = {"activo": False}
+
+
+def tarea(tipo: str, concurrencia: int = 1, max_intentos: int = 3, lease_segundos: int = 300):
+    """Decorador que registra una función como tipo de trabajo"""
+    def registrar(funcion):
+        _tareas[tipo] = {
+            "funcion": funcion,
+            "concurrencia": concurrencia,
+            "max_intentos": max_intentos,
+            "lease_segundos": lease_segundos,
+            "descripcion": (funcion.__doc__ or "").strip().split("\n")[0],
+        }
+        return funcion
+    return registrar
+
+def _cargar_tareas():
+    """Importa services/tareas.py una sola vez (registra los tipos con @tarea)"""
+    global _tareas_cargadas
+    if not _tareas_cargadas:
+        import services.tareas  # noqa: F401
+        _tareas_cargadas = True
+
+def _espera_reintento(intentos: int) -> int:
+    """30s, 60s, 120s... hasta 1 hora"""
+    return min(30 * (2 ** max(0, intentos - 1)), 3600)
+
+def tipos_registrados():
+    _cargar_tareas()
+    return [
+        {"tipo": tipo, "descripcion": datos["descripcion"], "concurrencia": datos["concurrencia"],
+         "max_intentos": datos["max_intentos"], "lease_segundos": datos["lease_segundos"]}
+        for tipo, datos in sorted(_tareas.items())
+    ]
+
+def encolar(tipo: str, parametros: dict = None, retraso_segundos: int = 0, prioridad: int = 0,
+            clave_unica: str = None, recurrente_cada: int = None, max_intentos: int = None):
+    """Encola un trabajo y retorna {"id_trabajo", "estado", "duplicado"} o {"error"}"""
+    _cargar_tareas()
+    if tipo not in _tareas:
+        return {"error": f"Tipo de trabajo desconocido: {tipo}"}
+    resultado = encolar_trabajo(
+        tipo, parametros or {}, retraso_segundos, prioridad,
+        max_intentos or _tareas[tipo]["max_intentos"], clave_unica, recurrente_cada
+    )
+    if "error" not in resultado and not retraso_segundos:
+        # Si los trabajadores corren en este proceso, que lo tomen sin esperar al siguiente sondeo
+        _despertar.set()
+    return resultado
+
+def programar_recurrente(tipo: str, cada_segundos: int, parametros: dict = None):
+    """Programa un trabajo recurrente una sola vez (clave_unica = recurrente:<tipo>)"""
+    return encolar(tipo, parametros, prioridad=-1, clave_unica=f"recurrente:{tipo}",
+                   recurrente_cada=cada_segundos)
+
+def _renovar_plazo(trabajo, identidad: str, terminado: threading.Event):
+    lease = _tareas[trabajo["tipo"]]["lease_segundos"]
+    while not terminado.wait(lease / 2):
+        extender_bloqueo(trabajo["id_trabajo"], identidad, lease)
+
+def _ejecutar(trabajo, identidad: str):
+    tipo = trabajo["tipo"]
+    terminado = threading.Event()
+    threading.Thread(
+        target=_renovar_plazo, args=(trabajo, identidad, terminado), name=f"lease-{trabajo['id_trabajo']}", daemon=True
+    ).start()
+    inicio = time.perf_counter()
+    exito = False
+    try:
+        resultado = _tareas[tipo]["funcion"](**trabajo["parametros"])
+        if isinstance(resultado, dict) and "error" in resultado:
+            fallar_trabajo(trabajo["id_trabajo"], identidad, resultado["error"], _espera_reintento(trabajo["intentos"]))
+        else:
+            completar_trabajo(trabajo["id_trabajo"], identidad, resultado)
+            exito = True
+    except Exception as e:
+        fallar_trabajo(trabajo["id_trabajo"], identidad, f"{type(e).__name__}: {str(e)}",
+                       _espera_reintento(trabajo["intentos"]))
+    finally:
+        terminado.set()
+        with _lock:
+            _en_curso[tipo] -= 1
+            _estado["ejecutados"] = _estado.get("ejecutados", 0) + 1
+            if not exito:
+                _estado["fallidos"] = _estado.get("fallidos", 0) + 1
+        _despertar.set()
+    print(f"{'✅' if exito else '⚠️ '} Trabajo {trabajo['id_trabajo']} ({tipo}) "
+          f"{'completado' if exito else 'falló'} en {time.perf_counter() - inicio:.2f} s")
+
+def _ciclo(hilos: int, tipos, identidad: str):
+    ultimo_liberar = 0.0
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="trabajo") as ejecutor:
+        while not _detener.is_set():
+            _despertar.clear()
+            if time.monotonic() - ultimo_liberar > INTERVALO_LIBERAR_SEGUNDOS:
+                liberar_trabajos_vencidos()
+                ultimo_liberar = time.monotonic()
+
+            reclamados = 0
+            for tipo in tipos:
+                with _lock:
+                    libres_total = hilos - sum(_en_curso.values())
+                    libres_tipo = _tareas[tipo]["concurrencia"] - _en_curso.get(tipo, 0)
+                libres = min(libres_total, libres_tipo)
+                if libres_total <= 0:
+                    break
+                if libres <= 0:
+                    continue
+                trabajos = reclamar_trabajos(identidad, [tipo], libres, _tareas[tipo]["lease_segundos"])
+                if isinstance(trabajos, dict):
+                    print(f"⚠️  Trabajadores: {trabajos['error']}")
+                    break
+                for trabajo in trabajos:
+                    with _lock:
+                        _en_curso[tipo] = _en_curso.get(tipo, 0) + 1
+                    ejecutor.submit(_ejecutar, trabajo, identidad)
+                reclamados += len(trabajos)
+
+            if not reclamados:
+                _despertar.wait(INTERVALO_SEGUNDOS)
+    with _lock:
+        _estado["activo"] = False
+
+def iniciar_trabajadores(hilos: int = None, tipos=None, bloquear: bool = False):
+    """
+    Arranca los trabajadores de este proceso.
+    - hilos: trabajos simultáneos en total (TRABAJOS_HILOS, por omisión 2)
+    - tipos: limitar a ciertos tipos (por omisión todos los registrados)
+    - bloquear: correr en el hilo actual (para trabajador.py)
+    """
+    global _hilo
+    _cargar_tareas()
+    hilos = hilos or int(os.getenv("TRABAJOS_HILOS", "2"))
+    tipos = [tipo for tipo in (tipos or _tareas) if tipo in _tareas]
+    identidad = f"{socket.gethostname()}:{os.getpid()}"
+    with _lock:
+        if _estado.get("activo"):
+            return False
+        _estado.update({"activo": True, "identidad": identidad, "hilos": hilos, "tipos": tipos,
+                        "inicio": time.strftime("%Y-%m-%d %H:%M:%S")})
+    _detener.clear()
+    if bloquear:
+        _ciclo(hilos, tipos, identidad)
+        return True
+    _hilo = threading.Thread(target=_ciclo, args=(hilos, tipos, identidad), name="trabajadores", daemon=True)
+    _hilo.start()
+    return True
+
+def detener_trabajadores():
+    """Deja de reclamar trabajos; los que están corriendo terminan"""
+    _detener.set()
+    _despertar.set()
+
+def estado_trabajadores():
+    with _lock:
+        return {**_estado, "en_curso": {tipo: n for tipo, n in _en_curso.items() if n}}
+
+def ver_trabajo_service(id_trabajo: int):
+    return ver_trabajo(id_trabajo)
+
+def listar_trabajos_service(estado: str = None, tipo: str = None, limite: int = 50, antes_de_id: int = None):
+    return listar_trabajos(estado, tipo, limite, antes_de_id)
+
+def resumen_trabajos_service():
+    resumen = resumen_trabajos()
+    if "error" in resumen:
+        return resumen
+    return {**resumen, "trabajadores": estado_trabajadores()}
+
+def cancelar_trabajo_service(id_trabajo: int):
+    return cancelar_trabajo(id_trabajo)
+
+def reintentar_trabajo_service(id_trabajo: int):
+    resultado = reintentar_trabajo(id_trabajo)
+    if "error" not in resultado:
+        _despertar.set()
+    return resultado
@@ -1,8 +1,16 @@
 from repository.venta_repository import (
     crear_venta, ver_venta_by_id, ver_todas_ventas, ver_ventas_por_fecha,
-    obtener_info_ticket_actual
+    obtener_info_ticket_actual, abrir_lineas_ventas, COLUMNAS_LINEAS_VENTA
 )
 from schemas.venta_schema import VentaCreate
+from utils.exportacion import (
+    csv_por_bloques, parquet_por_bloques, importar_pyarrow, ExportacionNoDisponibleError
+)
+from datetime import datetime
+from decimal import Decimal
+
+METODOS_PAGO = ("efectivo", "tarjeta", "transferencia")
+COLUMNAS_EXPORTACION = COLUMNAS_LINEAS_VENTA + [f"pago_{metodo}" for metodo in METODOS_PAGO]
 
 def crear_venta_service(venta: VentaCreate):
     return crear_venta(venta)
@@ -19,3 +27,67 @@ def ver_ventas_por_fecha_service(fecha_inicio: str, fecha_fin: str):
 def obtener_info_ticket_actual_service():
     return obtener_info_ticket_actual()
 
+def _con_desglose_pago(bloques):
+    """
+    Agrega pago_<método>: el total de la venta en su primera línea, en la columna de
+    su método de pago (0 en las demás). La suma de cada columna es lo cobrado por ese
+    método, sin contar dos veces las ventas de varias líneas.
+    """
+    ultima_venta = None
+    cero = Decimal("0")
+    for filas in bloques:
+        salida = []
+        for fila in filas:
+            primera = fila[0] != ultima_venta
+            ultima_venta = fila[0]
+            metodo, total = fila[2], fila[3]
+            salida.append(tuple(fila) + tuple(
+                total if primera and metodo == m else cero for m in METODOS_PAGO
+            ))
+        yield salida
+
+def _esquema_parquet():
+    pa = importar_pyarrow()
+    dinero = pa.decimal128(10, 2)
+    return pa.schema([
+        ("id_venta", pa.int32()), ("fecha_venta", pa.timestamp("s")), ("metodo_pago", pa.string()),
+        ("total_venta", dinero), ("id_cliente", pa.int32()), ("cliente", pa.string()),
+        ("id_usuario", pa.int32()), ("vendedor", pa.string()), ("id_detalle_venta", pa.int32()),
+        ("id_producto", pa.int32()), ("producto", pa.string()), ("categoria", pa.string()),
+        ("cantidad", pa.int32()), ("precio_unitario", dinero), ("subtotal", dinero),
+    ] + [(f"pago_{metodo}", dinero) for metodo in METODOS_PAGO])
+
+def exportar_ventas_service(fecha_inicio: str, fecha_fin: str, formato: str = "csv", tamano_bloque: int = 1000):
+    """
+    Exportación de ventas con sus líneas y desglose por método de pago, en una sola
+    lectura. Retorna {"contenido": generador de bytes, "media_type", "nombre_archivo"}
+    o {"error"}. Los errores se detectan antes de empezar a enviar.
+    """
+    try:
+        inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d")
+        fin = datetime.strptime(fecha_fin, "%Y-%m-%d")
+    except ValueError:
+        return {"error": "Las fechas deben tener formato YYYY-MM-DD"}
+    if fin < inicio:
+        return {"error": "fecha_fin no puede ser anterior a fecha_inicio"}
+    if formato not in ("csv", "parquet"):
+        return {"error": "Formato no soportado (csv o parquet)"}
+
+    esquema = None
+    if formato == "parquet":
+        try:
+            esquema = _esquema_parquet()
+        except ExportacionNoDisponibleError as e:
+            return {"error": str(e)}
+
+    bloques = abrir_lineas_ventas(fecha_inicio, fecha_fin, tamano_bloque)
+    if isinstance(bloques, dict):
+        return bloques
+
+    nombre = f"ventas_{fecha_inicio}_{fecha_fin}.{formato}"
+    if formato == "parquet":
+        # Un row group por bloque leído
+        return {"contenido": parquet_por_bloques(esquema, _con_desglose_pago(bloques)),
+                "media_type": "application/vnd.apache.parquet", "nombre_archivo": nombre}
+    return {"contenido": csv_por_bloques(COLUMNAS_EXPORTACION, _con_desglose_pago(bloques)),
+            "media_type": "text/csv; charset=utf-8", "nombre_archivo": nombre}
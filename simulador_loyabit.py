@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Servidor local que simula la API de Loyabit para pruebas sin credenciales reales.
+
+Implementa los endpoints que usa utils/loyabit_client.py:
+- POST customers, POST customers/bulk_upsert, GET customers/search?email=
+- GET/PUT customers/{id}
+- GET customers/{id}/points
+- POST customers/{id}/points/add y customers/{id}/points/redeem (respetan Idempotency-Key)
+- GET health (lo usa el sondeo del circuit breaker)
+
+Inyección de fallas configurable: latencia base + jitter, una fracción de
+respuestas lentas y una fracción de errores 503. Se puede cambiar en caliente
+con POST /_simulador/config y ver lo recibido con GET /_simulador/estadisticas.
+Los clientes que no existen se crean al consultarlos (--sin-autocrear lo
+desactiva), para poder usar los loyabit_id que ya tenga la base de datos.
+
+Uso:
+    python simulador_loyabit.py --puerto 8090
+    python simulador_loyabit.py --puerto 8090 --latencia 80 --jitter 40 --errores 0.05 --lentas 0.02
+
+Después, en el .env del backend:
+    LOYABIT_BASE_URL=http://localhost:8090
+    LOYABIT_API_KEY=simulador
+    LOYABIT_API_SECRET=simulador
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class SimuladorLoyabit:
+    """Estado en memoria del simulador y su configuración de fallas"""
+
+    def __init__(self, latencia_ms: float = 0, jitter_ms: float = 0, tasa_errores: float = 0,
+                 tasa_lentas: float = 0, lentitud_ms: float = 5000, autocrear: bool = True, semilla=None):
+        self.config = {
+            "latencia_ms": latencia_ms,
+            "jitter_ms": jitter_ms,
+            "tasa_errores": tasa_errores,
+            "tasa_lentas": tasa_lentas,
+            "lentitud_ms": lentitud_ms,
+            "autocrear": autocrear,
+        }
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.clientes = {}          # id -> cliente
+        self.puntos = {}            # id -> saldo
+        self.idempotencia = {}      # Idempotency-Key -> (estado, respuesta)
+        self.estadisticas = {"peticiones": 0, "errores_inyectados": 0, "lentas_inyectadas": 0,
+                             "duplicados": 0, "por_ruta": {}}
+        self._servidor = None
+
+    # --- Ciclo de vida ---
+
+    def iniciar(self, host: str = "127.0.0.1", puerto: int = 0) -> str:
+        """Arranca el servidor en un hilo y retorna su URL base (puerto 0 = uno libre)"""
+        manejador = type("Manejador", (ManejadorLoyabit,), {"simulador": self})
+        self._servidor = ThreadingHTTPServer((host, puerto), manejador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="simulador-loyabit", daemon=True).start()
+        return f"http://{host}:{self._servidor.server_port}"
+
+    def detener(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    # --- Fallas inyectadas ---
+
+    def falla_inyectada(self):
+        """Duerme la latencia configurada; retorna 503 si toca error inyectado, o None"""
+        with self._lock:
+            config = dict(self.config)
+            lenta = self._random.random() < config["tasa_lentas"]
+            error = self._random.random() < config["tasa_errores"]
+            espera = config["latencia_ms"] + self._random.uniform(0, config["jitter_ms"])
+            if lenta:
+                self.estadisticas["lentas_inyectadas"] += 1
+                espera = config["lentitud_ms"]
+            if error:
+                self.estadisticas["errores_inyectados"] += 1
+        if espera > 0:
+            time.sleep(espera / 1000)
+        return 503 if error else None
+
+    def registrar_peticion(self, ruta: str):
+        with self._lock:
+            self.estadisticas["peticiones"] += 1
+            self.estadisticas["por_ruta"][ruta] = self.estadisticas["por_ruta"].get(ruta, 0) + 1
+
+    # --- Operaciones ---
+
+    def _nuevo_cliente(self, datos, loyabit_id=None):
+        loyabit_id = loyabit_id or f"cus_{uuid.uuid4().hex[:12]}"
+        cliente = {
+            "id": loyabit_id,
+            "name": datos.get("name"),
+            "first_name": datos.get("first_name"),
+            "last_name": datos.get("last_name"),
+            "email": datos.get("email"),
+            "phone": datos.get("phone"),
+        }
+        self.clientes[loyabit_id] = cliente
+        self.puntos.setdefault(loyabit_id, 0.0)
+        return cliente
+
+    def obtener_cliente(self, loyabit_id):
+        with self._lock:
+            cliente = self.clientes.get(loyabit_id)
+            if cliente is None and self.config["autocrear"]:
+                cliente = self._nuevo_cliente({}, loyabit_id)
+            return cliente
+
+    def crear_cliente(self, datos):
+        with self._lock:
+            return self._nuevo_cliente(datos)
+
+    def crear_clientes_lote(self, lista):
+        with self._lock:
+            por_email = {c["email"].lower(): c for c in self.clientes.values() if c.get("email")}
+            resultado = []
+            for datos in lista:
+                email = (datos.get("email") or "").lower()
+                cliente = por_email.get(email) or self._nuevo_cliente(datos)
+                por_email[email] = cliente
+                resultado.append({"email": cliente["email"], "id": cliente["id"]})
+            return resultado
+
+    def buscar_por_email(self, email):
+        with self._lock:
+            return [c for c in self.clientes.values() if (c.get("email") or "").lower() == email.lower()]
+
+    def actualizar_cliente(self, loyabit_id, datos):
+        with self._lock:
+            if loyabit_id not in self.clientes:
+                return None
+            self.clientes[loyabit_id].update({k: v for k, v in datos.items() if v is not None})
+            return self.clientes[loyabit_id]
+
+    def movimiento_puntos(self, loyabit_id, tipo, datos, clave):
+        """Retorna (estado, respuesta); una clave repetida devuelve la respuesta original"""
+        with self._lock:
+            if clave and clave in self.idempotencia:
+                self.estadisticas["duplicados"] += 1
+                return self.idempotencia[clave]
+            if loyabit_id not in self.clientes:
+                if not self.config["autocrear"]:
+                    return 404, {"error": "Customer not found"}
+                self._nuevo_cliente({}, loyabit_id)
+            puntos = float(datos.get("points") or 0)
+            if puntos <= 0:
+                resultado = (422, {"error": "points must be greater than 0"})
+            elif tipo == "redeem" and self.puntos[loyabit_id] < puntos:
+                resultado = (422, {"error": "Insufficient points", "balance": self.puntos[loyabit_id]})
+            else:
+                self.puntos[loyabit_id] += puntos if tipo == "add" else -puntos
+                resultado = (200, {
+                    "id": f"txn_{uuid.uuid4().hex[:12]}",
+                    "customer_id": loyabit_id,
+                    "type": tipo,
+                    "points": puntos,
+                    "balance": self.puntos[loyabit_id],
+                    "reference": datos.get("reference"),
+                })
+            if clave:
+                self.idempotencia[clave] = resultado
+            return resultado
+
+    def resumen(self):
+        with self._lock:
+            return {"config": dict(self.config), "clientes": len(self.clientes), **self.estadisticas,
+                    "por_ruta": dict(self.estadisticas["por_ruta"])}
+
+
+class ManejadorLoyabit(BaseHTTPRequestHandler):
+    simulador: SimuladorLoyabit = None
+    protocol_version = "HTTP/1.1"   # keep-alive, como el pool del cliente
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado: int, cuerpo):
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer_json(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        if not largo:
+            return {}
+        try:
+            return json.loads(self.rfile.read(largo))
+        except ValueError:
+            return None
+
+    def _atender(self, metodo: str):
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split("/") if p]
+        cuerpo = self._leer_json() if metodo in ("POST", "PUT") else {}
+        simulador = self.simulador
+
+        # Control del simulador (sin fallas ni autenticación)
+        if partes[:1] == ["_simulador"]:
+            if metodo == "GET" and partes[1:] == ["estadisticas"]:
+                return self._responder(200, simulador.resumen())
+            if metodo == "POST" and partes[1:] == ["config"] and isinstance(cuerpo, dict):
+                with simulador._lock:
+                    simulador.config.update({k: v for k, v in cuerpo.items() if k in simulador.config})
+                return self._responder(200, simulador.resumen()["config"])
+            return self._responder(404, {"error": "Not found"})
+
+        # Ruta genérica para estadísticas: customers/{id}/points -> customers/:id/points
+        ruta = f"{metodo} " + "/".join(
+            ":id" if i == 1 and partes[0] == "customers" and p not in ("search", "bulk_upsert") else p
+            for i, p in enumerate(partes)
+        )
+        simulador.registrar_peticion(ruta)
+
+        if partes == ["health"]:
+            return self._responder(200, {"status": "ok"})
+        if not (self.headers.get("Authorization") or "").replace("Bearer", "").strip():
+            return self._responder(401, {"error": "Missing API key"})
+        error = simulador.falla_inyectada()
+        if error:
+            return self._responder(error, {"error": "Injected failure"})
+        if cuerpo is None:
+            return self._responder(400, {"error": "Invalid JSON"})
+
+        if partes[:1] != ["customers"]:
+            return self._responder(404, {"error": "Not found"})
+
+        if metodo == "POST" and len(partes) == 1:
+            return self._responder(201, simulador.crear_cliente(cuerpo))
+        if metodo == "POST" and partes[1:] == ["bulk_upsert"]:
+            return self._responder(200, {"data": simulador.crear_clientes_lote(cuerpo.get("customers") or [])})
+        if metodo == "GET" and partes[1:] == ["search"]:
+            email = (parse_qs(url.query).get("email") or [""])[0]
+            return self._responder(200, {"data": simulador.buscar_por_email(email)})
+
+        loyabit_id = partes[1] if len(partes) > 1 else None
+        if metodo == "GET" and len(partes) == 2:
+            cliente = simulador.obtener_cliente(loyabit_id)
+            return self._responder(200, cliente) if cliente else self._responder(404, {"error": "Customer not found"})
+        if metodo == "PUT" and len(partes) == 2:
+            cliente = simulador.actualizar_cliente(loyabit_id, cuerpo)
+            return self._responder(200, cliente) if cliente else self._responder(404, {"error": "Customer not found"})
+        if metodo == "GET" and partes[2:] == ["points"]:
+            if simulador.obtener_cliente(loyabit_id) is None:
+                return self._responder(404, {"error": "Customer not found"})
+            return self._responder(200, {"customer_id": loyabit_id, "points": simulador.puntos[loyabit_id]})
+        if metodo == "POST" and partes[2:3] == ["points"] and partes[3:] in (["add"], ["redeem"]):
+            estado, respuesta = simulador.movimiento_puntos(
+                loyabit_id, partes[3], cuerpo, self.headers.get("Idempotency-Key")
+            )
+            return self._responder(estado, respuesta)
+
+        return self._responder(404, {"error": "Not found"})
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def do_PUT(self):
+        self._atender("PUT")
+
+    def do_DELETE(self):
+        self._atender("DELETE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local de la API de Loyabit")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8090)
+    parser.add_argument("--latencia", type=float, default=0, help="Latencia base por petición (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="Latencia aleatoria adicional, 0..N ms")
+    parser.add_argument("--errores", type=float, default=0, help="Fracción de peticiones que responden 503")
+    parser.add_argument("--lentas", type=float, default=0, help="Fracción de peticiones lentas")
+    parser.add_argument("--lentitud", type=float, default=5000, help="Duración de una petición lenta (ms)")
+    parser.add_argument("--sin-autocrear", action="store_true", help="Responder 404 a clientes desconocidos")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla para reproducir las fallas")
+    args = parser.parse_args()
+
+    simulador = SimuladorLoyabit(
+        args.latencia, args.jitter, args.errores, args.lentas, args.lentitud,
+        autocrear=not args.sin_autocrear, semilla=args.semilla
+    )
+    url = simulador.iniciar(args.host, args.puerto)
+    print(f"🧪 Simulador de Loyabit escuchando en {url}  (Ctrl+C para detener)")
+    print(f"   Configuración: {simulador.config}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulador.detener()
+        print(f"📊 {json.dumps(simulador.resumen(), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Sincronización masiva de clientes con Loyabit (alta inicial de la base de socios).
+
+Vincula todos los clientes con loyabit_sincronizado = FALSE, por páginas y con
+concurrencia acotada. Si se interrumpe, volver a ejecutarlo continúa con los
+que faltan.
+
+Uso:
+    python sincronizar_loyabit.py
+    python sincronizar_loyabit.py --lote 200 --concurrencia 16
+    python sincronizar_loyabit.py --limite 50      # prueba con pocos clientes
+"""
+
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.loyabit_sincronizacion_service import sincronizar_clientes_pendientes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincronización masiva de clientes con Loyabit")
+    parser.add_argument("--lote", type=int, default=100, help="Clientes por página")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Llamadas simultáneas a Loyabit")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de clientes a procesar")
+    parser.add_argument("--sin-lote", action="store_true", help="No usar la operación en lote de la API")
+    args = parser.parse_args()
+
+    print("🔄 Sincronizando clientes pendientes con Loyabit...")
+    resultado = sincronizar_clientes_pendientes(
+        args.lote, args.concurrencia, args.limite, usar_lote=not args.sin_lote
+    )
+
+    if "error" in resultado:
+        print(f"❌ {resultado['error']}")
+    print(f"✅ Procesados: {resultado.get('procesados', 0)}  "
+          f"Vinculados: {resultado.get('vinculados', 0)}  "
+          f"Errores: {resultado.get('errores', 0)}  "
+          f"({resultado.get('segundos', '-')} s)")
+    for error in resultado.get("primeros_errores", []):
+        print(f"   ⚠️  Cliente {error['id_cliente']}: {error['error']}")
+    sys.exit(1 if "error" in resultado else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Proceso trabajador de la cola de trabajos (tabla trabajos).
+
+Atiende los trabajos en un proceso aparte del servidor web. Se pueden correr
+varios a la vez (en la misma máquina o en otras): se reparten los trabajos con
+SELECT ... FOR UPDATE SKIP LOCKED. Para que el servidor no atienda trabajos,
+arrancarlo con TRABAJOS_EN_SERVIDOR=0.
+
+Uso:
+    python trabajador.py
+    python trabajador.py --hilos 4
+    python trabajador.py --tipos analizar_compras_recomendadas,reconciliar_visitas
+    python trabajador.py --listar
+"""
+
+import argparse
+import signal
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.trabajos_service import iniciar_trabajadores, detener_trabajadores, tipos_registrados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proceso trabajador de la cola de trabajos")
+    parser.add_argument("--hilos", type=int, default=None, help="Trabajos simultáneos (por omisión TRABAJOS_HILOS o 2)")
+    parser.add_argument("--tipos", default=None, help="Tipos a atender, separados por coma (por omisión todos)")
+    parser.add_argument("--listar", action="store_true", help="Mostrar los tipos de trabajo registrados y salir")
+    args = parser.parse_args()
+
+    tipos = tipos_registrados()
+    if args.listar:
+        for tipo in tipos:
+            print(f"  {tipo['tipo']:<32} concurrencia {tipo['concurrencia']}, "
+                  f"{tipo['max_intentos']} intentos - {tipo['descripcion']}")
+        return
+
+    seleccion = [t.strip() for t in args.tipos.split(",")] if args.tipos else None
+    desconocidos = [t for t in (seleccion or []) if t not in {tipo["tipo"] for tipo in tipos}]
+    if desconocidos:
+        print(f"❌ Tipos desconocidos: {', '.join(desconocidos)} (ver --listar)")
+        sys.exit(1)
+
+    # Ctrl+C / SIGTERM: dejar de reclamar y esperar a que terminen los trabajos en curso
+    signal.signal(signal.SIGTERM, lambda *_: detener_trabajadores())
+    print(f"🛠️  Trabajador iniciado ({', '.join(seleccion) if seleccion else 'todos los tipos'})")
+    try:
+        iniciar_trabajadores(args.hilos, seleccion, bloquear=True)
+    except KeyboardInterrupt:
+        detener_trabajadores()
+    print("👋 Trabajador detenido")
+
+
+if __name__ == "__main__":
+    main()
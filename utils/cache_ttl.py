@@ -0,0 +1,98 @@
+"""
+Caché en memoria con expiración (TTL) por entrada.
+
+- Thread-safe; cada proceso tiene la suya
+- obtener_o_calcular evita que varias peticiones simultáneas con la misma clave
+  calculen el valor a la vez: la primera lo calcula y las demás esperan su resultado
+- Tamaño acotado: al llenarse se descartan primero las entradas más viejas
+- Las entradas vencidas se conservan hasta que se reemplazan o se desplazan por
+  tamaño, para poder servirlas con obtener_vencido cuando el origen no responde
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_SIN_VALOR = object()
+
+
+class CacheTTL:
+    def __init__(self, ttl_segundos: float, max_entradas: int = 1000):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()     # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self._calculando = {}           # clave -> threading.Lock
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, predeterminado=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                self.fallos += 1
+                return predeterminado
+            self.aciertos += 1
+            return entrada[1]
+
+    def obtener_vencido(self, clave, predeterminado=None):
+        """
+        Último valor guardado aunque ya haya vencido, con su antigüedad:
+        (valor, segundos_vencido) o predeterminado. Para modo degradado.
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return predeterminado
+            return entrada[1], max(0.0, time.monotonic() - entrada[0])
+
+    def guardar(self, clave, valor, ttl_segundos: float = None):
+        expira_en = time.monotonic() + (self.ttl if ttl_segundos is None else ttl_segundos)
+        with self._lock:
+            self._datos[clave] = (expira_en, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def obtener_o_calcular(self, clave, calcular, cachear=lambda valor: True):
+        """
+        Retorna el valor en caché o lo calcula con calcular() y lo guarda.
+        cachear(valor) decide si el resultado se guarda (p. ej. no guardar errores).
+        """
+        valor = self.obtener(clave, _SIN_VALOR)
+        if valor is not _SIN_VALOR:
+            return valor
+
+        with self._lock:
+            lock_clave = self._calculando.setdefault(clave, threading.Lock())
+        with lock_clave:
+            # Otro hilo pudo haberlo calculado mientras se esperaba el lock
+            with self._lock:
+                entrada = self._datos.get(clave)
+                if entrada is not None and entrada[0] > time.monotonic():
+                    return entrada[1]
+            try:
+                valor = calcular()
+                if cachear(valor):
+                    self.guardar(clave, valor)
+                return valor
+            finally:
+                with self._lock:
+                    self._calculando.pop(clave, None)
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._datos),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / total, 3) if total else None,
+            }
@@ -0,0 +1,147 @@
+"""
+Circuit breaker para servicios externos (Loyabit).
+
+- cerrado: las llamadas pasan y se registra su resultado y latencia
+- abierto: las llamadas fallan al instante con CircuitoAbiertoError, sin tocar
+  la red ni ocupar un worker esperando el timeout. Un hilo en segundo plano
+  sondea el servicio cada `segundos_abierto` y cierra el circuito cuando responde.
+
+Se abre con `fallos_consecutivos` fallos seguidos, o cuando en la ventana de las
+últimas `ventana` llamadas la proporción de fallos llega a `tasa_fallos`
+(las llamadas más lentas que `lentitud_ms` cuentan como fallo para la tasa).
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from fastapi import HTTPException
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+
+
+class CircuitoAbiertoError(HTTPException):
+    """El servicio se considera caído: se rechazó la llamada sin intentarla"""
+
+    def __init__(self, nombre: str):
+        super().__init__(
+            status_code=503,
+            detail=f"{nombre} no disponible temporalmente (circuito abierto); intente más tarde"
+        )
+
+
+class CircuitBreaker:
+    def __init__(self, nombre: str, fallos_consecutivos: int = 5, ventana: int = 20, tasa_fallos: float = 0.5,
+                 lentitud_ms: Optional[float] = None, segundos_abierto: float = 30.0,
+                 sondeo: Optional[Callable[[], bool]] = None):
+        self.nombre = nombre
+        self.fallos_consecutivos = fallos_consecutivos
+        self.tasa_fallos = tasa_fallos
+        self.lentitud_ms = lentitud_ms
+        self.segundos_abierto = segundos_abierto
+        # sondeo() -> True si el servicio respondió; sin sondeo se cierra al pasar segundos_abierto
+        self.sondeo = sondeo
+
+        self._lock = threading.Lock()
+        self._ventana = deque(maxlen=ventana)   # True = llamada sana
+        self._estado = CERRADO
+        self._consecutivos = 0
+        self._abierto_desde = None
+        self._aperturas = 0
+        self._rechazadas = 0
+        self._sondeos = 0
+        self._ultimo_error = None
+        self._hilo_sondeo = None
+
+    @property
+    def abierto(self) -> bool:
+        return self._estado == ABIERTO
+
+    def verificar(self):
+        """Lanza CircuitoAbiertoError si el circuito está abierto"""
+        if self._estado == ABIERTO:
+            with self._lock:
+                self._rechazadas += 1
+            raise CircuitoAbiertoError(self.nombre)
+
+    def registrar_exito(self, duracion_ms: float):
+        lenta = self.lentitud_ms is not None and duracion_ms > self.lentitud_ms
+        with self._lock:
+            # Llamadas que empezaron antes de abrirse no cuentan: decide el sondeo
+            if self._estado == ABIERTO:
+                return
+            self._ventana.append(not lenta)
+            self._consecutivos = 0
+            if lenta:
+                self._ultimo_error = f"Llamada lenta ({duracion_ms:.0f} ms)"
+            self._evaluar()
+
+    def registrar_fallo(self, error, duracion_ms: float):
+        with self._lock:
+            if self._estado == ABIERTO:
+                return
+            self._ventana.append(False)
+            self._consecutivos += 1
+            self._ultimo_error = str(error)[:200]
+            self._evaluar()
+
+    def _evaluar(self):
+        """Con self._lock tomado"""
+        ventana_llena = len(self._ventana) == self._ventana.maxlen
+        fallos = self._ventana.count(False)
+        if self._consecutivos >= self.fallos_consecutivos or (
+            ventana_llena and fallos / len(self._ventana) >= self.tasa_fallos
+        ):
+            self._abrir()
+
+    def _abrir(self):
+        """Con self._lock tomado"""
+        self._estado = ABIERTO
+        self._abierto_desde = time.time()
+        self._aperturas += 1
+        print(f"⚠️  Circuito {self.nombre} abierto: {self._ultimo_error}")
+        if self._hilo_sondeo is None or not self._hilo_sondeo.is_alive():
+            self._hilo_sondeo = threading.Thread(
+                target=self._ciclo_sondeo, name=f"sondeo-{self.nombre.lower()}", daemon=True
+            )
+            self._hilo_sondeo.start()
+
+    def _cerrar(self):
+        with self._lock:
+            self._estado = CERRADO
+            self._abierto_desde = None
+            self._consecutivos = 0
+            self._ventana.clear()
+        print(f"✅ Circuito {self.nombre} cerrado: el servicio volvió a responder")
+
+    def _ciclo_sondeo(self):
+        while self._estado == ABIERTO:
+            time.sleep(self.segundos_abierto)
+            with self._lock:
+                self._sondeos += 1
+            try:
+                recuperado = self.sondeo() if self.sondeo else True
+            except Exception as e:
+                recuperado = False
+                with self._lock:
+                    self._ultimo_error = f"Sondeo: {str(e)[:180]}"
+            if recuperado:
+                self._cerrar()
+
+    def estado(self):
+        """Estado del circuito para métricas"""
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "abierto_desde": (
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self._abierto_desde))
+                    if self._abierto_desde else None
+                ),
+                "llamadas_ventana": len(self._ventana),
+                "fallos_ventana": self._ventana.count(False),
+                "fallos_consecutivos": self._consecutivos,
+                "aperturas": self._aperturas,
+                "rechazadas": self._rechazadas,
+                "sondeos": self._sondeos,
+                "ultimo_error": self._ultimo_error,
+            }
@@ -1,105 +1,178 @@
 """
 Utilidades para conversión de unidades de medida
+
+El registro de unidades se arma una sola vez al importar el módulo:
+- cada unidad tiene un id canónico (los valores de UnidadMedidaEnum), una
+  dimensión (masa, volumen, conteo...) y su factor a la unidad base de la dimensión
+- los alias (kg, ml, litro, onza, cda...) se resuelven al id canónico
+- la matriz de factores entre todas las unidades de una misma dimensión se
+  precalcula, así convertir es un lookup y una multiplicación
 """
 from decimal import Decimal
+from functools import lru_cache
+from utils.normalize import UnidadMedidaEnum
 
-# Factores de conversión a unidades base
-FACTORES_CONVERSION = {
+
+class UnidadIncompatibleError(ValueError):
+    """Se intentó convertir entre unidades de dimensiones distintas (o desconocidas)"""
+
+
+# Unidades canónicas: id -> (dimensión, factor a la unidad base de la dimensión)
+# Bases: masa en gramos, volumen en mililitros, conteo en unidades
+UNIDADES = {
     # Masa
-    'kg': Decimal('1000'),      # 1 kg = 1000 gramos
-    'kilogramos': Decimal('1000'),  # Alias para kg
-    'kilogramo': Decimal('1000'),   # Singular
-    'gramos': Decimal('1'),    # Unidad base
-    'gramo': Decimal('1'),     # Singular
-    'onzas': Decimal('28.3495'),  # 1 onza = 28.3495 gramos
-    'onza': Decimal('28.3495'),    # Singular
-    
+    UnidadMedidaEnum.GRAMOS.value: ('masa', Decimal('1')),
+    UnidadMedidaEnum.KILOGRAMOS.value: ('masa', Decimal('1000')),
+    UnidadMedidaEnum.ONZAS.value: ('masa', Decimal('28.3495')),
+    UnidadMedidaEnum.LIBRAS.value: ('masa', Decimal('453.592')),
+
     # Volumen
-    'litros': Decimal('1000'),     # 1 litro = 1000 mililitros
-    'litro': Decimal('1000'),      # Singular
-    'mililitros': Decimal('1'),    # Unidad base
-    'mililitro': Decimal('1'),     # Singular
-    'ml': Decimal('1'),            # Abreviación
-    'onzas_fluidas': Decimal('29.5735'),  # 1 onza fluida = 29.5735 ml
-    'onza_fluida': Decimal('29.5735'),    # Singular
-    
-    # Unidades
-    'unidades': Decimal('1'),
-    'unidad': Decimal('1'),        # Singular
-    'piezas': Decimal('1'),
-    'pieza': Decimal('1'),          # Singular
+    UnidadMedidaEnum.MILILITROS.value: ('volumen', Decimal('1')),
+    UnidadMedidaEnum.LITROS.value: ('volumen', Decimal('1000')),
+    UnidadMedidaEnum.TAZAS.value: ('volumen', Decimal('240')),
+    UnidadMedidaEnum.CUCHARADAS.value: ('volumen', Decimal('15')),
+    UnidadMedidaEnum.CUCHARADITAS.value: ('volumen', Decimal('5')),
+    'onzas_fluidas': ('volumen', Decimal('29.5735')),
+
+    # Conteo: piezas y unidades son lo mismo; un paquete, una lata o una botella
+    # no tienen un número fijo de piezas, así que cada uno es su propia dimensión
+    UnidadMedidaEnum.UNIDADES.value: ('conteo', Decimal('1')),
+    UnidadMedidaEnum.PIEZAS.value: ('conteo', Decimal('1')),
+    UnidadMedidaEnum.PAQUETES.value: ('paquete', Decimal('1')),
+    UnidadMedidaEnum.LATAS.value: ('lata', Decimal('1')),
+    UnidadMedidaEnum.BOTELLAS.value: ('botella', Decimal('1')),
+}
+
+# Alias -> id canónico
+ALIAS = {
+    'kg': 'kilogramos', 'kgs': 'kilogramos', 'kilogramo': 'kilogramos', 'kilo': 'kilogramos', 'kilos': 'kilogramos',
+    'g': 'gramos', 'gr': 'gramos', 'grs': 'gramos', 'gramo': 'gramos',
+    'oz': 'onzas', 'onza': 'onzas',
+    'lb': 'libras', 'lbs': 'libras', 'libra': 'libras',
+    'ml': 'mililitros', 'mililitro': 'mililitros',
+    'l': 'litros', 'lt': 'litros', 'lts': 'litros', 'litro': 'litros',
+    'taza': 'tazas',
+    'cda': 'cucharadas', 'cucharada': 'cucharadas',
+    'cdta': 'cucharaditas', 'cucharadita': 'cucharaditas',
+    'onza_fluida': 'onzas_fluidas', 'fl oz': 'onzas_fluidas', 'fl_oz': 'onzas_fluidas',
+    'unidad': 'unidades', 'u': 'unidades',
+    'pieza': 'piezas', 'pza': 'piezas', 'pzas': 'piezas',
+    'paquete': 'paquetes',
+    'lata': 'latas',
+    'botella': 'botellas',
+}
+
+# Matriz de factores precalculada: (origen, destino) -> factor, sólo para pares compatibles
+_MATRIZ = {
+    (origen, destino): factor_origen / factor_destino
+    for origen, (dimension_origen, factor_origen) in UNIDADES.items()
+    for destino, (dimension_destino, factor_destino) in UNIDADES.items()
+    if dimension_origen == dimension_destino
 }
 
+# Compatibilidad con código anterior: factor a la unidad base por nombre o alias
+FACTORES_CONVERSION = {
+    **{unidad: factor for unidad, (_, factor) in UNIDADES.items()},
+    **{alias: UNIDADES[canonica][1] for alias, canonica in ALIAS.items()},
+}
+
+
+@lru_cache(maxsize=256)
+def normalizar_unidad(unidad: str) -> str:
+    """
+    Devuelve el id canónico de una unidad ('Kg ' -> 'kilogramos').
+    Las unidades desconocidas se devuelven normalizadas (minúsculas, sin espacios
+    extremos) para que al menos se reconozcan iguales entre sí.
+    """
+    unidad_limpia = ' '.join((unidad or '').lower().split())
+    return ALIAS.get(unidad_limpia, unidad_limpia)
+
+
+def dimension_de(unidad: str):
+    """Dimensión de la unidad (masa, volumen, conteo...) o None si es desconocida"""
+    registro = UNIDADES.get(normalizar_unidad(unidad))
+    return registro[0] if registro else None
+
+
+def factor_conversion(unidad_origen: str, unidad_destino: str) -> Decimal:
+    """
+    Factor para convertir de unidad_origen a unidad_destino.
+    Lanza UnidadIncompatibleError si las unidades no son de la misma dimensión.
+    Dos unidades desconocidas pero iguales se consideran la misma (factor 1).
+    """
+    origen = normalizar_unidad(unidad_origen)
+    destino = normalizar_unidad(unidad_destino)
+    if origen == destino:
+        return Decimal('1')
+    factor = _MATRIZ.get((origen, destino))
+    if factor is None:
+        raise UnidadIncompatibleError(f"No se puede convertir de '{unidad_origen}' a '{unidad_destino}'")
+    return factor
+
+
 def convertir_a_unidad_base(cantidad: Decimal, unidad: str) -> Decimal:
     """
     Convierte una cantidad a su unidad base
-    
+
     Masa: gramos (base)
     Volumen: mililitros (base)
     Unidades: unidades (base)
     """
-    unidad_lower = unidad.lower().strip()
-    
-    if unidad_lower in FACTORES_CONVERSION:
-        return cantidad * FACTORES_CONVERSION[unidad_lower]
-    
-    # Si no está en la lista, asumir que es 1:1 (unidades, piezas, etc.)
-    return cantidad
+    registro = UNIDADES.get(normalizar_unidad(unidad))
+
+    # Si no está en el registro, asumir que es 1:1 (no hay base a la cual llevarla)
+    return cantidad * registro[1] if registro else cantidad
+
 
 def convertir_desde_unidad_base(cantidad_base: Decimal, unidad_destino: str) -> Decimal:
     """
     Convierte una cantidad desde la unidad base a la unidad destino
     """
-    unidad_lower = unidad_destino.lower().strip()
-    
-    if unidad_lower in FACTORES_CONVERSION:
-        factor = FACTORES_CONVERSION[unidad_lower]
-        if factor > 0:
-            return cantidad_base / factor
-    
-    # Si no está en la lista, asumir que es 1:1
-    return cantidad_base
+    registro = UNIDADES.get(normalizar_unidad(unidad_destino))
+
+    # Si no está en el registro, asumir que es 1:1
+    return cantidad_base / registro[1] if registro else cantidad_base
+
 
 def convertir_unidades(cantidad: Decimal, unidad_origen: str, unidad_destino: str) -> Decimal:
     """
     Convierte una cantidad de una unidad a otra
-    
+
     Ejemplos:
     - convertir_unidades(1, 'litros', 'mililitros') -> 1000
     - convertir_unidades(1000, 'gramos', 'kg') -> 1
     - convertir_unidades(250, 'mililitros', 'litros') -> 0.25
+
+    Lanza UnidadIncompatibleError si las unidades no son compatibles.
     """
-    if unidad_origen.lower().strip() == unidad_destino.lower().strip():
-        return cantidad
-    
-    # Convertir a unidad base
-    cantidad_base = convertir_a_unidad_base(cantidad, unidad_origen)
-    
-    # Convertir desde unidad base a destino
-    cantidad_destino = convertir_desde_unidad_base(cantidad_base, unidad_destino)
-    
-    return cantidad_destino
+    return Decimal(str(cantidad)) * factor_conversion(unidad_origen, unidad_destino)
 
-def son_unidades_compatibles(unidad1: str, unidad2: str) -> bool:
+
+def convertir_lote(conversiones, estricto: bool = True):
     """
-    Verifica si dos unidades son compatibles (misma categoría: masa, volumen, unidades)
+    Convierte varias cantidades en una sola llamada (una receta o una comanda completa).
+
+    conversiones: iterable de (cantidad, unidad_origen, unidad_destino)
+    Retorna una lista de Decimal en el mismo orden. Con estricto=True la primera
+    conversión incompatible lanza UnidadIncompatibleError; con estricto=False esa
+    posición queda en None y el resto se convierte.
     """
-    unidad1_lower = unidad1.lower().strip()
-    unidad2_lower = unidad2.lower().strip()
-    
-    # Masa
-    masa = ['kg', 'gramos', 'onzas']
-    # Volumen
-    volumen = ['litros', 'mililitros', 'onzas_fluidas']
-    # Unidades
-    unidades = ['unidades', 'piezas']
-    
-    categorias = [masa, volumen, unidades]
-    
-    for categoria in categorias:
-        if unidad1_lower in categoria and unidad2_lower in categoria:
-            return True
-    
-    # Si no están en ninguna categoría conocida, asumir compatibles
-    return True
+    resultado = []
+    for cantidad, unidad_origen, unidad_destino in conversiones:
+        try:
+            resultado.append(Decimal(str(cantidad)) * factor_conversion(unidad_origen, unidad_destino))
+        except UnidadIncompatibleError:
+            if estricto:
+                raise
+            resultado.append(None)
+    return resultado
+
 
+def son_unidades_compatibles(unidad1: str, unidad2: str) -> bool:
+    """
+    Verifica si dos unidades son compatibles (misma dimensión: masa, volumen, conteo...)
+    Las unidades desconocidas sólo son compatibles consigo mismas.
+    """
+    origen = normalizar_unidad(unidad1)
+    destino = normalizar_unidad(unidad2)
+    return origen == destino or (origen, destino) in _MATRIZ
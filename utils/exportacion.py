@@ -0,0 +1,89 @@
+"""
+Serialización por bloques para exportaciones grandes (StreamingResponse).
+
+Las funciones reciben un iterable de bloques de filas (listas de tuplas, como las
+entrega cursor.fetchmany) y producen bytes a medida que llegan: nunca se arma el
+archivo completo en memoria.
+
+- csv_por_bloques: un fragmento de CSV por bloque (UTF-8 con BOM para Excel)
+- parquet_por_bloques: un row group de Parquet por bloque; requiere pyarrow
+  (dependencia opcional, ver requirements.txt)
+"""
+import csv
+import io
+
+
+class ExportacionNoDisponibleError(RuntimeError):
+    """El formato pedido necesita una dependencia que no está instalada"""
+
+
+def csv_por_bloques(columnas, bloques, bom: bool = True):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if bom:
+        buffer.write("\ufeff")
+    escritor.writerow(columnas)
+    for filas in bloques:
+        escritor.writerows(filas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _SalidaPorPartes(io.RawIOBase):
+    """Destino de ParquetWriter que acumula lo escrito hasta que se retira con vaciar()"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def importar_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportacionNoDisponibleError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def parquet_por_bloques(esquema, bloques, compresion: str = "snappy"):
+    """esquema: pyarrow.Schema con las columnas en el orden de las tuplas"""
+    pa = importar_pyarrow()
+    salida = _SalidaPorPartes()
+    escritor = pa.parquet.ParquetWriter(salida, esquema, compression=compresion)
+    try:
+        for filas in bloques:
+            if not filas:
+                continue
+            columnas = list(zip(*filas))
+            tabla = pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema
+            )
+            escritor.write_table(tabla)
+            datos = salida.vaciar()
+            if datos:
+                yield datos
+    finally:
+        # Escribe el pie del archivo (metadatos de los row groups)
+        escritor.close()
+    yield salida.vaciar()
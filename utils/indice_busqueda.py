@@ -0,0 +1,203 @@
+"""
+Índice de búsqueda en memoria para autocompletado
+
+- Prefijos: cada palabra del texto normalizado (sin acentos, minúsculas) se indexa
+  por todos sus prefijos, así "caf lech" encuentra "Café con leche"
+- Trigramas: si no hay suficientes coincidencias por prefijo se buscan textos
+  parecidos (tolera errores de dedo como "chocolte")
+- Facetas opcionales (p. ej. categoría) para filtrar y contar sin consultar MySQL
+
+Cada proceso tiene su propia copia del índice; quien lo usa se encarga de
+mantenerlo al día cuando cambian los datos.
+"""
+import threading
+from utils.normalize import normalizar_nombre
+
+LONGITUD_MAXIMA_PREFIJO = 15
+SIMILITUD_MINIMA_TRIGRAMAS = 0.3
+
+
+def trigramas(texto: str) -> set:
+    """Trigramas de cada palabra, con relleno para que cuenten inicio y fin"""
+    resultado = set()
+    for palabra in texto.split():
+        relleno = f"  {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
+
+
+class IndiceBusqueda:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._documentos = {}   # id -> {"texto", "datos", "facetas", "trigramas"}
+        self._prefijos = {}     # prefijo -> {id}
+        self._trigramas = {}    # trigrama -> {id}
+
+    def __len__(self):
+        return len(self._documentos)
+
+    def agregar(self, id_documento, texto: str, datos: dict = None, facetas: dict = None):
+        """Agrega o reemplaza un documento"""
+        texto_normalizado = normalizar_nombre(texto or "")
+        tris = trigramas(texto_normalizado)
+        with self._lock:
+            self._quitar(id_documento)
+            self._documentos[id_documento] = {
+                "texto": texto_normalizado,
+                "datos": datos or {},
+                "facetas": facetas or {},
+                "trigramas": tris,
+            }
+            for palabra in set(texto_normalizado.split()):
+                for i in range(1, min(len(palabra), LONGITUD_MAXIMA_PREFIJO) + 1):
+                    self._prefijos.setdefault(palabra[:i], set()).add(id_documento)
+            for tri in tris:
+                self._trigramas.setdefault(tri, set()).add(id_documento)
+
+    def eliminar(self, id_documento):
+        with self._lock:
+            self._quitar(id_documento)
+
+    def reconstruir(self, documentos):
+        """Reemplaza todo el contenido; documentos: iterable de (id, texto, datos, facetas)"""
+        with self._lock:
+            self._documentos.clear()
+            self._prefijos.clear()
+            self._trigramas.clear()
+            for id_documento, texto, datos, facetas in documentos:
+                self.agregar(id_documento, texto, datos, facetas)
+
+    def _quitar(self, id_documento):
+        documento = self._documentos.pop(id_documento, None)
+        if not documento:
+            return
+        for palabra in set(documento["texto"].split()):
+            for i in range(1, min(len(palabra), LONGITUD_MAXIMA_PREFIJO) + 1):
+                ids = self._prefijos.get(palabra[:i])
+                if ids is not None:
+                    ids.discard(id_documento)
+                    if not ids:
+                        del self._prefijos[palabra[:i]]
+        for tri in documento["trigramas"]:
+            ids = self._trigramas.get(tri)
+            if ids is not None:
+                ids.discard(id_documento)
+                if not ids:
+                    del self._trigramas[tri]
+
+    def buscar_exacto(self, texto: str):
+        """Id del documento cuyo texto normalizado es igual al dado, o None"""
+        texto_normalizado = normalizar_nombre(texto or "")
+        palabras = texto_normalizado.split()
+        if not palabras:
+            return None
+        with self._lock:
+            for id_documento in self._prefijos.get(palabras[0][:LONGITUD_MAXIMA_PREFIJO], ()):
+                if self._documentos[id_documento]["texto"] == texto_normalizado:
+                    return id_documento
+        return None
+
+    def _puntuar(self, consulta: str, limite: int, filtros: dict = None, difusa: bool = True) -> dict:
+        """
+        Candidatos de la consulta con su puntaje, sin aplicar filtros ni límite.
+        Los filtros sólo deciden si hacen falta trigramas: se buscan cuando las
+        coincidencias por prefijo que cumplen los filtros no llegan a `limite`.
+        """
+        texto_consulta = normalizar_nombre(consulta or "")
+        palabras = texto_consulta.split()
+        if not palabras:
+            return {id_documento: 0.0 for id_documento in self._documentos}
+
+        candidatos = None
+        for palabra in palabras:
+            ids = self._prefijos.get(palabra[:LONGITUD_MAXIMA_PREFIJO], set())
+            candidatos = set(ids) if candidatos is None else candidatos & ids
+            if not candidatos:
+                break
+        puntajes = {}
+        for id_documento in candidatos or ():
+            texto = self._documentos[id_documento]["texto"]
+            if texto == texto_consulta:
+                puntajes[id_documento] = 3.0
+            elif texto.startswith(texto_consulta):
+                puntajes[id_documento] = 2.0
+            else:
+                puntajes[id_documento] = 1.0
+
+        coincidencias = sum(1 for id_documento in puntajes if not filtros or self._cumple_filtros(id_documento, filtros))
+        if difusa and coincidencias < limite and len(texto_consulta) >= 3:
+            tris_consulta = trigramas(texto_consulta)
+            comunes = {}
+            for tri in tris_consulta:
+                for id_documento in self._trigramas.get(tri, ()):
+                    comunes[id_documento] = comunes.get(id_documento, 0) + 1
+            for id_documento, compartidos in comunes.items():
+                if id_documento in puntajes:
+                    continue
+                total = len(tris_consulta) + len(self._documentos[id_documento]["trigramas"]) - compartidos
+                similitud = compartidos / total if total else 0
+                if similitud >= SIMILITUD_MINIMA_TRIGRAMAS:
+                    puntajes[id_documento] = round(similitud, 3)
+        return puntajes
+
+    def _ordenar(self, puntajes: dict, limite: int, filtros: dict = None):
+        if filtros:
+            puntajes = {
+                id_documento: puntaje for id_documento, puntaje in puntajes.items()
+                if self._cumple_filtros(id_documento, filtros)
+            }
+        ordenados = sorted(
+            puntajes.items(),
+            key=lambda par: (-par[1], len(self._documentos[par[0]]["texto"]), self._documentos[par[0]]["texto"])
+        )[:limite]
+        return [
+            {"id": id_documento, "puntaje": puntaje, **self._documentos[id_documento]["datos"]}
+            for id_documento, puntaje in ordenados
+        ]
+
+    def _contar(self, faceta: str, ids) -> dict:
+        conteo = {}
+        for id_documento in ids:
+            valor = self._documentos[id_documento]["facetas"].get(faceta)
+            if valor is not None:
+                conteo[valor] = conteo.get(valor, 0) + 1
+        return conteo
+
+    def buscar(self, consulta: str, limite: int = 10, filtros: dict = None, difusa: bool = True):
+        """
+        Retorna hasta `limite` resultados ordenados por relevancia:
+        [{"id": ..., "puntaje": float, **datos}]
+
+        Puntaje: 3 texto idéntico, 2 el texto empieza con la consulta, 1 todas las
+        palabras de la consulta son prefijo de alguna palabra; las coincidencias
+        por trigramas puntúan su similitud (0 a 1). Los empates prefieren textos cortos.
+        """
+        with self._lock:
+            return self._ordenar(self._puntuar(consulta, limite, filtros, difusa), limite, filtros)
+
+    def buscar_con_facetas(self, consulta: str, faceta: str, limite: int = 10, filtros: dict = None,
+                           difusa: bool = True):
+        """
+        Como buscar, y además cuenta por valor de `faceta` los mismos candidatos que
+        se puntuaron (incluidos los de trigramas), antes de aplicar filtros y límite.
+        Retorna (resultados, conteo).
+        """
+        with self._lock:
+            puntajes = self._puntuar(consulta, limite, filtros, difusa)
+            return self._ordenar(puntajes, limite, filtros), self._contar(faceta, puntajes)
+
+    def contar_facetas(self, faceta: str, consulta: str = None) -> dict:
+        """Cuántos documentos hay por valor de la faceta (opcionalmente sólo los que coinciden con la consulta)"""
+        with self._lock:
+            if consulta:
+                return self._contar(faceta, self._puntuar(consulta, len(self._documentos)))
+            return self._contar(faceta, self._documentos)
+
+    def _cumple_filtros(self, id_documento, filtros: dict) -> bool:
+        facetas = self._documentos[id_documento]["facetas"]
+        for nombre, valor in filtros.items():
+            if valor is None:
+                continue
+            if normalizar_nombre(str(facetas.get(nombre) or "")) != normalizar_nombre(str(valor)):
+                return False
+        return True
@@ -3,9 +3,72 @@ Cliente para integración con API de Loyabit
 Ajusta las URLs y endpoints según la documentación oficial de Loyabit
 """
 import os
+import random
+import json
+import threading
+import time
+from collections import deque, namedtuple
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any
 from fastapi import HTTPException
+from utils.circuit_breaker import CircuitBreaker
+
+# Métodos que se pueden repetir sin efectos duplicados
+METODOS_IDEMPOTENTES = {"GET", "PUT", "DELETE"}
+# Respuestas que indican un problema temporal del lado de Loyabit
+ESTADOS_REINTENTABLES = {429, 502, 503, 504}
+
+# Lo que _enviar ya leyó de la respuesta (la conexión ya volvió al pool)
+RespuestaLoyabit = namedtuple("RespuestaLoyabit", ["status_code", "headers", "contenido"])
+
+
+def _detalle_error(contenido: bytes):
+    """Cuerpo de una respuesta de error: JSON si se puede, si no el texto"""
+    try:
+        return json.loads(contenido)
+    except ValueError:
+        return contenido.decode("utf-8", errors="replace")
+
+
+class MetricasLoyabit:
+    """Latencia y resultado de las llamadas a Loyabit, por operación"""
+    
+    def __init__(self, muestras: int = 200):
+        self._lock = threading.Lock()
+        self._muestras = muestras
+        self._operaciones = {}
+    
+    def registrar(self, operacion: str, duracion_ms: float, exito: bool, reintentos: int):
+        with self._lock:
+            datos = self._operaciones.setdefault(operacion, {
+                "llamadas": 0, "errores": 0, "reintentos": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "recientes": deque(maxlen=self._muestras)
+            })
+            datos["llamadas"] += 1
+            datos["errores"] += 0 if exito else 1
+            datos["reintentos"] += reintentos
+            datos["total_ms"] += duracion_ms
+            datos["max_ms"] = max(datos["max_ms"], duracion_ms)
+            datos["recientes"].append(duracion_ms)
+    
+    def resumen(self) -> Dict[str, Any]:
+        """Por operación: llamadas, errores, reintentos, promedio, p50, p95 y máximo (ms)"""
+        with self._lock:
+            resumen = {}
+            for operacion, datos in self._operaciones.items():
+                recientes = sorted(datos["recientes"])
+                resumen[operacion] = {
+                    "llamadas": datos["llamadas"],
+                    "errores": datos["errores"],
+                    "reintentos": datos["reintentos"],
+                    "promedio_ms": round(datos["total_ms"] / datos["llamadas"], 2),
+                    "p50_ms": round(recientes[len(recientes) // 2], 2),
+                    "p95_ms": round(recientes[min(len(recientes) - 1, int(len(recientes) * 0.95))], 2),
+                    "max_ms": round(datos["max_ms"], 2),
+                }
+            return resumen
+
 
 class LoyabitClient:
     """Cliente para interactuar con la API de Loyabit"""
@@ -18,6 +81,33 @@ class LoyabitClient:
         self.base_url = os.getenv("LOYABIT_BASE_URL", "https://api.loyabit.com/v1")  # Ajustar según la URL real
         self.merchant_id = os.getenv("LOYABIT_MERCHANT_ID", "")
         
+        # Conectar debe ser rápido (si no, el servidor no está); leer puede tardar más
+        self.timeout = (
+            float(os.getenv("LOYABIT_CONNECT_TIMEOUT", "3.05")),
+            float(os.getenv("LOYABIT_READ_TIMEOUT", "10"))
+        )
+        # Plazo para toda la operación (incluye reintentos, esperas y la lectura del
+        # cuerpo): el read timeout de requests es por lectura de socket, no total
+        self.plazo_total = float(os.getenv("LOYABIT_TOTAL_TIMEOUT", "10"))
+        self.max_reintentos = int(os.getenv("LOYABIT_MAX_RETRIES", "2"))
+        self.backoff_base = float(os.getenv("LOYABIT_BACKOFF_BASE", "0.2"))
+        self.backoff_max = float(os.getenv("LOYABIT_BACKOFF_MAX", "2"))
+        self.pool_size = int(os.getenv("LOYABIT_POOL_SIZE", "10"))
+        
+        self.metricas = MetricasLoyabit()
+        self.endpoint_salud = os.getenv("LOYABIT_HEALTH_ENDPOINT", "health")  # Ajustar según la API
+        self.circuito = CircuitBreaker(
+            "Loyabit",
+            fallos_consecutivos=int(os.getenv("LOYABIT_CB_FALLOS", "5")),
+            ventana=int(os.getenv("LOYABIT_CB_VENTANA", "20")),
+            tasa_fallos=float(os.getenv("LOYABIT_CB_TASA_FALLOS", "0.5")),
+            lentitud_ms=float(os.getenv("LOYABIT_CB_LENTITUD_MS", "3000")),
+            segundos_abierto=float(os.getenv("LOYABIT_CB_SEGUNDOS_ABIERTO", "30")),
+            sondeo=self._sondear
+        )
+        self._session = None
+        self._session_lock = threading.Lock()
+        
         if not self.api_key or not self.api_secret:
             # Si no hay credenciales, el servicio funcionará pero no hará llamadas reales
             self.enabled = False
@@ -33,10 +123,91 @@ class LoyabitClient:
             # Agregar otros headers según la documentación de Loyabit
         }
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
+    def _get_session(self) -> requests.Session:
+        """
+        Sesión compartida con pool de conexiones keep-alive: las llamadas reutilizan
+        la conexión TCP+TLS en lugar de abrir una nueva cada vez.
+        Los reintentos los maneja _make_request (no urllib3) para poder medirlos.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adaptador)
+                    session.mount("http://", adaptador)
+                    session.headers.update(self._get_headers())
+                    self._session = session
+        return self._session
+    
+    def cerrar(self):
+        """Cierra las conexiones del pool"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+    
+    def _sondear(self) -> bool:
+        """Sondeo del circuito: cualquier respuesta que no sea 5xx indica que Loyabit está arriba"""
+        response = self._get_session().get(f"{self.base_url}/{self.endpoint_salud}", timeout=self.timeout)
+        response.close()
+        return response.status_code < 500
+    
+    def _enviar(self, session: requests.Session, method: str, url: str, data: Optional[Dict],
+                headers: Optional[Dict[str, str]], limite: float) -> RespuestaLoyabit:
+        """
+        Una petición que no puede pasar de `limite` (time.monotonic()): los timeouts
+        de conexión/lectura se recortan a lo que queda y el cuerpo se lee por
+        partes verificando el plazo, así una respuesta que llega gota a gota
+        tampoco lo excede. Retorna el estado, los headers y el cuerpo leído.
+        """
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise requests.exceptions.ReadTimeout("Plazo total de la operación agotado")
+        timeout = (min(self.timeout[0], restante), min(self.timeout[1], restante))
+        if method == "GET":
+            argumentos = {"params": data}
+        elif method == "DELETE":
+            argumentos = {}
+        else:
+            argumentos = {"json": data}
+        response = session.request(method, url, headers=headers, timeout=timeout, stream=True, **argumentos)
+        try:
+            partes = []
+            # read1 (urllib3 2.x) entrega lo que ya llegó sin esperar a llenar el bloque
+            leer = getattr(response.raw, "read1", None)
+            bloques = (
+                iter(lambda: leer(8192, decode_content=True), b"") if leer else response.iter_content(8192)
+            )
+            for parte in bloques:
+                partes.append(parte)
+                if time.monotonic() > limite:
+                    raise requests.exceptions.ReadTimeout("La respuesta de Loyabit excedió el plazo total")
+        finally:
+            response.close()
+        return RespuestaLoyabit(response.status_code, response.headers, b"".join(partes))
+    
+    def _espera_reintento(self, intento: int, response=None) -> float:
+        """Backoff exponencial con jitter completo; respeta Retry-After si viene en segundos"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+    
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, operacion: Optional[str] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Realiza una petición HTTP a la API de Loyabit
         Ajusta según el formato que use la API de Loyabit
+        
+        GET/PUT/DELETE se reintentan (hasta max_reintentos) ante errores de red,
+        timeouts y respuestas 429/502/503/504. POST sólo se reintenta si no se
+        llegó a conectar, porque repetirlo podría duplicar la operación, salvo
+        que lleve header Idempotency-Key.
+        
+        Toda la operación respeta plazo_total. Si el circuito está abierto falla
+        al instante con CircuitoAbiertoError (503) sin llamar a Loyabit.
         """
         if not self.enabled:
             raise HTTPException(
@@ -44,42 +215,70 @@ class LoyabitClient:
                 detail="Servicio de Loyabit no configurado. Configura las variables de entorno LOYABIT_API_KEY y LOYABIT_API_SECRET"
             )
         
+        method = method.upper()
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"Método HTTP no soportado: {method}")
+        
+        self.circuito.verificar()
+        
         url = f"{self.base_url}/{endpoint}"
+        operacion = operacion or f"{method} {endpoint.split('/')[0]}"
+        idempotente = method in METODOS_IDEMPOTENTES or "Idempotency-Key" in (headers or {})
+        session = self._get_session()
+        inicio = time.perf_counter()
+        limite = time.monotonic() + self.plazo_total
+        intento = 0
+        exito = False
+        # Para el circuito sólo cuentan las fallas del servicio (red, timeouts,
+        # 5xx, 429), no los rechazos del contenido (4xx)
+        falla_servicio = None
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self._get_headers(), params=data, timeout=10)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self._get_headers(), json=data, timeout=10)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=self._get_headers(), json=data, timeout=10)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=self._get_headers(), timeout=10)
-            else:
-                raise ValueError(f"Método HTTP no soportado: {method}")
-            
-            response.raise_for_status()
-            return response.json()
-            
+            while True:
+                try:
+                    response = self._enviar(session, method, url, data, headers, limite)
+                    
+                    if idempotente and response.status_code in ESTADOS_REINTENTABLES and intento < self.max_reintentos:
+                        espera = self._espera_reintento(intento, response)
+                        if time.monotonic() + espera < limite:
+                            time.sleep(espera)
+                            intento += 1
+                            continue
+                    
+                    if response.status_code >= 500 or response.status_code == 429:
+                        falla_servicio = f"HTTP {response.status_code}"
+                    if response.status_code >= 400:
+                        error_detail = _detalle_error(response.contenido)
+                        print(f"Error en petición a Loyabit: HTTP {response.status_code} {url}")
+                        raise HTTPException(
+                            status_code=response.status_code,
+                            detail=f"Error en API de Loyabit: {error_detail}"
+                        )
+                    resultado = json.loads(response.contenido) if response.contenido else None
+                    exito = True
+                    return resultado
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    reintentable = idempotente or isinstance(e, requests.exceptions.ConnectTimeout)
+                    espera = self._espera_reintento(intento)
+                    if not reintentable or intento >= self.max_reintentos or time.monotonic() + espera >= limite:
+                        falla_servicio = str(e)
+                        raise
+                    time.sleep(espera)
+                    intento += 1
         except requests.exceptions.RequestException as e:
             # Log del error (en producción usar un logger apropiado)
             print(f"Error en petición a Loyabit: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    raise HTTPException(
-                        status_code=e.response.status_code,
-                        detail=f"Error en API de Loyabit: {error_detail}"
-                    )
-                except:
-                    raise HTTPException(
-                        status_code=e.response.status_code,
-                        detail=f"Error en API de Loyabit: {e.response.text}"
-                    )
             raise HTTPException(
-                status_code=500,
+                status_code=504 if isinstance(e, requests.exceptions.Timeout) else 502,
                 detail=f"Error de conexión con Loyabit: {str(e)}"
             )
+        finally:
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            self.metricas.registrar(operacion, duracion_ms, exito, intento)
+            if falla_servicio:
+                self.circuito.registrar_fallo(falla_servicio, duracion_ms)
+            else:
+                self.circuito.registrar_exito(duracion_ms)
     
     def crear_cliente(self, cliente_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -103,7 +302,37 @@ class LoyabitClient:
         }
         
         # Ajustar el endpoint según la documentación
-        return self._make_request("POST", "customers", payload)
+        return self._make_request("POST", "customers", payload, operacion="crear_cliente")
+    
+    def crear_clientes_lote(self, clientes_data: list) -> list:
+        """
+        Crea o vincula (por email) varios clientes en una sola llamada.
+        Ajustar el endpoint y la respuesta según la documentación de Loyabit.
+        
+        Args:
+            clientes_data: Lista de diccionarios con los datos de cada cliente
+            
+        Returns:
+            Lista de {"email", "id"} de los clientes creados o encontrados.
+            Lanza HTTPException 404/405/501 si la API no tiene operaciones en lote.
+        """
+        payload = {
+            "customers": [
+                {
+                    "name": f"{cliente.get('nombre')} {cliente.get('apellido_paterno', '')}",
+                    "first_name": cliente.get('nombre'),
+                    "last_name": cliente.get('apellido_paterno', ''),
+                    "email": cliente.get('correo'),
+                    "phone": cliente.get('celular'),
+                }
+                for cliente in clientes_data
+            ],
+            "match_by": "email",  # no duplicar clientes que ya existan
+        }
+        response = self._make_request("POST", "customers/bulk_upsert", payload, operacion="crear_clientes_lote")
+        if isinstance(response, dict):
+            return response.get("data", [])
+        return response or []
     
     def obtener_cliente(self, loyabit_id: str) -> Dict[str, Any]:
         """
@@ -115,7 +344,7 @@ class LoyabitClient:
         Returns:
             Diccionario con la información del cliente
         """
-        return self._make_request("GET", f"customers/{loyabit_id}")
+        return self._make_request("GET", f"customers/{loyabit_id}", operacion="obtener_cliente")
     
     def buscar_cliente_por_email(self, email: str) -> Optional[Dict[str, Any]]:
         """
@@ -130,7 +359,7 @@ class LoyabitClient:
         """
         try:
             # Ajustar el endpoint según la documentación
-            response = self._make_request("GET", "customers/search", {"email": email})
+            response = self._make_request("GET", "customers/search", {"email": email}, operacion="buscar_cliente_por_email")
             # Ajustar según la estructura de respuesta
             if response and isinstance(response, dict) and "data" in response:
                 customers = response.get("data", [])
@@ -163,7 +392,7 @@ class LoyabitClient:
             "phone": cliente_data.get('celular'),
         }
         
-        return self._make_request("PUT", f"customers/{loyabit_id}", payload)
+        return self._make_request("PUT", f"customers/{loyabit_id}", payload, operacion="actualizar_cliente")
     
     def obtener_puntos_cliente(self, loyabit_id: str) -> Dict[str, Any]:
         """
@@ -176,9 +405,9 @@ class LoyabitClient:
             Diccionario con información de puntos
         """
         # Ajustar el endpoint según la documentación
-        return self._make_request("GET", f"customers/{loyabit_id}/points")
+        return self._make_request("GET", f"customers/{loyabit_id}/points", operacion="obtener_puntos")
     
-    def agregar_puntos(self, loyabit_id: str, puntos: float, motivo: str = "Compra") -> Dict[str, Any]:
+    def agregar_puntos(self, loyabit_id: str, puntos: float, motivo: str = "Compra", referencia: Optional[str] = None) -> Dict[str, Any]:
         """
         Agrega puntos a un cliente en Loyabit
         
@@ -186,6 +415,8 @@ class LoyabitClient:
             loyabit_id: ID del cliente en Loyabit
             puntos: Cantidad de puntos a agregar
             motivo: Motivo por el cual se agregan puntos
+            referencia: Clave única del movimiento; se envía como Idempotency-Key
+                para que un reenvío no duplique los puntos
             
         Returns:
             Diccionario con la respuesta de Loyabit
@@ -195,11 +426,16 @@ class LoyabitClient:
             "reason": motivo,
             # Agregar otros campos según la documentación
         }
+        if referencia:
+            payload["reference"] = referencia
         
         # Ajustar el endpoint según la documentación
-        return self._make_request("POST", f"customers/{loyabit_id}/points/add", payload)
+        return self._make_request(
+            "POST", f"customers/{loyabit_id}/points/add", payload, operacion="agregar_puntos",
+            headers={"Idempotency-Key": referencia} if referencia else None
+        )
     
-    def canjear_puntos(self, loyabit_id: str, puntos: float, motivo: str = "Canje") -> Dict[str, Any]:
+    def canjear_puntos(self, loyabit_id: str, puntos: float, motivo: str = "Canje", referencia: Optional[str] = None) -> Dict[str, Any]:
         """
         Canjea puntos de un cliente en Loyabit
         
@@ -207,6 +443,7 @@ class LoyabitClient:
             loyabit_id: ID del cliente en Loyabit
             puntos: Cantidad de puntos a canjear
             motivo: Motivo del canje
+            referencia: Clave única del movimiento (Idempotency-Key)
             
         Returns:
             Diccionario con la respuesta de Loyabit
@@ -215,9 +452,14 @@ class LoyabitClient:
             "points": puntos,
             "reason": motivo,
         }
+        if referencia:
+            payload["reference"] = referencia
         
         # Ajustar el endpoint según la documentación
-        return self._make_request("POST", f"customers/{loyabit_id}/points/redeem", payload)
+        return self._make_request(
+            "POST", f"customers/{loyabit_id}/points/redeem", payload, operacion="canjear_puntos",
+            headers={"Idempotency-Key": referencia} if referencia else None
+        )
 
 # Instancia global del cliente (singleton)
 _loyabit_client = None
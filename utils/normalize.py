@@ -1,5 +1,5 @@
 """
-Utilidades para normalizar nombres de insumos y manejar unidades de medida
+Utilidades para normalizar nombres de insumos y clientes, y manejar unidades de medida
 """
 import unicodedata
 import re
@@ -47,3 +47,17 @@ def normalizar_nombre(nombre: str) -> str:
     return nombre
 
 
+
+def normalizar_celular(celular: str) -> str:
+    """
+    Deja sólo los dígitos de un teléfono; si trae lada de país se conservan los
+    últimos 10 dígitos.
+    
+    Ejemplo: "+52 (55) 1234-5678" -> "5512345678"
+    """
+    digitos = re.sub(r'\D', '', celular or '')
+    return digitos[-10:] if len(digitos) > 10 else digitos
+
+def normalizar_nombre_cliente(nombre: str, apellido_paterno: str = None, apellido_materno: str = None) -> str:
+    """Nombre completo normalizado: "José Pérez" -> "jose perez" """
+    return normalizar_nombre(' '.join(p for p in (nombre, apellido_paterno, apellido_materno) if p))
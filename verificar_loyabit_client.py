@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Verificación del cliente de Loyabit (utils/loyabit_client.py) contra un
+servidor HTTP mínimo levantado en este mismo proceso, sin credenciales reales
+ni base de datos.
+
+Comprueba:
+1. keep-alive: varias llamadas seguidas reutilizan una sola conexión TCP
+2. reintento: un POST con Idempotency-Key que recibe 503 se repite con la
+   misma clave y termina con la respuesta 200
+3. error 4xx: llega como HTTPException con el detalle del cuerpo y sin reintentar
+
+Uso:
+    python verificar_loyabit_client.py
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorPrueba(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ManejadorPrueba)
+        self.lock = threading.Lock()
+        self.conexiones = set()          # (host, puerto) del cliente por conexión
+        self.claves_recibidas = []       # Idempotency-Key de cada POST a points/add
+        self.fallas_pendientes = 0       # cuántos 503 responder antes del 200
+
+
+class ManejadorPrueba(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.conexiones.add(self.client_address)
+        if self.path.startswith("/customers/no-existe"):
+            self._responder(404, {"message": "Cliente no encontrado"})
+        else:
+            self._responder(200, {"id": self.path.split("/")[2], "points": 10})
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(largo)
+        with self.server.lock:
+            self.server.conexiones.add(self.client_address)
+            self.server.claves_recibidas.append(self.headers.get("Idempotency-Key"))
+            fallar = self.server.fallas_pendientes > 0
+            if fallar:
+                self.server.fallas_pendientes -= 1
+        if fallar:
+            self._responder(503, {"message": "No disponible"})
+        else:
+            self._responder(200, {"ok": True})
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def main():
+    servidor = ServidorPrueba()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    os.environ.update({
+        "LOYABIT_BASE_URL": f"http://127.0.0.1:{servidor.server_address[1]}",
+        "LOYABIT_API_KEY": "prueba",
+        "LOYABIT_API_SECRET": "prueba",
+        "LOYABIT_MAX_RETRIES": "2",
+        "LOYABIT_BACKOFF_BASE": "0.01",
+        "LOYABIT_BACKOFF_MAX": "0.05",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from fastapi import HTTPException
+    from utils.loyabit_client import LoyabitClient
+
+    cliente = LoyabitClient()
+    fallos = []
+
+    def verificar(condicion, mensaje):
+        print(f"{'✅' if condicion else '❌'} {mensaje}")
+        if not condicion:
+            fallos.append(mensaje)
+
+    try:
+        # 1. keep-alive
+        for _ in range(5):
+            respuesta = cliente.obtener_cliente("abc")
+        verificar(respuesta.get("points") == 10, "La respuesta JSON se lee del cuerpo ya descargado")
+        verificar(
+            len(servidor.conexiones) == 1,
+            f"5 llamadas seguidas usan una sola conexión (conexiones: {len(servidor.conexiones)})"
+        )
+
+        # 2. reintento con la misma Idempotency-Key
+        servidor.fallas_pendientes = 1
+        respuesta = cliente.agregar_puntos("abc", 5, referencia="mov-123")
+        verificar(respuesta == {"ok": True}, "Tras el 503 el reintento devuelve la respuesta 200")
+        verificar(
+            servidor.claves_recibidas == ["mov-123", "mov-123"],
+            f"El reintento repite la misma Idempotency-Key (recibidas: {servidor.claves_recibidas})"
+        )
+        verificar(cliente.metricas.resumen()["agregar_puntos"]["reintentos"] == 1, "Las métricas cuentan 1 reintento")
+
+        # 3. error 4xx
+        try:
+            cliente.obtener_cliente("no-existe")
+            verificar(False, "Un 404 debe lanzar HTTPException")
+        except HTTPException as e:
+            verificar(
+                e.status_code == 404 and "Cliente no encontrado" in e.detail,
+                f"Un 404 llega como HTTPException con el detalle ({e.status_code}: {e.detail})"
+            )
+        verificar(
+            cliente.metricas.resumen()["obtener_cliente"]["reintentos"] == 0, "Un 404 no se reintenta"
+        )
+    finally:
+        cliente.cerrar()
+        servidor.shutdown()
+
+    if fallos:
+        print(f"\n❌ {len(fallos)} verificación(es) fallaron")
+        sys.exit(1)
+    print("\n✅ Cliente de Loyabit verificado")
+
+
+if __name__ == "__main__":
+    main()